@@ -0,0 +1,170 @@
+"""
+    Benchmark of the DeepSpeech feature pipeline: loop-based reference vs vectorized routines.
+
+    Reports seconds per minute of audio for the post-processing (interpolation + windowing), and,
+    when wav files are given, for the whole extraction (MFCC + network + post-processing).
+
+    Examples:
+        python benchmark_ds_features.py --minutes 10
+        python benchmark_ds_features.py --input /path/to/wavs --batch-size 8
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+from deepspeech_store import get_deepspeech_model_file
+from deepspeech_features import (conv_audio_to_deepspeech_input_vector, conv_audios_to_deepspeech,
+                                 conv_network_output_to_features, load_audio_file, make_windows,
+                                 prepare_deepspeech_net, resample_audio)
+import tensorflow.compat.v1 as tf
+
+DEEPSPEECH_FPS = 50
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark DeepSpeech feature extraction",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10.0, help="synthetic audio length for post-processing")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions, best time is reported")
+    parser.add_argument("--input", type=str, help="directory with wav files for the end-to-end benchmark")
+    parser.add_argument("--deepspeech", type=str, default="~/.tensorflow/models/deepspeech-0_1_0-b90017e8.pb",
+                        help="path to DeepSpeech 0.1.0 frozen model")
+    parser.add_argument("--batch-size", type=int, default=8, help="files per network call")
+    return parser.parse_args()
+
+
+# ---------- loop-based reference (previous implementation) ----------
+
+def reference_interpolate_features(features, input_rate, output_rate, output_len):
+    input_len = features.shape[0]
+    num_features = features.shape[1]
+    input_timestamps = np.arange(input_len) / float(input_rate)
+    output_timestamps = np.arange(output_len) / float(output_rate)
+    output_features = np.zeros((output_len, num_features))
+    for feature_idx in range(num_features):
+        output_features[:, feature_idx] = np.interp(
+            x=output_timestamps,
+            xp=input_timestamps,
+            fp=features[:, feature_idx])
+    return output_features
+
+
+def reference_make_windows(features, window_size, window_stride):
+    windows = []
+    for window_index in range(0, features.shape[0] - window_size, window_stride):
+        windows.append(features[window_index:window_index + window_size])
+    return np.array(windows)
+
+
+def reference_postprocess(network_output, num_frames):
+    features = reference_interpolate_features(network_output[:, 0], DEEPSPEECH_FPS, DEEPSPEECH_FPS, num_frames)
+    features = reference_make_windows(features, 1, 1)
+    net_output = features.reshape(-1, 29)
+    zero_pad = np.zeros((8, 29))
+    return reference_make_windows(np.concatenate((zero_pad, net_output, zero_pad), axis=0), 16, 2)
+
+
+def vectorized_postprocess(network_output, num_frames):
+    features = conv_network_output_to_features(network_output, num_frames / float(DEEPSPEECH_FPS), 1, 1, num_frames)
+    net_output = features.reshape(-1, 29)
+    zero_pad = np.zeros((8, 29))
+    return make_windows(np.concatenate((zero_pad, net_output, zero_pad), axis=0), 16, 2)
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+# ---------- benchmarks ----------
+
+def bench_postprocess(minutes, repeat):
+    num_steps = int(minutes * 60 * DEEPSPEECH_FPS)
+    network_output = np.random.randn(num_steps, 1, 29).astype(np.float32)
+
+    ref_time, ref_result = best_time(lambda: reference_postprocess(network_output, num_steps), repeat)
+    vec_time, vec_result = best_time(lambda: vectorized_postprocess(network_output, num_steps), repeat)
+
+    assert ref_result.shape == vec_result.shape, (ref_result.shape, vec_result.shape)
+    max_diff = float(np.abs(ref_result - vec_result).max()) if ref_result.size else 0.0
+
+    print("post-processing ({:.1f} min of audio, output {}):".format(minutes, vec_result.shape))
+    print("  reference : {:.4f} s/audio-min".format(ref_time / minutes))
+    print("  vectorized: {:.4f} s/audio-min  (x{:.1f}, max abs diff {:.2e})".format(
+        vec_time / minutes, ref_time / max(vec_time, 1e-9), max_diff))
+
+
+def bench_end_to_end(input_dir, deepspeech_pb_path, batch_size, repeat):
+    wav_paths = sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir) if name.lower().endswith(".wav"))
+    if not wav_paths:
+        print("no wav files in {}".format(input_dir))
+        return
+
+    minutes = 0.0
+    for wav_path in wav_paths:
+        audio, sample_rate = load_audio_file(wav_path)
+        minutes += audio.shape[0] / float(sample_rate) / 60.0
+
+    out_dir = tempfile.mkdtemp(prefix="ds_bench_")
+
+    def run_reference():
+        graph, logits_ph, input_node_ph, input_lengths_ph = prepare_deepspeech_net(deepspeech_pb_path)
+        with tf.Session(graph=graph) as sess:
+            net_fn = lambda x: sess.run(logits_ph, feed_dict={input_node_ph: x[np.newaxis, ...],
+                                                             input_lengths_ph: [x.shape[0]]})
+            for i, wav_path in enumerate(wav_paths):
+                audio, sample_rate = load_audio_file(wav_path)
+                input_vector = conv_audio_to_deepspeech_input_vector(
+                    resample_audio(audio, sample_rate), sample_rate=16000, num_cepstrum=26, num_context=9)
+                num_frames = int(round(audio.shape[0] / float(sample_rate) * DEEPSPEECH_FPS))
+                np.save(os.path.join(out_dir, "ref_{}.npy".format(i)),
+                        reference_postprocess(net_fn(input_vector), num_frames))
+        tf.reset_default_graph()
+
+    def run_vectorized():
+        conv_audios_to_deepspeech(
+            audios=wav_paths,
+            out_files=[os.path.join(out_dir, "vec_{}.npy".format(i)) for i in range(len(wav_paths))],
+            num_frames_info=[None] * len(wav_paths),
+            deepspeech_pb_path=deepspeech_pb_path,
+            batch_size=batch_size)
+        tf.reset_default_graph()
+
+    ref_time, _ = best_time(run_reference, repeat)
+    vec_time, _ = best_time(run_vectorized, repeat)
+
+    max_diff = 0.0
+    for i in range(len(wav_paths)):
+        ref = np.load(os.path.join(out_dir, "ref_{}.npy".format(i)))
+        vec = np.load(os.path.join(out_dir, "vec_{}.npy".format(i)))
+        assert ref.shape == vec.shape, (wav_paths[i], ref.shape, vec.shape)
+        if ref.size:
+            max_diff = max(max_diff, float(np.abs(ref - vec).max()))
+
+    print("end-to-end ({} files, {:.1f} min of audio, batch size {}):".format(len(wav_paths), minutes, batch_size))
+    print("  reference : {:.3f} s/audio-min".format(ref_time / minutes))
+    print("  vectorized: {:.3f} s/audio-min  (x{:.1f}, max abs diff {:.2e})".format(
+        vec_time / minutes, ref_time / max(vec_time, 1e-9), max_diff))
+
+
+def main():
+    args = parse_args()
+    bench_postprocess(args.minutes, args.repeat)
+
+    if args.input:
+        deepspeech_pb_path = os.path.expanduser(args.deepspeech)
+        if not os.path.exists(deepspeech_pb_path):
+            deepspeech_pb_path = get_deepspeech_model_file()
+        bench_end_to_end(os.path.expanduser(args.input), deepspeech_pb_path, args.batch_size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
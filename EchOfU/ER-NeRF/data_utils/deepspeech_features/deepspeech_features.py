@@ -3,7 +3,8 @@
     NB: Based on VOCA code. See the corresponding license restrictions.
 """
 
-__all__ = ['conv_audios_to_deepspeech']
+__all__ = ['conv_audios_to_deepspeech', 'conv_audio_file_to_deepspeech', 'prepare_deepspeech_net',
+           'make_batched_net_fn']
 
 import numpy as np
 import warnings
@@ -13,15 +14,28 @@ from python_speech_features import mfcc
 import tensorflow.compat.v1 as tf
 tf.disable_v2_behavior()
 
+try:
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:  # numpy < 1.20
+    def sliding_window_view(x, window_shape, axis):
+        assert axis == 0
+        shape = (x.shape[0] - window_shape + 1,) + x.shape[1:] + (window_shape,)
+        strides = x.strides + (x.strides[0],)
+        return np.lib.stride_tricks.as_strided(x, shape=shape, strides=strides, writeable=False)
+
 def conv_audios_to_deepspeech(audios,
                               out_files,
                               num_frames_info,
                               deepspeech_pb_path,
                               audio_window_size=1,
-                              audio_window_stride=1):
+                              audio_window_stride=1,
+                              batch_size=8):
     """
     Convert list of audio files into files with DeepSpeech features.
 
+    All files are processed in one TensorFlow session. Up to `batch_size` files of similar length are
+    fed to the network in one call (padded to the longest one, trimmed back by `input_lengths`).
+
     Parameters
     ----------
     audios : list of str or list of None
@@ -36,43 +50,202 @@ def conv_audios_to_deepspeech(audios,
         Audio window size.
     audio_window_stride : int, default 1
         Audio window stride.
+    batch_size : int, default 8
+        Maximal number of audio files per network call (1 disables batching).
     """
     # deepspeech_pb_path="/disk4/keyu/DeepSpeech/deepspeech-0.9.2-models.pbmm"
     graph, logits_ph, input_node_ph, input_lengths_ph = prepare_deepspeech_net(
         deepspeech_pb_path)
 
     with tf.compat.v1.Session(graph=graph) as sess:
+        batched_net_fn = make_batched_net_fn(sess, logits_ph, input_node_ph, input_lengths_ph)
+
+        jobs = []
         for audio_file_path, out_file_path, num_frames in zip(audios, out_files, num_frames_info):
             print(audio_file_path)
             print(out_file_path)
-            audio_sample_rate, audio = wavfile.read(audio_file_path)
-            if audio.ndim != 1:
-                warnings.warn(
-                    "Audio has multiple channels, the first channel is used")
-                audio = audio[:, 0]
-            ds_features = pure_conv_audio_to_deepspeech(
-                audio=audio,
-                audio_sample_rate=audio_sample_rate,
-                audio_window_size=audio_window_size,
-                audio_window_stride=audio_window_stride,
-                num_frames=num_frames,
-                net_fn=lambda x: sess.run(
-                    logits_ph,
-                    feed_dict={
-                        input_node_ph: x[np.newaxis, ...],
-                        input_lengths_ph: [x.shape[0]]}))
-
-            net_output = ds_features.reshape(-1, 29)
-            win_size = 16
-            zero_pad = np.zeros((int(win_size / 2), net_output.shape[1]))
-            net_output = np.concatenate(
-                (zero_pad, net_output, zero_pad), axis=0)
-            windows = []
-            for window_index in range(0, net_output.shape[0] - win_size, 2):
-                windows.append(
-                    net_output[window_index:window_index + win_size])
-            print(np.array(windows).shape)
-            np.save(out_file_path, np.array(windows))
+            audio, audio_sample_rate = load_audio_file(audio_file_path)
+            input_vector = conv_audio_to_deepspeech_input_vector(
+                audio=resample_audio(audio, audio_sample_rate),
+                sample_rate=16000,
+                num_cepstrum=26,
+                num_context=9)
+            jobs.append((input_vector, audio.shape[0] / float(audio_sample_rate), num_frames, out_file_path))
+
+        # similar lengths in one batch keep the padding small
+        order = sorted(range(len(jobs)), key=lambda i: jobs[i][0].shape[0])
+        for start in range(0, len(order), max(1, batch_size)):
+            batch = [jobs[i] for i in order[start:start + max(1, batch_size)]]
+            network_outputs = batched_net_fn([job[0] for job in batch])
+            for (_, audio_len_s, num_frames, out_file_path), network_output in zip(batch, network_outputs):
+                ds_features = conv_network_output_to_features(
+                    network_output=network_output,
+                    audio_len_s=audio_len_s,
+                    audio_window_size=audio_window_size,
+                    audio_window_stride=audio_window_stride,
+                    num_frames=num_frames)
+                save_windowed_features(ds_features, out_file_path)
+
+
+def make_batched_net_fn(sess, logits_ph, input_node_ph, input_lengths_ph):
+    """
+    Create a function running DeepSpeech on several input vectors in one call.
+
+    Parameters
+    ----------
+    sess : obj
+        Open TensorFlow session.
+    logits_ph : obj
+        TensorFlow placeholder for `logits`.
+    input_node_ph : obj
+        TensorFlow placeholder for `input_node`.
+    input_lengths_ph : obj
+        TensorFlow placeholder for `input_lengths`.
+
+    Returns
+    -------
+    func
+        Function mapping a list of input vectors to a list of network outputs (time x 1 x 29),
+        the same layout a single-item call returns.
+    """
+    def run_single(x):
+        return sess.run(
+            logits_ph,
+            feed_dict={
+                input_node_ph: x[np.newaxis, ...],
+                input_lengths_ph: [x.shape[0]]})
+
+    state = {"batching": True}
+
+    def batched_net_fn(input_vectors):
+        if len(input_vectors) == 1 or not state["batching"]:
+            return [run_single(x) for x in input_vectors]
+
+        lengths = [x.shape[0] for x in input_vectors]
+        batch = np.zeros((len(input_vectors), max(lengths), input_vectors[0].shape[1]),
+                         dtype=input_vectors[0].dtype)
+        for i, x in enumerate(input_vectors):
+            batch[i, :x.shape[0]] = x
+        try:
+            logits = sess.run(
+                logits_ph,
+                feed_dict={
+                    input_node_ph: batch,
+                    input_lengths_ph: lengths})
+        except (tf.errors.InvalidArgumentError, ValueError) as e:
+            # graphs exported with a fixed batch of 1
+            warnings.warn("DeepSpeech graph does not accept batches, falling back to single calls: {}".format(e))
+            state["batching"] = False
+            return [run_single(x) for x in input_vectors]
+        # logits are time-major: (time, batch, 29)
+        return [logits[:length, i:i + 1] for i, length in enumerate(lengths)]
+
+    return batched_net_fn
+
+
+def conv_audio_file_to_deepspeech(audio_file_path,
+                                  out_file_path,
+                                  num_frames,
+                                  net_fn,
+                                  audio_window_size=1,
+                                  audio_window_stride=1):
+    """
+    Convert one audio file into a file with windowed DeepSpeech features.
+
+    Parameters
+    ----------
+    audio_file_path : str
+        Path to input audio file.
+    out_file_path : str
+        Path to output file with DeepSpeech features.
+    num_frames : int or None
+        Numbers of frames.
+    net_fn : func
+        Function for DeepSpeech model call (keeps an open session).
+    audio_window_size : int, default 1
+        Audio window size.
+    audio_window_stride : int, default 1
+        Audio window stride.
+    """
+    print(audio_file_path)
+    print(out_file_path)
+    audio, audio_sample_rate = load_audio_file(audio_file_path)
+    ds_features = pure_conv_audio_to_deepspeech(
+        audio=audio,
+        audio_sample_rate=audio_sample_rate,
+        audio_window_size=audio_window_size,
+        audio_window_stride=audio_window_stride,
+        num_frames=num_frames,
+        net_fn=net_fn)
+    save_windowed_features(ds_features, out_file_path)
+
+
+def load_audio_file(audio_file_path):
+    """
+    Read a wav file, keeping the first channel only.
+
+    Returns
+    -------
+    tuple of (np.array, int)
+        Audio data and sample rate.
+    """
+    audio_sample_rate, audio = wavfile.read(audio_file_path)
+    if audio.ndim != 1:
+        warnings.warn(
+            "Audio has multiple channels, the first channel is used")
+        audio = audio[:, 0]
+    return audio, audio_sample_rate
+
+
+def save_windowed_features(ds_features, out_file_path, win_size=16):
+    """
+    Save DeepSpeech features as overlapping windows (num_windows x 16 x 29), the layout ER-NeRF loads.
+
+    Parameters
+    ----------
+    ds_features : np.array
+        DeepSpeech features from `pure_conv_audio_to_deepspeech`.
+    out_file_path : str
+        Path to output file.
+    win_size : int, default 16
+        Window size.
+    """
+    net_output = ds_features.reshape(-1, 29)
+    zero_pad = np.zeros((int(win_size / 2), net_output.shape[1]))
+    net_output = np.concatenate(
+        (zero_pad, net_output, zero_pad), axis=0)
+    windows = make_windows(net_output, win_size, 2)
+    print(windows.shape)
+    np.save(out_file_path, windows)
+
+
+def make_windows(features, window_size, window_stride):
+    """
+    Cut overlapping windows along the first axis.
+
+    Equivalent to stacking features[i:i + window_size] for i in range(0, len - window_size, window_stride),
+    without the Python loop.
+
+    Parameters
+    ----------
+    features : np.array
+        Features (time x channels).
+    window_size : int
+        Window size.
+    window_stride : int
+        Window stride.
+
+    Returns
+    -------
+    np.array
+        Windows (num_windows x window_size x channels).
+    """
+    num_positions = features.shape[0] - window_size
+    if num_positions <= 0:
+        return np.array([])
+    # (time - window_size + 1, channels, window_size) -> (num_windows, window_size, channels)
+    windows = sliding_window_view(features, window_size, axis=0)[0:num_positions:window_stride]
+    return np.ascontiguousarray(windows.transpose(0, 2, 1))
 
 
 def prepare_deepspeech_net(deepspeech_pb_path):
@@ -139,15 +312,8 @@ def pure_conv_audio_to_deepspeech(audio,
         DeepSpeech features.
     """
     target_sample_rate = 16000
-    if audio_sample_rate != target_sample_rate:
-        resampled_audio = resampy.resample(
-            x=audio.astype(np.float),
-            sr_orig=audio_sample_rate,
-            sr_new=target_sample_rate)
-    else:
-        resampled_audio = audio.astype(np.float32)
     input_vector = conv_audio_to_deepspeech_input_vector(
-        audio=resampled_audio.astype(np.int16),
+        audio=resample_audio(audio, audio_sample_rate, target_sample_rate),
         sample_rate=target_sample_rate,
         num_cepstrum=26,
         num_context=9)
@@ -155,9 +321,61 @@ def pure_conv_audio_to_deepspeech(audio,
     network_output = net_fn(input_vector)
     # print(network_output.shape)
 
+    return conv_network_output_to_features(
+        network_output=network_output,
+        audio_len_s=float(audio.shape[0]) / audio_sample_rate,
+        audio_window_size=audio_window_size,
+        audio_window_stride=audio_window_stride,
+        num_frames=num_frames)
+
+
+def resample_audio(audio, audio_sample_rate, target_sample_rate=16000):
+    """
+    Resample audio to the DeepSpeech sample rate.
+
+    Returns
+    -------
+    np.array
+        Audio data as int16.
+    """
+    if audio_sample_rate != target_sample_rate:
+        resampled_audio = resampy.resample(
+            x=audio.astype(np.float64),
+            sr_orig=audio_sample_rate,
+            sr_new=target_sample_rate)
+    else:
+        resampled_audio = audio.astype(np.float32)
+    return resampled_audio.astype(np.int16)
+
+
+def conv_network_output_to_features(network_output,
+                                    audio_len_s,
+                                    audio_window_size,
+                                    audio_window_stride,
+                                    num_frames):
+    """
+    Resample raw DeepSpeech logits to the video frame rate and cut them into windows.
+
+    Parameters
+    ----------
+    network_output : np.array
+        DeepSpeech logits (time x 1 x 29).
+    audio_len_s : float
+        Audio duration in seconds.
+    audio_window_size : int
+        Audio window size.
+    audio_window_stride : int
+        Audio window stride.
+    num_frames : int or None
+        Numbers of frames.
+
+    Returns
+    -------
+    np.array
+        DeepSpeech features.
+    """
     deepspeech_fps = 50
     video_fps = 50  # Change this option if video fps is different
-    audio_len_s = float(audio.shape[0]) / audio_sample_rate
     if num_frames is None:
         num_frames = int(round(audio_len_s * video_fps))
     else:
@@ -172,12 +390,7 @@ def pure_conv_audio_to_deepspeech(audio,
     zero_pad = np.zeros((int(audio_window_size / 2), network_output.shape[1]))
     network_output = np.concatenate(
         (zero_pad, network_output, zero_pad), axis=0)
-    windows = []
-    for window_index in range(0, network_output.shape[0] - audio_window_size, audio_window_stride):
-        windows.append(
-            network_output[window_index:window_index + audio_window_size])
-
-    return np.array(windows)
+    return make_windows(network_output, audio_window_size, audio_window_stride)
 
 
 def conv_audio_to_deepspeech_input_vector(audio,
@@ -263,13 +476,16 @@ def interpolate_features(features,
         Interpolated data.
     """
     input_len = features.shape[0]
-    num_features = features.shape[1]
     input_timestamps = np.arange(input_len) / float(input_rate)
     output_timestamps = np.arange(output_len) / float(output_rate)
-    output_features = np.zeros((output_len, num_features))
-    for feature_idx in range(num_features):
-        output_features[:, feature_idx] = np.interp(
-            x=output_timestamps,
-            xp=input_timestamps,
-            fp=features[:, feature_idx])
+    if input_len == 1:
+        return np.repeat(features.astype(np.float64), output_len, axis=0)
+
+    # Same result as np.interp per column (clamped at both ends), for all columns at once:
+    right = np.clip(np.searchsorted(input_timestamps, output_timestamps, side="right"), 1, input_len - 1)
+    left = right - 1
+    weight = (output_timestamps - input_timestamps[left]) / (input_timestamps[right] - input_timestamps[left])
+    weight = np.clip(weight, 0.0, 1.0)[:, np.newaxis]
+    left_values = features[left].astype(np.float64)
+    output_features = left_values + (features[right] - left_values) * weight
     return output_features
@@ -0,0 +1,383 @@
+"""
+ER-NeRF resident worker.
+
+Keeps the DeepSpeech TF session and recently used NeRFNetwork checkpoints
+loaded between requests, so feature extraction and inference no longer pay
+for interpreter start-up, CUDA context creation and model loading on every call.
+
+Protocol (HTTP + JSON, default port 8888):
+    GET  /health                      -> {"ok": true, "result": {...worker info...}}
+    POST /rpc  {"method": ..., "params": {...}}
+                                      -> {"ok": true, "result": {...}}
+                                      -> {"ok": false, "error": "..."}
+    bad method or params: 400, failure inside the method: 500
+
+Methods:
+    extract_features(wav_path, output_path=None)        -> {"npy_path": ...}
+    infer(data_path, workspace, audio_npy_path, torso)  -> {"video_path": ...}
+    preprocess(video_path, task_id=None)                -> {"data_path": ...}
+
+Usage:
+    python ernerf_worker.py --host 0.0.0.0 --port 8888
+    python ernerf_worker.py --stand-in --port 8899   # no GPU / TF / torch needed
+"""
+
+import os
+import sys
+import json
+import glob
+import inspect
+import time
+import uuid
+import wave
+import argparse
+import threading
+import subprocess
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROTOCOL_VERSION = 1
+
+# DeepSpeech features: 50 windows per second of audio, each window 16 x 29
+DS_WINDOWS_PER_SECOND = 50
+DS_WINDOW_SHAPE = (16, 29)
+
+
+class WorkerError(Exception):
+    """Error reported back to the client as {"ok": false}."""
+
+
+# ==============================================================================
+# Backends
+# ==============================================================================
+
+class WorkerBackend:
+    """RPC methods shared by the real and the stand-in worker."""
+
+    name = "base"
+    METHODS = ("extract_features", "infer", "preprocess")
+
+    def __init__(self):
+        # one GPU per worker: run heavy requests one at a time, /health stays responsive
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.requests_served = 0
+
+    def info(self):
+        return {
+            "backend": self.name,
+            "protocol": PROTOCOL_VERSION,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at, 1),
+            "requests_served": self.requests_served,
+        }
+
+    def call(self, method, params):
+        if method not in self.METHODS:
+            raise WorkerError(f"unknown method: {method}")
+        func = getattr(self, method)
+        try:
+            inspect.signature(func).bind(**params)
+        except TypeError as e:
+            raise WorkerError(f"bad params for {method}: {e}")
+        with self._lock:
+            result = func(**params)
+            self.requests_served += 1
+            return result
+
+    @staticmethod
+    def _default_npy_path(wav_path):
+        return os.path.splitext(wav_path)[0] + ".npy"
+
+    @staticmethod
+    def _require_file(path, what):
+        if not path or not os.path.isfile(path):
+            raise WorkerError(f"{what} not found: {path}")
+
+
+class ERNeRFBackend(WorkerBackend):
+    """Real worker: DeepSpeech session and NeRF trainers stay resident."""
+
+    name = "ernerf"
+
+    def __init__(self, max_models=2, entrypoint="/workspace/scripts/entrypoint.sh"):
+        super().__init__()
+        self.max_models = max_models
+        self.entrypoint = entrypoint
+        self._ds_net_fn = None
+        self._ds_session = None
+        self._trainers = OrderedDict()  # key -> Trainer (LRU)
+
+    def info(self):
+        info = super().info()
+        info.update({
+            "deepspeech_loaded": self._ds_net_fn is not None,
+            "resident_models": [key[0] for key in self._trainers],
+            "max_models": self.max_models,
+        })
+        return info
+
+    # ---------- DeepSpeech ----------
+
+    def _get_deepspeech(self):
+        if self._ds_net_fn is not None:
+            return self._ds_net_fn
+
+        sys.path.insert(0, os.path.join(ROOT_DIR, "data_utils", "deepspeech_features"))
+        import numpy as np
+        import tensorflow.compat.v1 as tf
+        from deepspeech_features import prepare_deepspeech_net
+        from deepspeech_store import get_deepspeech_model_file
+
+        pb_path = os.path.expanduser("~/.tensorflow/models/deepspeech-0_1_0-b90017e8.pb")
+        if not os.path.exists(pb_path):
+            pb_path = get_deepspeech_model_file()
+
+        print(f"[worker] loading DeepSpeech graph: {pb_path}", flush=True)
+        graph, logits_ph, input_node_ph, input_lengths_ph = prepare_deepspeech_net(pb_path)
+
+        # share the GPU with torch: do not let TF grab all memory up front
+        config = tf.ConfigProto()
+        config.gpu_options.allow_growth = True
+        self._ds_session = tf.Session(graph=graph, config=config)
+
+        session = self._ds_session
+        self._ds_net_fn = lambda x: session.run(
+            logits_ph,
+            feed_dict={
+                input_node_ph: x[np.newaxis, ...],
+                input_lengths_ph: [x.shape[0]]})
+        return self._ds_net_fn
+
+    def extract_features(self, wav_path, output_path=None):
+        self._require_file(wav_path, "audio file")
+        net_fn = self._get_deepspeech()
+        from deepspeech_features import conv_audio_file_to_deepspeech  # path set by _get_deepspeech
+
+        output_path = output_path or self._default_npy_path(wav_path)
+        conv_audio_file_to_deepspeech(
+            audio_file_path=wav_path,
+            out_file_path=output_path,
+            num_frames=None,
+            net_fn=net_fn)
+        return {"npy_path": output_path}
+
+    # ---------- NeRF inference ----------
+
+    @staticmethod
+    def _checkpoint_signature(workspace):
+        checkpoints = sorted(glob.glob(os.path.join(workspace, "checkpoints", "ngp_ep*.pth")))
+        if not checkpoints:
+            return None
+        latest = checkpoints[-1]
+        return os.path.basename(latest), os.path.getmtime(latest)
+
+    def _get_trainer(self, opt):
+        import torch
+        from nerf_triplane.network import NeRFNetwork
+        from nerf_triplane.utils import Trainer
+
+        workspace = os.path.abspath(opt.workspace)
+        # a newer checkpoint (e.g. after another training stage) invalidates the resident model
+        key = (workspace, os.path.abspath(opt.path), opt.torso, self._checkpoint_signature(workspace))
+
+        trainer = self._trainers.get(key)
+        if trainer is not None:
+            self._trainers.move_to_end(key)
+            return trainer
+
+        for stale_key in [k for k in self._trainers if k[0] == workspace]:
+            del self._trainers[stale_key]
+        while len(self._trainers) >= self.max_models:
+            self._trainers.popitem(last=False)
+        torch.cuda.empty_cache()
+
+        print(f"[worker] loading NeRF checkpoint: {workspace}", flush=True)
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        model = NeRFNetwork(opt)
+        criterion = torch.nn.MSELoss(reduction='none')
+        # metrics are only needed by evaluate(); serving only renders the video
+        trainer = Trainer('ngp', opt, model, device=device, workspace=opt.workspace,
+                          criterion=criterion, fp16=opt.fp16, metrics=[], use_checkpoint=opt.ckpt)
+        self._trainers[key] = trainer
+        return trainer
+
+    def infer(self, data_path, workspace, audio_npy_path, torso=True):
+        self._require_file(audio_npy_path, "audio feature file")
+        if not os.path.isdir(data_path):
+            raise WorkerError(f"dataset not found: {data_path}")
+
+        import torch
+        from main import parse_opt
+        from nerf_triplane.provider import NeRFDataset
+
+        argv = [data_path, "--workspace", workspace, "-O", "--test", "--test_train",
+                "--aud", audio_npy_path, "--smooth_path", "--smooth_path_window", "7"]
+        if torso:
+            argv.append("--torso")
+        opt = parse_opt(argv)
+
+        trainer = self._get_trainer(opt)
+        # the cached trainer keeps the options it was built with; only the audio changes
+        trainer.opt.aud = opt.aud
+
+        test_set = NeRFDataset(opt, device=trainer.device, type='train')
+        # a manual fix to test on the training dataset
+        test_set.training = False
+        test_set.num_rays = -1
+        test_loader = test_set.dataloader()
+
+        trainer.model.aud_features = test_loader._data.auds
+        trainer.model.eye_areas = test_loader._data.eye_area
+        trainer.model.reset_clip_state()
+
+        name = f"ngp_ep{trainer.epoch:04d}_{uuid.uuid4().hex[:8]}"
+        trainer.test(test_loader, name=name)
+
+        del test_loader, test_set
+        torch.cuda.empty_cache()
+        return {"video_path": os.path.join(workspace, "results", f"{name}.mp4")}
+
+    # ---------- preprocessing ----------
+
+    def preprocess(self, video_path, task_id=None):
+        self._require_file(video_path, "video file")
+        task_id = task_id or os.path.splitext(os.path.basename(video_path))[0]
+
+        # preprocessing is a long multi-tool pipeline; reuse the entrypoint logic as-is
+        result = subprocess.run([self.entrypoint, "preprocess", video_path, task_id],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise WorkerError(f"preprocess failed: {result.stderr[-2000:] or result.stdout[-2000:]}")
+        return {"data_path": os.path.join("/workspace", "data", task_id)}
+
+
+class StandInBackend(WorkerBackend):
+    """
+    Stand-in worker without TF / torch / GPU.
+
+    Produces outputs with the right shapes and locations so the protocol and the
+    client can be exercised on any machine.
+    """
+
+    name = "stand-in"
+
+    def extract_features(self, wav_path, output_path=None):
+        self._require_file(wav_path, "audio file")
+        import numpy as np
+
+        with wave.open(wav_path, "rb") as wav:
+            duration = wav.getnframes() / float(wav.getframerate())
+
+        output_path = output_path or self._default_npy_path(wav_path)
+        num_windows = max(1, int(duration * DS_WINDOWS_PER_SECOND))
+        np.save(output_path, np.zeros((num_windows,) + DS_WINDOW_SHAPE, dtype=np.float32))
+        return {"npy_path": output_path}
+
+    def infer(self, data_path, workspace, audio_npy_path, torso=True):
+        self._require_file(audio_npy_path, "audio feature file")
+        results_dir = os.path.join(workspace, "results")
+        os.makedirs(results_dir, exist_ok=True)
+
+        video_path = os.path.join(results_dir, f"standin_{uuid.uuid4().hex[:8]}.mp4")
+        with open(video_path, "wb") as f:
+            f.write(b"")
+        return {"video_path": video_path}
+
+    def preprocess(self, video_path, task_id=None):
+        self._require_file(video_path, "video file")
+        task_id = task_id or os.path.splitext(os.path.basename(video_path))[0]
+        data_path = os.path.join(os.path.dirname(os.path.abspath(video_path)), task_id)
+        os.makedirs(data_path, exist_ok=True)
+        return {"data_path": data_path}
+
+
+# ==============================================================================
+# HTTP server
+# ==============================================================================
+
+class WorkerRequestHandler(BaseHTTPRequestHandler):
+    backend = None  # set by make_server
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send(200, {"ok": True, "result": self.backend.info()})
+        else:
+            self._send(404, {"ok": False, "error": f"not found: {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/rpc":
+            self._send(404, {"ok": False, "error": f"not found: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            method = request["method"]
+            params = request.get("params") or {}
+        except (ValueError, KeyError) as e:
+            self._send(400, {"ok": False, "error": f"bad request: {e}"})
+            return
+
+        start = time.time()
+        try:
+            result = self.backend.call(method, params)
+        except WorkerError as e:
+            self._send(400, {"ok": False, "error": str(e)})
+            return
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self._send(500, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+            return
+
+        print(f"[worker] {method} done in {time.time() - start:.2f}s", flush=True)
+        self._send(200, {"ok": True, "result": result})
+
+    def log_message(self, format, *args):
+        # request lines are noisy with /health polling; method timings are printed instead
+        pass
+
+
+def make_server(backend, host="0.0.0.0", port=8888):
+    handler = type("BoundWorkerRequestHandler", (WorkerRequestHandler,), {"backend": backend})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ER-NeRF resident worker")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--stand-in", action="store_true", help="fake backend without TF / torch / GPU")
+    parser.add_argument("--max-models", type=int, default=int(os.environ.get("ERNERF_WORKER_MAX_MODELS", 2)),
+                        help="number of NeRF checkpoints kept resident")
+    args = parser.parse_args()
+
+    if args.stand_in:
+        backend = StandInBackend()
+    else:
+        os.chdir(ROOT_DIR)
+        sys.path.insert(0, ROOT_DIR)
+        backend = ERNeRFBackend(max_models=args.max_models)
+
+    server = make_server(backend, args.host, args.port)
+    print(f"[worker] {backend.name} worker listening on {args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
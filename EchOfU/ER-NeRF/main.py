@@ -12,9 +12,9 @@ try:
     torch.backends.cudnn.allow_tf32 = False
 except AttributeError as e:
     print('Info. This pytorch version is not support with tf32.')
-    
-if __name__ == '__main__':
 
+
+def get_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument('path', type=str)
     parser.add_argument('-O', action='store_true', help="equals --fp16 --cuda_ray --exp_eye")
@@ -30,6 +30,7 @@ if __name__ == '__main__':
     parser.add_argument('--lr_net', type=float, default=1e-3, help="initial learning rate")
     parser.add_argument('--ckpt', type=str, default='latest')
     parser.add_argument('--num_rays', type=int, default=4096 * 16, help="num rays sampled per image for each training step")
+    parser.add_argument('--batch_frames', type=int, default=1, help="number of frames per training step, each contributing num_rays rays (not with --finetune_lips)")
     parser.add_argument('--cuda_ray', action='store_true', help="use CUDA raymarching instead of pytorch")
     parser.add_argument('--max_steps', type=int, default=16, help="max num steps sampled per ray (only valid when using --cuda_ray)")
     parser.add_argument('--num_steps', type=int, default=16, help="num steps sampled per ray (only valid when NOT using --cuda_ray)")
@@ -58,6 +59,9 @@ if __name__ == '__main__':
     ### dataset options
     parser.add_argument('--color_space', type=str, default='srgb', help="Color space, supports (linear, srgb)")
     parser.add_argument('--preload', type=int, default=0, help="0 means load data from disk on-the-fly, 1 means preload to CPU, 2 means GPU.")
+    parser.add_argument('--packed', type=int, default=0, help="1 means use the packed uint8 memmap dataset (<path>/packed, built on first use), see nerf_triplane/packed_dataset.py")
+    parser.add_argument('--data_workers', type=int, default=0, help="number of background threads that decode frames and sample rays ahead of training, 0 means build batches on the main thread")
+    parser.add_argument('--prefetch', type=int, default=2, help="number of batches kept ready ahead of training when --data_workers > 0")
     # (the default value is for the fox dataset)
     parser.add_argument('--bound', type=float, default=1, help="assume the scene is bounded in box[-bound, bound]^3, if > 1, will invoke adaptive ray marching.")
     parser.add_argument('--scale', type=float, default=4, help="scale camera location into box[-bound, bound]^3")
@@ -118,7 +122,11 @@ if __name__ == '__main__':
     parser.add_argument('-m', type=int, default=50)
     parser.add_argument('-r', type=int, default=10)
 
-    opt = parser.parse_args()
+    return parser
+
+
+def parse_opt(argv=None):
+    opt = get_parser().parse_args(argv)
 
     if opt.O:
         opt.fp16 = True
@@ -139,6 +147,13 @@ if __name__ == '__main__':
     # if opt.finetune_lips:
     #     # do not update density grid in finetune stage
     #     opt.update_extra_interval = 1e9
+
+    return opt
+
+
+if __name__ == '__main__':
+
+    opt = parse_opt()
     
     print(opt)
     
@@ -217,7 +232,8 @@ if __name__ == '__main__':
 
         train_loader = NeRFDataset(opt, device=device, type='train').dataloader()
 
-        assert len(train_loader) < opt.ind_num, f"[ERROR] dataset too many frames: {len(train_loader)}, please increase --ind_num to this number!"
+        num_frames = train_loader._data.poses.shape[0]
+        assert num_frames < opt.ind_num, f"[ERROR] dataset too many frames: {num_frames}, please increase --ind_num to this number!"
 
         # temp fix: for update_extra_states
         model.aud_features = train_loader._data.auds
@@ -29,11 +29,11 @@ class AudioAttNet(nn.Module):
         )
 
     def forward(self, x):
-        # x: [1, seq_len, dim_aud]
-        y = x.permute(0, 2, 1)  # [1, dim_aud, seq_len]
+        # x: [B, seq_len, dim_aud], B = 1 except for multi-frame training batches
+        y = x.permute(0, 2, 1)  # [B, dim_aud, seq_len]
         y = self.attentionConvNet(y) 
-        y = self.attentionNet(y.view(1, self.seq_len)).view(1, self.seq_len, 1)
-        return torch.sum(y * x, dim=1) # [1, dim_aud]
+        y = self.attentionNet(y.view(-1, self.seq_len)).view(-1, self.seq_len, 1)
+        return torch.sum(y * x, dim=1) # [B, dim_aud]
 
 
 # Audio feature extractor
@@ -222,16 +222,27 @@ class NeRFNetwork(NeRFRenderer):
     def encode_audio(self, a):
         # a: [1, 29, 16] or [8, 29, 16], audio features from deepspeech
         # if emb, a should be: [1, 16] or [8, 16]
+        # multi-frame training batches add a leading [B] dim, and return [B, 64]
 
         # fix audio traininig
         if a is None: return None
 
         if self.emb:
-            a = self.embedding(a).transpose(-1, -2).contiguous() # [1/8, 29, 16]
+            a = self.embedding(a).transpose(-1, -2).contiguous() # [(B,) 1/8, 29, 16]
+
+        B = a.shape[0] if a.dim() == 4 else None
+        if B is not None:
+            a = a.flatten(0, 1) # [B * 1/8, 29, 16]
 
         enc_a = self.audio_net(a) # [1/8, 64]
 
-        if self.att > 0:
+        if B is not None:
+            enc_a = enc_a.view(B, -1, enc_a.shape[-1]) # [B, 1/8, 64]
+            if self.att > 0:
+                enc_a = self.audio_att_net(enc_a) # [B, 64]
+            else:
+                enc_a = enc_a.view(B, -1) # [B, 64]
+        elif self.att > 0:
             enc_a = self.audio_att_net(enc_a.unsqueeze(0)) # [1, 64]
             
         return enc_a
@@ -252,6 +263,7 @@ class NeRFNetwork(NeRFRenderer):
         # enc_a: [1, aud_dim]
         # c: [1, ind_dim], individual code
         # e: [1, 1], eye feature
+        # (enc_a, c and e are [N, ...] per point for multi-frame training batches)
         enc_x = self.encode_x(x, bound=self.bound)
 
         sigma_result = self.density(x, enc_a, e, enc_x)
@@ -264,7 +276,7 @@ class NeRFNetwork(NeRFRenderer):
         enc_d = self.encoder_dir(d)
 
         if c is not None:
-            h = torch.cat([enc_d, geo_feat, c.repeat(x.shape[0], 1)], dim=-1)
+            h = torch.cat([enc_d, geo_feat, c.expand(x.shape[0], -1)], dim=-1)
         else:
             h = torch.cat([enc_d, geo_feat], dim=-1)
                 
@@ -282,7 +294,7 @@ class NeRFNetwork(NeRFRenderer):
         if enc_x is None:
             enc_x = self.encode_x(x, bound=self.bound)
 
-        enc_a = enc_a.repeat(enc_x.shape[0], 1)
+        enc_a = enc_a.expand(enc_x.shape[0], -1)
         aud_ch_att = self.aud_ch_att_net(enc_x)
         enc_w = enc_a * aud_ch_att
 
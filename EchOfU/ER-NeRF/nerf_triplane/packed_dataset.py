@@ -0,0 +1,281 @@
+"""
+Packed training data for NeRFDataset.
+
+Decodes every frame once and stores it as uint8 arrays in memory-mapped .npy files,
+so loading a dataset no longer touches thousands of jpg/png/npy files and training
+only converts the sampled pixels to float.
+
+Layout (<data>/packed/):
+    index.json      version, H, W, img_ids and a fingerprint of the source files
+    gt_imgs.npy     uint8   [N, H, W, 3]  RGB,  from gt_imgs/<id>.jpg
+    torso_imgs.npy  uint8   [N, H, W, 4]  RGBA, from torso_imgs/<id>.png
+    landmarks.npy   float32 [N, 68, 2]    from landmarks/<id>.npy
+    rects.npy       int32   [N, 4, 4]     face / lower half / eyes / lips as [xmin, xmax, ymin, ymax]
+    poses.npy       float32 [N, 4, 4]     raw transform_matrix (nerf convention)
+    valid.npy       bool    [N, 2]        gt image / torso image present, frames missing one are skipped
+    aud*.npy        copies of the audio feature files
+
+Usage:
+    python -m nerf_triplane.packed_dataset data/obama
+    python main.py data/obama --packed 1 ...   # builds the pack on first use
+"""
+
+import os
+import glob
+import json
+import hashlib
+import shutil
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import tqdm
+
+
+PACK_VERSION = 1
+PACK_DIRNAME = 'packed'
+
+
+def landmark_rects(lms, H, W):
+    # face / lower half / eyes / lips rects from 68 landmarks, each [xmin, xmax, ymin, ymax]
+    lh_xmin, lh_xmax = int(lms[31:36, 1].min()), int(lms[:, 1].max()) # actually lower half area
+    xmin, xmax = int(lms[:, 1].min()), int(lms[:, 1].max())
+    ymin, ymax = int(lms[:, 0].min()), int(lms[:, 0].max())
+    face_rect = [xmin, xmax, ymin, ymax]
+    lhalf_rect = [lh_xmin, lh_xmax, ymin, ymax]
+
+    xmin, xmax = int(lms[36:48, 1].min()), int(lms[36:48, 1].max())
+    ymin, ymax = int(lms[36:48, 0].min()), int(lms[36:48, 0].max())
+    eye_rect = [xmin, xmax, ymin, ymax]
+
+    lips = slice(48, 60)
+    xmin, xmax = int(lms[lips, 1].min()), int(lms[lips, 1].max())
+    ymin, ymax = int(lms[lips, 0].min()), int(lms[lips, 0].max())
+
+    # padding to H == W
+    cx = (xmin + xmax) // 2
+    cy = (ymin + ymax) // 2
+
+    l = max(xmax - xmin, ymax - ymin) // 2
+    xmin = max(0, cx - l)
+    xmax = min(H, cx + l)
+    ymin = max(0, cy - l)
+    ymax = min(W, cy + l)
+    lips_rect = [xmin, xmax, ymin, ymax]
+
+    return face_rect, lhalf_rect, eye_rect, lips_rect
+
+
+def landmark_path(root_path, img_id):
+    path = os.path.join(root_path, 'landmarks', str(img_id) + '.npy')
+    # zero-padded file names (00000.npy)
+    if not os.path.exists(path):
+        path = os.path.join(root_path, 'landmarks', f"{int(img_id):05d}.npy")
+    return path
+
+
+def _transform_paths(root_path):
+    return sorted(glob.glob(os.path.join(root_path, 'transforms_*.json')))
+
+
+def _audio_paths(root_path):
+    return sorted(glob.glob(os.path.join(root_path, 'aud*.npy')))
+
+
+def _dir_digest(dir_path):
+    # hash of every file's name, mtime and size, so frames overwritten in place are noticed too
+    try:
+        entries = sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in os.scandir(dir_path) if e.is_file())
+    except OSError:
+        return None
+    digest = hashlib.sha1()
+    for name, mtime_ns, size in entries:
+        digest.update(f'{name}\0{mtime_ns}\0{size}\n'.encode('utf-8'))
+    return [len(entries), digest.hexdigest()]
+
+
+def source_fingerprint(root_path):
+    fingerprint = {}
+    for path in _transform_paths(root_path) + _audio_paths(root_path):
+        try:
+            stat = os.stat(path)
+            fingerprint[os.path.basename(path)] = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            fingerprint[os.path.basename(path)] = None
+    for name in ('gt_imgs', 'torso_imgs', 'landmarks'):
+        fingerprint[name] = _dir_digest(os.path.join(root_path, name))
+    return fingerprint
+
+
+def _image_size(transform):
+    if 'h' in transform and 'w' in transform:
+        return int(transform['h']), int(transform['w'])
+    return int(transform['cy']) * 2, int(transform['cx']) * 2
+
+
+class PackedDataset:
+    # read-only view of a pack directory, arrays are memory-mapped
+
+    def __init__(self, pack_dir, index):
+        self.pack_dir = pack_dir
+        self.H = index['H']
+        self.W = index['W']
+        self.img_ids = index['img_ids']
+        self.audio_files = index['audio_files']
+        self.row_of = {img_id: row for row, img_id in enumerate(self.img_ids)}
+
+        load = lambda name: np.load(os.path.join(pack_dir, name), mmap_mode='r')
+        self.gt_imgs = load('gt_imgs.npy')
+        self.torso_imgs = load('torso_imgs.npy')
+        self.landmarks = load('landmarks.npy')
+        self.rects = load('rects.npy')
+        self.poses = load('poses.npy')
+        self.valid = load('valid.npy')
+
+    def __len__(self):
+        return len(self.img_ids)
+
+    def row(self, img_id, torso=False):
+        # row of a frame, None if missing or an image it needs was not found when packing.
+        # the torso png is the background in every mode, the gt jpg is only needed without --torso
+        row = self.row_of.get(img_id)
+        if row is None or not self.valid[row, 1] or (not torso and not self.valid[row, 0]):
+            return None
+        return row
+
+    def audio_path(self, name):
+        return os.path.join(self.pack_dir, name) if name in self.audio_files else None
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.gt_imgs, self.torso_imgs, self.landmarks, self.rects, self.poses))
+
+
+def load_packed_dataset(root_path, pack_dir=None):
+    # returns None when the pack is missing, from another version, or older than the source files
+    pack_dir = pack_dir or os.path.join(root_path, PACK_DIRNAME)
+    try:
+        with open(os.path.join(pack_dir, 'index.json'), 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if index.get('version') != PACK_VERSION or index.get('fingerprint') != source_fingerprint(root_path):
+        return None
+    return PackedDataset(pack_dir, index)
+
+
+def build_packed_dataset(root_path, pack_dir=None, workers=8):
+    pack_dir = pack_dir or os.path.join(root_path, PACK_DIRNAME)
+    fingerprint = source_fingerprint(root_path)
+
+    # union of the frames of all splits, keyed by img_id
+    frames = {}
+    H = W = None
+    for transform_path in _transform_paths(root_path):
+        with open(transform_path, 'r') as f:
+            transform = json.load(f)
+        if H is None:
+            H, W = _image_size(transform)
+        for f in transform['frames']:
+            frames.setdefault(f['img_id'], f['transform_matrix'])
+    if not frames:
+        raise RuntimeError(f'[ERROR] no transforms_*.json frames found in {root_path}')
+
+    img_ids = sorted(frames)
+    N = len(img_ids)
+    print(f'[INFO] packing {N} frames ({H}x{W}) into {pack_dir}')
+
+    # write into a temp dir, index.json is written last and the dir swapped in at the end
+    tmp_dir = pack_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    open_memmap = np.lib.format.open_memmap
+    gt_imgs = open_memmap(os.path.join(tmp_dir, 'gt_imgs.npy'), mode='w+', dtype=np.uint8, shape=(N, H, W, 3))
+    torso_imgs = open_memmap(os.path.join(tmp_dir, 'torso_imgs.npy'), mode='w+', dtype=np.uint8, shape=(N, H, W, 4))
+    landmarks = np.zeros((N, 68, 2), dtype=np.float32)
+    rects = np.zeros((N, 4, 4), dtype=np.int32)
+    valid = np.zeros((N, 2), dtype=bool)
+    poses = np.stack([np.array(frames[img_id], dtype=np.float32) for img_id in img_ids], axis=0)
+
+    def read_image(path, code, out):
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            return False
+        image = cv2.cvtColor(image, code)
+        if image.shape[:2] != (H, W):
+            raise RuntimeError(f'[ERROR] {path} is {image.shape[1]}x{image.shape[0]}, expected {W}x{H}')
+        out[...] = image
+        return True
+
+    def pack_frame(row):
+        img_id = img_ids[row]
+        valid[row, 0] = read_image(os.path.join(root_path, 'gt_imgs', str(img_id) + '.jpg'),
+                                   cv2.COLOR_BGR2RGB, gt_imgs[row])
+        valid[row, 1] = read_image(os.path.join(root_path, 'torso_imgs', str(img_id) + '.png'),
+                                   cv2.COLOR_BGRA2RGBA, torso_imgs[row])
+        lms = np.load(landmark_path(root_path, img_id))
+        landmarks[row] = lms
+        rects[row] = landmark_rects(lms, H, W)
+
+    # cv2 decoding releases the GIL
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in tqdm.tqdm(executor.map(pack_frame, range(N)), total=N, desc='Packing'):
+            pass
+
+    gt_imgs.flush()
+    torso_imgs.flush()
+    np.save(os.path.join(tmp_dir, 'landmarks.npy'), landmarks)
+    np.save(os.path.join(tmp_dir, 'rects.npy'), rects)
+    np.save(os.path.join(tmp_dir, 'poses.npy'), poses)
+    np.save(os.path.join(tmp_dir, 'valid.npy'), valid)
+
+    audio_files = []
+    for path in _audio_paths(root_path):
+        shutil.copy2(path, tmp_dir)
+        audio_files.append(os.path.basename(path))
+
+    missing = int((~valid).sum())
+    if missing:
+        print(f'[WARN] {missing} images not found while packing, their frames will be skipped')
+
+    index = {
+        'version': PACK_VERSION,
+        'H': H,
+        'W': W,
+        'img_ids': img_ids,
+        'audio_files': audio_files,
+        'fingerprint': fingerprint,
+    }
+    with open(os.path.join(tmp_dir, 'index.json'), 'w') as f:
+        json.dump(index, f)
+
+    shutil.rmtree(pack_dir, ignore_errors=True)
+    os.replace(tmp_dir, pack_dir)
+
+    pack = PackedDataset(pack_dir, index)
+    print(f'[INFO] packed dataset: {pack.nbytes / 1024 ** 3:.2f} GB')
+    return pack
+
+
+def load_or_build_packed_dataset(root_path, pack_dir=None, workers=8):
+    pack = load_packed_dataset(root_path, pack_dir)
+    if pack is None:
+        pack = build_packed_dataset(root_path, pack_dir, workers)
+    return pack
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='pack a processed ER-NeRF dataset into memory-mapped arrays')
+    parser.add_argument('path', type=str, help='dataset dir (contains transforms_*.json, gt_imgs, torso_imgs, landmarks)')
+    parser.add_argument('--pack_dir', type=str, default=None, help='output dir, defaults to <path>/packed')
+    parser.add_argument('--workers', type=int, default=8, help='decoding threads')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the pack is up to date')
+    args = parser.parse_args()
+
+    if not args.force and load_packed_dataset(args.path, args.pack_dir) is not None:
+        print('[INFO] packed dataset is up to date')
+    else:
+        build_packed_dataset(args.path, args.pack_dir, args.workers)
@@ -13,7 +13,9 @@ import torch
 import torch.nn.functional as F
 from torch.utils.data import DataLoader
 
-from .utils import get_audio_features, get_rays, get_bg_coords, convert_poses
+from .utils import get_audio_features, get_bg_coords, convert_poses, RayGenerator
+from .packed_dataset import load_or_build_packed_dataset, landmark_rects, landmark_path
+from .data_pipeline import PrefetchLoader
 
 # ref: https://github.com/NVlabs/instant-ngp/blob/b76004c8cf478880227401ae763be4c02f80b62f/include/neural-graphics-primitives/nerf_loader.h#L50
 def nerf_matrix_to_ngp(pose, scale=0.33, offset=[0, 0, 0]):
@@ -234,6 +236,8 @@ class NeRFDataset_Test:
         cy = (transform['cy'] / downscale)
 
         self.intrinsics = np.array([fl_x, fl_y, cx, cy])
+        # pixel grid and unit ray directions are built once, not on every get_rays call
+        self.ray_generator = RayGenerator(self.intrinsics, self.H, self.W)
 
         # directly build the coordinate meshgrid in [-1, 1]^2
         self.bg_coords = get_bg_coords(self.H, self.W, self.device) # [1, H*W, 2] in [-1, 1]
@@ -264,7 +268,7 @@ class NeRFDataset_Test:
 
         poses = self.poses[index].to(self.device) # [B, 4, 4]
         
-        rays = get_rays(poses, self.intrinsics, self.H, self.W, self.num_rays, self.opt.patch_size)
+        rays = self.ray_generator(poses, self.num_rays, self.opt.patch_size)
 
         results['index'] = index # for ind. code
         results['H'] = self.H
@@ -385,21 +389,26 @@ class NeRFDataset:
 
         print(f'[INFO] load {len(frames)} {type} frames.')
 
+        # uint8 memory-mapped frames instead of per-frame jpg/png/npy files (see packed_dataset.py)
+        self.packed = None
+        if getattr(self.opt, 'packed', 0) and downscale == 1:
+            self.packed = load_or_build_packed_dataset(self.root_path)
+
         # only load pre-calculated aud features when not live-streaming
         if not self.opt.asr:
 
             # empty means the default self-driven extracted features.
             if self.opt.aud == '':
                 if 'esperanto' in self.opt.asr_model:
-                    aud_features = np.load(os.path.join(self.root_path, 'aud_eo.npy'))
+                    aud_features = np.load(self._data_file('aud_eo.npy'))
                 elif 'deepspeech' in self.opt.asr_model:
-                    aud_features = np.load(os.path.join(self.root_path, 'aud_ds.npy'))
+                    aud_features = np.load(self._data_file('aud_ds.npy'))
                 # elif 'hubert_cn' in self.opt.asr_model:
                 #     aud_features = np.load(os.path.join(self.root_path, 'aud_hu_cn.npy'))
                 elif 'hubert' in self.opt.asr_model:
-                    aud_features = np.load(os.path.join(self.root_path, 'aud_hu.npy'))
+                    aud_features = np.load(self._data_file('aud_hu.npy'))
                 else:
-                    aud_features = np.load(os.path.join(self.root_path, 'aud.npy'))
+                    aud_features = np.load(self._data_file('aud.npy'))
             # cross-driven extracted features. 
             else:
                 aud_features = np.load(self.opt.aud)
@@ -438,50 +447,61 @@ class NeRFDataset:
         self.eye_area = []
         self.eye_rect = []
 
+        self.frame_rows = []
+
         for f in tqdm.tqdm(frames, desc=f'Loading {type} data'):
 
-            # f_path = os.path.join(self.root_path, 'gt_imgs', str(f['img_id']) + '.jpg')
-            #
-            # if not os.path.exists(f_path):
-            #     print('[WARN]', f_path, 'NOT FOUND!')
-            #     continue
+            if self.packed is not None:
+                row = self.packed.row(f['img_id'], torso=self.opt.torso)
+                if row is None:
+                    print('[WARN]', f['img_id'], 'NOT FOUND in packed dataset!')
+                    continue
+                self.frame_rows.append(row)
 
-            # --- 修改开始：如果开启了 torso，优先读取带 Alpha 的 png 作为真值 ---
-            if self.opt.torso:
-                f_path = os.path.join(self.root_path, 'torso_imgs', str(f['img_id']) + '.png')
             else:
-                f_path = os.path.join(self.root_path, 'gt_imgs', str(f['img_id']) + '.jpg')
+                # f_path = os.path.join(self.root_path, 'gt_imgs', str(f['img_id']) + '.jpg')
+                #
+                # if not os.path.exists(f_path):
+                #     print('[WARN]', f_path, 'NOT FOUND!')
+                #     continue
+
+                # --- 修改开始：如果开启了 torso，优先读取带 Alpha 的 png 作为真值 ---
+                if self.opt.torso:
+                    f_path = os.path.join(self.root_path, 'torso_imgs', str(f['img_id']) + '.png')
+                else:
+                    f_path = os.path.join(self.root_path, 'gt_imgs', str(f['img_id']) + '.jpg')
 
-            if not os.path.exists(f_path):
-                print('[WARN]', f_path, 'NOT FOUND!')
-                continue
-            # --- 修改结束 ---
+                if not os.path.exists(f_path):
+                    print('[WARN]', f_path, 'NOT FOUND!')
+                    continue
+                # --- 修改结束 ---
 
             pose = np.array(f['transform_matrix'], dtype=np.float32) # [4, 4]
             pose = nerf_matrix_to_ngp(pose, scale=self.scale, offset=self.offset)
             self.poses.append(pose)
 
-            if self.preload > 0:
-                image = cv2.imread(f_path, cv2.IMREAD_UNCHANGED) # [H, W, 3] o [H, W, 4]
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                image = image.astype(np.float32) / 255 # [H, W, 3/4]
+            if self.packed is None:
+                if self.preload > 0:
+                    image = cv2.imread(f_path, cv2.IMREAD_UNCHANGED) # [H, W, 3] o [H, W, 4]
+                    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                    image = image.astype(np.float32) / 255 # [H, W, 3/4]
 
-                self.images.append(image)
-            else:
-                self.images.append(f_path)
+                    self.images.append(image)
+                else:
+                    self.images.append(f_path)
 
-            # load frame-wise bg
-        
-            torso_img_path = os.path.join(self.root_path, 'torso_imgs', str(f['img_id']) + '.png')
+                # load frame-wise bg
 
-            if self.preload > 0:
-                torso_img = cv2.imread(torso_img_path, cv2.IMREAD_UNCHANGED) # [H, W, 4]
-                torso_img = cv2.cvtColor(torso_img, cv2.COLOR_BGRA2RGBA)
-                torso_img = torso_img.astype(np.float32) / 255 # [H, W, 3/4]
+                torso_img_path = os.path.join(self.root_path, 'torso_imgs', str(f['img_id']) + '.png')
 
-                self.torso_img.append(torso_img)
-            else:
-                self.torso_img.append(torso_img_path)
+                if self.preload > 0:
+                    torso_img = cv2.imread(torso_img_path, cv2.IMREAD_UNCHANGED) # [H, W, 4]
+                    torso_img = cv2.cvtColor(torso_img, cv2.COLOR_BGRA2RGBA)
+                    torso_img = torso_img.astype(np.float32) / 255 # [H, W, 3/4]
+
+                    self.torso_img.append(torso_img)
+                else:
+                    self.torso_img.append(torso_img_path)
 
             # find the corresponding audio to the image frame
             if not self.opt.asr and self.opt.aud == '':
@@ -489,63 +509,27 @@ class NeRFDataset:
                 self.auds.append(aud)
 
             # load lms and extract face
-            # lms = np.loadtxt(os.path.join(self.root_path, 'ori_imgs', str(f['img_id']) + '.lms')) # [68, 2]
-            # --- 修改开始：读取 .npy 文件而不是 .lms ---
-            # 旧代码（注释掉）：
-            # lms = np.loadtxt(os.path.join(self.root_path, 'ori_imgs', str(f['img_id']) + '.lms'))
-
-            # 新代码：从 landmarks 文件夹读取 .npy
-            lms_path = os.path.join(self.root_path, 'landmarks', str(f['img_id']) + '.npy')
-
-            # 容错处理：万一文件名是 00000.npy 这种补零格式
-            if not os.path.exists(lms_path):
-                lms_path = os.path.join(self.root_path, 'landmarks', f"{int(f['img_id']):05d}.npy")
-
-            lms = np.load(lms_path)
-            # --- 修改结束 ---
+            if self.packed is not None:
+                face_rect, lhalf_rect, eye_rect, lips_rect = self.packed.rects[row].tolist()
+            else:
+                # --- 修改：从 landmarks 文件夹读取 .npy 而不是 ori_imgs/*.lms（兼容 00000.npy 补零格式）---
+                lms = np.load(landmark_path(self.root_path, f['img_id']))
+                face_rect, lhalf_rect, eye_rect, lips_rect = landmark_rects(lms, self.H, self.W)
 
-            lh_xmin, lh_xmax = int(lms[31:36, 1].min()), int(lms[:, 1].max()) # actually lower half area
-            xmin, xmax = int(lms[:, 1].min()), int(lms[:, 1].max())
-            ymin, ymax = int(lms[:, 0].min()), int(lms[:, 0].max())
-            self.face_rect.append([xmin, xmax, ymin, ymax])
-            self.lhalf_rect.append([lh_xmin, lh_xmax, ymin, ymax])
+            self.face_rect.append(face_rect)
+            self.lhalf_rect.append(lhalf_rect)
 
             if self.opt.exp_eye:
-                # eyes_left = slice(36, 42)
-                # eyes_right = slice(42, 48)
-
-                # area_left = polygon_area(lms[eyes_left, 0], lms[eyes_left, 1])
-                # area_right = polygon_area(lms[eyes_right, 0], lms[eyes_right, 1])
-
-                # # area percentage of two eyes of the whole image...
-                # area = (area_left + area_right) / (self.H * self.W) * 100
-
                 # action units blink AU45
                 area = au_blink[f['img_id']]
                 area = np.clip(area, 0, 2) / 2
                 # area = area + np.random.rand() / 10
                 self.eye_area.append(area)
 
-                xmin, xmax = int(lms[36:48, 1].min()), int(lms[36:48, 1].max())
-                ymin, ymax = int(lms[36:48, 0].min()), int(lms[36:48, 0].max())
-                self.eye_rect.append([xmin, xmax, ymin, ymax])
+                self.eye_rect.append(eye_rect)
 
             if self.opt.finetune_lips:
-                lips = slice(48, 60)
-                xmin, xmax = int(lms[lips, 1].min()), int(lms[lips, 1].max())
-                ymin, ymax = int(lms[lips, 0].min()), int(lms[lips, 0].max())
-
-                # padding to H == W
-                cx = (xmin + xmax) // 2
-                cy = (ymin + ymax) // 2
-
-                l = max(xmax - xmin, ymax - ymin) // 2
-                xmin = max(0, cx - l)
-                xmax = min(self.H, cx + l)
-                ymin = max(0, cy - l)
-                ymax = min(self.W, cy + l)
-
-                self.lips_rect.append([xmin, xmax, ymin, ymax])
+                self.lips_rect.append(lips_rect)
         
         # load pre-extracted background image (should be the same size as training image...)
 
@@ -573,7 +557,17 @@ class NeRFDataset:
             
         self.poses = torch.from_numpy(self.poses) # [N, 4, 4]
 
-        if self.preload > 0:
+        if self.packed is not None:
+            # uint8 frames: memory-mapped (preload 0) or held in memory at 1/4 of the float32 footprint
+            self.frame_rows = np.array(self.frame_rows, dtype=np.int64)
+            images = self.packed.torso_imgs[..., :3] if self.opt.torso else self.packed.gt_imgs
+            if self.preload > 0:
+                self.images = torch.from_numpy(np.ascontiguousarray(images[self.frame_rows])) # [N, H, W, 3] uint8
+                self.torso_img = torch.from_numpy(np.ascontiguousarray(self.packed.torso_imgs[self.frame_rows])) # [N, H, W, 4] uint8
+            else:
+                self.images = images
+                self.torso_img = self.packed.torso_imgs
+        elif self.preload > 0:
             self.images = torch.from_numpy(np.stack(self.images, axis=0)) # [N, H, W, C]
             self.torso_img = torch.from_numpy(np.stack(self.torso_img, axis=0)) # [N, H, W, C]
         else:
@@ -628,8 +622,12 @@ class NeRFDataset:
 
             self.bg_img = self.bg_img.to(torch.half).to(self.device)
 
-            self.torso_img = self.torso_img.to(torch.half).to(self.device)
-            self.images = self.images.to(torch.half).to(self.device)
+            if self.packed is not None:
+                self.torso_img = self.torso_img.to(self.device)
+                self.images = self.images.to(self.device)
+            else:
+                self.torso_img = self.torso_img.to(torch.half).to(self.device)
+                self.images = self.images.to(torch.half).to(self.device)
             
             if self.opt.exp_eye:
                 self.eye_area = self.eye_area.to(self.device)
@@ -653,9 +651,12 @@ class NeRFDataset:
         cy = (transform['cy'] / downscale) if 'cy' in transform else (self.H / 2)
     
         self.intrinsics = np.array([fl_x, fl_y, cx, cy])
+        # pixel grid and unit ray directions are built once, not on every get_rays call
+        self.ray_generator = RayGenerator(self.intrinsics, self.H, self.W)
 
         # directly build the coordinate meshgrid in [-1, 1]^2
         self.bg_coords = get_bg_coords(self.H, self.W, self.device) # [1, H*W, 2] in [-1, 1]
+        self._bg_coords_copies = {}
 
 
     def mirror_index(self, index):
@@ -668,29 +669,95 @@ class NeRFDataset:
             return size - res - 1
 
 
-    def collate(self, index):
-
-        B = len(index) # a list of length 1
-        # assert B == 1
+    def _data_file(self, name):
+        if self.packed is not None:
+            path = self.packed.audio_path(name)
+            if path is not None:
+                return path
+        return os.path.join(self.root_path, name)
+
+    def load_frames(self, frames, index, rgba=False):
+        # frames of self.images / self.torso_img at the given indices, [B, H, W, C]
+        # uint8 when loaded from disk or packed data (convert with to_float), float when preloaded
+        if self.packed is not None:
+            if self.preload == 0:
+                return torch.from_numpy(np.ascontiguousarray(frames[self.frame_rows[index]]))
+            return frames[index]
+
+        if self.preload == 0: # on the fly loading, one path per frame of the batch
+            images = []
+            for path in frames[index]:
+                image = cv2.imread(path, cv2.IMREAD_UNCHANGED) # [H, W, 3/4]
+                images.append(cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA if rgba else cv2.COLOR_BGR2RGB))
+            return torch.from_numpy(np.stack(images, axis=0))
+        return frames[index]
+
+    def load_pixels(self, frames, index, inds, rgba=False):
+        # only the pixels at the flattened indices inds [B, N] of the given frames, [B, N, C]
+        # preloaded and packed frames are indexed in place, nothing of size H * W is copied
+        if self.packed is None and self.preload == 0:
+            # jpg / png can only be decoded whole
+            frames = self.load_frames(frames, index, rgba)
+            index = list(range(len(index)))
+
+        if isinstance(frames, np.ndarray): # packed memmap
+            rows = self.frame_rows[index][:, None]
+            inds = inds.cpu().numpy()
+            return torch.from_numpy(frames[rows, inds // self.W, inds % self.W])
+
+        # index_select on the flattened frame is several times faster than advanced indexing
+        inds = inds.to(frames.device)
+        flat = frames.view(frames.shape[0], -1, frames.shape[-1]) # [N, H*W, C]
+        return torch.stack([flat[row].index_select(0, inds[b]) for b, row in enumerate(index)], dim=0)
+
+    @staticmethod
+    def to_float(images):
+        if images.dtype == torch.uint8:
+            return images.float() / 255
+        return images
+
+    def bg_coords_on(self, device):
+        # self.bg_coords lives on self.device, the prefetching pipeline needs a cpu copy
+        device = torch.device(device)
+        if self.bg_coords.device.type == device.type:
+            return self.bg_coords
+        if device not in self._bg_coords_copies:
+            self._bg_coords_copies[device] = self.bg_coords.to(device)
+        return self._bg_coords_copies[device]
+
+    @staticmethod
+    def rect_mask(rays, rects, index):
+        # rays inside each frame's rect [xmin, xmax, ymin, ymax] --> [B, N]
+        xmin, xmax, ymin, ymax = torch.tensor([rects[i] for i in index], device=rays['i'].device).t()[..., None] # [B, 1] each
+        return (rays['j'] >= xmin) & (rays['j'] < xmax) & (rays['i'] >= ymin) & (rays['i'] < ymax)
+
+    def collate(self, index, device=None, generator=None):
+        # device / generator are set by the prefetching pipeline (data_pipeline.py),
+        # which builds batches on the cpu in worker threads, each with its own random stream
+        device = self.device if device is None else device
+
+        B = len(index) # 1, or --batch_frames in training
 
         results = {}
 
         # audio use the original index
         if self.auds is not None:
-            auds = get_audio_features(self.auds, self.opt.att, index[0]).to(self.device)
-            results['auds'] = auds
+            auds = [get_audio_features(self.auds, self.opt.att, i) for i in index]
+            auds = auds[0] if B == 1 else torch.stack(auds, dim=0) # [1/8, 29, 16], [B, 1/8, 29, 16] for multi-frame batches
+            results['auds'] = auds.to(device)
 
         # head pose and bg image may mirror (replay --> <-- --> <--).
-        index[0] = self.mirror_index(index[0])
+        index = [self.mirror_index(i) for i in index]
 
-        poses = self.poses[index].to(self.device) # [B, 4, 4]
+        poses = self.poses[index].to(device) # [B, 4, 4]
         
         if self.training and self.opt.finetune_lips:
+            assert B == 1, 'finetune_lips samples a different lips rect per frame, use --batch_frames 1'
             rect = self.lips_rect[index[0]]
             results['rect'] = rect
-            rays = get_rays(poses, self.intrinsics, self.H, self.W, -1, rect=rect)
+            rays = self.ray_generator(poses, -1, rect=rect)
         else:
-            rays = get_rays(poses, self.intrinsics, self.H, self.W, self.num_rays, self.opt.patch_size)
+            rays = self.ray_generator(poses, self.num_rays, self.opt.patch_size, generator=generator)
 
         results['index'] = index # for ind. code
         results['H'] = self.H
@@ -700,67 +767,52 @@ class NeRFDataset:
 
         # get a mask for rays inside rect_face
         if self.training:
-            xmin, xmax, ymin, ymax = self.face_rect[index[0]]
-            face_mask = (rays['j'] >= xmin) & (rays['j'] < xmax) & (rays['i'] >= ymin) & (rays['i'] < ymax) # [B, N]
-            results['face_mask'] = face_mask
-            
-            xmin, xmax, ymin, ymax = self.lhalf_rect[index[0]]
-            lhalf_mask = (rays['j'] >= xmin) & (rays['j'] < xmax) & (rays['i'] >= ymin) & (rays['i'] < ymax) # [B, N]
-            results['lhalf_mask'] = lhalf_mask
+            results['face_mask'] = self.rect_mask(rays, self.face_rect, index) # [B, N]
+            results['lhalf_mask'] = self.rect_mask(rays, self.lhalf_rect, index) # [B, N]
 
         if self.opt.exp_eye:
-            results['eye'] = self.eye_area[index].to(self.device) # [1]
+            results['eye'] = self.eye_area[index].to(device) # [B, 1]
             if self.training:
-                results['eye'] += (np.random.rand()-0.5) / 10
-                xmin, xmax, ymin, ymax = self.eye_rect[index[0]]
-                eye_mask = (rays['j'] >= xmin) & (rays['j'] < xmax) & (rays['i'] >= ymin) & (rays['i'] < ymax) # [B, N]
-                results['eye_mask'] = eye_mask
+                # one draw per frame (a single np.random.rand() draw for B == 1, as before)
+                noise = np.random.rand(B, 1) if generator is None else torch.rand(B, 1, generator=generator).double().numpy()
+                results['eye'] += torch.from_numpy((noise-0.5) / 10).to(results['eye'])
+                results['eye_mask'] = self.rect_mask(rays, self.eye_rect, index) # [B, N]
 
         else:
             results['eye'] = None
 
         # load bg
-        bg_torso_img = self.torso_img[index]
-        if self.preload == 0: # on the fly loading
-            bg_torso_img = cv2.imread(bg_torso_img[0], cv2.IMREAD_UNCHANGED) # [H, W, 4]
-            bg_torso_img = cv2.cvtColor(bg_torso_img, cv2.COLOR_BGRA2RGBA)
-            bg_torso_img = bg_torso_img.astype(np.float32) / 255 # [H, W, 3/4]
-            bg_torso_img = torch.from_numpy(bg_torso_img).unsqueeze(0)
-        bg_torso_img = bg_torso_img[..., :3] * bg_torso_img[..., 3:] + self.bg_img * (1 - bg_torso_img[..., 3:])
-        bg_torso_img = bg_torso_img.view(B, -1, 3).to(self.device)
+        # in training, only the sampled pixels are gathered, converted to float and composited
+        if self.training:
+            torso_img = self.load_pixels(self.torso_img, index, rays['inds'], rgba=True) # [B, N, 4]
+            inds = rays['inds'].to(self.bg_img.device)
+            bg_img = self.bg_img[inds // self.W, inds % self.W] # [B, N, 3]
+        else:
+            torso_img = self.load_frames(self.torso_img, index, rgba=True).view(B, -1, 4) # [B, H*W, 4]
+            bg_img = self.bg_img.view(1, -1, 3).repeat(B, 1, 1) # [B, H*W, 3]
+
+        torso_img = self.to_float(torso_img)
+        bg_torso_img = torso_img[..., :3] * torso_img[..., 3:] + bg_img * (1 - torso_img[..., 3:])
+        bg_torso_img = bg_torso_img.to(device)
 
         if not self.opt.torso:
-            bg_img = bg_torso_img
+            results['bg_color'] = bg_torso_img
         else:
-            bg_img = self.bg_img.view(1, -1, 3).repeat(B, 1, 1).to(self.device)
+            results['bg_color'] = bg_img.to(device)
+            if self.training:
+                results['bg_torso_color'] = bg_torso_img
 
         if self.training:
-            bg_img = torch.gather(bg_img, 1, torch.stack(3 * [rays['inds']], -1)) # [B, N, 3]
-
-        results['bg_color'] = bg_img
-
-        if self.opt.torso and self.training:
-            bg_torso_img = torch.gather(bg_torso_img, 1, torch.stack(3 * [rays['inds']], -1)) # [B, N, 3]
-            results['bg_torso_color'] = bg_torso_img
-
-        images = self.images[index] # [B, H, W, 3/4]
-        if self.preload == 0:
-            images = cv2.imread(images[0], cv2.IMREAD_UNCHANGED) # [H, W, 3]
-            images = cv2.cvtColor(images, cv2.COLOR_BGR2RGB)
-            images = images.astype(np.float32) / 255 # [H, W, 3]
-            images = torch.from_numpy(images).unsqueeze(0)
-        images = images.to(self.device)
+            images = self.load_pixels(self.images, index, rays['inds']) # [B, N, 3/4]
+        else:
+            images = self.load_frames(self.images, index) # [B, H, W, 3/4]
 
-        if self.training:
-            C = images.shape[-1]
-            images = torch.gather(images.view(B, -1, C), 1, torch.stack(C * [rays['inds']], -1)) # [B, N, 3/4]
-            
-        results['images'] = images
+        results['images'] = self.to_float(images).to(device)
 
         if self.training:
-            bg_coords = torch.gather(self.bg_coords, 1, torch.stack(2 * [rays['inds']], -1)) # [1, N, 2]
+            bg_coords = torch.gather(self.bg_coords_on(device).expand(B, -1, -1), 1, torch.stack(2 * [rays['inds']], -1)) # [B, N, 2]
         else:
-            bg_coords = self.bg_coords # [1, N, 2]
+            bg_coords = self.bg_coords_on(device) # [1, N, 2]
 
         results['bg_coords'] = bg_coords
 
@@ -783,8 +835,19 @@ class NeRFDataset:
             else:
                 size = 2 * self.poses.shape[0]
 
-        loader = DataLoader(list(range(size)), batch_size=1, collate_fn=self.collate, shuffle=self.training, num_workers=0)
-        loader._data = self # an ugly fix... we need poses in trainer.
+        # multi-frame training batches, each step renders num_rays rays from each of batch_frames frames
+        batch_frames = getattr(self.opt, 'batch_frames', 1) if self.training else 1
+        if batch_frames > 1 and self.opt.finetune_lips:
+            print('[WARN] --finetune_lips renders one lips rect per step, using --batch_frames 1')
+            batch_frames = 1
+
+        # build batches ahead of time in background threads, unless everything is on the gpu already (--preload 2)
+        data_workers = getattr(self.opt, 'data_workers', 0)
+        if data_workers > 0 and self.preload < 2:
+            loader = PrefetchLoader(self, size, shuffle=self.training, workers=data_workers, depth=getattr(self.opt, 'prefetch', 2), batch_size=batch_frames)
+        else:
+            loader = DataLoader(list(range(size)), batch_size=batch_frames, collate_fn=self.collate, shuffle=self.training, num_workers=0)
+            loader._data = self # an ugly fix... we need poses in trainer.
 
         # do evaluate if has gt images and use self-driven setting
         loader.has_gt = (self.opt.aud == '')
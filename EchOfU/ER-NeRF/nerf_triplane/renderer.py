@@ -47,6 +47,20 @@ def sample_pdf(bins, weights, n_samples, det=False):
     return samples
 
 
+def sample_frame_ids(rays, rays_per_frame, M):
+    # frame id of each of the M points generated by march_rays_train, for a batch of frames
+    # rays: [N, 3] int32 (index, point_offset, point_count), frame b owns rays [b * rays_per_frame, (b + 1) * rays_per_frame)
+    # return: [M] int64, computed on device without a host sync
+    index, offset, count = rays.long().unbind(-1)
+    order = torch.argsort(offset)
+    offset, count = offset[order], count[order]
+    frame = index[order] // rays_per_frame
+    # point offsets are contiguous, points past M were dropped by march_rays_train
+    count = torch.minimum(count, (M - offset).clamp(min=0))
+    pad = (M - count.sum()).view(1)
+    return torch.repeat_interleave(torch.cat([frame, frame.new_zeros(1)]), torch.cat([count, pad]), output_size=M)
+
+
 def plot_pointcloud(pc, color=None):
     # pc: [N, 3]
     # color: [N, 3/4]
@@ -154,25 +168,36 @@ class NeRFRenderer(nn.Module):
         self.mean_count = 0
         self.local_step = 0
 
+    def reset_clip_state(self):
+        # state carried from frame to frame within one audio clip (smoothed audio feature),
+        # a model reused for another clip must not start from the previous clip's audio
+        if self.smooth_lips:
+            self.enc_a = None
+
 
     def run_cuda(self, rays_o, rays_d, auds, bg_coords, poses, eye=None, index=0, dt_gamma=0, bg_color=None, perturb=False, force_all_rays=False, max_steps=1024, T_thresh=1e-4, **kwargs):
-        # rays_o, rays_d: [B, N, 3], assumes B == 1
+        # rays_o, rays_d: [B, N, 3], B > 1 only for multi-frame training batches
         # auds: [B, 16]
         # index: [B]
         # return: image: [B, N, 3], depth: [B, N]
 
         prefix = rays_o.shape[:-1]
+        B = rays_o.shape[0]
         rays_o = rays_o.contiguous().view(-1, 3)
         rays_d = rays_d.contiguous().view(-1, 3)
         bg_coords = bg_coords.contiguous().view(-1, 2)
 
         # only add camera offset at training!
         if self.train_camera and (self.training or self.test_train):
-            dT = self.camera_dT[index] # [1, 3]
-            dR = euler_angles_to_matrix(self.camera_dR[index] / 180 * np.pi + 1e-8).squeeze(0) # [1, 3] --> [3, 3]
-            
-            rays_o = rays_o + dT
-            rays_d = rays_d @ dR
+            dT = self.camera_dT[index] # [B, 3]
+            dR = euler_angles_to_matrix(self.camera_dR[index] / 180 * np.pi + 1e-8) # [B, 3] --> [B, 3, 3]
+
+            if B > 1:
+                rays_o = (rays_o.view(B, -1, 3) + dT[:, None]).view(-1, 3)
+                rays_d = (rays_d.view(B, -1, 3) @ dR).view(-1, 3)
+            else:
+                rays_o = rays_o + dT
+                rays_d = rays_d @ dR.squeeze(0)
 
         N = rays_o.shape[0] # N = B * N, in fact
         device = rays_o.device
@@ -185,7 +210,7 @@ class NeRFRenderer(nn.Module):
         fars = fars.detach()
 
         # encode audio
-        enc_a = self.encode_audio(auds) # [1, 64]
+        enc_a = self.encode_audio(auds) # [1, 64], [B, 64] for multi-frame batches
 
         if enc_a is not None and self.smooth_lips:
             if self.enc_a is not None:
@@ -210,6 +235,14 @@ class NeRFRenderer(nn.Module):
             self.local_step += 1
 
             xyzs, dirs, deltas, rays = raymarching.march_rays_train(rays_o, rays_d, self.bound, self.density_bitfield, self.cascade, self.grid_size, nears, fars, counter, self.mean_count, perturb, 128, force_all_rays, dt_gamma, max_steps)
+
+            if B > 1:
+                # multi-frame batch: every point uses the audio, ind code and eye of its own frame
+                frame = sample_frame_ids(rays, N // B, xyzs.shape[0]) # [M]
+                enc_a = enc_a[frame] if enc_a is not None else None
+                ind_code = ind_code[frame] if ind_code is not None else None
+                eye = eye[frame] if eye is not None else None
+
             sigmas, rgbs, amb_aud, amb_eye, uncertainty = self(xyzs, dirs, enc_a, ind_code, eye)
             sigmas = self.density_scale * sigmas
 
@@ -292,7 +325,7 @@ class NeRFRenderer(nn.Module):
     
 
     def run_torso(self, rays_o, bg_coords, poses, index=0, bg_color=None, **kwargs):
-        # rays_o, rays_d: [B, N, 3], assumes B == 1
+        # rays_o, rays_d: [B, N, 3], B > 1 only for multi-frame training batches
         # auds: [B, 16]
         # index: [B]
         # return: image: [B, N, 3], depth: [B, N]
@@ -308,6 +341,9 @@ class NeRFRenderer(nn.Module):
         # background
         if bg_color is None:
             bg_color = 1
+        elif torch.is_tensor(bg_color):
+            # [B, N, 3] from collate (or a [3] color from the gui), rays are flattened to [B*N]
+            bg_color = bg_color.reshape(-1, 3)
 
         # first mix torso with background
         if self.torso:
@@ -331,7 +367,23 @@ class NeRFRenderer(nn.Module):
             torso_alpha = torch.zeros([N, 1], device=device)
             torso_color = torch.zeros([N, 3], device=device)
 
-            if mask.any():
+            if mask.any() and poses.shape[0] > 1:
+                # multi-frame batch: the torso deformation depends on each frame's head pose
+                B = poses.shape[0]
+                frame = torch.arange(N, device=device) // (N // B)
+                deform = []
+                for b in range(B):
+                    mask_b = mask & (frame == b)
+                    c = ind_code_torso[b:b+1] if ind_code_torso is not None and self.training else ind_code_torso
+                    torso_alpha_mask, torso_color_mask, deform_b = self.forward_torso(bg_coords[mask_b], poses[b:b+1], c)
+
+                    torso_alpha[mask_b] = torso_alpha_mask.float()
+                    torso_color[mask_b] = torso_color_mask.float()
+                    deform.append(deform_b)
+
+                results['deform'] = torch.cat(deform, dim=0)
+
+            elif mask.any():
                 torso_alpha_mask, torso_color_mask, deform = self.forward_torso(bg_coords[mask], poses, ind_code_torso)
 
                 torso_alpha[mask] = torso_alpha_mask.float()
@@ -656,7 +708,7 @@ class NeRFRenderer(nn.Module):
 
 
     def render(self, rays_o, rays_d, auds, bg_coords, poses, staged=False, max_ray_batch=4096, **kwargs):
-        # rays_o, rays_d: [B, N, 3], assumes B == 1
+        # rays_o, rays_d: [B, N, 3], B > 1 only for multi-frame training batches
         # auds: [B, 29, 16]
         # eye: [B, 1]
         # bg_coords: [1, N, 2]
@@ -679,7 +731,7 @@ class NeRFRenderer(nn.Module):
     
     
     def render_torso(self, rays_o, rays_d, auds, bg_coords, poses, staged=False, max_ray_batch=4096, **kwargs):
-        # rays_o, rays_d: [B, N, 3], assumes B == 1
+        # rays_o, rays_d: [B, N, 3], B > 1 only for multi-frame training batches
         # auds: [B, 29, 16]
         # eye: [B, 1]
         # bg_coords: [1, N, 2]
@@ -246,12 +246,13 @@ def get_bg_coords(H, W, device):
 
 
 @torch.cuda.amp.autocast(enabled=False)
-def get_rays(poses, intrinsics, H, W, N=-1, patch_size=1, rect=None):
+def get_rays(poses, intrinsics, H, W, N=-1, patch_size=1, rect=None, generator=None):
     ''' get rays
     Args:
         poses: [B, 4, 4], cam2world
         intrinsics: [4]
         H, W, N: int
+        generator: optional torch.Generator for the ray sampling
     Returns:
         rays_o, rays_d: [B, N, 3]
         inds: [B, N]
@@ -276,22 +277,20 @@ def get_rays(poses, intrinsics, H, W, N=-1, patch_size=1, rect=None):
 
         if patch_size > 1:
 
-            # random sample left-top cores.
+            # random sample left-top cores, separately for each frame.
             # NOTE: this impl will lead to less sampling on the image corner pixels... but I don't have other ideas.
             num_patch = N // (patch_size ** 2)
-            inds_x = torch.randint(0, H - patch_size, size=[num_patch], device=device)
-            inds_y = torch.randint(0, W - patch_size, size=[num_patch], device=device)
-            inds = torch.stack([inds_x, inds_y], dim=-1) # [np, 2]
+            inds_x = torch.randint(0, H - patch_size, size=[B, num_patch], device=device, generator=generator)
+            inds_y = torch.randint(0, W - patch_size, size=[B, num_patch], device=device, generator=generator)
+            inds = torch.stack([inds_x, inds_y], dim=-1) # [B, np, 2]
 
             # create meshgrid for each patch
             pi, pj = custom_meshgrid(torch.arange(patch_size, device=device), torch.arange(patch_size, device=device))
             offsets = torch.stack([pi.reshape(-1), pj.reshape(-1)], dim=-1) # [p^2, 2]
 
-            inds = inds.unsqueeze(1) + offsets.unsqueeze(0) # [np, p^2, 2]
-            inds = inds.view(-1, 2) # [N, 2]
-            inds = inds[:, 0] * W + inds[:, 1] # [N], flatten
-
-            inds = inds.expand([B, N])
+            inds = inds.unsqueeze(2) + offsets.view(1, 1, -1, 2) # [B, np, p^2, 2]
+            inds = inds.view(B, -1, 2) # [B, N, 2]
+            inds = inds[..., 0] * W + inds[..., 1] # [B, N], flatten
         
         # only get rays in the specified rect
         elif rect is not None:
@@ -303,8 +302,8 @@ def get_rays(poses, intrinsics, H, W, N=-1, patch_size=1, rect=None):
             inds = inds.unsqueeze(0) # [1, N]
 
         else:
-            inds = torch.randint(0, H*W, size=[N], device=device) # may duplicate
-            inds = inds.expand([B, N])
+            # each frame of a multi-frame batch gets its own pixels (same draws as before for B == 1)
+            inds = torch.randint(0, H*W, size=[B, N], device=device, generator=generator) # may duplicate
 
         i = torch.gather(i, -1, inds)
         j = torch.gather(j, -1, inds)
@@ -334,6 +333,102 @@ def get_rays(poses, intrinsics, H, W, N=-1, patch_size=1, rect=None):
     return results
 
 
+class RayGenerator:
+    ''' get_rays for a fixed H, W and intrinsics (one per dataset)
+    The pixel grid and the camera-space unit directions are built once per device,
+    so each call is a gather of the sampled directions plus a 3x3 rotation,
+    with the same sampling and results as get_rays.
+    '''
+
+    def __init__(self, intrinsics, H, W):
+        self.intrinsics = intrinsics
+        self.H = H
+        self.W = W
+        self._grids = {} # device -> ([H*W, 5] table of i, j, directions, arange)
+        self._patch_offsets = {} # (device, patch_size) -> [p^2]
+
+    @torch.cuda.amp.autocast(enabled=False)
+    def grid(self, device):
+        device = torch.device(device)
+        if device not in self._grids:
+            H, W = self.H, self.W
+            fx, fy, cx, cy = self.intrinsics
+            i, j = custom_meshgrid(torch.linspace(0, W-1, W, device=device), torch.linspace(0, H-1, H, device=device)) # float
+            i = i.t().reshape(H*W) + 0.5
+            j = j.t().reshape(H*W) + 0.5
+            zs = torch.ones_like(i)
+            xs = (i - cx) / fx * zs
+            ys = (j - cy) / fy * zs
+            directions = torch.stack((xs, ys, zs), dim=-1)
+            directions = directions / torch.norm(directions, dim=-1, keepdim=True) # [H*W, 3]
+            # one table so that sampling is a single index_select
+            self._grids[device] = (torch.cat([i[:, None], j[:, None], directions], dim=-1), torch.arange(H*W, device=device))
+        return self._grids[device]
+
+    def patch_offsets(self, patch_size, device):
+        key = (torch.device(device), patch_size)
+        if key not in self._patch_offsets:
+            pi, pj = custom_meshgrid(torch.arange(patch_size, device=device), torch.arange(patch_size, device=device))
+            self._patch_offsets[key] = pi.reshape(-1) * self.W + pj.reshape(-1) # [p^2], flatten
+        return self._patch_offsets[key]
+
+    @torch.cuda.amp.autocast(enabled=False)
+    def __call__(self, poses, N=-1, patch_size=1, rect=None, generator=None):
+        ''' same as get_rays(poses, self.intrinsics, self.H, self.W, N, patch_size, rect, generator) '''
+
+        device = poses.device
+        B = poses.shape[0]
+        H, W = self.H, self.W
+        table, arange = self.grid(device)
+
+        if rect is not None:
+            xmin, xmax, ymin, ymax = rect
+            N = (xmax - xmin) * (ymax - ymin)
+
+        results = {}
+
+        if N > 0:
+            N = min(N, H*W)
+
+            if patch_size > 1:
+                # random sample left-top cores per frame, same draws as get_rays
+                num_patch = N // (patch_size ** 2)
+                inds_x = torch.randint(0, H - patch_size, size=[B, num_patch], device=device, generator=generator)
+                inds_y = torch.randint(0, W - patch_size, size=[B, num_patch], device=device, generator=generator)
+                inds = (inds_x * W + inds_y).unsqueeze(-1) + self.patch_offsets(patch_size, device) # [B, np, p^2]
+                inds = inds.view(B, -1)
+
+            # only get rays in the specified rect, row-major like torch.where on a mask
+            elif rect is not None:
+                # assert B == 1
+                inds = (arange[xmin:xmax, None] * W + arange[None, ymin:ymax]).view(1, -1) # [1, N]
+
+            else:
+                inds = torch.randint(0, H*W, size=[B, N], device=device, generator=generator) # may duplicate, per frame
+
+            table = table.index_select(0, inds.reshape(-1)).view(*inds.shape, 5)
+
+        else:
+            inds = arange.expand([B, H*W])
+            table = table.expand([B, H*W, 5])
+
+        results['i'] = table[..., 0]
+        results['j'] = table[..., 1]
+        directions = table[..., 2:]
+
+        results['inds'] = inds
+
+        rays_d = directions @ poses[:, :3, :3].transpose(-1, -2) # (B, N, 3)
+
+        rays_o = poses[..., :3, 3] # [B, 3]
+        rays_o = rays_o[..., None, :].expand_as(rays_d) # [B, N, 3]
+
+        results['rays_o'] = rays_o
+        results['rays_d'] = rays_d
+
+        return results
+
+
 def seed_everything(seed):
     random.seed(seed)
     os.environ['PYTHONHASHSEED'] = str(seed)
@@ -724,13 +819,13 @@ class Trainer(object):
 
         rays_o = data['rays_o'] # [B, N, 3]
         rays_d = data['rays_d'] # [B, N, 3]
-        bg_coords = data['bg_coords'] # [1, N, 2]
+        bg_coords = data['bg_coords'] # [B, N, 2]
         poses = data['poses'] # [B, 6]
         face_mask = data['face_mask'] # [B, N]
         eye_mask = data['eye_mask'] # [B, N]
         lhalf_mask = data['lhalf_mask']
         eye = data['eye'] # [B, 1]
-        auds = data['auds'] # [B, 29, 16]
+        auds = data['auds'] # [8, 29, 16], [B, 8, 29, 16] for --batch_frames > 1
         index = data['index'] # [B]
 
         if not self.opt.torso:
@@ -753,7 +848,7 @@ class Trainer(object):
         if not self.opt.torso:
             pred_rgb = outputs['image']
         else:
-            pred_rgb = outputs['torso_color']
+            pred_rgb = outputs['torso_color'].view(B, N, 3)
 
 
         # loss factor
@@ -774,7 +869,7 @@ class Trainer(object):
 
         if self.opt.unc_loss and not self.flip_finetune_lips:
             alpha = 0.2
-            uncertainty = outputs['uncertainty'] # [N], abs sum
+            uncertainty = outputs['uncertainty'].view(B, N) # abs sum
             beta = uncertainty + 1
 
             unc_weight = F.softmax(uncertainty, dim=-1) * N
@@ -785,10 +880,10 @@ class Trainer(object):
             beta = uncertainty + 1
             norm_rgb = torch.norm((pred_rgb - rgb), dim=-1).detach()
             loss_u = norm_rgb / (2*beta**2) + (torch.log(beta)**2) / 2
-            loss_u *= face_mask.view(-1)
+            loss_u *= face_mask
             loss += step_factor * loss_u
 
-            loss_static_uncertainty = (uncertainty * (~face_mask.view(-1)))
+            loss_static_uncertainty = (uncertainty * (~face_mask))
             loss += 1e-3 * step_factor * loss_static_uncertainty
         
         # patch-based rendering
@@ -844,7 +939,7 @@ class Trainer(object):
         # aud att loss (regions out of face should be static)
         if self.opt.amb_aud_loss and not self.opt.torso:
             ambient_aud = outputs['ambient_aud']
-            loss_amb_aud = (ambient_aud * (~face_mask.view(-1))).mean()
+            loss_amb_aud = (ambient_aud * (~face_mask)).mean()
             # gradually increase it
             lambda_amb = step_factor * self.opt.lambda_amb 
             loss += lambda_amb * loss_amb_aud
@@ -853,7 +948,7 @@ class Trainer(object):
         if self.opt.amb_eye_loss and not self.opt.torso:
             ambient_eye = outputs['ambient_eye'] / self.opt.max_steps
 
-            loss_cross = ((ambient_eye * ambient_aud.detach())*face_mask.view(-1)).mean()
+            loss_cross = ((ambient_eye * ambient_aud.detach())*face_mask).mean()
             loss += lambda_amb * loss_cross
         
         # regularize
@@ -12,21 +12,26 @@
 # - 系统状态监控 (API接口)
 # =============================================================================
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import os
 import json
 from datetime import datetime
 
-from backend.video_generator import generate_video
+from backend.video_generator import generate_video, is_failed_video
 from backend.model_trainer import train_model
 from backend.chat_engine import chat_response
-from backend.voice_generator import get_voice_service, ServiceConfig
+from backend.voice_generator import get_voice_service, ServiceConfig, VoiceGeneratorError
 from backend.file_manager import file_manager
+from backend.job_queue import get_job_queue, JobStatus
+from backend.gpu_scheduler import get_gpu_scheduler, GPUAcquireAborted
+from backend.media_server import get_media_server
+from backend.upload_ingest import IngestRequest
 from backend.api_handlers import (
     upload_reference_audio as api_upload_reference_audio,
     get_reference_audios as api_get_reference_audios,
     upload_training_video as api_upload_training_video,
     get_training_videos as api_get_training_videos,
+    get_generated_audios as api_get_generated_audios,
     get_available_models as api_get_available_models,
     get_model_details as api_get_model_details
 )
@@ -51,13 +56,101 @@ except ImportError:
 # =============================================================================
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = file_manager.path_manager.get_static_path()
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 限制上传文件大小为100MB
+# 请求体总上限取各上传策略中最大的（训练视频200MB），单个文件的上限由上传策略在流式接收时校验
+app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024
+
+# 参考音频和训练视频上传：请求体边解析边写入暂存文件，同时计算哈希和校验文件头
+app.request_class = IngestRequest
+IngestRequest.register_upload_policy('upload_reference_audio', file_manager.reference_audio_policy)
+IngestRequest.register_upload_policy('upload_training_video', file_manager.training_video_policy)
 
 # FileManager初始化时会自动确保目录存在
 print(f"[App] 使用FileManager进行文件管理")
 print(f"[App] 参考音频目录: {file_manager.path_manager.get_ref_voice_path()}")
 print(f"[App] 结果音频目录: {file_manager.path_manager.get_res_voice_path()}")
 
+# =============================================================================
+# 后台任务队列初始化
+# =============================================================================
+# 视频生成、模型训练、人机对话在后台工作线程中执行，请求线程只负责提交任务
+# 工作线程数量由环境变量 JOB_WORKERS 配置（默认2）
+# 需要GPU的任务先由GPU调度器分配显卡：gpu_choice 默认 auto（选负载最低的显卡），
+# 用户显式选择的显卡仅作为偏好，显存不足时自动改选
+
+gpu_scheduler = get_gpu_scheduler()
+
+def _gpu_job_kind(model_name, stage):
+    """根据模型名称确定GPU任务类型（决定默认显存需求）"""
+    prefix = 'ernerf' if model_name in ('ER-NeRF', 'ER_NeRF', 'ER NeRF') else 'synctalk'
+    return f"{prefix}_{stage}"
+
+def _run_on_gpu(payload, context, job_kind, func):
+    """分配显卡后执行任务，等待显卡期间可被取消"""
+    try:
+        lease = gpu_scheduler.acquire(
+            job_kind,
+            memory_mb=payload.get('gpu_memory_mb') or None,
+            preferred=payload.get('gpu_choice'),
+            should_abort=context.is_cancelled
+        )
+    except GPUAcquireAborted:
+        context.check_cancelled()
+        raise
+
+    with lease:
+        context.update_progress(0.05, f"已分配 {lease.gpu_choice}")
+        return func(dict(payload, gpu_choice=lease.gpu_choice), context)
+
+def _job_failed(context, message):
+    """后端函数返回失败结果：已请求取消时按取消处理，否则使任务失败"""
+    context.check_cancelled()
+    raise RuntimeError(message)
+
+def _run_video_generation_job(payload, context):
+    """视频生成任务"""
+    context.update_progress(0.0, "等待GPU")
+    job_kind = _gpu_job_kind(payload.get('model_name'), 'infer')
+    video_path = _run_on_gpu(payload, context, job_kind, generate_video)
+    if is_failed_video(video_path):
+        _job_failed(context, "视频生成失败，详见服务日志")
+    return {'video_path': video_path}
+
+def _run_model_training_job(payload, context):
+    """模型训练任务"""
+    context.update_progress(0.0, "等待GPU")
+    job_kind = _gpu_job_kind(payload.get('model_choice'), 'train')
+    model_path = _run_on_gpu(payload, context, job_kind, train_model)
+    if model_path is None:
+        _job_failed(context, "模型训练失败，详见服务日志")
+    return {'model_path': model_path}
+
+def _run_chat_job(payload, context):
+    """人机对话任务"""
+    context.update_progress(0.0, "等待GPU")
+    job_kind = _gpu_job_kind(payload.get('model_name'), 'infer')
+    video_path = _run_on_gpu(payload, context, job_kind, chat_response)
+    if is_failed_video(video_path):
+        _job_failed(context, "对话视频生成失败，详见服务日志")
+    return {'response': video_path, 'video_path': video_path}
+
+job_queue = get_job_queue()
+job_queue.register_handler('video_generation', _run_video_generation_job)
+job_queue.register_handler('model_training', _run_model_training_job)
+job_queue.register_handler('chat', _run_chat_job)
+# 多个进程导入应用时（重载子进程、gunicorn worker）只有持有执行锁的进程
+# 恢复中断任务并执行任务，避免把其他进程正在执行的任务重复入队
+job_queue.start_as_runner()
+
+def _job_submitted_response(job_id, message):
+    """任务提交成功的统一响应"""
+    return jsonify({
+        'status': 'success',
+        'job_id': job_id,
+        'task_id': job_id,
+        'status_url': f'/api/jobs/{job_id}',
+        'message': message
+    }), 202
+
 # =============================================================================
 # 页面路由
 # =============================================================================
@@ -80,20 +173,16 @@ def video_generation():
                 "model_name": request.form.get('model_name', 'SyncTalk'),    # 生成模型选择
                 "model_param": request.form.get('model_param', ''),          # 模型参数路径
                 "ref_audio": request.form.get('ref_audio', ''),              # 参考音频路径
-                "gpu_choice": request.form.get('gpu_choice', 'GPU0'),        # GPU设备选择
+                "gpu_choice": request.form.get('gpu_choice', 'auto'),        # GPU设备选择（auto 或调度偏好）
+                "gpu_memory_mb": request.form.get('gpu_memory_mb', ''),      # 显存需求（MB，可选）
                 "target_text": request.form.get('target_text', ''),          # 目标文本内容
                 "pitch": request.form.get('pitch', '0'),                      # 变调步数（半音）
                 "pitch_quality": request.form.get('pitch_quality', 'balanced') # 音质预设
             }
 
-            # 调用后端视频生成模块
-            video_path = generate_video(data)
-
-            return jsonify({
-                'status': 'success',
-                'video_path': video_path,
-                'message': '视频生成成功'
-            })
+            # 提交到后台任务队列，结果通过 /api/jobs/<job_id> 获取
+            job_id = job_queue.submit('video_generation', data)
+            return _job_submitted_response(job_id, '视频生成任务已提交')
 
         except Exception as e:
             return jsonify({
@@ -132,21 +221,16 @@ def model_training():
             data = {
                 "model_choice": request.form.get('model_choice', 'SyncTalk'),     # 模型类型选择
                 "ref_video": request.form.get('ref_video', ''),                  # 参考视频路径
-                "gpu_choice": request.form.get('gpu_choice', 'GPU0'),            # 训练GPU选择
+                "gpu_choice": request.form.get('gpu_choice', 'auto'),            # 训练GPU选择（auto 或调度偏好）
+                "gpu_memory_mb": request.form.get('gpu_memory_mb', ''),          # 显存需求（MB，可选）
                 "epoch": request.form.get('epoch', '100'),                       # 训练轮数
                 "custom_params": request.form.get('custom_params', '')           # 自定义参数
             }
 
-            # 调用后端模型训练模块
-            result = train_model(data)
-
-            return jsonify({
-                'status': 'success',
-                'message': '模型训练开始',
-                'task_id': f"train_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            })
+            # 提交到后台任务队列，进度通过 /api/jobs/<job_id> 获取
+            job_id = job_queue.submit('model_training', data)
+            return _job_submitted_response(job_id, '模型训练开始')
 
-            # ToDo : 这里不够完善，后续可以返回训练日志或进度
         except Exception as e:
             return jsonify({
                 'status': 'error',
@@ -156,6 +240,13 @@ def model_training():
     # GET请求：渲染模型训练页面
     return render_template('model_training.html')
 
+def _resolve_app_path(path):
+    """将相对于应用目录的路径转换为绝对路径"""
+    if not os.path.isabs(path):
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        path = os.path.normpath(os.path.join(current_dir, path))
+    return path
+
 @app.route('/audio_clone', methods=['GET', 'POST'])
 def audio_clone():
     """音频克隆页面路由 - 处理语音克隆请求"""
@@ -190,10 +281,7 @@ def audio_clone():
             print(f"[音频克隆] 生成文本: {generate_text}")
 
             # 将相对路径转换为绝对路径
-            if not os.path.isabs(ref_audio_path):
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                ref_audio_path = os.path.join(current_dir, ref_audio_path)
-                ref_audio_path = os.path.normpath(ref_audio_path)
+            ref_audio_path = _resolve_app_path(ref_audio_path)
 
             # 执行语音克隆
             result = service.clone_voice(
@@ -246,50 +334,94 @@ def audio_clone():
 # API接口路由
 # =============================================================================
 
-@app.route('/api/cloned-audios', methods=['GET'])
-def get_cloned_audios():
-    """获取已克隆的音频列表API - 获取生成的音频文件列表"""
-    try:
-        # 获取生成的音频文件列表（res_voices）
-        res_voices_dir = file_manager.path_manager.get_res_voice_path()
-        cloned_audios = []
-
-        if os.path.exists(res_voices_dir):
-            for filename in os.listdir(res_voices_dir):
-                if filename.endswith(('.wav', '.mp3', '.m4a', '.flac', '.ogg')):
-                    file_path = os.path.join(res_voices_dir, filename)
-                    file_stat = os.stat(file_path)
-
-                    # 获取相对路径
-                    relative_path = file_manager._get_relative_path(file_path)
-
-                    cloned_audios.append({
-                        "id": filename,
-                        "name": filename,
-                        "path": relative_path,
-                        "created_at": datetime.fromtimestamp(file_stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-                        "size_mb": round(file_stat.st_size / (1024 * 1024), 2),
-                        "status": "已生成"
-                    })
+@app.route('/api/audio-clone/stream', methods=['POST'])
+def audio_clone_stream():
+    """流式音频克隆API - 边生成边返回音频数据"""
+    ref_audio_path = request.form.get('ref_audio_path', '').strip()
+    generate_text = request.form.get('generate_text', '').strip()
+    audio_format = request.form.get('format', 'wav').strip().lower()
 
-        # 按创建时间降序排列
-        cloned_audios.sort(key=lambda x: x['created_at'], reverse=True)
+    if not ref_audio_path:
+        return jsonify({
+            'status': 'error',
+            'message': '请选择参考音频'
+        }), 400
 
-        print(f"[API] 获取到 {len(cloned_audios)} 个生成的音频")
+    if not generate_text:
         return jsonify({
-            'status': 'success',
-            'audios': cloned_audios,
-            'total_count': len(cloned_audios)
-        })
+            'status': 'error',
+            'message': '请输入要生成的文本内容'
+        }), 400
 
+    try:
+        speed = float(request.form.get('speed', 1.2))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': '语速参数无效'
+        }), 400
+
+    try:
+        service = get_voice_service(ServiceConfig(enable_vllm=True))
+        ref_audio_path = _resolve_app_path(ref_audio_path)
+
+        print("[音频克隆] 开始流式语音克隆:")
+        print(f"[音频克隆] 参考音频: {ref_audio_path}")
+        print(f"[音频克隆] 生成文本: {generate_text}")
+
+        stream = service.clone_voice_stream(
+            text=generate_text,
+            reference_audio=ref_audio_path,
+            speed=speed,
+            audio_format=audio_format
+        )
+
+        # 预取首个数据块，使模型错误在响应头发送前以JSON返回
+        first_chunk = next(stream)
+        sample_rate = service.get_sample_rate()
+
+    except VoiceGeneratorError as e:
+        print(f"[音频克隆] 流式请求无效: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except StopIteration:
+        return jsonify({
+            'status': 'error',
+            'message': '语音克隆失败: 未生成任何音频'
+        }), 500
     except Exception as e:
-        print(f"[API] 获取生成音频列表失败: {e}")
+        print(f"[音频克隆] 流式请求失败: {e}")
         return jsonify({
             'status': 'error',
-            'message': str(e),
-            'audios': []
+            'message': str(e)
         }), 500
 
+    def generate():
+        yield first_chunk
+        try:
+            for chunk in stream:
+                yield chunk
+        except Exception as e:
+            # 响应头已发送，只能记录错误并提前结束流
+            print(f"[音频克隆] 流式生成中断: {e}")
+
+    mimetype = 'audio/wav' if audio_format == 'wav' else 'application/octet-stream'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={
+            'X-Sample-Rate': str(sample_rate),
+            'Cache-Control': 'no-cache'
+        }
+    )
+
+@app.route('/api/cloned-audios', methods=['GET'])
+def get_cloned_audios():
+    """获取已克隆的音频列表API - 生成的音频文件列表（媒体索引，支持 ?limit=&cursor=&type= 分页）"""
+    return api_get_generated_audios()
+
 @app.route('/api/upload-reference-audio', methods=['POST'])
 def upload_reference_audio():
     """上传参考音频文件API - 使用backend模块"""
@@ -336,14 +468,9 @@ def chat_system():
                 "api_choice": request.form.get('api_choice', 'glm-4-plus')        # API模型选择
             }
 
-            # 调用后端对话引擎
-            result = chat_response(data)
-
-            return jsonify({
-                'status': 'success',
-                'response': result,
-                'message': '对话生成成功'
-            })
+            # 提交到后台任务队列，结果通过 /api/jobs/<job_id> 获取
+            job_id = job_queue.submit('chat', data)
+            return _job_submitted_response(job_id, '对话生成任务已提交')
 
         except Exception as e:
             return jsonify({
@@ -354,6 +481,68 @@ def chat_system():
     # GET请求：渲染人机对话页面
     return render_template('chat_system.html')
 
+# =============================================================================
+# 任务队列API
+# =============================================================================
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """任务列表API - 支持按类型和状态过滤"""
+    try:
+        status = request.args.get('status')
+        jobs = job_queue.list_jobs(
+            job_type=request.args.get('type') or None,
+            status=JobStatus(status) if status else None,
+            limit=min(int(request.args.get('limit', 50)), 500)
+        )
+        return jsonify({
+            'status': 'success',
+            'jobs': [job.to_dict() for job in jobs],
+            'stats': job_queue.get_stats()
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'参数无效: {e}'}), 400
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """任务状态与进度API"""
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': '任务不存在'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """任务结果API - 任务未完成时返回409"""
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': '任务不存在'}), 404
+
+    if job.status == JobStatus.SUCCEEDED:
+        return jsonify({'status': 'success', 'job_id': job_id, 'result': job.result})
+    if job.status.is_finished:
+        return jsonify({
+            'status': 'error',
+            'job_id': job_id,
+            'job_status': job.status.value,
+            'message': job.error or job.message
+        }), 410
+    return jsonify({
+        'status': 'pending',
+        'job_id': job_id,
+        'job_status': job.status.value,
+        'progress': job.progress,
+        'message': job.message
+    }), 409
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """取消任务API"""
+    job = job_queue.cancel_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': '任务不存在'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict()})
+
 @app.route('/save_audio', methods=['POST'])
 def save_audio():
     """音频文件保存API - 处理前端上传的录音文件"""
@@ -402,6 +591,13 @@ def system_status():
             except Exception as e:
                 print(f"获取GPU信息失败: {e}")
 
+        # GPU调度状态（显存预留与运行中的任务）
+        try:
+            gpu_scheduler_status = gpu_scheduler.get_status()
+        except Exception as e:
+            print(f"获取GPU调度状态失败: {e}")
+            gpu_scheduler_status = None
+
         return jsonify({
             'cpu_percent': cpu_percent,
             'memory_percent': memory.percent,
@@ -409,6 +605,7 @@ def system_status():
             'memory_total': memory.total,
             'disk_percent': disk.percent,
             'gpus': gpu_info,
+            'gpu_scheduler': gpu_scheduler_status,
             'timestamp': datetime.now().isoformat()
         })
 
@@ -418,15 +615,28 @@ def system_status():
             'message': str(e)
         }), 500
 
+# 生成的视频和音频走媒体文件服务（Range/206、ETag、条件请求），
+# 覆盖 Flask 默认静态路由中对应的目录，拖动进度条时不再重复下载整个文件
+media_server = get_media_server()
+
 @app.route('/video/<path:filename>')
+@app.route('/static/videos/<path:filename>')
 def serve_video(filename):
     """视频文件服务API - 提供生成的视频文件访问"""
 
-    video_path = os.path.join('static', 'videos', filename)
-    if os.path.exists(video_path):
-        return send_file(video_path)
-    else:
+    response = media_server.send(file_manager.path_manager.get_videos_path(), filename, request)
+    if response is None:
         return jsonify({'status': 'error', 'message': '视频文件不存在'}), 404
+    return response
+
+@app.route('/static/voices/res_voices/<path:filename>')
+def serve_generated_audio(filename):
+    """生成音频文件服务"""
+
+    response = media_server.send(file_manager.path_manager.get_res_voice_path(), filename, request)
+    if response is None:
+        return jsonify({'status': 'error', 'message': '音频文件不存在'}), 404
+    return response
 
 # =============================================================================
 # 应用启动
@@ -9,17 +9,21 @@ CosyVoice3 语音克隆服务模块
 """
 
 import os
+import re
 import sys
 import time
 import uuid
 import json
 import logging
+import hashlib
 import threading
+import importlib.util
 import traceback
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Tuple, Any
-from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Union, Tuple, Any
+from dataclasses import dataclass, field, asdict
 from enum import Enum
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import torch
@@ -46,6 +50,8 @@ if MATCHA_TTS_PATH.exists():
 
 # 导入现有的工具模块
 from .path_manager import PathManager
+from .audio_buffer import AudioBuffer
+from .media_index import record_media_file
 from .model_download_manager import ModelDownloadManager, DownloadSource, ModelType
 
 # CosyVoice导入检查
@@ -57,6 +63,25 @@ except ImportError as e:
     COSYVOICE_AVAILABLE = False
     AutoModel = None
 
+# VLLM 需要独立环境（见 requirements.txt 末尾说明），必须通过环境变量显式开启
+VLLM_OPT_IN_ENV = "COSYVOICE_ENABLE_VLLM"
+
+
+def resolve_vllm(requested: bool) -> bool:
+    """
+    判断是否加载VLLM：调用方请求、环境变量显式开启且 vllm 已安装时才启用
+
+    ServiceConfig.enable_vllm 只表示"可以使用"，不会单独触发 VLLM 加载。
+    """
+    if not requested:
+        return False
+    if os.environ.get(VLLM_OPT_IN_ENV, "").lower() not in ("1", "true", "yes"):
+        return False
+    if importlib.util.find_spec("vllm") is None:
+        logging.warning(f"[CosyService] 已设置 {VLLM_OPT_IN_ENV}，但未安装 vllm，使用普通推理")
+        return False
+    return True
+
 
 # ==================== 异常类定义 ====================
 
@@ -105,6 +130,20 @@ class AudioMetadata:
                 os.path.exists(self.file_path))
 
 
+@dataclass
+class ReferenceCacheEntry:
+    """参考音频缓存条目"""
+    key: Optional[str]
+    audio_path: str
+    metadata: AudioMetadata
+    prompt_text: Optional[str] = None
+
+    @property
+    def is_cached(self) -> bool:
+        """是否为已持久化的缓存条目"""
+        return self.key is not None
+
+
 @dataclass
 class VoiceCloneRequest:
     """语音克隆请求"""
@@ -115,6 +154,8 @@ class VoiceCloneRequest:
     speed: float = 1.0
     stream: bool = False
     language: Optional[str] = None
+    speaker_id: Optional[str] = None
+    save_output: bool = True    # False 时只在内存中返回音频（audio_buffer），不写文件
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
     def __post_init__(self):
@@ -142,14 +183,16 @@ class VoiceCloneResult:
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
     error_message: Optional[str] = None
     created_time: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    segment_count: int = 0      # 合成的文本片段数
+    queue_time: float = 0.0     # 批量合成时从批次开始到本条目开始合成的等待时间
+    audio_buffer: Optional[AudioBuffer] = None  # 合成音频的内存副本（未落盘时为唯一结果）
 
     @property
     def is_valid(self) -> bool:
         """检查结果是否有效"""
-        return (self.success and
-                self.audio_path and
-                os.path.exists(self.audio_path) and
-                self.audio_metadata is not None)
+        has_audio = (self.audio_buffer is not None or
+                     bool(self.audio_path and os.path.exists(self.audio_path)))
+        return self.success and has_audio and self.audio_metadata is not None
 
 
 # ==================== 枚举类定义 ====================
@@ -256,24 +299,20 @@ class AudioValidator(LoggerMixin):
 
             # 获取音频信息
             try:
-                # 对于支持的格式，先尝试使用torchaudio加载
-                waveform, sample_rate = torchaudio.load(audio_path)
-
-                # 从加载的数据中获取信息
-                num_channels = waveform.shape[0] if waveform.dim() >= 2 else 1
-                num_frames = waveform.shape[1] if waveform.dim() >= 2 else waveform.shape[0]
-                duration = num_frames / sample_rate
+                # 只读取文件头（soundfile），不解码整段音频
+                import soundfile as sf
+                info = sf.info(audio_path)
 
                 metadata = AudioMetadata(
                     file_path=os.path.abspath(audio_path),
-                    duration=duration,
-                    sample_rate=sample_rate,
-                    channels=num_channels,
+                    duration=info.frames / info.samplerate,
+                    sample_rate=info.samplerate,
+                    channels=info.channels,
                     file_size=os.path.getsize(audio_path)
                 )
 
             except Exception as e:
-                # 如果torchaudio加载失败，尝试其他方法
+                # 如果soundfile无法解析文件头，尝试其他方法
                 try:
                     # 使用mutagen获取音频元数据（如果可用）
                     try:
@@ -341,7 +380,7 @@ class ModelManager(LoggerMixin):
         self.device_manager = device_manager
         self.model = None
         self.model_info = {}
-        self._load_vllm = load_vllm
+        self._load_vllm = resolve_vllm(load_vllm)
         self._load_jit = load_jit
         self._load_trt = load_trt
         self._fp16 = fp16
@@ -417,7 +456,16 @@ class ModelManager(LoggerMixin):
                     if self._load_trt:
                         load_params["trt_concurrent"] = self._trt_concurrent
 
-                self.model = AutoModel(**load_params)
+                try:
+                    self.model = AutoModel(**load_params)
+                except Exception as e:
+                    if not self._load_vllm:
+                        raise
+                    # VLLM 依赖缺失或初始化失败时回退到普通推理
+                    self.logger.warning(f"[ModelManager] VLLM加载失败，回退到普通推理: {e}")
+                    self._load_vllm = False
+                    load_params["load_vllm"] = False
+                    self.model = AutoModel(**load_params)
 
                 # 记录使用的优化选项
                 optimizations = []
@@ -504,6 +552,10 @@ class ModelManager(LoggerMixin):
         """获取优化信息"""
         return self.model_info["optimizations"].copy()
 
+    def supports_concurrent_inference(self) -> bool:
+        """模型是否支持多线程并发推理（VLLM 引擎会将并发请求合并批处理）"""
+        return self._load_vllm
+
 
 class AudioProcessor(LoggerMixin):
     """音频处理器 - 负责音频文件的加载、保存和格式转换"""
@@ -627,9 +679,406 @@ class AudioProcessor(LoggerMixin):
         return self.path_manager.get_res_voice_path(filename)
 
 
+class ReferenceVoiceCache(LoggerMixin):
+    """
+    参考音频缓存 - 按内容寻址缓存参考音频的处理结果
+
+    缓存键由参考音频文件内容的 SHA-256 与预处理配置摘要组成，每个条目保存：
+    - 校验后的音频元数据
+    - 预处理后的 wav 文件
+    - ASR 识别出的提示文本
+
+    同一段参考音频重复使用时可直接跳过校验、预处理和 ASR。
+    缓存按总大小和条目数限制，超限时按 LRU 顺序淘汰。
+    """
+
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_dir: str, max_size_mb: float = 512.0, max_entries: int = 256):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        # LRU 顺序: 最近使用的条目在末尾
+        self._entries: "OrderedDict[str, ReferenceCacheEntry]" = OrderedDict()
+        self._entry_sizes: Dict[str, int] = {}
+        self._digest_memo: Dict[Tuple[str, int, int], str] = {}
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_entries()
+
+    # ---------- 键计算 ----------
+
+    def compute_key(self, audio_path: str, config: Any) -> str:
+        """计算缓存键（文件内容哈希 + 预处理配置摘要）"""
+        return f"{self._content_digest(audio_path)}_{self._config_digest(config)}"
+
+    def _content_digest(self, audio_path: str) -> str:
+        """计算文件内容的 SHA-256（按路径、大小和修改时间记忆）"""
+        abs_path = os.path.abspath(audio_path)
+        stat = os.stat(abs_path)
+        memo_key = (abs_path, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            digest = self._digest_memo.get(memo_key)
+        if digest is not None:
+            return digest
+
+        sha256 = hashlib.sha256()
+        with open(abs_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+
+        with self._lock:
+            if len(self._digest_memo) >= self.max_entries * 4:
+                self._digest_memo.clear()
+            self._digest_memo[memo_key] = digest
+        return digest
+
+    @staticmethod
+    def _config_digest(config: Any) -> str:
+        """计算预处理配置摘要"""
+        fields = {
+            name: value.value if isinstance(value, Enum) else value
+            for name, value in asdict(config).items()
+        }
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    # ---------- 路径 ----------
+
+    def _audio_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get_staging_path(self, key: str) -> str:
+        """获取预处理输出的临时路径（与缓存目录同一文件系统，便于原子移动）"""
+        return os.path.join(self.cache_dir, f"{key}.{uuid.uuid4().hex[:8]}.tmp.wav")
+
+    # ---------- 读写 ----------
+
+    def _load_entries(self):
+        """从磁盘恢复缓存索引（按条目文件修改时间恢复 LRU 顺序）"""
+        loaded = []
+        for filename in os.listdir(self.cache_dir):
+            file_path = os.path.join(self.cache_dir, filename)
+
+            # 清理上次异常退出遗留的临时文件
+            if filename.endswith('.tmp.wav') or filename.endswith('.json.tmp'):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+                continue
+
+            if not filename.endswith('.json'):
+                continue
+
+            key = filename[:-len('.json')]
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                entry = ReferenceCacheEntry(
+                    key=key,
+                    audio_path=self._audio_path(key),
+                    metadata=AudioMetadata(**data['metadata']),
+                    prompt_text=data.get('prompt_text')
+                )
+                if not os.path.exists(entry.audio_path):
+                    os.remove(file_path)
+                    continue
+                size = os.path.getsize(entry.audio_path) + os.path.getsize(file_path)
+                loaded.append((os.path.getmtime(file_path), key, entry, size))
+            except Exception as e:
+                self.logger.warning(f"[ReferenceVoiceCache] 跳过损坏的缓存条目 {filename}: {e}")
+
+        loaded.sort(key=lambda item: item[0])
+        with self._lock:
+            for _, key, entry, size in loaded:
+                self._entries[key] = entry
+                self._entry_sizes[key] = size
+            self._evict_if_needed()
+
+        if loaded:
+            self.logger.info(f"[ReferenceVoiceCache] 已加载 {len(self._entries)} 个缓存条目")
+
+    def _write_entry(self, entry: ReferenceCacheEntry):
+        """原子写入条目元数据"""
+        entry_path = self._entry_path(entry.key)
+        tmp_path = f"{entry_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "metadata": asdict(entry.metadata),
+                "prompt_text": entry.prompt_text
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, entry_path)
+
+    def get(self, key: str) -> Optional[ReferenceCacheEntry]:
+        """查询缓存，命中时更新 LRU 顺序"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry.audio_path):
+                if entry is not None:
+                    self._remove(key)
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+
+        # 用文件修改时间持久化访问顺序，重启后可恢复 LRU
+        try:
+            os.utime(self._entry_path(key))
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, audio_path: str, metadata: AudioMetadata,
+            prompt_text: Optional[str] = None) -> ReferenceCacheEntry:
+        """写入缓存条目（预处理音频会被移动到缓存目录）"""
+        entry = ReferenceCacheEntry(
+            key=key,
+            audio_path=self._audio_path(key),
+            metadata=metadata,
+            prompt_text=prompt_text
+        )
+
+        with self._lock:
+            os.replace(audio_path, entry.audio_path)
+            self._write_entry(entry)
+
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._entry_sizes[key] = (os.path.getsize(entry.audio_path) +
+                                      os.path.getsize(self._entry_path(key)))
+            self._stats["stores"] += 1
+            self._evict_if_needed()
+
+        self.logger.info(f"[ReferenceVoiceCache] 缓存参考音频: {key[:16]}...")
+        return entry
+
+    def update_prompt_text(self, key: str, prompt_text: str) -> Optional[ReferenceCacheEntry]:
+        """补充条目的 ASR 提示文本"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.prompt_text = prompt_text
+            self._write_entry(entry)
+            return entry
+
+    def _remove(self, key: str):
+        """删除条目及其文件（调用方需持有锁）"""
+        self._entries.pop(key, None)
+        self._entry_sizes.pop(key, None)
+        for path in (self._audio_path(key), self._entry_path(key)):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                self.logger.warning(f"[ReferenceVoiceCache] 删除缓存文件失败 {path}: {e}")
+
+    def _evict_if_needed(self):
+        """按 LRU 顺序淘汰超出限制的条目（调用方需持有锁）"""
+        while self._entries and (
+            len(self._entries) > self.max_entries or
+            sum(self._entry_sizes.values()) > self.max_size_bytes
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for key in list(self._entries.keys()):
+                self._remove(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            stats = self._stats.copy()
+            lookups = stats["hits"] + stats["misses"]
+            stats.update({
+                "hit_rate": stats["hits"] / lookups if lookups > 0 else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_mb": round(sum(self._entry_sizes.values()) / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+                "cache_dir": self.cache_dir
+            })
+            return stats
+
+
+class SpeakerRegistry(LoggerMixin):
+    """
+    说话人注册表 - 持久化CosyVoice零样本推理的前端特征
+
+    在参考音频首次用于克隆时提取一次说话人嵌入（campplus）和提示语音token
+    （speech tokenizer），保存为张量文件；克隆请求通过 zero_shot_spk_id
+    直接复用，避免每次请求重复执行两次ONNX前端推理。
+
+    存储布局:
+    - 索引: PathManager.get_speaker_features_path()
+    - 张量: PathManager.get_speaker_feature_tensor_path(speaker_id)
+    """
+
+    def __init__(self, path_manager: PathManager):
+        self.path_manager = path_manager
+        self.index_path = path_manager.get_speaker_features_path()
+        self._lock = threading.RLock()
+        self._speakers: Dict[str, Dict[str, Any]] = {}
+        self._load_index()
+
+    def _load_index(self):
+        """加载说话人索引"""
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._speakers = json.load(f)
+        except Exception as e:
+            self.logger.warning(f"[SpeakerRegistry] 加载说话人索引失败: {e}")
+            self._speakers = {}
+
+    def _save_index(self):
+        """原子保存说话人索引（调用方需持有锁）"""
+        self.path_manager.ensure_file_directory(self.index_path)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._speakers, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def has_speaker(self, speaker_id: str) -> bool:
+        """检查说话人是否已注册且特征文件存在"""
+        with self._lock:
+            info = self._speakers.get(speaker_id)
+        return info is not None and os.path.exists(info["tensor_path"])
+
+    def get_speaker(self, speaker_id: str) -> Optional[Dict[str, Any]]:
+        """获取说话人注册信息"""
+        with self._lock:
+            info = self._speakers.get(speaker_id)
+            return dict(info) if info else None
+
+    def register(self, model, speaker_id: str, prompt_wav: str, prompt_text: str,
+                 full_prompt_text: str, source_audio: Optional[str] = None) -> bool:
+        """
+        提取并保存说话人前端特征
+
+        Args:
+            model: CosyVoice模型实例
+            speaker_id: 说话人ID
+            prompt_wav: 参考音频路径（预处理后）
+            prompt_text: 参考音频对应的文本
+            full_prompt_text: 实际送入模型的提示文本（含指令前缀）
+            source_audio: 原始参考音频路径（仅记录）
+
+        Returns:
+            bool: 是否注册成功
+        """
+        frontend = getattr(model, 'frontend', None)
+        if frontend is None or not hasattr(model, 'add_zero_shot_spk'):
+            self.logger.warning("[SpeakerRegistry] 当前模型不支持零样本说话人注册")
+            return False
+
+        try:
+            with self._lock:
+                model.add_zero_shot_spk(full_prompt_text, prompt_wav, speaker_id)
+                model_input = frontend.spk2info[speaker_id]
+
+                tensor_path = self.path_manager.get_speaker_feature_tensor_path(speaker_id)
+                self.path_manager.ensure_file_directory(tensor_path)
+                tmp_path = f"{tensor_path}.tmp"
+                torch.save({
+                    name: value.detach().cpu() if isinstance(value, torch.Tensor) else value
+                    for name, value in model_input.items()
+                }, tmp_path)
+                os.replace(tmp_path, tensor_path)
+
+                self._speakers[speaker_id] = {
+                    "tensor_path": tensor_path,
+                    "prompt_text": prompt_text,
+                    "prompt_wav": prompt_wav,
+                    "source_audio": source_audio,
+                    "created_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                }
+                self._save_index()
+
+            self.logger.info(f"[SpeakerRegistry] 说话人特征已保存: {tensor_path}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"[SpeakerRegistry] 说话人注册失败: {e}")
+            return False
+
+    def load_into_model(self, model, speaker_id: str) -> bool:
+        """
+        确保说话人特征已加载到模型前端
+
+        Returns:
+            bool: 模型是否可以使用该 zero_shot_spk_id
+        """
+        frontend = getattr(model, 'frontend', None)
+        if frontend is None or not hasattr(frontend, 'spk2info'):
+            return False
+
+        with self._lock:
+            if speaker_id in frontend.spk2info:
+                return True
+
+            info = self._speakers.get(speaker_id)
+            if info is None or not os.path.exists(info["tensor_path"]):
+                return False
+
+            try:
+                device = getattr(frontend, 'device', 'cpu')
+                frontend.spk2info[speaker_id] = torch.load(info["tensor_path"], map_location=device)
+                self.logger.info(f"[SpeakerRegistry] 加载说话人特征: {speaker_id[:16]}...")
+                return True
+            except Exception as e:
+                self.logger.warning(f"[SpeakerRegistry] 加载说话人特征失败: {e}")
+                return False
+
+    def remove(self, speaker_id: str, model=None) -> bool:
+        """删除说话人注册信息及特征文件"""
+        with self._lock:
+            info = self._speakers.pop(speaker_id, None)
+            if info is None:
+                return False
+
+            if os.path.exists(info["tensor_path"]):
+                os.remove(info["tensor_path"])
+            self._save_index()
+
+            frontend = getattr(model, 'frontend', None)
+            if frontend is not None and hasattr(frontend, 'spk2info'):
+                frontend.spk2info.pop(speaker_id, None)
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取注册表统计信息"""
+        with self._lock:
+            return {
+                "registered_speakers": len(self._speakers),
+                "index_path": self.index_path
+            }
+
+
 class VoiceCloner(LoggerMixin):
     """语音克隆器 - 核心语音克隆逻辑"""
 
+    # CosyVoice3 推荐的提示前缀，用于防止提示词内容被读入音频
+    PROMPT_PREFIX = "You are a helpful assistant.<|endofprompt|>"
+
+    # 批量合成时单个片段的最大字符数，长文本在句子边界处切分
+    SEGMENT_MAX_CHARS = 200
+    _SENTENCE_BOUNDARY = re.compile(r'(?<=[。！？；!?;…])|(?<=\.)(?=\s)|\n+')
+    _CLAUSE_BOUNDARY = re.compile(r'(?<=[，,、：:])')
+
     def __init__(self, model_manager: ModelManager, audio_processor: AudioProcessor):
         self.model_manager = model_manager
         self.audio_processor = audio_processor
@@ -649,6 +1098,41 @@ class VoiceCloner(LoggerMixin):
                 self._whisper_model = False
         return self._whisper_model
 
+    @classmethod
+    def build_prompt_text(cls, text: str) -> str:
+        """构建送入模型的提示文本"""
+        return f"{cls.PROMPT_PREFIX} {text}"
+
+    @classmethod
+    def split_sentences(cls, text: str, max_chars: Optional[int] = None) -> List[str]:
+        """
+        在句子边界处切分长文本
+
+        相邻短句合并为不超过 max_chars 的片段；单句超长时按逗号等
+        子句边界继续切分，仍然超长则按长度硬切。
+        """
+        max_chars = max_chars or cls.SEGMENT_MAX_CHARS
+
+        pieces = []
+        for sentence in cls._SENTENCE_BOUNDARY.split(text):
+            sentence = sentence.strip()
+            if len(sentence) <= max_chars:
+                if sentence:
+                    pieces.append(sentence)
+                continue
+            for clause in cls._CLAUSE_BOUNDARY.split(sentence):
+                clause = clause.strip()
+                pieces.extend(clause[i:i + max_chars] for i in range(0, len(clause), max_chars))
+
+        segments = []
+        for piece in pieces:
+            separator = " " if piece[0].isascii() else ""
+            if segments and len(segments[-1]) + len(separator) + len(piece) <= max_chars:
+                segments[-1] = f"{segments[-1]}{separator}{piece}"
+            else:
+                segments.append(piece)
+        return segments
+
     def _transcribe_audio(self, audio_path: str) -> Optional[str]:
         """使用 Whisper 从音频中提取文本"""
         try:
@@ -665,6 +1149,46 @@ class VoiceCloner(LoggerMixin):
             self.logger.warning(f"[VoiceCloner] ASR 识别失败: {e}")
             return None
 
+    def _prepare_inference(self, request: VoiceCloneRequest) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        准备推理输入
+
+        Returns:
+            (参考音频路径, 提示文本, inference_zero_shot 关键字参数)
+        """
+        # 检查参考音频是否需要格式转换（CosyVoice内部使用torchaudio.load，不支持.m4a）
+        reference_audio = request.reference_audio_path
+        if self.audio_processor._needs_conversion(reference_audio):
+            self.logger.info(f"[VoiceCloner] 参考音频需要格式转换: {Path(reference_audio).suffix}")
+            reference_audio = self.audio_processor._convert_to_wav(reference_audio)
+            self.logger.info(f"[VoiceCloner] 使用转换后的音频: {reference_audio}")
+
+        # 准备提示文本 - 使用CosyVoice3推荐的高级提示格式
+        if request.prompt_text:
+            # 用户提供了自定义提示词（应该是参考音频中说话的内容）
+            prompt_text = self.build_prompt_text(request.prompt_text)
+        else:
+            # 未提供 prompt_text，使用 ASR 从参考音频中提取文本
+            self.logger.info("[VoiceCloner] 未提供 prompt_text，尝试从参考音频中提取文本...")
+            transcribed_text = self._transcribe_audio(reference_audio)
+
+            if transcribed_text:
+                # 使用识别出的文本作为 prompt
+                prompt_text = self.build_prompt_text(transcribed_text)
+                self.logger.info(f"[VoiceCloner] 使用 ASR 识别文本作为 prompt")
+            else:
+                # ASR 失败，回退到使用合成文本（虽然不完美，但比只有前缀好）
+                self.logger.warning("[VoiceCloner] ASR 识别失败，使用合成文本作为 prompt（可能效果不佳）")
+                prompt_text = self.build_prompt_text(request.text)
+
+        # 已注册的说话人直接复用预计算的前端特征（跳过说话人嵌入和语音token提取）
+        inference_kwargs = {"stream": request.stream, "speed": request.speed}
+        if request.speaker_id:
+            inference_kwargs["zero_shot_spk_id"] = request.speaker_id
+            self.logger.info(f"[VoiceCloner] 使用已注册说话人特征: {request.speaker_id[:16]}...")
+
+        return reference_audio, prompt_text, inference_kwargs
+
     def clone_voice(self, request: VoiceCloneRequest) -> VoiceCloneResult:
         """执行语音克隆"""
         start_time = time.time()
@@ -678,39 +1202,16 @@ class VoiceCloner(LoggerMixin):
             # 获取模型
             model = self.model_manager.get_model()
 
-            # 生成输出路径
-            if request.output_filename:
-                output_path = self.audio_processor.get_output_path(request.output_filename)
-            else:
-                output_path = self.audio_processor.get_output_path()
-
-            # 检查参考音频是否需要格式转换（CosyVoice内部使用torchaudio.load，不支持.m4a）
-            reference_audio = request.reference_audio_path
-            if self.audio_processor._needs_conversion(reference_audio):
-                self.logger.info(f"[VoiceCloner] 参考音频需要格式转换: {Path(reference_audio).suffix}")
-                reference_audio = self.audio_processor._convert_to_wav(reference_audio)
-                self.logger.info(f"[VoiceCloner] 使用转换后的音频: {reference_audio}")
-
-            # 准备提示文本 - 使用CosyVoice3推荐的高级提示格式
-            # 必需的前缀，用于防止提示词内容被读入音频
-            prefix_prompt = "You are a helpful assistant.<|endofprompt|>"
-
-            if request.prompt_text:
-                # 用户提供了自定义提示词（应该是参考音频中说话的内容）
-                prompt_text = f"{prefix_prompt} {request.prompt_text}"
-            else:
-                # 未提供 prompt_text，使用 ASR 从参考音频中提取文本
-                self.logger.info("[VoiceCloner] 未提供 prompt_text，尝试从参考音频中提取文本...")
-                transcribed_text = self._transcribe_audio(reference_audio)
-
-                if transcribed_text:
-                    # 使用识别出的文本作为 prompt
-                    prompt_text = f"{prefix_prompt} {transcribed_text}"
-                    self.logger.info(f"[VoiceCloner] 使用 ASR 识别文本作为 prompt")
+            # 生成输出路径（只返回内存音频时不落盘）
+            output_path = None
+            if request.save_output:
+                if request.output_filename:
+                    output_path = self.audio_processor.get_output_path(request.output_filename)
                 else:
-                    # ASR 失败，回退到使用合成文本（虽然不完美，但比只有前缀好）
-                    self.logger.warning("[VoiceCloner] ASR 识别失败，使用合成文本作为 prompt（可能效果不佳）")
-                    prompt_text = f"{prefix_prompt} {request.text}"
+                    output_path = self.audio_processor.get_output_path()
+
+            # 准备参考音频、提示文本和推理参数
+            reference_audio, prompt_text, inference_kwargs = self._prepare_inference(request)
 
             # 执行语音克隆
             self.logger.info("[VoiceCloner] 开始生成语音...")
@@ -721,8 +1222,7 @@ class VoiceCloner(LoggerMixin):
                 request.text,
                 prompt_text,
                 reference_audio,  # 使用转换后的音频路径
-                stream=request.stream,
-                speed=request.speed
+                **inference_kwargs
             )):
                 if 'tts_speech' in audio_data:
                     # 收集音频片段
@@ -737,33 +1237,10 @@ class VoiceCloner(LoggerMixin):
             combined_audio = torch.cat(audio_segments, dim=-1)
 
             # 保存拼接后的音频
-            if self.audio_processor.save_audio(
-                combined_audio,
-                self.model_manager.model_info['sample_rate'],
-                output_path
-            ):
-                result = VoiceCloneResult(
-                    success=True,
-                    audio_path=output_path,
-                    generation_time=time.time() - start_time
-                )
+            result = self._save_result(combined_audio, output_path, start_time)
+            result.segment_count = len(audio_segments)
 
-                # 获取音频元数据
-                try:
-                    info = torchaudio.info(output_path)
-                    result.audio_metadata = AudioMetadata(
-                        file_path=output_path,
-                        duration=info.num_frames / info.sample_rate,
-                        sample_rate=info.sample_rate,
-                        channels=info.num_channels,
-                        file_size=os.path.getsize(output_path)
-                    )
-                except Exception as e:
-                    self.logger.warning(f"获取音频元数据失败: {e}")
-            else:
-                raise VoiceGenerationError("音频保存失败")
-
-            self.logger.info(f"[VoiceCloner] 语音克隆成功: {output_path}")
+            self.logger.info(f"[VoiceCloner] 语音克隆成功: {output_path or '内存音频'}")
             self.logger.info(f"  生成时长: {result.audio_metadata.duration:.2f}s")
             self.logger.info(f"  耗时: {result.generation_time:.2f}s")
 
@@ -779,6 +1256,187 @@ class VoiceCloner(LoggerMixin):
             self.logger.error(f"错误堆栈: {traceback.format_exc()}")
             return result
 
+    def _save_result(self, audio: torch.Tensor, output_path: Optional[str], start_time: float) -> VoiceCloneResult:
+        """保存合成音频并构建克隆结果（output_path 为 None 时只返回内存音频）"""
+        sample_rate = self.model_manager.model_info['sample_rate']
+        buffer = AudioBuffer.from_tensor(audio, sample_rate)
+
+        if output_path is not None:
+            if not self.audio_processor.save_audio(audio, sample_rate, output_path):
+                raise VoiceGenerationError("音频保存失败")
+            buffer.source_path = output_path
+            record_media_file(output_path)
+
+        result = VoiceCloneResult(
+            success=True,
+            audio_path=output_path,
+            audio_buffer=buffer,
+            generation_time=time.time() - start_time
+        )
+
+        # 元数据直接由内存音频得到，无需重新读取文件
+        result.audio_metadata = AudioMetadata(
+            file_path=output_path or "",
+            duration=buffer.duration,
+            sample_rate=sample_rate,
+            channels=1,
+            file_size=os.path.getsize(output_path) if output_path else 0
+        )
+
+        return result
+
+    def _synthesize_segment(self, model, text: str, prompt_text: str, reference_audio: str,
+                            inference_kwargs: Dict[str, Any]) -> Tuple[torch.Tensor, float]:
+        """合成单个文本片段，返回 (音频, 开始时间)"""
+        start_time = time.time()
+        segments = [
+            audio_data['tts_speech']
+            for audio_data in model.inference_zero_shot(text, prompt_text, reference_audio, **inference_kwargs)
+            if 'tts_speech' in audio_data
+        ]
+        if not segments:
+            raise VoiceGenerationError(f"片段生成失败：未生成有效音频 ({text[:20]}...)")
+        return torch.cat(segments, dim=-1), start_time
+
+    def clone_voice_batch(self, requests: List[VoiceCloneRequest], max_workers: int = 1) -> List[VoiceCloneResult]:
+        """
+        批量语音克隆
+
+        所有请求共享同一参考音频，提示文本、格式转换和说话人特征只准备一次。
+        每条文本在句子边界处切分为片段，全部片段提交到线程池并发合成
+        （VLLM 引擎会将并发请求合并批处理），最后按原顺序拼接保存。
+
+        Args:
+            requests: 共享同一参考音频的克隆请求列表
+            max_workers: 并发合成的片段数
+
+        Returns:
+            List[VoiceCloneResult]: 与 requests 顺序一致的结果列表
+        """
+        batch_start = time.time()
+        results = [VoiceCloneResult(success=False, request_id=request.request_id) for request in requests]
+        if not requests:
+            return results
+
+        try:
+            model = self.model_manager.get_model()
+            reference_audio, prompt_text, inference_kwargs = self._prepare_inference(requests[0])
+        except Exception as e:
+            self.logger.error(f"[VoiceCloner] 批量克隆准备失败: {e}")
+            for result in results:
+                result.error_message = str(e)
+                result.generation_time = time.time() - batch_start
+            return results
+        inference_kwargs["stream"] = False
+
+        item_segments = [self.split_sentences(request.text) for request in requests]
+        self.logger.info(f"[VoiceCloner] 开始批量语音克隆: {len(requests)} 条文本, "
+                         f"{sum(len(segments) for segments in item_segments)} 个片段, 并发数 {max_workers}")
+
+        item_audio = [[None] * len(segments) for segments in item_segments]
+        item_start = [None] * len(requests)
+        item_error = [None] * len(requests)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {}
+            for i, segments in enumerate(item_segments):
+                kwargs = dict(inference_kwargs, speed=requests[i].speed)
+                for j, segment_text in enumerate(segments):
+                    future = executor.submit(self._synthesize_segment, model, segment_text,
+                                             prompt_text, reference_audio, kwargs)
+                    futures[future] = (i, j)
+
+            for future in as_completed(futures):
+                i, j = futures[future]
+                try:
+                    item_audio[i][j], segment_start = future.result()
+                    item_start[i] = min(item_start[i] or segment_start, segment_start)
+                except Exception as e:
+                    self.logger.error(f"[VoiceCloner] 第 {i + 1} 条第 {j + 1} 个片段生成失败: {e}")
+                    item_error[i] = item_error[i] or str(e)
+
+        # 同一秒内生成的默认文件名会冲突，批量时统一加序号
+        default_prefix = f"cosyvoice_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        for i, request in enumerate(requests):
+            start_time = item_start[i] or batch_start
+            try:
+                if item_error[i]:
+                    raise VoiceGenerationError(item_error[i])
+
+                output_path = self.audio_processor.get_output_path(
+                    request.output_filename or f"{default_prefix}_{i:03d}"
+                )
+                result = self._save_result(torch.cat(item_audio[i], dim=-1), output_path, start_time)
+                result.request_id = request.request_id
+                result.segment_count = len(item_segments[i])
+                self.model_manager.update_performance_stats(result.generation_time)
+            except Exception as e:
+                result = results[i]
+                result.error_message = str(e)
+                result.generation_time = time.time() - start_time
+
+            result.queue_time = start_time - batch_start
+            results[i] = result
+
+        succeeded = sum(1 for result in results if result.success)
+        self.logger.info(f"[VoiceCloner] 批量语音克隆完成: {succeeded}/{len(requests)} 成功, "
+                         f"总耗时 {time.time() - batch_start:.2f}s")
+        return results
+
+    def clone_voice_stream(self, request: VoiceCloneRequest) -> Iterator[torch.Tensor]:
+        """
+        流式语音克隆
+
+        CosyVoice 每生成一个语音片段就立即产出，不拼接、不落盘，
+        首个片段的等待时间即为首包延迟。
+
+        Yields:
+            torch.Tensor: 形状为 (1, N) 的音频片段
+
+        Raises:
+            VoiceGenerationError: 未生成任何音频时抛出
+        """
+        start_time = time.time()
+
+        self.logger.info(f"[VoiceCloner] 开始流式语音克隆: {request.request_id}")
+        self.logger.info(f"  文本长度: {len(request.text)} 字符")
+        self.logger.info(f"  参考音频: {request.reference_audio_path}")
+
+        model = self.model_manager.get_model()
+        reference_audio, prompt_text, inference_kwargs = self._prepare_inference(request)
+        inference_kwargs["stream"] = True
+
+        segment_count = 0
+        total_samples = 0
+        for audio_data in model.inference_zero_shot(
+            request.text,
+            prompt_text,
+            reference_audio,
+            **inference_kwargs
+        ):
+            if 'tts_speech' not in audio_data:
+                continue
+
+            segment = audio_data['tts_speech']
+            if segment_count == 0:
+                self.logger.info(f"[VoiceCloner] 首包延迟: {time.time() - start_time:.2f}s")
+
+            segment_count += 1
+            total_samples += segment.shape[-1]
+            yield segment
+
+        if segment_count == 0:
+            raise VoiceGenerationError("语音生成失败：未生成有效音频")
+
+        generation_time = time.time() - start_time
+        sample_rate = self.model_manager.model_info['sample_rate']
+        self.logger.info(f"[VoiceCloner] 流式语音克隆完成: {segment_count} 个片段")
+        self.logger.info(f"  生成时长: {total_samples / sample_rate:.2f}s")
+        self.logger.info(f"  耗时: {generation_time:.2f}s")
+
+        self.model_manager.update_performance_stats(generation_time)
+
     def cleanup(self):
         """清理资源"""
         if hasattr(self, 'executor'):
@@ -809,6 +1467,9 @@ class CosyService(LoggerMixin):
             print(f"克隆成功: {result.audio_path}")
     """
 
+    # 批量合成的最大并发片段数（仅在 VLLM 启用时生效，否则串行合成）
+    BATCH_MAX_WORKERS = 4
+
     def __init__(self, model_dir: str = None,
                  load_vllm: bool = False, load_jit: bool = False, load_trt: bool = False,
                  fp16: bool = False, trt_concurrent: int = 1):
@@ -827,6 +1488,8 @@ class CosyService(LoggerMixin):
             self.device_manager = DeviceManager()
             self.audio_validator = AudioValidator()
             self.audio_processor = AudioProcessor(self.path_manager)
+            self.reference_cache = ReferenceVoiceCache(self.path_manager.get_reference_voice_cache_path())
+            self.speaker_registry = SpeakerRegistry(self.path_manager)
 
             # 初始化模型下载管理器
             self.model_download_manager = ModelDownloadManager(self.path_manager)
@@ -919,7 +1582,8 @@ class CosyService(LoggerMixin):
 
     def clone_voice(self, text: str, reference_audio_path: str,
                    prompt_text: str = None, output_filename: str = None,
-                   speed: float = 1.0, stream: bool = False) -> VoiceCloneResult:
+                   speed: float = 1.0, stream: bool = False,
+                   save_output: bool = True) -> VoiceCloneResult:
         """
         语音克隆主接口
 
@@ -930,6 +1594,7 @@ class CosyService(LoggerMixin):
             output_filename: 输出文件名（可选）
             speed: 语速控制（0.1-3.0）
             stream: 是否使用流式推理
+            save_output: 是否写出音频文件（False 时结果只包含 audio_buffer）
 
         Returns:
             VoiceCloneResult: 克隆结果
@@ -952,18 +1617,21 @@ class CosyService(LoggerMixin):
                 prompt_text=prompt_text,
                 output_filename=output_filename,
                 speed=speed,
-                stream=stream
+                stream=stream,
+                save_output=save_output
             )
 
-            # 验证参考音频
-            self.audio_validator.validate_audio_file(reference_audio_path)
+            # 验证并预处理参考音频（命中缓存时直接复用结果）
+            reference = self._prepare_reference_audio(
+                reference_audio_path,
+                need_prompt_text=not prompt_text
+            )
+            request.reference_audio_path = reference.audio_path
+            if not request.prompt_text and reference.prompt_text:
+                request.prompt_text = reference.prompt_text
 
-            # 音频预处理（提升克隆效果）
-            preprocessed_audio_path = self._preprocess_reference_audio(reference_audio_path)
-            if preprocessed_audio_path:
-                self.logger.info(f"[CosyService] 使用预处理后的音频: {preprocessed_audio_path}")
-                # 更新请求中的参考音频路径
-                request.reference_audio_path = preprocessed_audio_path
+            # 复用预计算的前端特征，参考音频首次使用时注册为说话人
+            request.speaker_id = self._ensure_speaker(reference, reference_audio_path, request.prompt_text)
 
             # 执行语音克隆
             result = self.voice_cloner.clone_voice(request)
@@ -977,6 +1645,252 @@ class CosyService(LoggerMixin):
                 error_message=str(e)
             )
 
+    def clone_voice_stream(self, text: str, reference_audio_path: str,
+                           prompt_text: str = None, speed: float = 1.0) -> Iterator[torch.Tensor]:
+        """
+        流式语音克隆接口
+
+        参考音频的校验和预处理在调用时立即完成（错误会直接抛出），
+        返回的生成器在 CosyVoice 产出每个片段时逐个产出音频张量。
+
+        Args:
+            text: 要克隆的文本内容
+            reference_audio_path: 参考音频文件路径
+            prompt_text: 提示文本（可选）
+            speed: 语速控制（0.1-3.0）
+
+        Returns:
+            Iterator[torch.Tensor]: 音频片段生成器
+
+        Raises:
+            CosyServiceError: 服务相关异常
+        """
+        if not COSYVOICE_AVAILABLE or not self.voice_cloner:
+            raise CosyServiceError("CosyVoice模块不可用，无法进行语音克隆")
+
+        request = VoiceCloneRequest(
+            text=text,
+            reference_audio_path=reference_audio_path,
+            prompt_text=prompt_text,
+            speed=speed,
+            stream=True
+        )
+
+        reference = self._prepare_reference_audio(
+            reference_audio_path,
+            need_prompt_text=not prompt_text
+        )
+        request.reference_audio_path = reference.audio_path
+        if not request.prompt_text and reference.prompt_text:
+            request.prompt_text = reference.prompt_text
+        request.speaker_id = self._ensure_speaker(reference, reference_audio_path, request.prompt_text)
+
+        return self.voice_cloner.clone_voice_stream(request)
+
+    def clone_voice_batch(self, texts: List[str], reference_audio_path: str,
+                          prompt_text: str = None, output_prefix: str = None,
+                          speed: float = 1.0) -> List[VoiceCloneResult]:
+        """
+        批量语音克隆接口
+
+        参考音频的校验、预处理、ASR 和说话人特征在整个批次中只准备一次；
+        长文本在句子边界处切分后并发合成，结果按输入顺序返回。
+
+        Args:
+            texts: 要克隆的文本列表
+            reference_audio_path: 参考音频文件路径
+            prompt_text: 提示文本（可选）
+            output_prefix: 输出文件名前缀（可选，文件名追加序号）
+            speed: 语速控制（0.1-3.0）
+
+        Returns:
+            List[VoiceCloneResult]: 与 texts 顺序一致的结果列表
+        """
+        if not COSYVOICE_AVAILABLE or not self.voice_cloner:
+            return [
+                VoiceCloneResult(success=False, error_message="CosyVoice模块不可用，无法进行语音克隆")
+                for _ in texts
+            ]
+
+        try:
+            requests = [
+                VoiceCloneRequest(
+                    text=text,
+                    reference_audio_path=reference_audio_path,
+                    prompt_text=prompt_text,
+                    output_filename=f"{output_prefix}_{i:03d}" if output_prefix else None,
+                    speed=speed
+                )
+                for i, text in enumerate(texts)
+            ]
+
+            reference = self._prepare_reference_audio(
+                reference_audio_path,
+                need_prompt_text=not prompt_text
+            )
+            prompt_text = prompt_text or reference.prompt_text
+
+            # 批量合成前先注册说话人，使所有片段共享同一份前端特征
+            speaker_id = self._ensure_speaker(reference, reference_audio_path, prompt_text)
+
+            for request in requests:
+                request.reference_audio_path = reference.audio_path
+                request.prompt_text = prompt_text
+                request.speaker_id = speaker_id
+
+            max_workers = self.BATCH_MAX_WORKERS if self.model_manager.supports_concurrent_inference() else 1
+            return self.voice_cloner.clone_voice_batch(requests, max_workers=max_workers)
+
+        except Exception as e:
+            self.logger.error(f"[CosyService] 批量语音克隆失败: {e}")
+            return [VoiceCloneResult(success=False, error_message=str(e)) for _ in texts]
+
+    def get_sample_rate(self) -> int:
+        """获取模型输出采样率"""
+        if self.model_manager is None:
+            raise ModelLoadError("模型未加载")
+        return self.model_manager.model_info['sample_rate']
+
+    def _prepare_reference_audio(self, audio_path: str, need_prompt_text: bool = True) -> ReferenceCacheEntry:
+        """
+        准备参考音频：校验、预处理并识别提示文本
+
+        结果按文件内容哈希和预处理配置缓存，同一参考音频的重复请求
+        会跳过校验、预处理和 ASR。
+
+        Args:
+            audio_path: 原始参考音频路径
+            need_prompt_text: 是否需要 ASR 提示文本（调用方未提供 prompt_text 时）
+
+        Returns:
+            ReferenceCacheEntry: 可直接用于推理的参考音频信息
+
+        Raises:
+            AudioValidationError: 音频验证异常
+        """
+        config = self._get_preprocess_config()
+
+        cache_key = None
+        if config is not None:
+            try:
+                cache_key = self.reference_cache.compute_key(audio_path, config)
+            except OSError as e:
+                self.logger.warning(f"[CosyService] 计算参考音频缓存键失败: {e}")
+
+        if cache_key is not None:
+            entry = self.reference_cache.get(cache_key)
+            if entry is not None:
+                self.logger.info(f"[CosyService] 参考音频缓存命中: {entry.audio_path}")
+                if need_prompt_text and not entry.prompt_text:
+                    transcribed_text = self.voice_cloner._transcribe_audio(entry.audio_path)
+                    if transcribed_text:
+                        entry = self.reference_cache.update_prompt_text(cache_key, transcribed_text) or entry
+                return entry
+
+        # 缓存未命中：完整执行校验和预处理
+        metadata = self.audio_validator.validate_audio_file(audio_path)
+
+        staging_path = self.reference_cache.get_staging_path(cache_key) if cache_key else None
+        preprocessed_audio_path = self._preprocess_reference_audio(
+            audio_path, output_path=staging_path, config=config
+        )
+        if not preprocessed_audio_path:
+            # 预处理失败时使用原始音频，不写入缓存
+            return ReferenceCacheEntry(key=None, audio_path=audio_path, metadata=metadata)
+
+        self.logger.info(f"[CosyService] 使用预处理后的音频: {preprocessed_audio_path}")
+
+        prompt_text = None
+        if need_prompt_text:
+            prompt_text = self.voice_cloner._transcribe_audio(preprocessed_audio_path)
+
+        if cache_key is None:
+            return ReferenceCacheEntry(key=None, audio_path=preprocessed_audio_path,
+                                       metadata=metadata, prompt_text=prompt_text)
+
+        try:
+            return self.reference_cache.put(cache_key, preprocessed_audio_path, metadata, prompt_text)
+        except OSError as e:
+            self.logger.warning(f"[CosyService] 写入参考音频缓存失败: {e}")
+            return ReferenceCacheEntry(key=None, audio_path=preprocessed_audio_path,
+                                       metadata=metadata, prompt_text=prompt_text)
+
+    def _resolve_speaker_id(self, reference: ReferenceCacheEntry, prompt_text: Optional[str]) -> Optional[str]:
+        """查找可用于本次请求的已注册说话人ID"""
+        if not reference.is_cached or not prompt_text:
+            return None
+
+        speaker = self.speaker_registry.get_speaker(reference.key)
+        if speaker is None or speaker.get("prompt_text") != prompt_text:
+            return None
+
+        if self.speaker_registry.load_into_model(self.model_manager.get_model(), reference.key):
+            return reference.key
+        return None
+
+    def _ensure_speaker(self, reference: ReferenceCacheEntry, reference_audio_path: str,
+                        prompt_text: Optional[str]) -> Optional[str]:
+        """
+        获取本次请求的说话人ID，参考音频首次使用时注册（懒注册）
+
+        上传接口只保存文件，说话人特征在第一次克隆时提取并持久化，
+        之后的请求直接复用，不再阻塞上传请求加载模型和执行 ASR。
+        """
+        speaker_id = self._resolve_speaker_id(reference, prompt_text)
+        if speaker_id is None and reference.is_cached and prompt_text:
+            speaker_id = self._register_reference(reference, reference_audio_path, prompt_text)
+        return speaker_id
+
+    def _register_reference(self, reference: ReferenceCacheEntry, reference_audio_path: str,
+                            prompt_text: str) -> Optional[str]:
+        """将已缓存的参考音频注册为说话人，返回说话人ID"""
+        speaker = self.speaker_registry.get_speaker(reference.key)
+        if speaker and speaker.get("prompt_text") == prompt_text and self.speaker_registry.has_speaker(reference.key):
+            return reference.key
+
+        if self.speaker_registry.register(
+            self.model_manager.get_model(),
+            speaker_id=reference.key,
+            prompt_wav=reference.audio_path,
+            prompt_text=prompt_text,
+            full_prompt_text=VoiceCloner.build_prompt_text(prompt_text),
+            source_audio=os.path.abspath(reference_audio_path)
+        ):
+            return reference.key
+        return None
+
+    def register_speaker(self, reference_audio_path: str, prompt_text: str = None) -> Optional[str]:
+        """
+        注册说话人：预计算参考音频的零样本前端特征并持久化
+
+        Args:
+            reference_audio_path: 参考音频文件路径
+            prompt_text: 参考音频对应的文本（可选，默认使用ASR识别结果）
+
+        Returns:
+            说话人ID，注册失败时返回 None
+        """
+        try:
+            if not COSYVOICE_AVAILABLE or not self.voice_cloner:
+                self.logger.warning("[CosyService] CosyVoice模块不可用，跳过说话人注册")
+                return None
+
+            reference = self._prepare_reference_audio(reference_audio_path, need_prompt_text=not prompt_text)
+            prompt_text = prompt_text or reference.prompt_text
+
+            if not reference.is_cached:
+                self.logger.warning("[CosyService] 参考音频未能缓存，跳过说话人注册")
+                return None
+            if not prompt_text:
+                self.logger.warning("[CosyService] 无法获取参考音频文本，跳过说话人注册")
+                return None
+
+            return self._register_reference(reference, reference_audio_path, prompt_text)
+
+        except Exception as e:
+            self.logger.error(f"[CosyService] 说话人注册失败: {e}")
+            return None
+
     def validate_reference_audio(self, audio_path: str) -> AudioMetadata:
         """
         验证参考音频文件
@@ -1080,18 +1994,36 @@ class CosyService(LoggerMixin):
         """获取模型本地路径"""
         return self.model_download_manager.get_model_path(model_type)
 
-    def _preprocess_reference_audio(self, audio_path: str) -> Optional[str]:
+    def _get_preprocess_config(self):
+        """获取参考音频预处理配置，预处理模块不可用时返回 None"""
+        try:
+            from .audio_preprocessor import PreprocessConfig, ProcessingMode
+        except ImportError:
+            return None
+
+        return PreprocessConfig(
+            target_sample_rate=24000,  # CosyVoice 最优采样率
+            trim=True,                  # 去除首尾静音
+            denoise=True,               # 降噪
+            normalize=True,             # 归一化音量
+            mode=ProcessingMode.BALANCED
+        )
+
+    def _preprocess_reference_audio(self, audio_path: str, output_path: Optional[str] = None,
+                                    config=None) -> Optional[str]:
         """
         预处理参考音频以提升克隆效果
 
         Args:
             audio_path: 原始音频路径
+            output_path: 输出路径（None 表示自动生成到参考音频目录）
+            config: 预处理配置（None 表示使用默认配置）
 
         Returns:
             预处理后的音频路径，失败时返回 None
         """
         try:
-            from .audio_preprocessor import AudioPreprocessorFactory, PreprocessConfig, ProcessingMode
+            from .audio_preprocessor import AudioPreprocessorFactory
 
             self.logger.info(f"[CosyService] 开始预处理参考音频: {audio_path}")
 
@@ -1101,16 +2033,10 @@ class CosyService(LoggerMixin):
             )
 
             # 配置预处理参数
-            config = PreprocessConfig(
-                target_sample_rate=24000,  # CosyVoice 最优采样率
-                trim=True,                  # 去除首尾静音
-                denoise=True,               # 降噪
-                normalize=True,             # 归一化音量
-                mode=ProcessingMode.BALANCED
-            )
+            config = config or self._get_preprocess_config()
 
             # 执行预处理
-            result = preprocessor.preprocess(audio_path, config=config)
+            result = preprocessor.preprocess(audio_path, output_path=output_path, config=config)
 
             if result.success:
                 self.logger.info(f"[CosyService] 预处理成功: {result.output_path}")
@@ -1209,6 +2135,12 @@ class CosyService(LoggerMixin):
                 "model_download_available": False
             })
 
+        # 添加参考音频缓存信息
+        if hasattr(self, 'reference_cache'):
+            status["reference_cache"] = self.reference_cache.get_stats()
+        if hasattr(self, 'speaker_registry'):
+            status["speaker_registry"] = self.speaker_registry.get_stats()
+
         # 添加路径信息
         status["paths"] = {
             "cosyvoice_root": self.path_manager.get_cosyvoice_path(),
@@ -1221,9 +2153,9 @@ class CosyService(LoggerMixin):
 
 # ==================== 便捷函数 ====================
 
-def get_cosy_service(model_dir: str = None) -> CosyService:
+def get_cosy_service(model_dir: str = None, load_vllm: bool = False) -> CosyService:
     """获取CosyService实例"""
-    return CosyService(model_dir)
+    return CosyService(model_dir, load_vllm=load_vllm)
 
 
 def quick_clone(text: str, reference_audio_path: str,
@@ -5,11 +5,68 @@ API路由处理器 - 处理文件相关的API路由
 
 from flask import request, jsonify
 from .file_manager import file_manager
+from .media_index import MediaIndexError
+from .upload_ingest import UploadRejected
+
+# 分页每页最大条数
+MAX_PAGE_LIMIT = 1000
+
+
+def _page_args():
+    """
+    解析列表接口的分页参数：?limit=&cursor=&type=&sort=&order=
+
+    未提供 limit 时返回全部条目（兼容旧前端）
+
+    Raises:
+        ValueError: 参数无效
+    """
+    limit = request.args.get('limit')
+    if limit is not None:
+        limit = int(limit)
+        if not 1 <= limit <= MAX_PAGE_LIMIT:
+            raise ValueError(f'limit 必须在 1-{MAX_PAGE_LIMIT} 之间')
+
+    order = request.args.get('order', 'desc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError('order 必须是 asc 或 desc')
+
+    return {
+        'limit': limit,
+        'cursor': request.args.get('cursor') or None,
+        'file_type': request.args.get('type') or None,
+        'sort': request.args.get('sort', 'mtime'),
+        'descending': order == 'desc'
+    }
+
+
+def _list_files(list_func, items_key, error_label):
+    """执行分页列表查询，参数错误返回 400"""
+    try:
+        return jsonify(list_func(**_page_args()))
+
+    except (ValueError, MediaIndexError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'参数无效: {e}',
+            items_key: [],
+            'total_count': 0
+        }), 400
+
+    except Exception as e:
+        print(f"[API] {error_label}失败: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e),
+            items_key: [],
+            'total_count': 0
+        }), 500
 
 
 def upload_reference_audio():
     """上传参考音频文件API"""
     try:
+        # 流式接收时，格式或大小校验失败会在首次访问 request.files 时抛出 UploadRejected
         if 'audio' not in request.files:
             return jsonify({
                 'status': 'error',
@@ -27,6 +84,8 @@ def upload_reference_audio():
         # 否则直接返回结果
         return jsonify(result)
 
+    except UploadRejected as e:
+        return jsonify({'status': 'error', 'message': e.message}), e.status_code
     except Exception as e:
         print(f"[API] 参考音频上传失败: {e}")
         return jsonify({
@@ -36,24 +95,14 @@ def upload_reference_audio():
 
 
 def get_reference_audios():
-    """获取参考音频文件列表API"""
-    try:
-        result = file_manager.get_reference_audios()
-        return jsonify(result)
-
-    except Exception as e:
-        print(f"[API] 获取参考音频列表失败: {e}")
-        return jsonify({
-            'status': 'error',
-            'message': str(e),
-            'files': [],
-            'total_count': 0
-        }), 500
+    """获取参考音频文件列表API（支持 ?limit=&cursor=&type=&sort=&order= 分页）"""
+    return _list_files(file_manager.get_reference_audios, 'files', '获取参考音频列表')
 
 
 def upload_training_video():
     """上传训练视频文件API"""
     try:
+        # 流式接收时，格式或大小校验失败会在首次访问 request.files 时抛出 UploadRejected
         if 'video' not in request.files:
             return jsonify({
                 'status': 'error',
@@ -71,6 +120,8 @@ def upload_training_video():
         # 否则直接返回结果
         return jsonify(result)
 
+    except UploadRejected as e:
+        return jsonify({'status': 'error', 'message': e.message}), e.status_code
     except Exception as e:
         print(f"[API] 训练视频上传失败: {e}")
         return jsonify({
@@ -80,19 +131,13 @@ def upload_training_video():
 
 
 def get_training_videos():
-    """获取训练视频文件列表API"""
-    try:
-        result = file_manager.get_training_videos()
-        return jsonify(result)
+    """获取训练视频文件列表API（支持 ?limit=&cursor=&type=&sort=&order= 分页）"""
+    return _list_files(file_manager.get_training_videos, 'files', '获取训练视频列表')
 
-    except Exception as e:
-        print(f"[API] 获取训练视频列表失败: {e}")
-        return jsonify({
-            'status': 'error',
-            'message': str(e),
-            'files': [],
-            'total_count': 0
-        }), 500
+
+def get_generated_audios():
+    """获取生成音频文件列表API（支持 ?limit=&cursor=&type=&sort=&order= 分页）"""
+    return _list_files(file_manager.get_generated_audios, 'audios', '获取生成音频列表')
 
 
 def get_available_models():
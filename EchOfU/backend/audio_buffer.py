@@ -0,0 +1,195 @@
+"""
+内存音频缓冲模块
+在 TTS、变调和特征提取之间以内存形式传递音频，避免中间文件的反复写入、解码和重采样
+
+核心功能:
+- AudioBuffer: 单声道采样数据 + 采样率，可由张量零拷贝构造
+- 可选内存映射: 16 位 PCM / 32 位浮点 wav 直接映射数据块，不整体读入内存
+- 只在需要落盘时写文件（最终产物），写入时顺带计算内容哈希供特征缓存复用
+
+使用方式:
+    from backend.audio_buffer import AudioBuffer
+
+    buffer = AudioBuffer.from_tensor(tts_speech, 22050)
+    shifted = pitch_shifter.process(audio=buffer, config=config, save_output=False).audio_buffer
+    digest = shifted.save(final_wav_path)
+"""
+
+import io
+import os
+import wave
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+
+class AudioBufferError(Exception):
+    """音频缓冲相关异常"""
+    pass
+
+
+@dataclass
+class AudioBuffer:
+    """
+    内存中的单声道音频
+
+    Attributes:
+        data: 采样数据（一维 ndarray，float32 / int16，可为内存映射）
+        sample_rate: 采样率
+        source_path: 内容完全相同的磁盘文件（已落盘时设置，可直接交给外部进程）
+    """
+    data: np.ndarray
+    sample_rate: int
+    source_path: Optional[str] = None
+
+    def __post_init__(self):
+        if self.data.ndim == 2:
+            # (channels, samples) 或 (samples, channels)：取第一个声道
+            self.data = self.data[0] if self.data.shape[0] <= self.data.shape[1] else self.data[:, 0]
+        if self.data.ndim != 1:
+            raise AudioBufferError(f"不支持的音频数据维度: {self.data.shape}")
+        if self.sample_rate <= 0:
+            raise AudioBufferError(f"无效的采样率: {self.sample_rate}")
+
+    # ---------- 构造 ----------
+
+    @classmethod
+    def from_tensor(cls, tensor: Any, sample_rate: int) -> "AudioBuffer":
+        """由 torch 张量构造（CPU 张量与 ndarray 共享内存，不复制）"""
+        return cls(data=tensor.detach().cpu().numpy(), sample_rate=int(sample_rate))
+
+    @classmethod
+    def from_file(cls, filepath: str, mmap: bool = False) -> "AudioBuffer":
+        """
+        从音频文件加载
+
+        Args:
+            filepath: 音频文件路径
+            mmap: 是否内存映射（仅 16 位 PCM / 32 位浮点单声道 wav，其余格式自动退回完整解码）
+        """
+        if not os.path.exists(filepath):
+            raise AudioBufferError(f"文件不存在: {filepath}")
+
+        if mmap:
+            buffer = cls._memmap_wav(filepath)
+            if buffer is not None:
+                return buffer
+
+        try:
+            import soundfile as sf
+            data, sample_rate = sf.read(filepath, dtype="float32", always_2d=False)
+        except Exception as e:
+            raise AudioBufferError(f"加载音频失败: {e}") from e
+        if data.ndim == 2:
+            data = data[:, 0]
+        return cls(data=data, sample_rate=int(sample_rate), source_path=filepath)
+
+    @classmethod
+    def _memmap_wav(cls, filepath: str) -> Optional["AudioBuffer"]:
+        """映射 wav 数据块；格式不支持时返回 None"""
+        with open(filepath, "rb") as f:
+            header = f.read(12)
+            if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+                return None
+
+            fmt = None
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    return None
+                chunk_id = chunk_header[:4]
+                chunk_size = int.from_bytes(chunk_header[4:], "little")
+
+                if chunk_id == b"fmt ":
+                    raw = f.read(chunk_size)
+                    fmt = (
+                        int.from_bytes(raw[0:2], "little"),     # 1 = PCM, 3 = IEEE float
+                        int.from_bytes(raw[2:4], "little"),     # channels
+                        int.from_bytes(raw[4:8], "little"),     # sample rate
+                        int.from_bytes(raw[14:16], "little"),   # bits per sample
+                    )
+                elif chunk_id == b"data":
+                    if fmt is None:
+                        return None
+                    offset = f.tell()
+                    break
+                else:
+                    f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+        format_tag, channels, sample_rate, bits = fmt
+        dtypes = {(1, 16): "<i2", (3, 32): "<f4"}
+        if channels != 1 or (format_tag, bits) not in dtypes:
+            return None
+
+        dtype = np.dtype(dtypes[(format_tag, bits)])
+        # 流式写出的 wav 数据块长度可能是占位值，以实际文件大小为准
+        count = min(chunk_size, os.path.getsize(filepath) - offset) // dtype.itemsize
+        data = np.memmap(filepath, dtype=dtype, mode="r", offset=offset, shape=(count,))
+        return cls(data=data, sample_rate=sample_rate, source_path=filepath)
+
+    # ---------- 属性与转换 ----------
+
+    @property
+    def num_samples(self) -> int:
+        return int(self.data.shape[0])
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / float(self.sample_rate)
+
+    def as_float32(self) -> np.ndarray:
+        """float32 采样（[-1, 1]），已是 float32 时不复制"""
+        if self.data.dtype == np.float32:
+            return self.data
+        if self.data.dtype == np.int16:
+            return self.data.astype(np.float32) / 32768.0
+        return self.data.astype(np.float32)
+
+    def as_int16(self) -> np.ndarray:
+        """16 位 PCM 采样"""
+        if self.data.dtype == np.int16:
+            return self.data
+        return (np.clip(self.data, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+    def to_tensor(self):
+        """转为 torch 张量 (1, samples)，与 ndarray 共享内存"""
+        import torch
+        return torch.from_numpy(np.ascontiguousarray(self.as_float32())).unsqueeze(0)
+
+    def with_data(self, data: np.ndarray) -> "AudioBuffer":
+        """同采样率的新缓冲（处理结果尚未落盘）"""
+        return AudioBuffer(data=data, sample_rate=self.sample_rate)
+
+    # ---------- 落盘 ----------
+
+    def to_wav_bytes(self) -> bytes:
+        """编码为 16 位 PCM wav"""
+        output = io.BytesIO()
+        with wave.open(output, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.as_int16().tobytes())
+        return output.getvalue()
+
+    def save(self, filepath: str) -> str:
+        """
+        保存为 16 位 PCM wav，并记录为 source_path
+
+        Returns:
+            写入内容的 SHA-256（供按内容寻址的缓存直接使用，无需重新读取文件）
+        """
+        payload = self.to_wav_bytes()
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = f"{filepath}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(payload)
+        os.replace(temp_path, filepath)
+
+        self.source_path = filepath
+        return hashlib.sha256(payload).hexdigest()
@@ -0,0 +1,269 @@
+"""
+音频特征缓存模块
+按音频内容缓存 ER-NeRF 推理所需的 ASR 特征（DeepSpeech / HuBERT / wav2vec）
+
+核心功能:
+- 缓存键 = 音频文件内容 SHA-256 + ASR 模型名，同一段音频驱动不同形象时只提取一次
+- 缓存位于 audio_features/ 目录（与 ER-NeRF 容器共享的卷），Docker 与直接模式共用
+- 写入先落临时文件再 os.replace，进程中断不会留下半个 .npy
+- 按总大小限制，超限时按最近访问时间淘汰
+
+目录结构:
+    audio_features/
+    └── deepspeech/
+        └── <sha256>.npy
+
+使用方式:
+    from backend.audio_feature_cache import get_audio_feature_cache
+
+    cache = get_audio_feature_cache()
+    if not cache.fetch(wav_path, "deepspeech", output_npy_path):
+        extract(wav_path, output_npy_path)
+        cache.store(wav_path, "deepspeech", output_npy_path)
+"""
+
+import os
+import re
+import uuid
+import shutil
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+from .path_manager import PathManager
+
+
+class AudioFeatureCache:
+    """基于内容寻址的 ASR 特征缓存"""
+
+    HASH_CHUNK_SIZE = 1024 * 1024
+    TEMP_SUFFIX = ".tmp.npy"
+
+    def __init__(self, cache_dir: str, max_size_mb: float = 2048.0):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.RLock()
+        self._digest_memo: Dict[Tuple[str, int, int], str] = {}
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._cleanup_temp_files()
+
+    # ---------- 键与路径 ----------
+
+    @staticmethod
+    def normalize_model_name(asr_model: str) -> str:
+        """
+        ASR 模型名转为目录名
+
+        与 ER-NeRF 的 --asr_model 参数一致，如 deepspeech、
+        facebook/hubert-large-ls960-ft、cpierse/wav2vec2-large-xlsr-53-esperanto
+        """
+        name = (asr_model or "deepspeech").strip().lower()
+        return re.sub(r"[^a-z0-9._-]+", "_", name).strip("._") or "deepspeech"
+
+    def content_digest(self, audio_path: str) -> str:
+        """计算音频文件内容的 SHA-256（按路径、大小和修改时间记忆）"""
+        abs_path = os.path.abspath(audio_path)
+        stat = os.stat(abs_path)
+        memo_key = (abs_path, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            digest = self._digest_memo.get(memo_key)
+        if digest is not None:
+            return digest
+
+        sha256 = hashlib.sha256()
+        with open(abs_path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+
+        with self._lock:
+            if len(self._digest_memo) >= 1024:
+                self._digest_memo.clear()
+            self._digest_memo[memo_key] = digest
+        return digest
+
+    def remember_digest(self, audio_path: str, digest: str):
+        """登记已知的文件内容哈希（写文件时已算出哈希，避免查缓存时重新读取）"""
+        abs_path = os.path.abspath(audio_path)
+        stat = os.stat(abs_path)
+        with self._lock:
+            self._digest_memo[(abs_path, stat.st_size, stat.st_mtime_ns)] = digest
+
+    def get_entry_path(self, audio_path: str, asr_model: str = "deepspeech") -> str:
+        """获取音频对应的缓存文件路径（不保证存在）"""
+        return os.path.join(
+            self.cache_dir,
+            self.normalize_model_name(asr_model),
+            f"{self.content_digest(audio_path)}.npy"
+        )
+
+    # ---------- 读写 ----------
+
+    def lookup(self, audio_path: str, asr_model: str = "deepspeech") -> Optional[str]:
+        """
+        查找缓存的特征文件
+
+        Returns:
+            缓存文件路径；未命中返回 None
+        """
+        entry_path = self.get_entry_path(audio_path, asr_model)
+        with self._lock:
+            if os.path.isfile(entry_path):
+                self._stats["hits"] += 1
+                # 更新访问时间，淘汰时按 mtime 判断新旧
+                try:
+                    os.utime(entry_path, None)
+                except OSError:
+                    pass
+                return entry_path
+            self._stats["misses"] += 1
+            return None
+
+    def fetch(self, audio_path: str, asr_model: str, output_path: str) -> bool:
+        """
+        命中时把缓存的特征放到 output_path
+
+        Returns:
+            是否命中
+        """
+        entry_path = self.lookup(audio_path, asr_model)
+        if entry_path is None:
+            return False
+
+        if os.path.abspath(entry_path) != os.path.abspath(output_path):
+            self._atomic_copy(entry_path, output_path)
+        print(f"[AudioFeatureCache] 命中特征缓存: {os.path.basename(audio_path)} ({asr_model})")
+        return True
+
+    def store(self, audio_path: str, asr_model: str, feature_path: str) -> Optional[str]:
+        """
+        将提取好的特征文件写入缓存
+
+        Returns:
+            缓存文件路径；写入失败返回 None（缓存失败不影响主流程）
+        """
+        try:
+            entry_path = self.get_entry_path(audio_path, asr_model)
+            self._atomic_copy(feature_path, entry_path)
+        except OSError as e:
+            print(f"[AudioFeatureCache] 写入特征缓存失败: {e}")
+            return None
+
+        with self._lock:
+            self._stats["stores"] += 1
+            self._evict()
+        return entry_path
+
+    @staticmethod
+    def _atomic_copy(src: str, dst: str):
+        """先复制到同目录临时文件，再原子替换目标文件"""
+        dst_dir = os.path.dirname(os.path.abspath(dst))
+        os.makedirs(dst_dir, exist_ok=True)
+        temp_path = os.path.join(dst_dir, f".{uuid.uuid4().hex[:8]}{AudioFeatureCache.TEMP_SUFFIX}")
+        try:
+            shutil.copyfile(src, temp_path)
+            os.replace(temp_path, dst)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    # ---------- 淘汰 ----------
+
+    def _iter_entries(self):
+        for model_dir in os.listdir(self.cache_dir):
+            model_path = os.path.join(self.cache_dir, model_dir)
+            if not os.path.isdir(model_path):
+                continue
+            for filename in os.listdir(model_path):
+                yield model_path, filename
+
+    def _cleanup_temp_files(self):
+        """清理上次异常退出遗留的临时文件"""
+        for model_path, filename in self._iter_entries():
+            if filename.endswith(self.TEMP_SUFFIX):
+                try:
+                    os.remove(os.path.join(model_path, filename))
+                except OSError:
+                    pass
+
+    def _evict(self):
+        """总大小超限时，按最近访问时间从旧到新删除"""
+        entries = []
+        total_size = 0
+        for model_path, filename in self._iter_entries():
+            if not filename.endswith(".npy") or filename.endswith(self.TEMP_SUFFIX):
+                continue
+            file_path = os.path.join(model_path, filename)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_path))
+            total_size += stat.st_size
+
+        if total_size <= self.max_size_bytes:
+            return
+
+        entries.sort()
+        for _, size, file_path in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(file_path)
+                total_size -= size
+                self._stats["evictions"] += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for model_path, filename in list(self._iter_entries()):
+                try:
+                    os.remove(os.path.join(model_path, filename))
+                except OSError:
+                    pass
+            self._digest_memo.clear()
+
+    def get_stats(self) -> Dict[str, object]:
+        """缓存统计信息"""
+        with self._lock:
+            entries = 0
+            total_size = 0
+            for model_path, filename in self._iter_entries():
+                if filename.endswith(".npy") and not filename.endswith(self.TEMP_SUFFIX):
+                    entries += 1
+                    total_size += os.path.getsize(os.path.join(model_path, filename))
+            stats = dict(self._stats)
+            stats.update({
+                "entries": entries,
+                "size_mb": round(total_size / (1024 * 1024), 2),
+                "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+            })
+            return stats
+
+
+# 便捷函数：创建全局单例
+_global_cache = None
+_global_cache_lock = threading.Lock()
+
+def get_audio_feature_cache() -> AudioFeatureCache:
+    """
+    获取音频特征缓存全局单例
+
+    缓存上限通过环境变量 AUDIO_FEATURE_CACHE_MB 设置（默认 2048）
+
+    Returns:
+        AudioFeatureCache实例
+    """
+    global _global_cache
+    with _global_cache_lock:
+        if _global_cache is None:
+            pm = PathManager()
+            max_size_mb = float(os.environ.get("AUDIO_FEATURE_CACHE_MB", 2048))
+            _global_cache = AudioFeatureCache(pm.get_audio_features_path(), max_size_mb=max_size_mb)
+    return _global_cache
@@ -4,21 +4,33 @@
 架构：
     AudioPreprocessor (核心处理器)
         ├── AudioQualityAnalyzer (质量分析)
-        ├── NoiseReducer (降噪策略)
+        ├── NoiseReducer (降噪策略：noisereduce / 内置谱门限 SpectralGateDenoiser / 高通滤波)
         ├── AudioNormalizer (归一化)
         ├── SilenceRemover (静音去除)
-        └── FormatConverter (格式转换)
+        ├── FormatConverter (格式转换)
+        └── AudioStats (单遍统计：RMS / 过零率 / 峰值 / 动态范围)
+
+处理流程（单次解码、单次重采样）：
+    文件头探测 (soundfile.info) → 按目标采样率解码 → 单遍统计
+    → 预处理 → 单遍统计 → 验证与质量评分复用统计量
 """
 
 import os
 import sys
+import re
 import time
+import uuid
 import logging
 import tempfile
+import threading
+import multiprocessing
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List, Optional, Any, Tuple, Callable
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Tuple, Callable, Iterable, Iterator
 from pathlib import Path
 
 # 导入现有的工具模块
@@ -45,6 +57,12 @@ except ImportError:
     NOISEREDUCE_AVAILABLE = False
     print("[提示] noisereduce 未安装，降噪功能将使用基础算法")
 
+try:
+    from threadpoolctl import threadpool_limits
+    THREADPOOLCTL_AVAILABLE = True
+except ImportError:
+    THREADPOOLCTL_AVAILABLE = False
+
 # 添加项目根目录到路径
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.append(str(PROJECT_ROOT))
@@ -81,6 +99,14 @@ class ProcessingMode(Enum):
     FAST = "fast"              # 速度优先
 
 
+class DenoiseMethod(Enum):
+    """降噪方法"""
+    AUTO = "auto"                      # 安装了 noisereduce 时使用它，否则使用高通滤波
+    NOISEREDUCE = "noisereduce"        # noisereduce 库（不可用时退回高通滤波）
+    SPECTRAL_GATE = "spectral_gate"    # 内置向量化谱门限（需显式选择，噪声谱可按说话人缓存）
+    HIGHPASS = "highpass"              # 80Hz 高通滤波
+
+
 @dataclass
 class AudioMetadata:
     """音频元数据"""
@@ -119,6 +145,8 @@ class PreprocessConfig:
         enhance: 是否增强音频
         trim: 是否裁剪首尾静音
         mode: 处理模式 (quality/balanced/fast)
+        denoise_method: 降噪方法 (auto/noisereduce/spectral_gate/highpass)
+        noise_profile_key: 噪声谱缓存键（如参考音色 ID；谱门限降噪时同一说话人的音频只估计一次噪声谱）
     """
     target_sample_rate: int = 24000
     remove_silence: bool = True
@@ -128,6 +156,8 @@ class PreprocessConfig:
     enhance: bool = False
     trim: bool = True
     mode: ProcessingMode = ProcessingMode.BALANCED
+    denoise_method: DenoiseMethod = DenoiseMethod.AUTO
+    noise_profile_key: Optional[str] = None
 
     # 验证范围
     MIN_SAMPLE_RATE = 8000
@@ -139,6 +169,8 @@ class PreprocessConfig:
         """配置验证"""
         if not self.MIN_SAMPLE_RATE <= self.target_sample_rate <= self.MAX_SAMPLE_RATE:
             raise ValueError(f"采样率必须在 {self.MIN_SAMPLE_RATE}-{self.MAX_SAMPLE_RATE} 范围内")
+        if isinstance(self.denoise_method, str):
+            self.denoise_method = DenoiseMethod(self.denoise_method)
 
 
 @dataclass
@@ -156,6 +188,7 @@ class PreprocessResult:
         warnings: 警告信息列表
         error_message: 错误信息
         applied_steps: 应用的处理步骤
+        input_path: 输入音频路径（批量处理时用于对应结果）
     """
     success: bool
     output_path: Optional[str] = None
@@ -166,6 +199,7 @@ class PreprocessResult:
     warnings: List[str] = field(default_factory=list)
     error_message: Optional[str] = None
     applied_steps: List[str] = field(default_factory=list)
+    input_path: Optional[str] = None
 
     def __str__(self) -> str:
         if self.success:
@@ -187,25 +221,127 @@ class PreprocessResult:
             "warnings": self.warnings,
             "error_message": self.error_message,
             "applied_steps": self.applied_steps,
+            "input_path": self.input_path,
             "input_metadata": self.input_metadata.to_dict() if self.input_metadata else None,
             "output_metadata": self.output_metadata.to_dict() if self.output_metadata else None
         }
 
 
+# ==================== 单遍统计 ====================
+
+@dataclass
+class AudioStats:
+    """
+    音频统计量（一次向量化遍历得到，验证、归一化和质量评分共用）
+
+    Attributes:
+        num_samples: 采样点数
+        rms: 均方根
+        peak: 峰值绝对值
+        min_value: 最小采样值
+        max_value: 最大采样值
+        zero_crossing_rate: 过零率（过零次数 / 采样点数）
+    """
+    num_samples: int
+    rms: float
+    peak: float
+    min_value: float
+    max_value: float
+    zero_crossing_rate: float
+
+    @property
+    def energy(self) -> float:
+        """总能量（平方和）"""
+        return self.rms ** 2 * self.num_samples
+
+    @property
+    def dynamic_range(self) -> float:
+        """动态范围（最大值 - 最小值）"""
+        return self.max_value - self.min_value
+
+    @classmethod
+    def compute(cls, audio: np.ndarray) -> "AudioStats":
+        """计算统计量（点积求平方和，不生成平方后的临时数组）"""
+        num_samples = int(audio.shape[0])
+        if num_samples == 0:
+            return cls(0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+        sum_squares = float(np.dot(audio, audio))
+        min_value = float(audio.min())
+        max_value = float(audio.max())
+        signs = np.signbit(audio)
+        crossings = int(np.count_nonzero(signs[1:] != signs[:-1]))
+
+        return cls(
+            num_samples=num_samples,
+            rms=float(np.sqrt(sum_squares / num_samples)),
+            peak=max(abs(min_value), abs(max_value)),
+            min_value=min_value,
+            max_value=max_value,
+            zero_crossing_rate=crossings / num_samples
+        )
+
+    def scaled(self, gain: float) -> "AudioStats":
+        """乘以正增益后的统计量（过零率不变，无需重新遍历音频）"""
+        return AudioStats(
+            num_samples=self.num_samples,
+            rms=self.rms * gain,
+            peak=self.peak * gain,
+            min_value=self.min_value * gain,
+            max_value=self.max_value * gain,
+            zero_crossing_rate=self.zero_crossing_rate
+        )
+
+
+def probe_audio(file_path: str) -> Optional[AudioMetadata]:
+    """
+    只读取文件头获取音频元数据，不解码音频
+
+    Returns:
+        AudioMetadata；soundfile 无法解析（如部分 mp3/m4a）时返回 None
+    """
+    if not LIBROSA_AVAILABLE:
+        return None
+
+    try:
+        info = sf.info(file_path)
+    except Exception:
+        return None
+
+    if info.samplerate <= 0:
+        return None
+
+    return AudioMetadata(
+        file_path=file_path,
+        duration=info.frames / info.samplerate,
+        sample_rate=info.samplerate,
+        channels=info.channels,
+        file_size=os.path.getsize(file_path),
+        format=(info.format or 'wav').lower()
+    )
+
+
 # ==================== 策略模式接口 ====================
 
 class PreprocessStrategy(ABC):
     """预处理策略抽象基类"""
 
     @abstractmethod
-    def process(self, audio: np.ndarray, sr: int, config: PreprocessConfig) -> Tuple[np.ndarray, int, Dict[str, Any]]:
+    def process(
+        self,
+        audio: np.ndarray,
+        sr: int,
+        config: PreprocessConfig,
+        stats: Optional[AudioStats] = None
+    ) -> Tuple[np.ndarray, int, Dict[str, Any]]:
         """
         执行预处理
 
         Args:
-            audio: 音频数据
+            audio: 音频数据（不会被修改）
             sr: 采样率
             config: 配置
+            stats: 输入音频的统计量（已计算时传入，避免重复遍历）
 
         Returns:
             (处理后的音频, 采样率, 处理信息字典)
@@ -236,13 +372,19 @@ class AudioQualityAnalyzer:
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    def analyze(self, audio: np.ndarray, sr: int) -> Dict[str, Any]:
+    def analyze(self, audio: np.ndarray, sr: int, stats: Optional[AudioStats] = None) -> Dict[str, Any]:
         """
         分析音频质量
 
+        Args:
+            audio: 音频数据
+            sr: 采样率
+            stats: 音频统计量（None 表示现场计算）
+
         Returns:
             质量分析结果字典
         """
+        stats = stats or AudioStats.compute(audio)
         scores = {}
 
         # 1. 时长评分
@@ -255,16 +397,16 @@ class AudioQualityAnalyzer:
         scores['sample_rate_value'] = sr
 
         # 3. 清晰度评分 (零交叉率)
-        scores['clarity'] = self._score_clarity(audio)
+        scores['clarity'] = self._score_clarity(stats.zero_crossing_rate)
 
         # 4. 信噪比评分
-        scores['snr'] = self._score_snr(audio)
+        scores['snr'] = self._score_snr(stats.rms)
 
         # 5. 能量评分
-        scores['energy'] = self._score_energy(audio)
+        scores['energy'] = self._score_energy(stats.rms)
 
         # 6. 动态范围评分
-        scores['dynamic_range'] = self._score_dynamic_range(audio)
+        scores['dynamic_range'] = self._score_dynamic_range(stats.dynamic_range)
 
         # 综合评分
         weights = {
@@ -309,11 +451,8 @@ class AudioQualityAnalyzer:
         else:
             return 30
 
-    def _score_clarity(self, audio: np.ndarray) -> float:
+    def _score_clarity(self, mean_zcr: float) -> float:
         """评分：清晰度（基于零交叉率）"""
-        zcr = librosa.feature.zero_crossing_rate(audio)[0]
-        mean_zcr = np.mean(zcr)
-
         # 语音的 ZCR 通常在 0.1-0.5 之间
         if 0.1 <= mean_zcr <= 0.5:
             return 100
@@ -322,10 +461,8 @@ class AudioQualityAnalyzer:
         else:
             return 60
 
-    def _score_snr(self, audio: np.ndarray) -> float:
+    def _score_snr(self, rms: float) -> float:
         """评分：信噪比（基于 RMS）"""
-        rms = np.sqrt(np.mean(audio ** 2))
-
         if rms > 0.15:
             return 100
         elif rms > 0.1:
@@ -337,17 +474,13 @@ class AudioQualityAnalyzer:
         else:
             return 30
 
-    def _score_energy(self, audio: np.ndarray) -> float:
-        """评分：能量分布"""
-        energy = np.sum(audio ** 2)
-        max_expected = len(audio) * 0.25
-        score = min(100, (energy / max_expected) * 100)
+    def _score_energy(self, rms: float) -> float:
+        """评分：能量分布（平均能量相对 0.25 的比例）"""
+        score = min(100, (rms ** 2 / 0.25) * 100)
         return max(30, score)
 
-    def _score_dynamic_range(self, audio: np.ndarray) -> float:
+    def _score_dynamic_range(self, dynamic_range: float) -> float:
         """评分：动态范围"""
-        dynamic_range = np.max(audio) - np.min(audio)
-
         if 0.3 <= dynamic_range <= 0.8:
             return 100
         elif 0.2 <= dynamic_range < 0.3 or 0.8 < dynamic_range <= 0.95:
@@ -387,6 +520,288 @@ class AudioQualityAnalyzer:
         return recommendations
 
 
+# ==================== 谱门限降噪 ====================
+
+@lru_cache(maxsize=8)
+def _hann_window(n_fft: int) -> np.ndarray:
+    """周期 Hann 窗（按帧长缓存，只计算一次）"""
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+
+@dataclass
+class NoiseProfile:
+    """
+    噪声谱（每个频点的噪声门限）
+
+    Attributes:
+        threshold_db: 每个频点的门限（dB），高于门限的能量视为语音
+        noise_db: 每个频点的平均噪声能量（dB）
+        sample_rate: 估计时的采样率
+        n_fft: 估计时的帧长
+    """
+    threshold_db: np.ndarray
+    noise_db: np.ndarray
+    sample_rate: int
+    n_fft: int
+
+    def matches(self, sample_rate: int, n_fft: int) -> bool:
+        return self.sample_rate == sample_rate and self.n_fft == n_fft
+
+    def save(self, filepath: str) -> None:
+        """保存为 .npz（先写临时文件再原子替换）"""
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        temp_path = f"{filepath}.{uuid.uuid4().hex[:8]}.tmp.npz"
+        np.savez(temp_path, threshold_db=self.threshold_db, noise_db=self.noise_db,
+                 sample_rate=self.sample_rate, n_fft=self.n_fft)
+        os.replace(temp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath: str) -> "NoiseProfile":
+        with np.load(filepath) as data:
+            return cls(
+                threshold_db=data["threshold_db"],
+                noise_db=data["noise_db"],
+                sample_rate=int(data["sample_rate"]),
+                n_fft=int(data["n_fft"])
+            )
+
+
+class SpectralGateDenoiser:
+    """
+    向量化谱门限降噪
+
+    - 短时傅里叶变换：整段分帧后一次 rfft（窗函数按帧长缓存）
+    - 噪声谱：取能量最低的一部分帧，统计每个频点的均值和标准差，门限 = 均值 + n_std * 标准差
+    - 掩码：高于门限的时频点保留，低于门限的按 prop_decrease 衰减，掩码在时间和频率上平滑
+    - 重建：irfft 后加窗叠加（overlap-add），按窗平方和归一化
+
+    噪声谱取自最安静的帧，要求音频中有真实的停顿（或传入预先估计的噪声谱）；
+    对没有停顿的连续信号，门限会落在信号本身上并将其抑制，因此不作为 AUTO 的默认方法。
+    """
+
+    def __init__(
+        self,
+        n_fft: int = 1024,
+        hop_length: Optional[int] = None,
+        n_std_thresh: float = 1.5,
+        prop_decrease: float = 1.0,
+        noise_frame_ratio: float = 0.2,
+        smooth_time: int = 3,
+        smooth_freq: int = 5
+    ):
+        """
+        Args:
+            n_fft: 帧长
+            hop_length: 帧移（默认 n_fft // 4，须整除 n_fft）
+            n_std_thresh: 门限高出噪声均值的标准差倍数
+            prop_decrease: 噪声衰减比例（1.0 表示完全抑制）
+            noise_frame_ratio: 用于估计噪声谱的低能量帧比例
+            smooth_time: 掩码时间方向平滑帧数
+            smooth_freq: 掩码频率方向平滑频点数
+        """
+        self.n_fft = n_fft
+        self.hop_length = hop_length or n_fft // 4
+        if self.n_fft % self.hop_length:
+            raise ValueError("hop_length 必须整除 n_fft")
+        self.n_std_thresh = n_std_thresh
+        self.prop_decrease = prop_decrease
+        self.noise_frame_ratio = noise_frame_ratio
+        self.smooth_time = smooth_time
+        self.smooth_freq = smooth_freq
+
+    # ---------- 短时傅里叶变换 ----------
+
+    def _stft(self, audio: np.ndarray) -> np.ndarray:
+        """分帧 + 加窗 + 批量 rfft，返回 (帧数, 频点数) 复数谱"""
+        pad = self.n_fft // 2
+        padded = np.pad(np.asarray(audio, dtype=np.float32), (pad, pad), mode="reflect")
+        if padded.shape[0] < self.n_fft:
+            padded = np.pad(padded, (0, self.n_fft - padded.shape[0]))
+        frames = np.lib.stride_tricks.sliding_window_view(padded, self.n_fft)[::self.hop_length]
+        return np.fft.rfft(frames * _hann_window(self.n_fft), axis=1)
+
+    def _istft(self, spectrum: np.ndarray, length: int) -> np.ndarray:
+        """irfft + 加窗叠加，按窗平方和归一化"""
+        window = _hann_window(self.n_fft)
+        frames = (np.fft.irfft(spectrum, n=self.n_fft, axis=1) * window).astype(np.float32)
+
+        num_frames = frames.shape[0]
+        overlap = self.n_fft // self.hop_length
+        blocks = frames.reshape(num_frames, overlap, self.hop_length)
+        window_sq = (window ** 2).reshape(overlap, self.hop_length)
+
+        output = np.zeros((num_frames + overlap - 1, self.hop_length), dtype=np.float32)
+        norm = np.zeros_like(output)
+        for k in range(overlap):
+            output[k:k + num_frames] += blocks[:, k]
+            norm[k:k + num_frames] += window_sq[k]
+
+        output = output.reshape(-1)
+        norm = norm.reshape(-1)
+        output /= np.maximum(norm, 1e-8)
+
+        pad = self.n_fft // 2
+        return output[pad:pad + length]
+
+    @staticmethod
+    def _power_db(spectrum: np.ndarray) -> np.ndarray:
+        return 10.0 * np.log10(spectrum.real ** 2 + spectrum.imag ** 2 + 1e-12)
+
+    # ---------- 噪声谱 ----------
+
+    def estimate_noise_profile(self, audio: np.ndarray, sr: int) -> NoiseProfile:
+        """由能量最低的帧估计噪声谱"""
+        return self._profile_from_power(self._power_db(self._stft(audio)), sr)
+
+    def _profile_from_power(self, power_db: np.ndarray, sr: int) -> NoiseProfile:
+        num_noise = max(1, int(power_db.shape[0] * self.noise_frame_ratio))
+        quietest = np.argpartition(power_db.mean(axis=1), num_noise - 1)[:num_noise]
+        noise = power_db[quietest]
+
+        noise_db = noise.mean(axis=0)
+        threshold_db = noise_db + self.n_std_thresh * noise.std(axis=0)
+        return NoiseProfile(
+            threshold_db=threshold_db.astype(np.float32),
+            noise_db=noise_db.astype(np.float32),
+            sample_rate=sr,
+            n_fft=self.n_fft
+        )
+
+    # ---------- 降噪 ----------
+
+    def _smooth(self, mask: np.ndarray) -> np.ndarray:
+        """掩码在时间和频率方向做滑动平均（累加和实现）"""
+        for axis, size in ((0, self.smooth_time), (1, self.smooth_freq)):
+            if size <= 1:
+                continue
+            before, after = size // 2, size - 1 - size // 2
+            pad_width = [(0, 0), (0, 0)]
+            pad_width[axis] = (before + 1, after)
+            cumsum = np.cumsum(np.pad(mask, pad_width, mode="edge"), axis=axis)
+            upper = np.take(cumsum, np.arange(size, cumsum.shape[axis]), axis=axis)
+            lower = np.take(cumsum, np.arange(0, cumsum.shape[axis] - size), axis=axis)
+            mask = (upper - lower) / size
+        return mask
+
+    def reduce(self, audio: np.ndarray, sr: int, profile: Optional[NoiseProfile] = None) -> np.ndarray:
+        """
+        降噪
+
+        Args:
+            audio: 音频数据
+            sr: 采样率
+            profile: 噪声谱（None 表示由本段音频估计）
+
+        Returns:
+            降噪后的音频（float32，与输入等长）
+        """
+        if audio.shape[0] == 0:
+            return audio.astype(np.float32)
+
+        spectrum = self._stft(audio)
+        power_db = self._power_db(spectrum)
+        if profile is None or not profile.matches(sr, self.n_fft):
+            profile = self._profile_from_power(power_db, sr)
+
+        speech = (power_db > profile.threshold_db).astype(np.float32)
+        gain = 1.0 - self.prop_decrease * (1.0 - self._smooth(speech))
+        spectrum *= gain
+        return self._istft(spectrum, audio.shape[0])
+
+
+class NoiseProfileCache:
+    """
+    说话人噪声谱缓存
+
+    内存 LRU + 可选磁盘持久化（.npz），批量预处理的各工作进程可共享磁盘上的噪声谱。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = 256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[str, NoiseProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _file_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        safe_key = re.sub(r"[^A-Za-z0-9._-]+", "_", key).strip("._") or "default"
+        return os.path.join(self.cache_dir, f"{safe_key}.npz")
+
+    def get(self, key: str, sample_rate: int, n_fft: int) -> Optional[NoiseProfile]:
+        """获取与采样率和帧长匹配的噪声谱"""
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+
+        if profile is None:
+            file_path = self._file_path(key)
+            if file_path and os.path.isfile(file_path):
+                try:
+                    profile = NoiseProfile.load(file_path)
+                except Exception:
+                    profile = None
+                if profile is not None:
+                    self._remember(key, profile)
+
+        if profile is not None and profile.matches(sample_rate, n_fft):
+            return profile
+        return None
+
+    def put(self, key: str, profile: NoiseProfile) -> None:
+        """写入噪声谱（磁盘写入失败不影响处理）"""
+        self._remember(key, profile)
+        file_path = self._file_path(key)
+        if file_path:
+            try:
+                profile.save(file_path)
+            except OSError as e:
+                print(f"[NoiseProfileCache] 保存噪声谱失败: {e}")
+
+    def _remember(self, key: str, profile: NoiseProfile) -> None:
+        with self._lock:
+            self._profiles[key] = profile
+            self._profiles.move_to_end(key)
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        """删除某个说话人的噪声谱（参考音频更新后调用）"""
+        with self._lock:
+            self._profiles.pop(key, None)
+        file_path = self._file_path(key)
+        if file_path and os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+
+# 便捷函数：创建全局单例
+_global_noise_profile_cache = None
+_global_noise_profile_cache_lock = threading.Lock()
+
+def get_noise_profile_cache() -> NoiseProfileCache:
+    """
+    获取说话人噪声谱缓存全局单例
+
+    Returns:
+        NoiseProfileCache实例
+    """
+    global _global_noise_profile_cache
+    with _global_noise_profile_cache_lock:
+        if _global_noise_profile_cache is None:
+            try:
+                cache_dir = PathManager().get_noise_profile_cache_path()
+            except Exception:
+                cache_dir = None
+            _global_noise_profile_cache = NoiseProfileCache(cache_dir)
+    return _global_noise_profile_cache
+
+
 # ==================== 预处理策略实现 ====================
 
 class ComprehensivePreprocessStrategy(PreprocessStrategy):
@@ -395,28 +810,34 @@ class ComprehensivePreprocessStrategy(PreprocessStrategy):
 
     按顺序执行：
     1. 裁剪静音
-    2. 重采样
+    2. 重采样（输入已按目标采样率解码时跳过）
     3. 降噪
     4. 归一化
     5. 增强（可选）
+
+    不复制输入：裁剪返回视图，归一化增益只在本策略产生的新数组上原地应用；
+    统计量随处理步骤传递（增益只缩放统计量），最终只在需要时遍历一次。
     """
 
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.quality_analyzer = AudioQualityAnalyzer()
+        self.spectral_gate = SpectralGateDenoiser()
 
     def process(
         self,
         audio: np.ndarray,
         sr: int,
-        config: PreprocessConfig
+        config: PreprocessConfig,
+        stats: Optional[AudioStats] = None
     ) -> Tuple[np.ndarray, int, Dict[str, Any]]:
         """执行综合预处理"""
 
         if not LIBROSA_AVAILABLE:
             raise PreprocessProcessingError("librosa 未安装，无法执行预处理")
 
-        processed_audio = audio.copy()
+        processed_audio = audio
+        processed_stats = stats  # 与 processed_audio 对应的统计量（None 表示已失效）
         processed_sr = sr
         applied_steps = []
         info = {}
@@ -424,7 +845,10 @@ class ComprehensivePreprocessStrategy(PreprocessStrategy):
         try:
             # 1. 裁剪首尾静音
             if config.trim:
-                processed_audio = self._trim_silence(processed_audio)
+                trimmed = self._trim_silence(processed_audio)
+                if trimmed is not processed_audio:
+                    processed_audio = trimmed
+                    processed_stats = None
                 applied_steps.append("trim_silence")
 
             # 2. 重采样
@@ -435,30 +859,43 @@ class ComprehensivePreprocessStrategy(PreprocessStrategy):
                     target_sr=config.target_sample_rate
                 )
                 processed_sr = config.target_sample_rate
+                processed_stats = None
                 applied_steps.append("resample")
                 info['original_sample_rate'] = sr
                 info['target_sample_rate'] = config.target_sample_rate
 
             # 3. 降噪
             if config.denoise:
-                processed_audio = self._denoise(processed_audio, processed_sr)
+                processed_audio = self._denoise(processed_audio, processed_sr, config)
+                processed_stats = None
                 applied_steps.append("denoise")
 
             # 4. 归一化
             if config.normalize:
-                processed_audio = self._normalize(processed_audio)
+                current_stats = processed_stats or AudioStats.compute(processed_audio)
+                gain = self._normalization_gain(current_stats.rms)
+                if np.may_share_memory(processed_audio, audio):
+                    processed_audio = processed_audio * gain
+                else:
+                    processed_audio *= gain
+                processed_stats = current_stats.scaled(gain)
                 applied_steps.append("normalize")
-                info['peak_db_before'] = float(20 * np.log10(np.max(np.abs(audio)) + 1e-10))
-                info['peak_db_after'] = float(20 * np.log10(np.max(np.abs(processed_audio)) + 1e-10))
+                input_peak = stats.peak if stats is not None else AudioStats.compute(audio).peak
+                info['peak_db_before'] = float(20 * np.log10(input_peak + 1e-10))
+                info['peak_db_after'] = float(20 * np.log10(processed_stats.peak + 1e-10))
 
             # 5. 增强（可选）
             if config.enhance:
                 processed_audio = self._enhance(processed_audio, processed_sr)
+                processed_stats = None
                 applied_steps.append("enhance")
 
-            # 质量分析
-            quality_scores = self.quality_analyzer.analyze(processed_audio, processed_sr)
+            # 质量分析（复用统计量）
+            processed_stats = processed_stats or AudioStats.compute(processed_audio)
+            quality_scores = self.quality_analyzer.analyze(processed_audio, processed_sr, stats=processed_stats)
             info['quality_scores'] = quality_scores
+            info['audio_stats'] = processed_stats
+            info['applied_steps'] = applied_steps
 
             self.logger.info(f"预处理完成: {', '.join(applied_steps)}")
 
@@ -478,8 +915,17 @@ class ComprehensivePreprocessStrategy(PreprocessStrategy):
 
         return trimmed
 
-    def _denoise(self, audio: np.ndarray, sr: int) -> np.ndarray:
-        """降噪"""
+    def _denoise(self, audio: np.ndarray, sr: int, config: Optional[PreprocessConfig] = None) -> np.ndarray:
+        """降噪（按 config.denoise_method 选择方法）"""
+        method = config.denoise_method if config is not None else DenoiseMethod.NOISEREDUCE
+        if method == DenoiseMethod.AUTO:
+            method = DenoiseMethod.NOISEREDUCE if NOISEREDUCE_AVAILABLE else DenoiseMethod.HIGHPASS
+
+        if method == DenoiseMethod.SPECTRAL_GATE:
+            return self._spectral_gate_denoise(audio, sr, config.noise_profile_key if config else None)
+        if method == DenoiseMethod.HIGHPASS:
+            return self._basic_denoise(audio, sr)
+
         if NOISEREDUCE_AVAILABLE:
             try:
                 # 使用 noisereduce 库
@@ -499,6 +945,19 @@ class ComprehensivePreprocessStrategy(PreprocessStrategy):
         # 简单的高通滤波
         return self._basic_denoise(audio, sr)
 
+    def _spectral_gate_denoise(self, audio: np.ndarray, sr: int, profile_key: Optional[str]) -> np.ndarray:
+        """内置谱门限降噪；给定缓存键时同一说话人的噪声谱只估计一次"""
+        if not profile_key:
+            return self.spectral_gate.reduce(audio, sr)
+
+        cache = get_noise_profile_cache()
+        profile = cache.get(profile_key, sr, self.spectral_gate.n_fft)
+        if profile is None:
+            profile = self.spectral_gate.estimate_noise_profile(audio, sr)
+            cache.put(profile_key, profile)
+            self.logger.info(f"已估计并缓存噪声谱: {profile_key}")
+        return self.spectral_gate.reduce(audio, sr, profile=profile)
+
     def _basic_denoise(self, audio: np.ndarray, sr: int) -> np.ndarray:
         """基础降噪（高通滤波）"""
         from scipy import signal
@@ -509,15 +968,17 @@ class ComprehensivePreprocessStrategy(PreprocessStrategy):
         b, a = signal.butter(4, cutoff, btype='high')
 
         filtered = signal.filtfilt(b, a, audio)
-        return filtered
+        return filtered.astype(audio.dtype, copy=False)
 
     def _normalize(self, audio: np.ndarray, target_db: float = -3.0) -> np.ndarray:
         """音量归一化"""
-        # 计算当前 RMS
-        rms = np.sqrt(np.mean(audio ** 2))
+        return audio * self._normalization_gain(AudioStats.compute(audio).rms, target_db)
 
+    @staticmethod
+    def _normalization_gain(rms: float, target_db: float = -3.0) -> float:
+        """由当前 RMS 计算归一化增益"""
         if rms < 1e-10:
-            return audio
+            return 1.0
 
         # 目标 RMS
         target_rms = 10 ** (target_db / 20)
@@ -526,9 +987,7 @@ class ComprehensivePreprocessStrategy(PreprocessStrategy):
         gain = target_rms / rms
 
         # 限制增益在合理范围
-        gain = np.clip(gain, 0.5, 2.0)
-
-        return audio * gain
+        return float(np.clip(gain, 0.5, 2.0))
 
     def _enhance(self, audio: np.ndarray, sr: int) -> np.ndarray:
         """音频增强"""
@@ -588,12 +1047,23 @@ class AudioPreprocessor:
             'error_count': 0
         }
 
-    def load_audio(self, file_path: str) -> Tuple[np.ndarray, int, AudioMetadata]:
+    def load_audio(
+        self,
+        file_path: str,
+        target_sr: Optional[int] = None
+    ) -> Tuple[np.ndarray, int, AudioMetadata]:
         """
         加载音频文件
 
+        先读文件头得到原始元数据，再一次性解码并重采样到 target_sr
+        （文件头无法解析时按原始采样率解码，由策略负责重采样）。
+
+        Args:
+            file_path: 音频路径
+            target_sr: 目标采样率（None 表示保持原始采样率）
+
         Returns:
-            (音频数据, 采样率, 元数据)
+            (音频数据, 采样率, 原始音频元数据)
 
         Raises:
             AudioLoadError: 加载失败
@@ -605,19 +1075,22 @@ class AudioPreprocessor:
             raise AudioLoadError("librosa 未安装，无法加载音频")
 
         try:
-            # 加载音频
-            audio, sr = librosa.load(file_path, sr=None)
-
-            # 获取元数据
-            file_size = os.path.getsize(file_path)
-            metadata = AudioMetadata(
-                file_path=file_path,
-                duration=len(audio) / sr,
-                sample_rate=sr,
-                channels=1,  # librosa 默认转为单声道
-                file_size=file_size,
-                format='wav'
-            )
+            # 文件头探测（不解码）
+            metadata = probe_audio(file_path)
+
+            # 解码（同时完成单声道化与重采样）
+            decode_sr = target_sr if metadata is not None else None
+            audio, sr = librosa.load(file_path, sr=decode_sr)
+
+            if metadata is None:
+                metadata = AudioMetadata(
+                    file_path=file_path,
+                    duration=len(audio) / sr,
+                    sample_rate=sr,
+                    channels=1,  # librosa 默认转为单声道
+                    file_size=os.path.getsize(file_path),
+                    format=os.path.splitext(file_path)[1].lstrip('.').lower() or 'wav'
+                )
 
             self.logger.info(f"加载音频: {file_path}")
             self.logger.info(f"  时长: {metadata.duration:.2f}s")
@@ -658,18 +1131,33 @@ class AudioPreprocessor:
         except Exception as e:
             raise PreprocessProcessingError(f"保存音频失败: {e}") from e
 
-    def validate_audio(self, audio: np.ndarray, sr: int, config: PreprocessConfig) -> List[str]:
+    def validate_audio(
+        self,
+        audio: np.ndarray,
+        sr: int,
+        config: PreprocessConfig,
+        stats: Optional[AudioStats] = None,
+        original_sr: Optional[int] = None
+    ) -> List[str]:
         """
         验证音频是否符合要求
 
+        Args:
+            audio: 音频数据
+            sr: audio 的采样率
+            config: 配置
+            stats: 音频统计量（None 表示现场计算）
+            original_sr: 源文件采样率（音频已重采样时用于采样率检查）
+
         Returns:
             警告列表（空列表表示验证通过）
         """
         warnings = []
 
         # 检查采样率
-        if sr < config.MIN_SAMPLE_RATE:
-            warnings.append(f"采样率过低 ({sr}Hz < {config.MIN_SAMPLE_RATE}Hz)")
+        source_sr = original_sr or sr
+        if source_sr < config.MIN_SAMPLE_RATE:
+            warnings.append(f"采样率过低 ({source_sr}Hz < {config.MIN_SAMPLE_RATE}Hz)")
 
         # 检查时长
         duration = len(audio) / sr
@@ -679,8 +1167,8 @@ class AudioPreprocessor:
             warnings.append(f"时长过长 ({duration:.2f}s > {config.MAX_DURATION}s)")
 
         # 检查是否为静音
-        rms = np.sqrt(np.mean(audio ** 2))
-        if rms < 0.001:
+        stats = stats or AudioStats.compute(audio)
+        if stats.rms < 0.001:
             warnings.append("音频可能为静音")
 
         return warnings
@@ -716,17 +1204,20 @@ class AudioPreprocessor:
                 f"{base_name}_preprocessed_{int(start_time * 1000)}.wav"
             )
 
-        result = PreprocessResult(success=False)
+        result = PreprocessResult(success=False, input_path=input_path)
 
         try:
             self.logger.info(f"开始预处理: {input_path}")
 
-            # 1. 加载音频
-            audio, sr, input_metadata = self.load_audio(input_path)
+            # 1. 加载音频（文件头探测 + 按目标采样率解码一次）
+            audio, sr, input_metadata = self.load_audio(input_path, target_sr=config.target_sample_rate)
             result.input_metadata = input_metadata
+            input_stats = AudioStats.compute(audio)
 
             # 2. 验证音频
-            validation_warnings = self.validate_audio(audio, sr, config)
+            validation_warnings = self.validate_audio(
+                audio, sr, config, stats=input_stats, original_sr=input_metadata.sample_rate
+            )
             result.warnings = validation_warnings
 
             if validation_warnings:
@@ -734,11 +1225,13 @@ class AudioPreprocessor:
 
             # 3. 执行预处理
             processed_audio, processed_sr, process_info = self.strategy.process(
-                audio, sr, config
+                audio, sr, config, stats=input_stats
             )
 
-            # 4. 再次验证处理后的音频
-            post_warnings = self.validate_audio(processed_audio, processed_sr, config)
+            # 4. 再次验证处理后的音频（复用策略算出的统计量）
+            post_warnings = self.validate_audio(
+                processed_audio, processed_sr, config, stats=process_info.get('audio_stats')
+            )
             if post_warnings:
                 result.warnings.extend([f"处理后: {w}" for w in post_warnings])
 
@@ -766,7 +1259,8 @@ class AudioPreprocessor:
                 processing_time=time.time() - start_time,
                 quality_score=quality_scores.get('overall', 0),
                 warnings=result.warnings,
-                applied_steps=process_info.get('quality_scores', {}).get('recommendations', [])
+                applied_steps=process_info.get('quality_scores', {}).get('recommendations', []),
+                input_path=input_path
             )
 
             # 更新统计
@@ -786,6 +1280,81 @@ class AudioPreprocessor:
             self.logger.error(f"预处理失败: {e}")
             return result
 
+    def preprocess_batch(
+        self,
+        paths: Iterable[str],
+        config: Optional[PreprocessConfig] = None,
+        workers: Optional[int] = None,
+        output_dir: Optional[str] = None
+    ) -> Iterator[PreprocessResult]:
+        """
+        批量预处理（进程池并行，按完成顺序流式返回结果）
+
+        librosa / noisereduce / scipy 的处理步骤是 CPU 密集型且持有 GIL，
+        因此使用进程池而非线程池；每个工作进程只创建一个预处理器并复用。
+        各工作进程的结果在本进程汇总进 get_stats()。
+
+        Args:
+            paths: 输入音频路径
+            config: 预处理配置（None 表示使用默认配置）
+            workers: 工作进程数（None 表示 CPU 核数；1 表示在当前进程顺序处理）
+            output_dir: 输出目录（None 表示使用本预处理器的输出目录）
+
+        Yields:
+            PreprocessResult: 每个文件的处理结果（按完成顺序，可用 input_path 对应输入）
+        """
+        paths = list(paths)
+        config = config or PreprocessConfig()
+        output_dir = output_dir or self.output_dir
+        workers = max(1, min(workers or os.cpu_count() or 1, len(paths) or 1))
+
+        # 输出文件名带批次时间戳和序号，不同目录下的同名文件不会互相覆盖
+        batch_id = int(time.time() * 1000)
+        jobs = [
+            (path, os.path.join(
+                output_dir,
+                f"{os.path.splitext(os.path.basename(path))[0]}_preprocessed_{batch_id}_{index}.wav"
+            ))
+            for index, path in enumerate(paths)
+        ]
+
+        self.logger.info(f"批量预处理: {len(jobs)} 个文件, {workers} 个工作进程")
+
+        if workers == 1:
+            for input_path, output_path in jobs:
+                yield self.preprocess(input_path, output_path=output_path, config=config)
+            return
+
+        # spawn：不从可能持有线程锁的 Web 服务进程 fork
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_batch_worker,
+            initargs=(self.strategy, output_dir)
+        )
+        futures = {
+            executor.submit(_preprocess_in_worker, input_path, output_path, config): input_path
+            for input_path, output_path in jobs
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 工作进程崩溃等进程池级错误
+                    result = PreprocessResult(
+                        success=False,
+                        error_message=f"工作进程失败: {e}",
+                        input_path=futures[future]
+                    )
+                self._update_stats(result.processing_time, success=result.success)
+                yield result
+        finally:
+            # 调用方提前停止迭代时取消尚未开始的任务
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
     def _update_stats(self, duration: float, success: bool) -> None:
         """更新性能统计"""
         self._stats['processed_count'] += 1
@@ -804,6 +1373,25 @@ class AudioPreprocessor:
         return stats
 
 
+# ==================== 批量处理工作进程 ====================
+
+# 工作进程内复用的预处理器（每个进程一个）
+_worker_preprocessor: Optional[AudioPreprocessor] = None
+
+
+def _init_batch_worker(strategy: PreprocessStrategy, output_dir: str) -> None:
+    """工作进程初始化：创建预处理器，并限制 BLAS/OpenMP 线程数避免与其他进程争抢核心"""
+    global _worker_preprocessor
+    if THREADPOOLCTL_AVAILABLE:
+        threadpool_limits(1)
+    _worker_preprocessor = AudioPreprocessor(strategy=strategy, output_dir=output_dir)
+
+
+def _preprocess_in_worker(input_path: str, output_path: str, config: PreprocessConfig) -> PreprocessResult:
+    """工作进程中执行单个文件的预处理"""
+    return _worker_preprocessor.preprocess(input_path, output_path=output_path, config=config)
+
+
 # ==================== 工厂模式 ====================
 
 class AudioPreprocessorFactory:
@@ -869,6 +1457,29 @@ def preprocess_audio(
     return preprocessor.preprocess(input_path, output_path=output_path, config=config)
 
 
+def preprocess_batch(
+    paths: Iterable[str],
+    config: Optional[PreprocessConfig] = None,
+    workers: Optional[int] = None,
+    output_dir: Optional[str] = None
+) -> Iterator[PreprocessResult]:
+    """
+    快捷批量预处理函数（多进程，按完成顺序流式返回结果）
+
+    Args:
+        paths: 输入音频路径
+        config: 预处理配置
+        workers: 工作进程数（None 表示 CPU 核数）
+        output_dir: 输出目录
+
+    Example:
+        >>> for result in preprocess_batch(wav_paths, workers=8, output_dir="processed"):
+        ...     print(result.input_path, result.quality_score)
+    """
+    preprocessor = AudioPreprocessorFactory.create(output_dir=output_dir)
+    return preprocessor.preprocess_batch(paths, config=config, workers=workers, output_dir=output_dir)
+
+
 # ==================== 模块测试 ====================
 
 if __name__ == "__main__":
@@ -7,12 +7,15 @@ from .path_manager import PathManager
 from .voice_generator import get_voice_service,ServiceConfig
 # 需要导入 video_generator 中的函数来生成最终视频
 from .video_generator import generate_video
+from .job_queue import NullJobContext
 
-def chat_response(data):
+def chat_response(data, context=None):
     """
     模拟实时对话系统视频生成逻辑。
     流程: 语音转文字 -> LLM回答 -> 文字转语音 -> 语音转视频
+    context 为任务上下文（JobContext），用于上报进度和响应取消请求。
     """
+    context = context or NullJobContext()
     # 初始化路径管理器
     pm = PathManager()
     
@@ -34,6 +37,7 @@ def chat_response(data):
     pm.ensure_directory(text_dir)
     input_text_file = os.path.join(text_dir, "input.txt")
 
+    context.update_progress(0.1, "语音识别")
     user_text = audio_to_text(input_audio, input_text_file)
     if not user_text:
         print("[backend.chat_engine] 无法识别语音或文件不存在，使用默认问候")
@@ -45,10 +49,14 @@ def chat_response(data):
     model = "glm-4-plus"
     
     # 获取AI回复
+    context.check_cancelled()
+    context.update_progress(0.2, "生成回复")
     ai_response_text = get_ai_response(input_text_file, output_text_file, api_key, model)
     print(f"[backend.chat_engine] AI回复文本: {ai_response_text}")
 
     # 3. 语音合成 (使用新的voice_generator)
+    context.check_cancelled()
+    context.update_progress(0.3, "语音合成")
     try:
         # 使用人机对话系统中的参考音频
         ref_audio = data.get('ref_audio', '')
@@ -101,13 +109,13 @@ def chat_response(data):
         'model_name': data.get('model_name', 'SyncTalk'), # 默认模型
         'model_param': model_param,
         'ref_audio': voice_path, # 传入刚才生成的语音
-        'gpu_choice': 'GPU0',
+        'gpu_choice': data.get('gpu_choice', 'GPU0'),
         'target_text': '', # 留空，避免 video_generator 重复 TTS
         'pitch': data.get('pitch', 0) # 传递可能的变调参数
     }
     
     # 调用视频生成
-    final_video_path = generate_video(video_gen_data)
+    final_video_path = generate_video(video_gen_data, context)
 
     print(f"[backend.chat_engine] 生成视频路径：{final_video_path}")
     return final_video_path
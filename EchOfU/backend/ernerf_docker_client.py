@@ -15,16 +15,156 @@ ER-NeRF Docker 客户端
 
     # 推理
     video_path = client.infer(data_path, model_path, audio_npy_path)
+
+常驻 Worker:
+    容器以 server 模式启动（docker compose up -d）时会运行 ER-NeRF/ernerf_worker.py，
+    DeepSpeech 会话和最近使用的模型常驻显存。特征提取、推理和预处理优先发给该 Worker，
+    Worker 不可达时自动退回一次性的 docker compose run --rm 模式。
+
+    环境变量:
+        ERNERF_WORKER_URL      Worker 地址（默认 http://127.0.0.1:8888，置空则禁用）
+        ERNERF_WORKER_ROOT     容器内项目根目录（默认 /workspace）
+        ERNERF_WORKER_GPU_ID   Worker 所在的宿主机GPU编号（默认 0）
 """
 
 import os
+import json
 import subprocess
 import shutil
 import time
-from typing import Optional, Tuple
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Optional, Tuple
 from .path_manager import PathManager
 
 
+class ERNeRFWorkerError(Exception):
+    """常驻 Worker 返回的错误（status 为 HTTP 状态码）"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def is_internal(self) -> bool:
+        """Worker 内部错误（5xx），而不是请求本身有误"""
+        return self.status is not None and self.status >= 500
+
+
+class ERNeRFWorkerClient:
+    """
+    常驻 ER-NeRF Worker 的 HTTP 客户端
+
+    宿主机与容器通过卷挂载共享目录，路径在两侧按
+    project_root <-> worker_root 做前缀映射。
+    """
+
+    # 健康检查结果的缓存时间（秒），避免每次调用都探测
+    HEALTH_TTL = 30.0
+    HEALTH_TIMEOUT = 2.0
+
+    # 单次 RPC 的最长等待时间（秒），预处理可能持续数小时
+    RPC_TIMEOUT = 6 * 3600
+
+    def __init__(self, project_root: str,
+                 url: Optional[str] = None,
+                 worker_root: Optional[str] = None,
+                 gpu_id: Optional[int] = None):
+        self.project_root = os.path.abspath(project_root)
+        self.url = (os.environ.get("ERNERF_WORKER_URL", "http://127.0.0.1:8888")
+                    if url is None else url).rstrip("/")
+        self.worker_root = (os.environ.get("ERNERF_WORKER_ROOT", "/workspace")
+                            if worker_root is None else worker_root).rstrip("/")
+        self.gpu_id = int(os.environ.get("ERNERF_WORKER_GPU_ID", 0)) if gpu_id is None else gpu_id
+
+        self._lock = threading.Lock()
+        self._healthy = False
+        self._checked_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    # ---------- 路径映射 ----------
+
+    def to_worker_path(self, path: str) -> str:
+        """宿主机路径 -> 容器内路径（不在项目目录下的路径原样返回）"""
+        path = os.path.abspath(path if os.path.isabs(path) else os.path.join(self.project_root, path))
+        if not self.worker_root:
+            return path
+        relative = os.path.relpath(path, self.project_root)
+        if relative.startswith(".."):
+            return path
+        return f"{self.worker_root}/{relative.replace(os.sep, '/')}"
+
+    def from_worker_path(self, path: str) -> str:
+        """容器内路径 -> 宿主机路径"""
+        if self.worker_root and (path == self.worker_root or path.startswith(self.worker_root + "/")):
+            relative = path[len(self.worker_root):].lstrip("/")
+            return os.path.join(self.project_root, *relative.split("/")) if relative else self.project_root
+        return path
+
+    # ---------- 通信 ----------
+
+    def is_available(self, gpu_id: Optional[int] = None, force: bool = False) -> bool:
+        """
+        Worker 是否可用
+
+        Args:
+            gpu_id: 任务被分配的GPU，与 Worker 所在GPU不同时不使用 Worker
+            force: 忽略缓存重新探测
+        """
+        if not self.enabled:
+            return False
+        if gpu_id is not None and int(gpu_id) != self.gpu_id:
+            return False
+
+        with self._lock:
+            if force or time.time() - self._checked_at >= self.HEALTH_TTL:
+                try:
+                    self.health()
+                    self._healthy = True
+                except (ERNeRFWorkerError, OSError):
+                    self._healthy = False
+                self._checked_at = time.time()
+            return self._healthy
+
+    def mark_unavailable(self):
+        """调用失败（连接层面）后标记不可用，下个检查周期再重试"""
+        with self._lock:
+            self._healthy = False
+            self._checked_at = time.time()
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health", timeout=self.HEALTH_TIMEOUT)
+
+    def call(self, method: str, **params) -> Dict[str, Any]:
+        return self._request("POST", "/rpc", {"method": method, "params": params}, timeout=self.RPC_TIMEOUT)
+
+    def _request(self, http_method: str, path: str, payload: Optional[dict] = None,
+                 timeout: float = 10.0) -> Dict[str, Any]:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.url + path, data=data, method=http_method,
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                body = json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            # 4xx: 请求本身有误；5xx: Worker 内部出错，调用方可退回一次性模式
+            try:
+                body = json.loads(e.read() or b"{}")
+            except ValueError:
+                body = {}
+            raise ERNeRFWorkerError(body.get("error") or f"HTTP {e.code}", status=e.code)
+
+        if not body.get("ok"):
+            raise ERNeRFWorkerError(body.get("error") or "unknown worker error")
+        return body.get("result") or {}
+
+
 class ERNeRFDockerClient:
     """
     ER-NeRF Docker 客户端
@@ -59,6 +199,9 @@ class ERNeRFDockerClient:
         # docker-compose完整路径
         self.docker_compose_path = os.path.join(self.project_root, docker_compose_file)
 
+        # 常驻 Worker（不可达时退回 docker compose run --rm）
+        self.worker = ERNeRFWorkerClient(self.project_root)
+
         print(f"[ERNeRFDockerClient] 初始化完成")
         print(f"[ERNeRFDockerClient] 项目根目录: {self.project_root}")
         print(f"[ERNeRFDockerClient] Docker Compose: {self.docker_compose_path}")
@@ -66,7 +209,8 @@ class ERNeRFDockerClient:
     def _run_docker_command(self,
                            mode: str,
                            args: list,
-                           capture_output: bool = True) -> Tuple[bool, str]:
+                           capture_output: bool = True,
+                           gpu_id: Optional[int] = None) -> Tuple[bool, str]:
         """
         运行Docker命令
 
@@ -74,6 +218,7 @@ class ERNeRFDockerClient:
             mode: entrypoint模式 (preprocess, train, test, etc.)
             args: 传递给entrypoint的参数列表
             capture_output: 是否捕获输出
+            gpu_id: 宿主机GPU编号（通过 ERNERF_GPU_ID 传给 docker-compose 的 device_ids）
 
         Returns:
             (success, output)
@@ -86,7 +231,13 @@ class ERNeRFDockerClient:
             mode
         ] + args
 
+        env = os.environ.copy()
+        if gpu_id is not None:
+            env["ERNERF_GPU_ID"] = str(gpu_id)
+
         print(f"[ERNeRFDockerClient] 执行命令: {' '.join(cmd)}")
+        if gpu_id is not None:
+            print(f"[ERNeRFDockerClient] 使用GPU: {gpu_id}")
 
         try:
             if capture_output:
@@ -95,11 +246,12 @@ class ERNeRFDockerClient:
                     capture_output=True,
                     text=True,
                     check=True,
-                    cwd=self.project_root
+                    cwd=self.project_root,
+                    env=env
                 )
                 return True, result.stdout
             else:
-                subprocess.run(cmd, check=True, cwd=self.project_root)
+                subprocess.run(cmd, check=True, cwd=self.project_root, env=env)
                 return True, ""
 
         except subprocess.CalledProcessError as e:
@@ -110,6 +262,38 @@ class ERNeRFDockerClient:
             print(f"[ERNeRFDockerClient] 未知错误: {e}")
             return False, str(e)
 
+    def _call_worker(self, method: str, gpu_id: Optional[int] = None,
+                     **params) -> Tuple[Optional[bool], Dict[str, Any]]:
+        """
+        通过常驻 Worker 执行任务
+
+        Returns:
+            (None, {})          Worker 不可用或内部出错，调用方应退回一次性模式
+            (True, result)      执行成功
+            (False, {"error"})  请求被 Worker 拒绝（参数或文件错误）
+        """
+        if not self.worker.is_available(gpu_id):
+            return None, {}
+
+        print(f"[ERNeRFDockerClient] 使用常驻Worker执行: {method}")
+        start = time.time()
+        try:
+            result = self.worker.call(method, **params)
+        except ERNeRFWorkerError as e:
+            if e.is_internal:
+                print(f"[ERNeRFDockerClient] Worker内部错误，退回一次性模式: {e}")
+                self.worker.mark_unavailable()
+                return None, {}
+            print(f"[ERNeRFDockerClient] Worker执行失败: {e}")
+            return False, {"error": str(e)}
+        except OSError as e:
+            print(f"[ERNeRFDockerClient] Worker连接失败，退回一次性模式: {e}")
+            self.worker.mark_unavailable()
+            return None, {}
+
+        print(f"[ERNeRFDockerClient] Worker完成 {method}，耗时 {time.time() - start:.2f}s")
+        return True, result
+
     def check_container_running(self) -> bool:
         """
         检查ER-NeRF容器是否在运行
@@ -157,13 +341,15 @@ class ERNeRFDockerClient:
 
     def preprocess(self,
                   video_path: str,
-                  task_id: Optional[str] = None) -> Tuple[bool, str]:
+                  task_id: Optional[str] = None,
+                  gpu_id: Optional[int] = None) -> Tuple[bool, str]:
         """
         数据预处理
 
         Args:
             video_path: 输入视频路径
             task_id: 任务ID（可选，默认使用视频文件名）
+            gpu_id: GPU编号（可选）
 
         Returns:
             (success, message)
@@ -180,11 +366,22 @@ class ERNeRFDockerClient:
         if not os.path.isabs(video_path):
             video_path = os.path.abspath(video_path)
 
+        ok, result = self._call_worker(
+            "preprocess", gpu_id=gpu_id,
+            video_path=self.worker.to_worker_path(video_path), task_id=task_id
+        )
+        if ok is not None:
+            if not ok:
+                return False, f"预处理失败: {result['error']}"
+            data_path = self.worker.from_worker_path(result["data_path"])
+            print("[ERNeRFDockerClient] 预处理完成")
+            return True, f"预处理完成，数据保存至: {data_path}"
+
         args = [video_path]
         if task_id:
             args.append(task_id)
 
-        success, output = self._run_docker_command("preprocess", args, capture_output=True)
+        success, output = self._run_docker_command("preprocess", args, capture_output=True, gpu_id=gpu_id)
 
         if success:
             print(f"[ERNeRFDockerClient] 预处理完成")
@@ -217,16 +414,17 @@ class ERNeRFDockerClient:
         print(f"[ERNeRFDockerClient] GPU: {gpu_id}")
         print(f"[ERNeRFDockerClient] 阶段: {stage}")
 
+        # 容器内只可见被分配的显卡，编号固定为0
         args = [
             data_path,
             model_path,
-            str(gpu_id),
+            "0",
             stage
         ]
 
         # 训练可能需要很长时间，不捕获输出以实时显示日志
         # 或者使用日志文件重定向
-        success, output = self._run_docker_command("train", args, capture_output=False)
+        success, output = self._run_docker_command("train", args, capture_output=False, gpu_id=gpu_id)
 
         if success:
             print(f"[ERNeRFDockerClient] 训练完成")
@@ -238,7 +436,8 @@ class ERNeRFDockerClient:
               data_path: str,
               model_path: str,
               audio_npy_path: str,
-              with_torso: bool = True) -> Tuple[bool, str]:
+              with_torso: bool = True,
+              gpu_id: Optional[int] = None) -> Tuple[bool, str]:
         """
         模型推理
 
@@ -247,6 +446,7 @@ class ERNeRFDockerClient:
             model_path: 模型路径
             audio_npy_path: 音频特征文件路径（.npy）
             with_torso: 是否包含躯干
+            gpu_id: GPU编号（可选）
 
         Returns:
             (success, video_path_or_error_message)
@@ -265,6 +465,20 @@ class ERNeRFDockerClient:
         if not os.path.isabs(audio_npy_path):
             audio_npy_path = os.path.abspath(audio_npy_path)
 
+        ok, result = self._call_worker(
+            "infer", gpu_id=gpu_id,
+            data_path=self.worker.to_worker_path(data_path),
+            workspace=self.worker.to_worker_path(model_path),
+            audio_npy_path=self.worker.to_worker_path(audio_npy_path),
+            torso=with_torso
+        )
+        if ok is not None:
+            if not ok:
+                return False, f"推理失败: {result['error']}"
+            video_path = self.worker.from_worker_path(result["video_path"])
+            print(f"[ERNeRFDockerClient] 推理完成: {video_path}")
+            return True, video_path
+
         args = [
             data_path,
             model_path,
@@ -272,7 +486,7 @@ class ERNeRFDockerClient:
             "true" if with_torso else "false"
         ]
 
-        success, output = self._run_docker_command("test", args, capture_output=True)
+        success, output = self._run_docker_command("test", args, capture_output=True, gpu_id=gpu_id)
 
         if success:
             # 查找生成的视频文件
@@ -286,12 +500,14 @@ class ERNeRFDockerClient:
             return False, f"推理失败: {output}"
 
     def extract_audio_features(self,
-                               wav_path: str) -> Tuple[bool, str]:
+                               wav_path: str,
+                               gpu_id: Optional[int] = None) -> Tuple[bool, str]:
         """
         提取音频特征（DeepSpeech）
 
         Args:
             wav_path: WAV音频文件路径
+            gpu_id: GPU编号（可选）
 
         Returns:
             (success, npy_path_or_error_message)
@@ -307,13 +523,24 @@ class ERNeRFDockerClient:
         if not os.path.isabs(wav_path):
             wav_path = os.path.abspath(wav_path)
 
+        npy_path = wav_path.replace('.wav', '.npy')
+
+        ok, result = self._call_worker(
+            "extract_features", gpu_id=gpu_id,
+            wav_path=self.worker.to_worker_path(wav_path),
+            output_path=self.worker.to_worker_path(npy_path)
+        )
+        if ok is not None:
+            if not ok:
+                return False, f"特征提取失败: {result['error']}"
+            return True, self.worker.from_worker_path(result["npy_path"])
+
         args = [wav_path]
 
-        success, output = self._run_docker_command("extract-features", args, capture_output=True)
+        success, output = self._run_docker_command("extract-features", args, capture_output=True, gpu_id=gpu_id)
 
         if success:
             # 返回.npy文件路径
-            npy_path = wav_path.replace('.wav', '.npy')
             if os.path.exists(npy_path):
                 return True, npy_path
             else:
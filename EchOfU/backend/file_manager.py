@@ -9,6 +9,15 @@ from datetime import datetime
 from werkzeug.utils import secure_filename
 from flask import request, jsonify
 from .path_manager import PathManager
+from .media_index import get_media_index
+from .upload_ingest import UploadPolicy, UploadRejected, ingest_file_storage, file_sha256
+
+
+# 媒体索引中的集合名
+REFERENCE_AUDIO = "reference_audio"
+GENERATED_AUDIO = "generated_audio"
+TRAINING_VIDEO = "training_video"
+ERNERF_MODELS = "ernerf_models"
 
 
 class FileManager:
@@ -18,6 +27,30 @@ class FileManager:
         self.path_manager = PathManager()
         # 确保必要目录存在
         self._ensure_directories()
+        self._register_media_collections()
+        self._build_upload_policies()
+
+    def _register_media_collections(self):
+        """向媒体索引注册列表接口对应的目录"""
+        self.media_index = get_media_index()
+        audio_extensions = self.get_supported_audio_extensions()
+        self.media_index.register_collection(
+            REFERENCE_AUDIO, self.path_manager.get_ref_voice_path(), audio_extensions)
+        self.media_index.register_collection(
+            GENERATED_AUDIO, self.path_manager.get_res_voice_path(), audio_extensions)
+        self.media_index.register_collection(
+            TRAINING_VIDEO, self.path_manager.get_ref_video_path(), self.get_supported_video_extensions())
+        self.media_index.register_collection(
+            ERNERF_MODELS, self.path_manager.get_ernerf_path(), recursive=True)
+
+    def _build_upload_policies(self):
+        """上传策略：允许的扩展名和大小上限（流式接收时即时校验）"""
+        staging_dir = self.path_manager.get_upload_staging_path()
+        self.reference_audio_policy = UploadPolicy(
+            REFERENCE_AUDIO, self.get_supported_audio_extensions(), 100 * 1024 * 1024, staging_dir)
+        # 视频文件允许更大一些
+        self.training_video_policy = UploadPolicy(
+            TRAINING_VIDEO, self.get_supported_video_extensions(), 200 * 1024 * 1024, staging_dir)
 
     def _ensure_directories(self):
         """确保必要的目录结构存在"""
@@ -54,27 +87,43 @@ class FileManager:
 
         return safe_filename
 
-    def _validate_file(self, file, allowed_extensions, max_size_mb=100):
-        """验证上传的文件"""
-        # 检查文件类型
-        filename = file.filename
-        if not filename:
-            return False, "没有选择文件"
-
-        file_ext = os.path.splitext(filename)[1].lower()
-        if file_ext not in allowed_extensions:
-            return False, f"不支持的文件格式。支持的格式: {', '.join(allowed_extensions)}"
-
-        # 检查文件大小
-        max_size = max_size_mb * 1024 * 1024
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0, os.SEEK_SET)
-
-        if file_size > max_size:
-            return False, f"文件大小超过限制。最大支持{max_size_mb}MB，当前文件大小: {file_size / (1024*1024):.2f}MB"
-
-        return True, "文件验证通过"
+    def _ingest_upload(self, file, policy, target_path_func):
+        """
+        接收上传文件：流式写入暂存目录并校验，内容与集合中已有文件相同时直接复用
+
+        Returns:
+            (文件路径, 是否为重复上传, IngestedUpload)
+        """
+        with ingest_file_storage(file, policy) as stream:
+            upload = stream.finish()
+
+            existing_path = self._find_duplicate(policy.name, upload.sha256, upload.size)
+            if existing_path:
+                return existing_path, True, upload
+
+            save_path = target_path_func(self._generate_safe_filename(file.filename))
+            stream.commit(save_path)
+
+        self.media_index.record(save_path, policy.name)
+        self.media_index.record_hash(save_path, upload.sha256, policy.name)
+        return save_path, False, upload
+
+    def _find_duplicate(self, collection, sha256, size):
+        """按内容哈希查找已有文件；历史文件只对大小相同的候选补算哈希"""
+        existing_path = self.media_index.find_by_hash(collection, sha256)
+        if existing_path:
+            return existing_path
+
+        self.media_index.reconcile(collection)
+        for path in self.media_index.unhashed_paths(collection, size):
+            try:
+                digest = file_sha256(path)
+            except OSError:
+                continue
+            self.media_index.record_hash(path, digest, collection)
+            if digest == sha256:
+                return path
+        return None
 
     def _get_file_info(self, file_path):
         """获取文件信息"""
@@ -91,6 +140,27 @@ class FileManager:
             'file_type': os.path.splitext(file_path)[1][1:].upper()  # 去掉点号，转为大写
         }
 
+    def _entry_to_file_info(self, entry):
+        """索引条目转为与 _get_file_info 相同格式的文件信息"""
+        return {
+            'filename': entry.filename,
+            'size': entry.size,
+            'size_mb': round(entry.size / (1024 * 1024), 2),
+            'created_time': datetime.fromtimestamp(entry.ctime).strftime('%Y-%m-%d %H:%M:%S'),
+            'modified_time': datetime.fromtimestamp(entry.mtime).strftime('%Y-%m-%d %H:%M:%S'),
+            'file_type': entry.ext.upper(),
+            'relative_path': self._get_relative_path(entry.path)
+        }
+
+    def _list_collection(self, collection, limit=None, cursor=None, file_type=None,
+                         sort='mtime', descending=True):
+        """分页查询某个集合，返回 (文件信息列表, 总数, 下一页游标)"""
+        page = self.media_index.query(
+            collection, limit=limit, cursor=cursor, file_type=file_type,
+            sort=sort, descending=descending
+        )
+        return [self._entry_to_file_info(entry) for entry in page.entries], page.total_count, page.next_cursor
+
     def _get_relative_path(self, absolute_path):
         """将绝对路径转换为相对路径"""
         if absolute_path.startswith(self.path_manager.project_root):
@@ -101,55 +171,48 @@ class FileManager:
     # ==================== 参考音频文件管理 ====================
 
     def upload_reference_audio(self, audio_file):
-        """上传参考音频文件"""
-        # 验证文件
-        is_valid, message = self._validate_file(
-            audio_file,
-            self.get_supported_audio_extensions()
-        )
-
-        if not is_valid:
-            return {
-                'status': 'error',
-                'message': message
-            }, 400
-
-        # 生成安全文件名
-        safe_filename = self._generate_safe_filename(audio_file.filename)
-
-        # 保存文件
-        save_path = self.path_manager.get_ref_voice_path(safe_filename)
-        audio_file.save(save_path)
-
-        # 验证保存的文件是否可以被音频库正确识别
+        """上传参考音频文件（流式接收 + 文件头校验，重复上传直接返回已有文件）"""
         try:
-            import torchaudio
-            torchaudio.load(save_path)
-            print(f"[FileManager] 音频文件验证通过: {safe_filename}")
-        except Exception as e:
-            # 文件无法被识别，删除并返回错误
-            os.remove(save_path)
-            print(f"[FileManager] 音频文件格式验证失败: {e}")
+            save_path, duplicate, upload = self._ingest_upload(
+                audio_file, self.reference_audio_policy, self.path_manager.get_ref_voice_path)
+        except UploadRejected as e:
+            print(f"[FileManager] 参考音频被拒绝: {e.message}")
             return {
                 'status': 'error',
-                'message': f'音频文件格式无效或损坏: {str(e)}。请确保上传有效的音频文件（WAV、MP3、M4A等）。'
-            }, 400
+                'message': e.message
+            }, e.status_code
 
-        # 获取相对路径
+        saved_filename = os.path.basename(save_path)
         relative_path = self._get_relative_path(save_path)
 
-        print(f"[FileManager] 参考音频上传成功: {audio_file.filename} -> {relative_path}")
+        if duplicate:
+            print(f"[FileManager] 参考音频与已有文件相同: {audio_file.filename} -> {relative_path}")
+        else:
+            print(f"[FileManager] 参考音频上传成功: {audio_file.filename} -> {relative_path} "
+                  f"({upload.media_format.container}/{upload.media_format.codec or '-'})")
 
         return {
             'status': 'success',
-            'message': '音频上传成功',
-            'filename': safe_filename,
+            'message': '音频已存在' if duplicate else '音频上传成功',
+            'filename': saved_filename,
             'relative_path': relative_path,
-            'original_name': audio_file.filename
+            'original_name': audio_file.filename,
+            'duplicate': duplicate,
+            'sha256': upload.sha256,
+            'media_format': upload.media_format.to_dict()
         }
 
-    def get_reference_audios(self):
-        """获取参考音频文件列表"""
+    def get_reference_audios(self, limit=None, cursor=None, file_type=None, sort='mtime', descending=True):
+        """
+        获取参考音频文件列表（来自媒体索引，默认按修改时间降序）
+
+        Args:
+            limit: 每页条数（None 表示全部）
+            cursor: 上一页返回的 next_cursor
+            file_type: 按扩展名过滤（如 wav）
+            sort: 排序字段（mtime / name / size）
+            descending: 是否倒序
+        """
         ref_voices_dir = self.path_manager.get_ref_voice_path()
 
         if not os.path.exists(ref_voices_dir):
@@ -157,72 +220,56 @@ class FileManager:
                 'status': 'success',
                 'files': [],
                 'total_count': 0,
+                'next_cursor': None,
                 'message': '参考音频目录不存在'
             }
 
-        audio_files = []
-        audio_extensions = self.get_supported_audio_extensions()
+        audio_files, total_count, next_cursor = self._list_collection(
+            REFERENCE_AUDIO, limit, cursor, file_type, sort, descending)
 
-        for filename in os.listdir(ref_voices_dir):
-            file_path = os.path.join(ref_voices_dir, filename)
-            if os.path.isfile(file_path):
-                file_ext = os.path.splitext(filename)[1].lower()
-                if file_ext in audio_extensions:
-                    file_info = self._get_file_info(file_path)
-                    if file_info:
-                        file_info['relative_path'] = self._get_relative_path(file_path)
-                        audio_files.append(file_info)
-
-        # 按修改时间降序排列（最新的在前）
-        audio_files.sort(key=lambda x: x['modified_time'], reverse=True)
-
-        print(f"[FileManager] 获取到 {len(audio_files)} 个参考音频文件")
+        print(f"[FileManager] 获取到 {len(audio_files)}/{total_count} 个参考音频文件")
 
         return {
             'status': 'success',
             'files': audio_files,
-            'total_count': len(audio_files)
+            'total_count': total_count,
+            'next_cursor': next_cursor
         }
 
     # ==================== 训练视频文件管理 ====================
 
     def upload_training_video(self, video_file):
-        """上传训练视频文件"""
-        # 验证文件
-        is_valid, message = self._validate_file(
-            video_file,
-            self.get_supported_video_extensions(),
-            max_size_mb=200  # 视频文件允许更大一些
-        )
-
-        if not is_valid:
+        """上传训练视频文件（流式接收 + 文件头校验，重复上传直接返回已有文件）"""
+        try:
+            save_path, duplicate, upload = self._ingest_upload(
+                video_file, self.training_video_policy, self.path_manager.get_ref_video_path)
+        except UploadRejected as e:
+            print(f"[FileManager] 训练视频被拒绝: {e.message}")
             return {
                 'status': 'error',
-                'message': message
-            }, 400
+                'message': e.message
+            }, e.status_code
 
-        # 生成安全文件名
-        safe_filename = self._generate_safe_filename(video_file.filename)
-
-        # 保存文件
-        save_path = self.path_manager.get_ref_video_path(safe_filename)
-        video_file.save(save_path)
-
-        # 获取相对路径
         relative_path = self._get_relative_path(save_path)
 
-        print(f"[FileManager] 训练视频上传成功: {video_file.filename} -> {relative_path}")
+        if duplicate:
+            print(f"[FileManager] 训练视频与已有文件相同: {video_file.filename} -> {relative_path}")
+        else:
+            print(f"[FileManager] 训练视频上传成功: {video_file.filename} -> {relative_path}")
 
         return {
             'status': 'success',
-            'message': '视频上传成功',
-            'filename': safe_filename,
+            'message': '视频已存在' if duplicate else '视频上传成功',
+            'filename': os.path.basename(save_path),
             'relative_path': relative_path,
-            'original_name': video_file.filename
+            'original_name': video_file.filename,
+            'duplicate': duplicate,
+            'sha256': upload.sha256,
+            'media_format': upload.media_format.to_dict()
         }
 
-    def get_training_videos(self):
-        """获取训练视频文件列表"""
+    def get_training_videos(self, limit=None, cursor=None, file_type=None, sort='mtime', descending=True):
+        """获取训练视频文件列表（来自媒体索引，参数同 get_reference_audios）"""
         ref_videos_dir = self.path_manager.get_ref_video_path()
 
         if not os.path.exists(ref_videos_dir):
@@ -230,31 +277,45 @@ class FileManager:
                 'status': 'success',
                 'files': [],
                 'total_count': 0,
+                'next_cursor': None,
                 'message': '参考视频目录不存在'
             }
 
-        video_files = []
-        video_extensions = self.get_supported_video_extensions()
+        video_files, total_count, next_cursor = self._list_collection(
+            TRAINING_VIDEO, limit, cursor, file_type, sort, descending)
 
-        for filename in os.listdir(ref_videos_dir):
-            file_path = os.path.join(ref_videos_dir, filename)
-            if os.path.isfile(file_path):
-                file_ext = os.path.splitext(filename)[1].lower()
-                if file_ext in video_extensions:
-                    file_info = self._get_file_info(file_path)
-                    if file_info:
-                        file_info['relative_path'] = self._get_relative_path(file_path)
-                        video_files.append(file_info)
+        print(f"[FileManager] 获取到 {len(video_files)}/{total_count} 个训练视频文件")
 
-        # 按修改时间降序排列（最新的在前）
-        video_files.sort(key=lambda x: x['modified_time'], reverse=True)
+        return {
+            'status': 'success',
+            'files': video_files,
+            'total_count': total_count,
+            'next_cursor': next_cursor
+        }
+
+    # ==================== 生成音频文件管理 ====================
+
+    def get_generated_audios(self, limit=None, cursor=None, file_type=None, sort='mtime', descending=True):
+        """获取生成的音频文件列表（res_voices，来自媒体索引，参数同 get_reference_audios）"""
+        audio_files, total_count, next_cursor = self._list_collection(
+            GENERATED_AUDIO, limit, cursor, file_type, sort, descending)
 
-        print(f"[FileManager] 获取到 {len(video_files)} 个训练视频文件")
+        audios = [{
+            "id": info['filename'],
+            "name": info['filename'],
+            "path": info['relative_path'],
+            "created_at": info['modified_time'],
+            "size_mb": info['size_mb'],
+            "status": "已生成"
+        } for info in audio_files]
+
+        print(f"[FileManager] 获取到 {len(audios)}/{total_count} 个生成的音频")
 
         return {
             'status': 'success',
-            'files': video_files,
-            'total_count': len(video_files)
+            'audios': audios,
+            'total_count': total_count,
+            'next_cursor': next_cursor
         }
 
     # ==================== 模型文件管理 ====================
@@ -282,39 +343,33 @@ class FileManager:
         #                     'description': f'SyncTalk模型 - 包含{len(model_files)}个模型文件'
         #                 })
 
-        # 获取ER-NeRF模型
+        # 获取ER-NeRF模型（媒体索引按一级子目录汇总权重文件，目录未变化时不再遍历）
         ernef_dir = self.path_manager.get_ernerf_path()
         if os.path.exists(ernef_dir):
-            # 首先检查子目录中的模型
-            for item in os.listdir(ernef_dir):
-                item_path = os.path.join(ernef_dir, item)
-                if os.path.isdir(item_path):
-                    model_files = [f for f in os.listdir(item_path)
-                                if f.endswith(('.pth', '.ckpt', '.pt', '.bin', '.safetensors'))]
-                    if model_files:
-                        stat = os.stat(item_path)
-                        available_models.append({
-                            'name': item,
-                            'type': 'ER-NeRF',
-                            'path': f"models/ER-NeRF/{item}",
-                            'model_files_count': len(model_files),
-                            'created_time': datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
-                            'description': f'ER-NeRF模型 - 包含{len(model_files)}个模型文件'
-                        })
-
-            # 然后检查直接在ER-NeRF目录下的模型文件
-            model_files = [f for f in os.listdir(ernef_dir)
-                          if f.endswith(('.pth', '.ckpt', '.pt', '.bin', '.safetensors')) and not f.startswith('.')]
-            if model_files:
-                stat = os.stat(ernef_dir)
-                available_models.append({
-                    'name': 'root',
-                    'type': 'ER-NeRF',
-                    'path': 'models/ER-NeRF',
-                    'model_files_count': len(model_files),
-                    'created_time': datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
-                    'description': f'ER-NeRF根目录模型 - 包含{len(model_files)}个模型文件'
-                })
+            for group in self.media_index.group_summary(ERNERF_MODELS, 'model_weight'):
+                name = group['group_name']
+                file_count = group['file_count']
+                created_time = datetime.fromtimestamp(group['ctime'] or 0).strftime('%Y-%m-%d %H:%M:%S')
+                if name:
+                    # 子目录中的模型
+                    available_models.append({
+                        'name': name,
+                        'type': 'ER-NeRF',
+                        'path': f"models/ER-NeRF/{name}",
+                        'model_files_count': file_count,
+                        'created_time': created_time,
+                        'description': f'ER-NeRF模型 - 包含{file_count}个模型文件'
+                    })
+                else:
+                    # 直接在ER-NeRF目录下的模型文件
+                    available_models.append({
+                        'name': 'root',
+                        'type': 'ER-NeRF',
+                        'path': 'models/ER-NeRF',
+                        'model_files_count': file_count,
+                        'created_time': created_time,
+                        'description': f'ER-NeRF根目录模型 - 包含{file_count}个模型文件'
+                    })
 
         # 添加默认选项（如果没有找到任何模型）
         if not available_models:
@@ -370,35 +425,51 @@ class FileManager:
         model_files = []
         total_size = 0
 
-        for root, dirs, files in os.walk(base_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, base_path)
-                stat = os.stat(file_path)
-
-                file_size = stat.st_size
-                total_size += file_size
-
-                # 判断文件类型
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in ['.pth', '.ckpt', '.pt', '.bin', '.safetensors']:
-                    file_type = 'model_weight'
-                elif file_ext in ['.json', '.yaml', '.yml', '.txt']:
-                    file_type = 'config'
-                elif file_ext in ['.py']:
-                    file_type = 'code'
-                else:
-                    file_type = 'other'
-
+        if model_type == 'ER-NeRF':
+            # ER-NeRF 模型目录已被媒体索引覆盖，不再遍历整棵目录树；
+            # 按路径前缀过滤，model_name 为 "a/b" 这类嵌套目录时也能查到
+            page = self.media_index.query(ERNERF_MODELS, dir_prefix=base_path, sort='name', descending=False)
+            for entry in page.entries:
+                total_size += entry.size
                 model_files.append({
-                    'filename': file,
-                    'relative_path': relative_path,
-                    'size': file_size,
-                    'size_mb': round(file_size / (1024 * 1024), 2),
-                    'file_type': file_type,
-                    'created_time': datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
-                    'modified_time': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+                    'filename': entry.filename,
+                    'relative_path': os.path.relpath(entry.path, base_path),
+                    'size': entry.size,
+                    'size_mb': round(entry.size / (1024 * 1024), 2),
+                    'file_type': entry.category if entry.category in ('model_weight', 'config', 'code') else 'other',
+                    'created_time': datetime.fromtimestamp(entry.ctime).strftime('%Y-%m-%d %H:%M:%S'),
+                    'modified_time': datetime.fromtimestamp(entry.mtime).strftime('%Y-%m-%d %H:%M:%S')
                 })
+        else:
+            for root, dirs, files in os.walk(base_path):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    relative_path = os.path.relpath(file_path, base_path)
+                    stat = os.stat(file_path)
+
+                    file_size = stat.st_size
+                    total_size += file_size
+
+                    # 判断文件类型
+                    file_ext = os.path.splitext(file)[1].lower()
+                    if file_ext in ['.pth', '.ckpt', '.pt', '.bin', '.safetensors']:
+                        file_type = 'model_weight'
+                    elif file_ext in ['.json', '.yaml', '.yml', '.txt']:
+                        file_type = 'config'
+                    elif file_ext in ['.py']:
+                        file_type = 'code'
+                    else:
+                        file_type = 'other'
+
+                    model_files.append({
+                        'filename': file,
+                        'relative_path': relative_path,
+                        'size': file_size,
+                        'size_mb': round(file_size / (1024 * 1024), 2),
+                        'file_type': file_type,
+                        'created_time': datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
+                        'modified_time': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+                    })
 
         # 获取目录信息
         dir_stat = os.stat(base_path)
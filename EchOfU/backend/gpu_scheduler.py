@@ -0,0 +1,394 @@
+"""
+GPU 调度模块
+为 ER-NeRF / SyncTalk 的训练和推理任务分配显卡
+
+核心功能:
+- 通过设备清单（默认 GPUtil）获取每张显卡的显存和负载
+- 按任务声明的显存需求做准入控制，显存不足时排队等待
+- 在可用显卡中选择负载最低的一张（可指定偏好显卡）
+- 设备清单可替换为固定清单，便于在无 GPU 的环境中验证调度逻辑
+
+使用方式:
+    from backend.gpu_scheduler import get_gpu_scheduler
+
+    scheduler = get_gpu_scheduler()
+    with scheduler.acquire("ernerf_train", preferred="GPU1") as lease:
+        data["gpu_choice"] = lease.gpu_choice
+        train_model(data)
+"""
+
+import time
+import uuid
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Union
+
+
+# ==================== 数据类定义 ====================
+
+@dataclass
+class GPUDevice:
+    """显卡状态快照"""
+    index: int
+    name: str = ""
+    memory_total: float = 0.0     # MB
+    memory_used: float = 0.0      # MB
+    load: float = 0.0             # 0.0-1.0
+
+    @property
+    def memory_free(self) -> float:
+        return max(0.0, self.memory_total - self.memory_used)
+
+
+@dataclass
+class GPULease:
+    """显卡占用凭证，任务结束时必须释放（支持 with 语句）"""
+    lease_id: str
+    job_kind: str
+    device_index: Optional[int]
+    memory_mb: float
+    acquired_at: float = field(default_factory=time.time)
+    cpu: bool = False             # 用户选择了 CPU 模式，不占用显卡
+    memory_used_at_grant: float = 0.0   # 分配时该卡的已用显存（MB），用于估算任务已实际占用的部分
+    _scheduler: Optional["GPUScheduler"] = field(default=None, repr=False)
+
+    @property
+    def gpu_choice(self) -> str:
+        """与表单字段 gpu_choice 相同格式的设备名（如 GPU0 / CPU）"""
+        if self.cpu:
+            return GPUScheduler.CPU_CHOICE
+        return f"GPU{self.device_index if self.device_index is not None else 0}"
+
+    def release(self):
+        if self._scheduler is not None:
+            self._scheduler.release(self)
+            self._scheduler = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+# ==================== 异常类定义 ====================
+
+class GPUSchedulerError(Exception):
+    """GPU 调度基础异常"""
+    pass
+
+
+class GPUAcquireAborted(GPUSchedulerError):
+    """等待显卡期间被中止（超时或任务取消）"""
+    pass
+
+
+# ==================== 设备清单 ====================
+
+class GPUtilInventory:
+    """基于 GPUtil 的真实设备清单"""
+
+    def get_devices(self) -> List[GPUDevice]:
+        try:
+            import GPUtil
+        except ImportError:
+            return []
+
+        try:
+            return [
+                GPUDevice(
+                    index=gpu.id,
+                    name=gpu.name,
+                    memory_total=float(gpu.memoryTotal),
+                    memory_used=float(gpu.memoryUsed),
+                    load=float(gpu.load)
+                )
+                for gpu in GPUtil.getGPUs()
+            ]
+        except Exception as e:
+            print(f"[GPUScheduler] 获取GPU信息失败: {e}")
+            return []
+
+
+class StaticInventory:
+    """固定设备清单（用于测试或手动指定设备），可通过 update 修改状态"""
+
+    def __init__(self, devices: List[GPUDevice]):
+        self._devices = {device.index: device for device in devices}
+
+    def update(self, index: int, **changes):
+        device = self._devices[index]
+        for key, value in changes.items():
+            setattr(device, key, value)
+
+    def get_devices(self) -> List[GPUDevice]:
+        return [GPUDevice(**vars(device)) for device in self._devices.values()]
+
+
+# ==================== 调度器 ====================
+
+class GPUScheduler:
+    """
+    显存准入 + 最低负载优先的显卡调度器
+
+    可用显存按 总显存 - 已用显存 - 尚未实际占用的预留显存 计算。
+    已用显存包含其他进程的占用；任务启动后实际占用也会出现在已用显存中，
+    因此预留只扣除尚未分配的部分：以该卡上最早的有效凭证分配时的已用显存为基准，
+    之后已用显存的增长视为预留任务已占用的显存。
+    """
+
+    # 各类任务默认声明的显存需求（MB），可在提交时覆盖
+    DEFAULT_MEMORY_MB = {
+        "ernerf_train": 8000,
+        "ernerf_infer": 4000,
+        "synctalk_train": 10000,
+        "synctalk_infer": 6000,
+    }
+
+    # 设备状态刷新的最小间隔（秒），避免频繁调用 nvidia-smi
+    REFRESH_INTERVAL = 1.0
+
+    # 显存不足时重新检查的间隔（秒）
+    WAIT_INTERVAL = 5.0
+
+    # 表单中表示 CPU 模式的 gpu_choice
+    CPU_CHOICE = "CPU"
+
+    def __init__(self, inventory=None, max_jobs_per_device: Optional[int] = None,
+                 clock: Callable[[], float] = time.time):
+        self.inventory = inventory or GPUtilInventory()
+        self.max_jobs_per_device = max_jobs_per_device
+        self._clock = clock
+
+        self._leases: Dict[str, GPULease] = {}
+        self._condition = threading.Condition(threading.RLock())
+        self._devices: List[GPUDevice] = []
+        self._refreshed_at = 0.0
+
+    # ---------- 设备状态 ----------
+
+    def _refresh_devices(self, force: bool = False) -> List[GPUDevice]:
+        now = self._clock()
+        if force or not self._devices or now - self._refreshed_at >= self.REFRESH_INTERVAL:
+            self._devices = sorted(self.inventory.get_devices(), key=lambda device: device.index)
+            self._refreshed_at = now
+        return self._devices
+
+    def _reserved_mb(self, index: int) -> float:
+        return sum(lease.memory_mb for lease in self._leases.values() if lease.device_index == index)
+
+    def _active_jobs(self, index: int) -> int:
+        return sum(1 for lease in self._leases.values() if lease.device_index == index)
+
+    def _pending_mb(self, device: GPUDevice) -> float:
+        """预留中尚未实际占用的显存"""
+        leases = [lease for lease in self._leases.values() if lease.device_index == device.index]
+        if not leases:
+            return 0.0
+        # _leases 按分配顺序排列，第一个即最早的凭证
+        allocated = max(0.0, device.memory_used - leases[0].memory_used_at_grant)
+        return max(0.0, sum(lease.memory_mb for lease in leases) - allocated)
+
+    def _available_mb(self, device: GPUDevice) -> float:
+        return device.memory_total - device.memory_used - self._pending_mb(device)
+
+    def _is_admissible(self, device: GPUDevice, memory_mb: float) -> bool:
+        if self.max_jobs_per_device is not None and self._active_jobs(device.index) >= self.max_jobs_per_device:
+            return False
+        return self._available_mb(device) >= memory_mb
+
+    def _select_device(self, devices: List[GPUDevice], memory_mb: float,
+                       preferred: Optional[int]) -> Optional[GPUDevice]:
+        """选择满足显存需求的设备：用户显式选择的偏好设备优先，否则（auto）取负载最低者"""
+        candidates = [device for device in devices if self._is_admissible(device, memory_mb)]
+        if not candidates:
+            return None
+
+        for device in candidates:
+            if device.index == preferred:
+                return device
+
+        return min(candidates, key=lambda device: (
+            self._active_jobs(device.index),
+            device.load,
+            -self._available_mb(device),
+            device.index
+        ))
+
+    # ---------- 对外接口 ----------
+
+    @staticmethod
+    def is_cpu_choice(gpu_choice: Union[str, int, None]) -> bool:
+        """gpu_choice 是否为 CPU 模式"""
+        return gpu_choice is not None and str(gpu_choice).strip().upper() == GPUScheduler.CPU_CHOICE
+
+    @staticmethod
+    def parse_gpu_choice(gpu_choice: Union[str, int, None]) -> Optional[int]:
+        """解析表单中的 gpu_choice（GPU0 / 0 / auto），无法解析时返回 None（CPU 模式见 is_cpu_choice）"""
+        if gpu_choice is None:
+            return None
+        text = str(gpu_choice).strip().upper().replace("GPU", "")
+        return int(text) if text.isdigit() else None
+
+    def memory_requirement(self, job_kind: str, memory_mb: Optional[float] = None) -> float:
+        """获取任务的显存需求（显式声明优先）"""
+        if memory_mb:
+            return float(memory_mb)
+        return float(self.DEFAULT_MEMORY_MB.get(job_kind, 0))
+
+    def try_acquire(self, job_kind: str, memory_mb: Optional[float] = None,
+                    preferred: Union[str, int, None] = None) -> Optional[GPULease]:
+        """
+        尝试立即分配显卡
+
+        Returns:
+            GPULease；当前没有满足需求的显卡时返回 None。
+            没有任何 GPU 时返回 device_index 为 None 的凭证，任务按原方式执行。
+            preferred 为 CPU 时不做准入控制，返回 gpu_choice 仍为 CPU 的凭证。
+
+        Raises:
+            GPUSchedulerError: 需求超过所有显卡的总显存，永远无法满足
+        """
+        if self.is_cpu_choice(preferred):
+            with self._condition:
+                return self._grant(job_kind, None, 0.0, cpu=True)
+
+        memory_mb = self.memory_requirement(job_kind, memory_mb)
+        preferred_index = self.parse_gpu_choice(preferred)
+
+        with self._condition:
+            devices = self._refresh_devices(force=True)
+            if not devices:
+                return self._grant(job_kind, None, memory_mb)
+
+            if all(device.memory_total < memory_mb for device in devices):
+                raise GPUSchedulerError(
+                    f"任务 {job_kind} 需要 {memory_mb:.0f}MB 显存，超过所有显卡的总显存"
+                )
+
+            device = self._select_device(devices, memory_mb, preferred_index)
+            if device is None:
+                return None
+            return self._grant(job_kind, device.index, memory_mb)
+
+    def acquire(self, job_kind: str, memory_mb: Optional[float] = None,
+                preferred: Union[str, int, None] = None, timeout: Optional[float] = None,
+                should_abort: Optional[Callable[[], bool]] = None) -> GPULease:
+        """
+        分配显卡，显存不足时阻塞等待其他任务释放
+
+        Args:
+            job_kind: 任务类型（见 DEFAULT_MEMORY_MB）
+            memory_mb: 显存需求（MB），默认按任务类型
+            preferred: 偏好显卡（如表单中的 GPU1），不满足需求时自动改选其他显卡；CPU 表示不占用显卡
+            timeout: 最长等待时间（秒），None 表示一直等待
+            should_abort: 等待期间定期调用，返回 True 时中止等待
+
+        Raises:
+            GPUAcquireAborted: 超时或被中止
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        waiting_logged = False
+
+        with self._condition:
+            while True:
+                lease = self.try_acquire(job_kind, memory_mb, preferred)
+                if lease is not None:
+                    return lease
+
+                if should_abort is not None and should_abort():
+                    raise GPUAcquireAborted(f"任务 {job_kind} 等待显卡时被中止")
+
+                wait_time = self.WAIT_INTERVAL
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        raise GPUAcquireAborted(f"任务 {job_kind} 等待显卡超时")
+                    wait_time = min(wait_time, remaining)
+
+                if not waiting_logged:
+                    print(f"[GPUScheduler] 暂无满足需求的显卡，{job_kind} 排队等待...")
+                    waiting_logged = True
+
+                # 其他任务释放显卡时会被唤醒；外部进程释放显存则依赖定期重试
+                self._condition.wait(wait_time)
+
+    def _grant(self, job_kind: str, device_index: Optional[int], memory_mb: float,
+               cpu: bool = False) -> GPULease:
+        device = next((device for device in self._devices if device.index == device_index), None)
+        lease = GPULease(
+            lease_id=uuid.uuid4().hex[:12],
+            job_kind=job_kind,
+            device_index=device_index,
+            memory_mb=memory_mb if device_index is not None else 0.0,
+            acquired_at=self._clock(),
+            cpu=cpu,
+            memory_used_at_grant=device.memory_used if device is not None else 0.0,
+            _scheduler=self
+        )
+        self._leases[lease.lease_id] = lease
+
+        if cpu:
+            print(f"[GPUScheduler] {job_kind} 使用CPU模式，不做显卡分配")
+        elif device_index is None:
+            print(f"[GPUScheduler] 未检测到GPU，{job_kind} 不做显卡分配")
+        else:
+            print(f"[GPUScheduler] {job_kind} 分配到 GPU{device_index}（预留 {memory_mb:.0f}MB）")
+        return lease
+
+    def release(self, lease: GPULease):
+        """释放显卡并唤醒等待中的任务"""
+        with self._condition:
+            if self._leases.pop(lease.lease_id, None) is not None:
+                if lease.device_index is not None:
+                    print(f"[GPUScheduler] {lease.job_kind} 释放 GPU{lease.device_index}")
+                self._condition.notify_all()
+
+    def get_status(self) -> Dict[str, object]:
+        """调度器状态（用于系统监控）"""
+        with self._condition:
+            devices = self._refresh_devices()
+            return {
+                "devices": [
+                    {
+                        "index": device.index,
+                        "name": device.name,
+                        "memory_total": device.memory_total,
+                        "memory_used": device.memory_used,
+                        "memory_reserved": self._reserved_mb(device.index),
+                        "memory_pending": self._pending_mb(device),
+                        "memory_available": max(0.0, self._available_mb(device)),
+                        "load": device.load,
+                        "active_jobs": self._active_jobs(device.index),
+                    }
+                    for device in devices
+                ],
+                "leases": [
+                    {
+                        "lease_id": lease.lease_id,
+                        "job_kind": lease.job_kind,
+                        "device_index": lease.device_index,
+                        "memory_mb": lease.memory_mb,
+                        "acquired_at": lease.acquired_at,
+                    }
+                    for lease in self._leases.values()
+                ],
+            }
+
+
+# 便捷函数：创建全局单例
+_global_scheduler = None
+_global_scheduler_lock = threading.Lock()
+
+def get_gpu_scheduler() -> GPUScheduler:
+    """
+    获取GPU调度器全局单例
+
+    Returns:
+        GPUScheduler实例
+    """
+    global _global_scheduler
+    with _global_scheduler_lock:
+        if _global_scheduler is None:
+            _global_scheduler = GPUScheduler()
+    return _global_scheduler
@@ -0,0 +1,567 @@
+"""
+异步任务队列模块
+将视频生成、模型训练、人机对话等耗时操作移出 Flask 请求线程
+
+核心功能:
+- 基于 SQLite 的持久化任务存储（服务启动时由执行进程将中断的任务重新入队）
+- 多进程部署时只有持有执行锁的进程执行任务，其余进程只提交和查询
+- 可配置大小的后台工作线程池
+- 任务状态、进度查询与结果获取
+- 任务取消（排队中立即取消，运行中由处理函数协作式检查，外部进程可被终止）
+
+使用方式:
+    from backend.job_queue import get_job_queue
+
+    queue = get_job_queue()
+    queue.register_handler("video_generation", handle_video)
+    queue.start_as_runner()
+    job_id = queue.submit("video_generation", {"model_name": "ER-NeRF", ...})
+
+    job = queue.get_job(job_id)
+    print(job.status, job.progress, job.result)
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import subprocess
+import traceback
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from .path_manager import PathManager
+
+
+# ==================== 枚举与数据类 ====================
+
+class JobStatus(Enum):
+    """任务状态"""
+    PENDING = "pending"        # 排队中
+    RUNNING = "running"        # 执行中
+    SUCCEEDED = "succeeded"    # 已完成
+    FAILED = "failed"          # 失败
+    CANCELLED = "cancelled"    # 已取消
+
+    @property
+    def is_finished(self) -> bool:
+        return self in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+@dataclass
+class Job:
+    """任务记录"""
+    job_id: str
+    job_type: str
+    payload: Dict[str, Any]
+    status: JobStatus = JobStatus.PENDING
+    progress: float = 0.0
+    message: str = ""
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可 JSON 序列化的字典"""
+        return {
+            "job_id": self.job_id,
+            "job_type": self.job_type,
+            "status": self.status.value,
+            "progress": round(self.progress, 4),
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "cancel_requested": self.cancel_requested,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# ==================== 异常类定义 ====================
+
+class JobQueueError(Exception):
+    """任务队列基础异常"""
+    pass
+
+
+class JobCancelled(JobQueueError):
+    """任务被取消（由处理函数在检查点抛出）"""
+    pass
+
+
+# ==================== 任务上下文 ====================
+
+class JobContext:
+    """
+    传给任务处理函数的上下文
+
+    处理函数通过它上报进度，并在长耗时步骤之间检查取消请求。
+    """
+
+    def __init__(self, store: "JobStore", job: Job):
+        self._store = store
+        self.job_id = job.job_id
+        self.job_type = job.job_type
+
+    def update_progress(self, progress: float, message: str = ""):
+        """上报进度（0.0-1.0）"""
+        self._store.update_progress(self.job_id, max(0.0, min(1.0, progress)), message)
+
+    def is_cancelled(self) -> bool:
+        """是否已收到取消请求"""
+        return self._store.is_cancel_requested(self.job_id)
+
+    def check_cancelled(self):
+        """收到取消请求时抛出 JobCancelled"""
+        if self.is_cancelled():
+            raise JobCancelled(f"任务已取消: {self.job_id}")
+
+
+class NullJobContext:
+    """不经任务队列直接调用处理逻辑时使用的空上下文"""
+
+    job_id = None
+    job_type = None
+
+    def update_progress(self, progress: float, message: str = ""):
+        pass
+
+    def is_cancelled(self) -> bool:
+        return False
+
+    def check_cancelled(self):
+        pass
+
+
+def run_subprocess(cmd, context=None, check: bool = False, poll_interval: float = 1.0,
+                   terminate_timeout: float = 10.0, **kwargs) -> subprocess.CompletedProcess:
+    """
+    可取消的 subprocess.run
+
+    等待外部进程期间定期检查取消请求，收到取消时终止进程并抛出 JobCancelled。
+    其余参数与 subprocess.run 相同（支持 capture_output / text / env / cwd）。
+    """
+    if kwargs.pop("capture_output", False):
+        kwargs["stdout"] = subprocess.PIPE
+        kwargs["stderr"] = subprocess.PIPE
+
+    with subprocess.Popen(cmd, **kwargs) as process:
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                if context is not None and context.is_cancelled():
+                    process.terminate()
+                    try:
+                        process.wait(timeout=terminate_timeout)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.wait()
+                    raise JobCancelled(f"任务已取消，外部进程已终止: {context.job_id}")
+
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+# ==================== 持久化存储 ====================
+
+class JobStore:
+    """基于 SQLite 的任务存储"""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            job_type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT NOT NULL DEFAULT '',
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def _row_to_job(self, row: sqlite3.Row) -> Job:
+        return Job(
+            job_id=row["job_id"],
+            job_type=row["job_type"],
+            payload=json.loads(row["payload"]),
+            status=JobStatus(row["status"]),
+            progress=row["progress"],
+            message=row["message"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            cancel_requested=bool(row["cancel_requested"]),
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    def create(self, job: Job) -> Job:
+        """写入新任务"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, job_type, payload, status, progress, message, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.job_id, job.job_type, json.dumps(job.payload, ensure_ascii=False),
+                 job.status.value, job.progress, job.message, job.created_at)
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """按ID获取任务"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list(self, job_type: Optional[str] = None, status: Optional[JobStatus] = None,
+             limit: int = 50) -> List[Job]:
+        """按创建时间倒序列出任务"""
+        query = "SELECT * FROM jobs"
+        conditions, params = [], []
+        if job_type:
+            conditions.append("job_type = ?")
+            params.append(job_type)
+        if status:
+            conditions.append("status = ?")
+            params.append(status.value)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def claim_next(self, job_types: List[str]) -> Optional[Job]:
+        """原子地取出最早的排队任务并标记为执行中"""
+        if not job_types:
+            return None
+
+        placeholders = ",".join("?" * len(job_types))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT job_id FROM jobs WHERE status = ? AND job_type IN ({placeholders}) "
+                f"ORDER BY created_at LIMIT 1",
+                [JobStatus.PENDING.value] + list(job_types)
+            ).fetchone()
+            if row is None:
+                return None
+
+            # 条件更新保证多进程共享同一数据库时任务只被领取一次
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, message = ? WHERE job_id = ? AND status = ?",
+                (JobStatus.RUNNING.value, time.time(), "执行中", row["job_id"], JobStatus.PENDING.value)
+            )
+            if cursor.rowcount == 0:
+                return None
+            return self.get(row["job_id"])
+
+    def update_progress(self, job_id: str, progress: float, message: str = ""):
+        """更新任务进度"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress = ?, message = ? WHERE job_id = ? AND status = ?",
+                (progress, message, job_id, JobStatus.RUNNING.value)
+            )
+
+    def finish(self, job_id: str, status: JobStatus, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None, message: str = ""):
+        """记录任务结束状态"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, message = ?, finished_at = ?, "
+                "progress = CASE WHEN ? = 'succeeded' THEN 1.0 ELSE progress END "
+                "WHERE job_id = ?",
+                (status.value, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, message, time.time(), status.value, job_id)
+            )
+
+    def request_cancel(self, job_id: str) -> Optional[Job]:
+        """
+        请求取消任务
+
+        排队中的任务直接标记为已取消；执行中的任务只设置取消标记，
+        由处理函数在检查点响应。
+        """
+        with self._lock:
+            job = self.get(job_id)
+            if job is None or job.status.is_finished:
+                return job
+
+            if job.status == JobStatus.PENDING:
+                self.finish(job_id, JobStatus.CANCELLED, message="已取消")
+            else:
+                self._conn.execute("UPDATE jobs SET cancel_requested = 1, message = ? WHERE job_id = ?",
+                                   ("正在取消", job_id))
+            return self.get(job_id)
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def requeue_interrupted(self) -> int:
+        """
+        将上次进程退出时仍在执行的任务重新放回队列
+
+        只能在没有其他进程使用同一数据库执行任务时调用（即应用启动时），
+        否则会把其他进程正在执行的任务重复入队。
+        退出前已请求取消的任务直接标记为已取消，不再重新执行。
+
+        Returns:
+            重新排队的任务数
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, finished_at = ? WHERE status = ? AND cancel_requested = 1",
+                (JobStatus.CANCELLED.value, "已取消", time.time(), JobStatus.RUNNING.value)
+            )
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, message = ? WHERE status = ?",
+                (JobStatus.PENDING.value, "服务重启，重新排队", JobStatus.RUNNING.value)
+            )
+            return cursor.rowcount
+
+    def get_counts(self) -> Dict[str, int]:
+        """各状态任务数量"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {status.value: 0 for status in JobStatus}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ==================== 任务队列 ====================
+
+JobHandler = Callable[[Dict[str, Any], JobContext], Optional[Dict[str, Any]]]
+
+
+class JobQueue:
+    """
+    持久化任务队列 + 工作线程池
+
+    处理函数签名为 handler(payload, context) -> result_dict，
+    返回值作为任务结果保存；抛出 JobCancelled 表示响应了取消请求，
+    抛出其他异常则任务失败。
+    """
+
+    # 空闲工作线程轮询数据库的间隔（秒），提交任务时会立即唤醒
+    POLL_INTERVAL = 2.0
+
+    # 未获得执行锁的进程重试的间隔（秒）
+    RUNNER_RETRY_INTERVAL = 5.0
+
+    def __init__(self, db_path: Optional[str] = None, num_workers: Optional[int] = None):
+        self.store = JobStore(db_path or PathManager().get_job_db_path())
+        self.num_workers = num_workers or int(os.environ.get("JOB_WORKERS", "2"))
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[threading.Thread] = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._runner_lock = None
+
+    def register_handler(self, job_type: str, handler: JobHandler):
+        """注册任务类型的处理函数"""
+        self._handlers[job_type] = handler
+        self._notify()
+
+    def requeue_interrupted(self) -> int:
+        """应用启动时调用一次：将上次退出时中断的任务重新排队"""
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            print(f"[JobQueue] {requeued} 个中断任务已重新排队")
+        return requeued
+
+    def start_as_runner(self) -> bool:
+        """
+        成为执行进程：恢复中断任务并启动工作线程（应用启动时调用）
+
+        Flask 重载子进程、gunicorn 多个 worker 等会各自导入应用并共享同一数据库。
+        只有获得数据库旁执行锁的进程恢复中断任务并执行任务，此时不会有其他进程
+        正在执行任务；其余进程只提交和查询任务，并在后台定期重试，执行进程退出后接管。
+
+        Returns:
+            本进程是否已成为执行进程
+        """
+        if self._try_lock_runner():
+            self.requeue_interrupted()
+            self.start()
+            return True
+
+        print("[JobQueue] 其他进程正在执行任务，本进程只提交和查询任务")
+        threading.Thread(target=self._wait_for_runner_lock, name="JobRunnerLock", daemon=True).start()
+        return False
+
+    def _try_lock_runner(self) -> bool:
+        if self._runner_lock is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            # 非 POSIX 平台没有 flock，按单进程部署处理
+            self._runner_lock = True
+            return True
+
+        lock_file = open(self.store.db_path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # 进程存活期间保持打开，进程退出时由系统释放
+        self._runner_lock = lock_file
+        return True
+
+    def _wait_for_runner_lock(self):
+        while not self._stopping:
+            time.sleep(self.RUNNER_RETRY_INTERVAL)
+            if self._try_lock_runner():
+                print("[JobQueue] 原执行进程已退出，本进程接管任务执行")
+                self.requeue_interrupted()
+                self.start()
+                return
+
+    def start(self):
+        """启动工作线程（重复调用无副作用）"""
+        if self._workers:
+            return
+
+        self._stopping = False
+        for index in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"JobWorker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        print(f"[JobQueue] 已启动 {self.num_workers} 个工作线程，数据库: {self.store.db_path}")
+
+    def shutdown(self, wait: bool = True):
+        """停止工作线程（正在执行的任务会执行完毕）"""
+        self._stopping = True
+        self._notify(all_workers=True)
+        if wait:
+            for worker in self._workers:
+                worker.join()
+        self._workers = []
+
+    def submit(self, job_type: str, payload: Dict[str, Any]) -> str:
+        """提交任务，返回任务ID"""
+        if job_type not in self._handlers:
+            raise JobQueueError(f"未注册的任务类型: {job_type}")
+
+        job = self.store.create(Job(
+            job_id=f"{job_type}_{uuid.uuid4().hex[:12]}",
+            job_type=job_type,
+            payload=payload,
+            message="排队中"
+        ))
+        print(f"[JobQueue] 任务已提交: {job.job_id}")
+        self._notify()
+        return job.job_id
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def list_jobs(self, job_type: Optional[str] = None, status: Optional[JobStatus] = None,
+                  limit: int = 50) -> List[Job]:
+        return self.store.list(job_type, status, limit)
+
+    def cancel_job(self, job_id: str) -> Optional[Job]:
+        """取消任务，任务不存在时返回 None"""
+        job = self.store.request_cancel(job_id)
+        if job is not None:
+            print(f"[JobQueue] 取消任务: {job_id} ({job.status.value})")
+        return job
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.num_workers,
+            "running_workers": sum(1 for worker in self._workers if worker.is_alive()),
+            "handlers": sorted(self._handlers),
+            "jobs": self.store.get_counts(),
+        }
+
+    def _notify(self, all_workers: bool = False):
+        with self._wakeup:
+            if all_workers:
+                self._wakeup.notify_all()
+            else:
+                self._wakeup.notify()
+
+    def _worker_loop(self):
+        while not self._stopping:
+            job = self.store.claim_next(list(self._handlers))
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.POLL_INTERVAL)
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job: Job):
+        handler = self._handlers[job.job_type]
+        context = JobContext(self.store, job)
+        start_time = time.time()
+        print(f"[JobQueue] 开始执行任务: {job.job_id}")
+
+        try:
+            result = handler(job.payload, context)
+        except JobCancelled:
+            self.store.finish(job.job_id, JobStatus.CANCELLED, message="已取消")
+            print(f"[JobQueue] 任务已取消: {job.job_id}")
+            return
+        except Exception as e:
+            self.store.finish(job.job_id, JobStatus.FAILED, error=str(e), message="执行失败")
+            print(f"[JobQueue] 任务失败: {job.job_id}: {e}")
+            traceback.print_exc()
+            return
+
+        # 处理函数未响应取消请求而正常结束时，仍保留其结果
+        self.store.finish(job.job_id, JobStatus.SUCCEEDED, result=result or {}, message="已完成")
+        print(f"[JobQueue] 任务完成: {job.job_id}，耗时 {time.time() - start_time:.1f}s")
+
+
+# 便捷函数：创建全局单例
+_global_queue = None
+_global_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """
+    获取任务队列全局单例
+
+    Returns:
+        JobQueue实例
+    """
+    global _global_queue
+    with _global_queue_lock:
+        if _global_queue is None:
+            _global_queue = JobQueue()
+    return _global_queue
@@ -0,0 +1,551 @@
+"""
+媒体文件索引模块
+为参考音频、生成音频、训练视频和模型文件的列表接口提供 SQLite 索引
+
+核心功能:
+- 上传 / 生成文件时直接登记（record），列表查询不再对每个文件 os.stat
+- 按目录 mtime 增量同步：目录未变化时跳过；变化时只列出文件名，
+  仅对新增文件 stat，删除消失的条目（目录 mtime 只反映增删改名，原地覆盖写入需调用 record）
+- 分页查询：limit + 游标（keyset，不随偏移量变慢），支持排序和按类型过滤
+
+使用方式:
+    from backend.media_index import get_media_index
+
+    index = get_media_index()
+    index.register_collection("reference_audio", ref_voices_dir, extensions={".wav", ".mp3"})
+    index.record(saved_path)
+
+    page = index.query("reference_audio", limit=50, cursor=request.args.get("cursor"))
+    for entry in page.entries:
+        print(entry.filename, entry.size)
+"""
+
+import os
+import json
+import time
+import base64
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .path_manager import PathManager
+
+
+# ==================== 异常与数据类 ====================
+
+class MediaIndexError(Exception):
+    """媒体索引异常（如无效的游标或排序字段）"""
+    pass
+
+
+@dataclass
+class MediaCollection:
+    """
+    一类被索引的文件
+
+    Attributes:
+        name: 集合名（如 reference_audio）
+        root_dir: 根目录
+        extensions: 允许的扩展名（小写，带点；None 表示全部）
+        recursive: 是否索引子目录
+    """
+    name: str
+    root_dir: str
+    extensions: Optional[Set[str]] = None
+    recursive: bool = False
+
+    def accepts(self, filename: str) -> bool:
+        if filename.startswith('.'):
+            return False
+        if self.extensions is None:
+            return True
+        return os.path.splitext(filename)[1].lower() in self.extensions
+
+
+@dataclass
+class MediaEntry:
+    """索引中的单个文件"""
+    path: str
+    collection: str
+    dir_path: str
+    filename: str
+    group_name: str     # 相对根目录的第一级子目录（根目录下的文件为空字符串）
+    depth: int          # 相对根目录的层级（根目录下的文件为 1）
+    ext: str            # 小写扩展名，不带点
+    category: str       # 文件类别（model_weight / config / code / audio / video / other）
+    size: int
+    mtime: float
+    ctime: float
+
+    @property
+    def relative_path(self) -> str:
+        """相对集合根目录的路径"""
+        return os.path.join(*self.path.split(os.sep)[-self.depth:])
+
+
+@dataclass
+class MediaPage:
+    """分页查询结果"""
+    entries: List[MediaEntry] = field(default_factory=list)
+    total_count: int = 0
+    next_cursor: Optional[str] = None
+
+
+# 扩展名到文件类别
+_CATEGORIES = {
+    **{ext: 'model_weight' for ext in ('pth', 'ckpt', 'pt', 'bin', 'safetensors')},
+    **{ext: 'config' for ext in ('json', 'yaml', 'yml', 'txt')},
+    'py': 'code',
+    **{ext: 'audio' for ext in ('wav', 'mp3', 'm4a', 'flac', 'ogg')},
+    **{ext: 'video' for ext in ('mp4', 'avi', 'mov', 'mkv', 'flv', 'webm')},
+}
+
+
+def file_category(filename: str) -> str:
+    """按扩展名判断文件类别"""
+    return _CATEGORIES.get(os.path.splitext(filename)[1][1:].lower(), 'other')
+
+
+# ==================== 索引 ====================
+
+class MediaIndex:
+    """基于 SQLite 的媒体文件索引"""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS media_files (
+            path TEXT PRIMARY KEY,
+            collection TEXT NOT NULL,
+            dir_path TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            group_name TEXT NOT NULL DEFAULT '',
+            depth INTEGER NOT NULL DEFAULT 1,
+            ext TEXT NOT NULL,
+            category TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            ctime REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_media_collection_mtime ON media_files (collection, mtime, path);
+        CREATE INDEX IF NOT EXISTS idx_media_collection_name ON media_files (collection, filename, path);
+        CREATE INDEX IF NOT EXISTS idx_media_dir ON media_files (dir_path);
+
+        CREATE TABLE IF NOT EXISTS media_dirs (
+            dir_path TEXT PRIMARY KEY,
+            collection TEXT NOT NULL,
+            parent TEXT,
+            mtime_ns INTEGER NOT NULL,
+            ctime REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_media_dirs_parent ON media_dirs (parent);
+
+        CREATE TABLE IF NOT EXISTS media_hashes (
+            path TEXT PRIMARY KEY,
+            collection TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_media_hashes_digest ON media_hashes (collection, sha256);
+    """
+
+    # 同一集合两次目录同步的最小间隔（秒）
+    RECONCILE_INTERVAL = 1.0
+
+    SORT_COLUMNS = {"mtime": "mtime", "name": "filename", "size": "size"}
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self._SCHEMA)
+
+        self._collections: Dict[str, MediaCollection] = {}
+        self._last_reconcile: Dict[str, float] = {}
+
+    # ---------- 集合 ----------
+
+    def register_collection(self, name: str, root_dir: str, extensions: Optional[Set[str]] = None,
+                            recursive: bool = False) -> MediaCollection:
+        """注册被索引的目录"""
+        collection = MediaCollection(
+            name=name,
+            root_dir=os.path.abspath(root_dir),
+            extensions={ext.lower() for ext in extensions} if extensions else None,
+            recursive=recursive
+        )
+        with self._lock:
+            self._collections[name] = collection
+        return collection
+
+    def get_collection(self, name: str) -> MediaCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            raise MediaIndexError(f"未注册的媒体集合: {name}")
+        return collection
+
+    def _collection_for_path(self, path: str) -> Optional[MediaCollection]:
+        """查找包含该文件的集合（取根目录最长的匹配）"""
+        best = None
+        for collection in self._collections.values():
+            root = collection.root_dir.rstrip(os.sep) + os.sep
+            if path.startswith(root):
+                if not collection.recursive and os.path.dirname(path) != collection.root_dir:
+                    continue
+                if best is None or len(collection.root_dir) > len(best.root_dir):
+                    best = collection
+        return best
+
+    # ---------- 写入 ----------
+
+    def _make_row(self, collection: MediaCollection, path: str, stat: os.stat_result) -> Tuple:
+        relative = os.path.relpath(path, collection.root_dir)
+        parts = relative.split(os.sep)
+        filename = parts[-1]
+        return (
+            path, collection.name, os.path.dirname(path), filename,
+            parts[0] if len(parts) > 1 else '', len(parts),
+            os.path.splitext(filename)[1][1:].lower(), file_category(filename),
+            stat.st_size, stat.st_mtime, stat.st_ctime
+        )
+
+    _INSERT = (
+        "INSERT OR REPLACE INTO media_files "
+        "(path, collection, dir_path, filename, group_name, depth, ext, category, size, mtime, ctime) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    def record(self, path: str, collection: Optional[str] = None) -> bool:
+        """
+        登记新写入或更新的文件（上传、生成完成后调用）
+
+        Returns:
+            是否已登记（文件不属于任何集合或不存在时返回 False）
+        """
+        path = os.path.abspath(path)
+        target = self.get_collection(collection) if collection else self._collection_for_path(path)
+        if target is None or not target.accepts(os.path.basename(path)):
+            return False
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+
+        with self._lock:
+            self._conn.execute(self._INSERT, self._make_row(target, path, stat))
+        return True
+
+    def forget(self, path: str) -> None:
+        """删除文件对应的条目"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._conn.execute("DELETE FROM media_files WHERE path = ?", (path,))
+            self._conn.execute("DELETE FROM media_hashes WHERE path = ?", (path,))
+
+    # ---------- 内容哈希（上传去重） ----------
+
+    def record_hash(self, path: str, sha256: str, collection: str) -> None:
+        """登记文件内容的 SHA-256（绑定当前大小和 mtime，文件改写后自动失效）"""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media_hashes (path, collection, size, mtime_ns, sha256) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, collection, stat.st_size, stat.st_mtime_ns, sha256)
+            )
+
+    def find_by_hash(self, collection: str, sha256: str) -> Optional[str]:
+        """查找集合中内容相同的文件，顺带清理已删除或被改写文件的哈希记录"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns FROM media_hashes WHERE collection = ? AND sha256 = ?",
+                (collection, sha256)
+            ).fetchall()
+
+        for row in rows:
+            try:
+                stat = os.stat(row["path"])
+            except OSError:
+                stat = None
+            if stat is not None and stat.st_size == row["size"] and stat.st_mtime_ns == row["mtime_ns"]:
+                return row["path"]
+            with self._lock:
+                self._conn.execute("DELETE FROM media_hashes WHERE path = ?", (row["path"],))
+        return None
+
+    def unhashed_paths(self, collection: str, size: int) -> List[str]:
+        """集合中指定大小且尚未计算哈希的文件（用于为历史文件补算哈希）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.path FROM media_files f LEFT JOIN media_hashes h ON h.path = f.path "
+                "WHERE f.collection = ? AND f.size = ? AND h.path IS NULL",
+                (collection, size)
+            ).fetchall()
+        return [row["path"] for row in rows]
+
+    # ---------- 目录同步 ----------
+
+    def reconcile(self, name: str, force: bool = False) -> int:
+        """
+        按目录 mtime 增量同步集合
+
+        Returns:
+            新增和删除的条目数
+        """
+        collection = self.get_collection(name)
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_reconcile.get(name, 0.0) < self.RECONCILE_INTERVAL:
+                return 0
+            self._last_reconcile[name] = now
+
+            known_dirs = {
+                row["dir_path"]: row["mtime_ns"]
+                for row in self._conn.execute(
+                    "SELECT dir_path, mtime_ns FROM media_dirs WHERE collection = ?", (name,))
+            }
+
+            changes = 0
+            seen_dirs = set()
+            stack = [(collection.root_dir, None)]
+            self._conn.execute("BEGIN")
+            try:
+                while stack:
+                    dir_path, parent = stack.pop()
+                    try:
+                        dir_stat = os.stat(dir_path)
+                    except OSError:
+                        continue
+                    seen_dirs.add(dir_path)
+
+                    if known_dirs.get(dir_path) == dir_stat.st_mtime_ns:
+                        # 目录未变化：子目录取自索引
+                        if collection.recursive:
+                            stack.extend(
+                                (row["dir_path"], dir_path) for row in self._conn.execute(
+                                    "SELECT dir_path FROM media_dirs WHERE parent = ?", (dir_path,))
+                            )
+                        continue
+
+                    changes += self._rescan_dir(collection, dir_path, stack)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO media_dirs (dir_path, collection, parent, mtime_ns, ctime) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (dir_path, name, parent, dir_stat.st_mtime_ns, dir_stat.st_ctime)
+                    )
+
+                # 已不存在的目录
+                for dir_path in set(known_dirs) - seen_dirs:
+                    cursor = self._conn.execute("DELETE FROM media_files WHERE dir_path = ?", (dir_path,))
+                    changes += cursor.rowcount
+                    self._conn.execute("DELETE FROM media_dirs WHERE dir_path = ?", (dir_path,))
+
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if changes:
+            print(f"[MediaIndex] 同步 {name}: {changes} 个条目变化")
+        return changes
+
+    def _rescan_dir(self, collection: MediaCollection, dir_path: str, stack: List) -> int:
+        """只列出文件名，stat 新增文件，删除消失的文件"""
+        present = set()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if collection.recursive and not entry.name.startswith('.'):
+                        stack.append((entry.path, dir_path))
+                elif collection.accepts(entry.name):
+                    present.add(entry.name)
+
+        known = {
+            row["filename"] for row in self._conn.execute(
+                "SELECT filename FROM media_files WHERE dir_path = ?", (dir_path,))
+        }
+
+        rows = []
+        for filename in present - known:
+            path = os.path.join(dir_path, filename)
+            try:
+                rows.append(self._make_row(collection, path, os.stat(path)))
+            except OSError:
+                continue
+        if rows:
+            self._conn.executemany(self._INSERT, rows)
+
+        removed = known - present
+        if removed:
+            self._conn.executemany(
+                "DELETE FROM media_files WHERE path = ?",
+                [(os.path.join(dir_path, filename),) for filename in removed]
+            )
+        return len(rows) + len(removed)
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def _encode_cursor(value: Any, path: str) -> str:
+        payload = json.dumps([value, path], ensure_ascii=False).encode("utf-8")
+        return base64.urlsafe_b64encode(payload).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[Any, str]:
+        try:
+            value, path = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+            return value, path
+        except Exception as e:
+            raise MediaIndexError(f"无效的分页游标: {cursor}") from e
+
+    @staticmethod
+    def _row_to_entry(row: sqlite3.Row) -> MediaEntry:
+        return MediaEntry(**{key: row[key] for key in row.keys()})
+
+    def query(
+        self,
+        name: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        file_type: Optional[str] = None,
+        sort: str = "mtime",
+        descending: bool = True,
+        group_name: Optional[str] = None,
+        dir_prefix: Optional[str] = None,
+        reconcile: bool = True
+    ) -> MediaPage:
+        """
+        分页查询
+
+        Args:
+            name: 集合名
+            limit: 每页条数（None 表示不分页）
+            cursor: 上一页返回的 next_cursor
+            file_type: 按扩展名（如 wav）或类别（如 model_weight）过滤
+            sort: 排序字段（mtime / name / size）
+            descending: 是否倒序
+            group_name: 只查询某个一级子目录
+            dir_prefix: 只查询该目录（含任意层子目录）下的文件
+            reconcile: 查询前是否同步目录
+
+        Raises:
+            MediaIndexError: 集合、排序字段或游标无效
+        """
+        column = self.SORT_COLUMNS.get(sort)
+        if column is None:
+            raise MediaIndexError(f"不支持的排序字段: {sort}")
+        if reconcile:
+            self.reconcile(name)
+
+        conditions, params = ["collection = ?"], [name]
+        if file_type:
+            conditions.append("(ext = ? OR category = ?)")
+            params.extend([file_type.lower().lstrip('.'), file_type.lower()])
+        if group_name is not None:
+            conditions.append("group_name = ?")
+            params.append(group_name)
+        if dir_prefix is not None:
+            # 用 substr 比较前缀，避免目录名中的 % 和 _ 被 LIKE 当作通配符
+            prefix = os.path.abspath(dir_prefix).rstrip(os.sep) + os.sep
+            conditions.append("substr(path, 1, ?) = ?")
+            params.extend([len(prefix), prefix])
+        where = " AND ".join(conditions)
+
+        with self._lock:
+            total_count = self._conn.execute(
+                f"SELECT COUNT(*) FROM media_files WHERE {where}", params).fetchone()[0]
+
+            page_conditions, page_params = list(conditions), list(params)
+            if cursor:
+                value, path = self._decode_cursor(cursor)
+                op = "<" if descending else ">"
+                page_conditions.append(f"({column} {op} ? OR ({column} = ? AND path {op} ?))")
+                page_params.extend([value, value, path])
+
+            order = "DESC" if descending else "ASC"
+            sql = (f"SELECT * FROM media_files WHERE {' AND '.join(page_conditions)} "
+                   f"ORDER BY {column} {order}, path {order}")
+            if limit is not None:
+                sql += " LIMIT ?"
+                page_params.append(limit + 1)
+            rows = self._conn.execute(sql, page_params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self._encode_cursor(last[column], last["path"])
+
+        return MediaPage(
+            entries=[self._row_to_entry(row) for row in rows],
+            total_count=total_count,
+            next_cursor=next_cursor
+        )
+
+    def group_summary(self, name: str, category: str) -> List[Dict[str, Any]]:
+        """
+        按一级子目录汇总某类文件（如每个模型目录下的权重文件数）
+
+        只统计根目录下（group_name 为空、depth 1）和一级子目录下（depth 2）的文件。
+        """
+        self.reconcile(name)
+        collection = self.get_collection(name)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.group_name AS group_name, COUNT(*) AS file_count, d.ctime AS dir_ctime "
+                "FROM media_files f LEFT JOIN media_dirs d ON d.dir_path = f.dir_path "
+                "WHERE f.collection = ? AND f.category = ? "
+                "AND ((f.group_name = '' AND f.depth = 1) OR f.depth = 2) "
+                "GROUP BY f.group_name",
+                (name, category)
+            ).fetchall()
+        return [
+            {
+                "group_name": row["group_name"],
+                "file_count": row["file_count"],
+                "dir_path": os.path.join(collection.root_dir, row["group_name"]) if row["group_name"]
+                else collection.root_dir,
+                "ctime": row["dir_ctime"],
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# 便捷函数：创建全局单例
+_global_index = None
+_global_index_lock = threading.Lock()
+
+def get_media_index() -> MediaIndex:
+    """
+    获取媒体索引全局单例
+
+    Returns:
+        MediaIndex实例
+    """
+    global _global_index
+    with _global_index_lock:
+        if _global_index is None:
+            _global_index = MediaIndex(PathManager().get_media_index_db_path())
+    return _global_index
+
+
+def record_media_file(path: str) -> bool:
+    """登记新生成的文件（索引不可用时忽略，不影响生成流程）"""
+    try:
+        return get_media_index().record(path)
+    except Exception as e:
+        print(f"[MediaIndex] 登记文件失败: {e}")
+        return False
@@ -0,0 +1,209 @@
+"""
+媒体文件服务模块
+为生成的视频和音频提供支持断点续传和缓存协商的 HTTP 文件服务
+
+核心功能:
+- HTTP Range 请求（206 Partial Content / 416），浏览器拖动进度条时只传输需要的片段
+- 基于文件标识（inode、大小、修改时间）的强 ETag
+- If-None-Match / If-Modified-Since / If-Range 条件请求，未变化时返回 304
+- 可配置的 Cache-Control 策略
+- 响应到文件末尾的片段（完整文件、bytes=N-）交给 wsgi.file_wrapper，
+  gunicorn 等服务器会使用 sendfile 零拷贝发送；有界片段按块读取
+
+使用方式:
+    from backend.media_server import get_media_server
+
+    @app.route('/video/<path:filename>')
+    def serve_video(filename):
+        response = get_media_server().send(videos_dir, filename, request)
+        if response is None:
+            return jsonify({'status': 'error', 'message': '视频文件不存在'}), 404
+        return response
+"""
+
+import os
+import hashlib
+import mimetypes
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import Response
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+
+# ==================== 缓存策略 ====================
+
+@dataclass
+class MediaCachePolicy:
+    """Cache-Control 策略
+
+    生成结果可能被同名覆盖（如对话视频），默认 max_age=0 + must-revalidate：
+    浏览器每次都携带 ETag 重新验证，未变化时只返回 304，不重复下载
+    """
+    max_age: int = 0
+    public: bool = True
+    must_revalidate: bool = True
+    immutable: bool = False
+
+    def header_value(self) -> str:
+        directives = ["public" if self.public else "private", f"max-age={self.max_age}"]
+        if self.must_revalidate:
+            directives.append("must-revalidate")
+        if self.immutable:
+            directives.append("immutable")
+        return ", ".join(directives)
+
+    @classmethod
+    def from_env(cls) -> "MediaCachePolicy":
+        """从环境变量 MEDIA_CACHE_MAX_AGE 读取缓存时长（秒）"""
+        return cls(max_age=max(0, int(os.environ.get("MEDIA_CACHE_MAX_AGE", "0"))))
+
+
+# ==================== 媒体文件服务 ====================
+
+class MediaFileServer:
+    """支持 Range 和条件请求的媒体文件服务"""
+
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, cache_policy: Optional[MediaCachePolicy] = None, chunk_size: int = CHUNK_SIZE):
+        self.cache_policy = cache_policy or MediaCachePolicy.from_env()
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def make_etag(stat_result: os.stat_result) -> str:
+        """由文件标识生成强 ETag（不含引号），文件被替换或改写后随之变化"""
+        identity = f"{stat_result.st_ino}-{stat_result.st_size}-{stat_result.st_mtime_ns}"
+        return hashlib.sha1(identity.encode("ascii")).hexdigest()[:20]
+
+    def resolve(self, root_dir: str, filename: str) -> Optional[str]:
+        """在根目录内解析文件路径，越界或不存在时返回 None"""
+        path = safe_join(root_dir, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def send(self, root_dir: str, filename: str, request,
+             cache_policy: Optional[MediaCachePolicy] = None) -> Optional[Response]:
+        """发送根目录下的文件，文件不存在时返回 None（由调用方决定错误格式）"""
+        path = self.resolve(root_dir, filename)
+        if path is None:
+            return None
+        return self.send_path(path, request, cache_policy=cache_policy)
+
+    def send_path(self, path: str, request, cache_policy: Optional[MediaCachePolicy] = None) -> Optional[Response]:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+
+        size = stat_result.st_size
+        etag = self.make_etag(stat_result)
+        last_modified = datetime.fromtimestamp(int(stat_result.st_mtime), tz=timezone.utc)
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Cache-Control": (cache_policy or self.cache_policy).header_value(),
+        }
+
+        if self._not_modified(request, etag, last_modified):
+            response = Response(status=304, headers=headers)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return response
+
+        start, end, status = 0, size, 200
+        byte_range = self._effective_range(request, etag, last_modified)
+        if byte_range is not None:
+            span = byte_range.range_for_length(size)
+            if span is None:
+                response = Response(status=416, headers=headers)
+                response.headers["Content-Range"] = f"bytes */{size}"
+                response.set_etag(etag)
+                return response
+            start, end = span
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+        length = end - start
+        body = () if request.method == "HEAD" else self._open_body(path, start, end, size, request.environ)
+
+        response = Response(body, status=status, mimetype=mimetype, headers=headers, direct_passthrough=True)
+        response.content_length = length
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        return response
+
+    # ---------- 条件请求 ----------
+
+    @staticmethod
+    def _not_modified(request, etag: str, last_modified: datetime) -> bool:
+        """If-None-Match 优先于 If-Modified-Since（RFC 9110 13.2.2）"""
+        if request.method not in ("GET", "HEAD"):
+            return False
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        if request.if_modified_since is not None:
+            return last_modified <= request.if_modified_since
+        return False
+
+    @staticmethod
+    def _effective_range(request, etag: str, last_modified: datetime):
+        """返回需要处理的单段 Range，多段、格式错误或 If-Range 不匹配时按完整文件响应"""
+        if request.method != "GET" or request.range is None:
+            return None
+        byte_range = request.range
+        if byte_range.units != "bytes" or len(byte_range.ranges) != 1:
+            return None
+
+        if_range = request.if_range
+        if if_range.etag is not None:
+            # If-Range 要求强比较
+            is_weak = if_range.etag.startswith("W/")
+            if is_weak or if_range.etag.strip('"') != etag:
+                return None
+        elif if_range.date is not None and if_range.date != last_modified:
+            return None
+        return byte_range
+
+    # ---------- 响应体 ----------
+
+    def _open_body(self, path: str, start: int, end: int, size: int, environ):
+        if end != size:
+            return self._iter_file_range(path, start, end - start)
+
+        # 到文件末尾的片段：服务器提供的 file_wrapper 可使用 sendfile 零拷贝
+        file = open(path, "rb")
+        try:
+            if start:
+                file.seek(start)
+            return wrap_file(environ, file, self.chunk_size)
+        except Exception:
+            file.close()
+            raise
+
+    def _iter_file_range(self, path: str, start: int, remaining: int):
+        """有界片段按块读取（在生成器内打开文件，未被迭代时不会泄漏句柄）"""
+        with open(path, "rb") as file:
+            file.seek(start)
+            while remaining > 0:
+                chunk = file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+# 便捷函数：创建全局单例
+_media_server: Optional[MediaFileServer] = None
+
+
+def get_media_server() -> MediaFileServer:
+    """获取全局媒体文件服务实例"""
+    global _media_server
+    if _media_server is None:
+        _media_server = MediaFileServer()
+    return _media_server
@@ -6,10 +6,11 @@ CosyVoice模型下载管理器
 
 功能特性:
 - 自动检测和选择下载源（ModelScope/HuggingFace）
-- 支持断点续传和下载进度跟踪
+- 按文件清单并行下载，大文件 HTTP Range 断点续传（parallel_downloader）
+- 下载时流式 SHA-256 校验，清单获取失败时回退到 snapshot_download
 - 模型完整性验证和状态管理
 - 自动处理依赖安装
-- 多线程并发下载优化
+- 进度追加写入日志并节流，终态时才重写状态文件
 - 完善的错误处理和重试机制
 
 """
@@ -31,6 +32,10 @@ import hashlib
 
 # 导入PathManager
 from .path_manager import PathManager
+from .parallel_downloader import (
+    DownloadManifest, ManifestError, ParallelDownloader, ProgressJournal,
+    MANIFEST_FILENAME, fetch_huggingface_manifest, fetch_modelscope_manifest
+)
 
 
 # ==================== 异常类定义 ====================
@@ -186,14 +191,26 @@ class ModelDownloadManager(LoggerMixin):
         status = manager.get_download_status()
     """
 
-    def __init__(self, path_manager: PathManager = None):
+    # 进度日志中同一模型两次写入的最小间隔（秒）
+    PROGRESS_PERSIST_INTERVAL = 2.0
+
+    def __init__(self, path_manager: PathManager = None, download_workers: int = 4,
+                 use_parallel_download: bool = True):
         # 初始化父类LoggerMixin
         LoggerMixin.__init__(self)
 
         self.path_manager = path_manager or PathManager()
+        self.download_workers = download_workers
+        self.use_parallel_download = use_parallel_download
         self._lock = threading.RLock()
         self._download_futures = {}
         self._progress_callbacks = {}
+
+        status_file = self.path_manager.get_model_status_file_path()
+        self._progress_journal = ProgressJournal(
+            os.path.splitext(status_file)[0] + "_progress.jsonl",
+            min_interval=self.PROGRESS_PERSIST_INTERVAL
+        )
         self._load_model_status()
 
         # 预定义模型信息
@@ -288,6 +305,9 @@ class ModelDownloadManager(LoggerMixin):
             self.logger.warning(f"加载模型状态失败: {e}")
             self._model_status = {}
 
+        # 合并上次运行中尚未落盘的进度
+        self._model_status.update(self._progress_journal.replay())
+
     def _save_model_status(self):
         """保存模型状态"""
         try:
@@ -320,14 +340,19 @@ class ModelDownloadManager(LoggerMixin):
         if preferred != DownloadSource.AUTO:
             return preferred
 
-        return self._check_download_source_availability()
+        try:
+            return self._check_download_source_availability()
+        except DownloadSourceError:
+            # 内置并行下载器不依赖 modelscope/huggingface_hub
+            if not self.use_parallel_download:
+                raise
+            self.logger.info("未安装 modelscope/huggingface_hub，使用内置下载器从ModelScope下载")
+            return DownloadSource.MODELSCOPE
 
-    def _download_with_modelscope(self, model_info: ModelInfo, force: bool = False) -> bool:
+    def _download_with_modelscope(self, model_info: ModelInfo, force: bool = False,
+                                  progress: Optional[DownloadProgress] = None) -> bool:
         """使用ModelScope下载模型"""
         try:
-            import modelscope
-            from modelscope.hub.api import HubApi
-
             local_path = self.path_manager.get_cosyvoice_model_path(model_info.local_dir)
 
             # 检查是否需要下载
@@ -339,7 +364,15 @@ class ModelDownloadManager(LoggerMixin):
             self.logger.info(f"模型ID: {model_info.modelscope_id}")
             self.logger.info(f"目标路径: {local_path}")
 
+            if self.use_parallel_download:
+                try:
+                    return self._download_files_parallel(
+                        model_info, DownloadSource.MODELSCOPE, local_path, force, progress)
+                except ManifestError as e:
+                    self.logger.warning(f"获取文件清单失败，回退到 snapshot_download: {e}")
+
             # 执行下载
+            import modelscope
             result = modelscope.snapshot_download(
                 model_info.modelscope_id,
                 local_dir=local_path
@@ -356,11 +389,10 @@ class ModelDownloadManager(LoggerMixin):
             self.logger.error(f"ModelScope下载失败: {e}")
             raise ModelDownloadError(f"ModelScope下载失败: {e}")
 
-    def _download_with_huggingface(self, model_info: ModelInfo, force: bool = False) -> bool:
+    def _download_with_huggingface(self, model_info: ModelInfo, force: bool = False,
+                                   progress: Optional[DownloadProgress] = None) -> bool:
         """使用HuggingFace下载模型"""
         try:
-            from huggingface_hub import snapshot_download
-
             local_path = self.path_manager.get_cosyvoice_model_path(model_info.local_dir)
 
             # 检查是否需要下载
@@ -372,7 +404,15 @@ class ModelDownloadManager(LoggerMixin):
             self.logger.info(f"模型ID: {model_info.huggingface_id}")
             self.logger.info(f"目标路径: {local_path}")
 
+            if self.use_parallel_download:
+                try:
+                    return self._download_files_parallel(
+                        model_info, DownloadSource.HUGGINGFACE, local_path, force, progress)
+                except ManifestError as e:
+                    self.logger.warning(f"获取文件清单失败，回退到 snapshot_download: {e}")
+
             # 执行下载
+            from huggingface_hub import snapshot_download
             result = snapshot_download(
                 model_info.huggingface_id,
                 local_dir=local_path
@@ -389,6 +429,54 @@ class ModelDownloadManager(LoggerMixin):
             self.logger.error(f"HuggingFace下载失败: {e}")
             raise ModelDownloadError(f"HuggingFace下载失败: {e}")
 
+    def _fetch_manifest(self, model_info: ModelInfo, source: DownloadSource) -> DownloadManifest:
+        """获取模型仓库的文件清单"""
+        if source == DownloadSource.MODELSCOPE:
+            return fetch_modelscope_manifest(model_info.modelscope_id)
+        return fetch_huggingface_manifest(model_info.huggingface_id)
+
+    def _download_files_parallel(self, model_info: ModelInfo, source: DownloadSource, local_path: str,
+                                 force: bool = False, progress: Optional[DownloadProgress] = None) -> bool:
+        """
+        按文件清单并行下载（断点续传 + 流式哈希校验）
+
+        Raises:
+            ManifestError: 无法获取清单（调用方回退到 snapshot_download）
+            ModelVerificationError: 部分文件下载或校验失败
+        """
+        manifest = self._fetch_manifest(model_info, source)
+        manifest.save(os.path.join(local_path, MANIFEST_FILENAME))
+        self.logger.info(f"文件清单: {len(manifest.entries)} 个文件, "
+                         f"{manifest.total_size / (1024 ** 3):.2f}GB, 并行数 {self.download_workers}")
+
+        progress = progress or DownloadProgress(model_type=model_info.model_type,
+                                                status=DownloadStatus.DOWNLOADING, start_time=time.time())
+
+        def on_progress(done: int, total: int, speed: float):
+            progress.downloaded_size = done
+            progress.total_size = total
+            progress.progress = done / total if total else 1.0
+            progress.speed = speed / 1024
+            progress.eta = int((total - done) / speed) if speed > 0 else None
+            self._update_progress(progress)
+
+        downloader = ParallelDownloader(workers=self.download_workers)
+        report = downloader.download(manifest, local_path, progress_callback=on_progress, force=force)
+
+        self.logger.info(
+            f"模型 {model_info.model_type.value}: 新下载 {len(report.downloaded)}，续传 {len(report.resumed)}，"
+            f"跳过 {len(report.skipped)}，传输 {report.bytes_transferred / (1024 ** 2):.1f}MB，"
+            f"耗时 {report.elapsed:.1f}s"
+        )
+        if not report.success:
+            failed = "; ".join(f"{path}: {error}" for path, error in report.failed.items())
+            raise ModelVerificationError(f"{len(report.failed)} 个文件下载失败: {failed}")
+
+        if self._is_model_complete(local_path, model_info):
+            self.logger.info(f"模型 {model_info.model_type.value} 下载成功")
+            return True
+        raise ModelVerificationError("模型下载不完整")
+
     def _is_model_complete(self, local_path: str, model_info: ModelInfo) -> bool:
         """检查模型是否完整"""
         if not os.path.exists(local_path):
@@ -406,7 +494,19 @@ class ModelDownloadManager(LoggerMixin):
                 self.logger.warning(f"缺少关键文件: {full_path}")
                 return False
 
-        # 可选：检查文件大小或哈希
+        # 有下载清单时检查每个文件的大小（哈希已在下载时流式校验）
+        manifest = DownloadManifest.load(os.path.join(local_path, MANIFEST_FILENAME))
+        if manifest is not None:
+            for entry in manifest.entries:
+                full_path = os.path.join(local_path, *entry.path.split("/"))
+                try:
+                    if os.path.getsize(full_path) != entry.size:
+                        self.logger.warning(f"文件大小与清单不符: {full_path}")
+                        return False
+                except OSError:
+                    self.logger.warning(f"缺少清单中的文件: {full_path}")
+                    return False
+
         return True
 
     def _get_required_files(self, model_type: ModelType) -> List[str]:
@@ -422,7 +522,7 @@ class ModelDownloadManager(LoggerMixin):
                 "campplus.onnx",         # 说话人编码器
                 "speech_tokenizer_v3.onnx"  # 语音 tokenizer
             ]
-        elif model_type in [ModelType.COSYVOICE2_05B, ModelType.COSYVOICE_300M,
+        elif model_type in [ModelType.COSYVOICE2, ModelType.COSYVOICE_300M,
                             ModelType.COSYVOICE_300M_SFT, ModelType.COSYVOICE_300M_INSTRUCT]:
             # CosyVoice/CosyVoice2 模型文件
             required_files = [
@@ -503,9 +603,9 @@ class ModelDownloadManager(LoggerMixin):
 
             # 执行下载
             if download_source == DownloadSource.MODELSCOPE:
-                success = self._download_with_modelscope(model_info, force)
+                success = self._download_with_modelscope(model_info, force, progress)
             else:
-                success = self._download_with_huggingface(model_info, force)
+                success = self._download_with_huggingface(model_info, force, progress)
 
             if success:
                 # 安装依赖
@@ -593,19 +693,32 @@ class ModelDownloadManager(LoggerMixin):
         return results
 
     def _update_progress(self, progress: DownloadProgress):
-        """更新下载进度"""
+        """
+        更新下载进度
+
+        进行中的更新追加到进度日志（按模型节流）；状态变化和终态才重写状态文件并清空日志
+        """
+        terminal = progress.status in (DownloadStatus.COMPLETED, DownloadStatus.FAILED,
+                                       DownloadStatus.CANCELLED, DownloadStatus.VERIFIED)
+        state = {
+            "status": progress.status.value,
+            "progress": progress.progress,
+            "downloaded_size": progress.downloaded_size,
+            "total_size": progress.total_size,
+            "error_message": progress.error_message,
+            "start_time": progress.start_time,
+            "end_time": progress.end_time,
+            "last_updated": time.time()
+        }
         with self._lock:
-            self._model_status[progress.model_type.value] = {
-                "status": progress.status.value,
-                "progress": progress.progress,
-                "downloaded_size": progress.downloaded_size,
-                "total_size": progress.total_size,
-                "error_message": progress.error_message,
-                "start_time": progress.start_time,
-                "end_time": progress.end_time,
-                "last_updated": time.time()
-            }
-            self._save_model_status()
+            previous = self._model_status.get(progress.model_type.value, {})
+            self._model_status[progress.model_type.value] = state
+            if terminal or previous.get("status") != state["status"]:
+                # 状态文件包含所有模型的最新进度，落盘后日志可以清空
+                self._save_model_status()
+                self._progress_journal.compact()
+            else:
+                self._progress_journal.append(progress.model_type.value, state)
 
         # 调用回调
         for callback in self._progress_callbacks.values():
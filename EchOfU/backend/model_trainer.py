@@ -5,6 +5,7 @@ import json
 import numpy as np
 from .path_manager import PathManager
 from .ernerf_docker_client import get_ernerf_docker_client
+from .job_queue import JobCancelled, NullJobContext, run_subprocess
 
 # ==============================================================================
 # ER-NeRF 调用模式配置
@@ -14,12 +15,15 @@ from .ernerf_docker_client import get_ernerf_docker_client
 USE_DOCKER_FOR_ERNERF = os.environ.get('USE_DOCKER_FOR_ERNERF', 'true').lower() == 'true'
 
 
-def train_model(data):
+def train_model(data, context=None):
     """
     模拟模型训练逻辑。
     负责调度 SyncTalk 或 ER-NeRF 的训练脚本。
     ER-NeRF 实现了三阶段自动训练逻辑。
+    成功时返回参考视频路径，失败时返回 None。
+    context 为任务上下文（JobContext），用于上报进度和响应取消请求。
     """
+    context = context or NullJobContext()
     # 初始化路径管理器
     pm = PathManager()
     
@@ -64,15 +68,18 @@ def train_model(data):
                 "--epochs", str(data.get('epoch', 10))
             ]
             print(f"[backend.model_trainer] 执行命令: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            context.update_progress(0.1, "SyncTalk 训练")
+            result = run_subprocess(cmd, context, capture_output=True, text=True, check=True)
             print("[backend.model_trainer] SyncTalk 训练输出:", result.stdout)
 
+        except JobCancelled:
+            raise
         except subprocess.CalledProcessError as e:
             print(f"[backend.model_trainer] SyncTalk 训练失败: {e.stderr}")
-            return ref_video_path
+            return None
         except Exception as e:
             print(f"[backend.model_trainer] SyncTalk 错误: {e}")
-            return ref_video_path
+            return None
 
     elif model_choice == "ER-NeRF":
         try:
@@ -91,6 +98,7 @@ def train_model(data):
 
                     # 步骤1: 数据预处理
                     print(f"[backend.model_trainer] [1/3] 正在进行数据预处理: {ref_video_path}")
+                    context.update_progress(0.1, "数据预处理")
 
                     # 获取相对路径（Docker容器内路径）
                     # 需要确保视频在project_root/data目录下可访问
@@ -99,11 +107,16 @@ def train_model(data):
                     else:
                         ref_video_abs = ref_video_path
 
-                    success, message = client.preprocess(ref_video_abs, task_id)
+                    # 获取GPU ID
+                    gpu_id = 0
+                    if 'gpu_choice' in data:
+                        gpu_id = int(data['gpu_choice'].replace("GPU", ""))
+
+                    success, message = client.preprocess(ref_video_abs, task_id, gpu_id=gpu_id)
 
                     if not success:
                         print(f"[backend.model_trainer] Docker预处理失败: {message}")
-                        return ref_video_path
+                        return None
 
                     print(f"[backend.model_trainer] 预处理完成: {message}")
 
@@ -134,13 +147,10 @@ def train_model(data):
                     print(f"[backend.model_trainer] 数据集长度: {real_dataset_length}, Epoch: {current_epoch}, 总步数: {current_step}")
 
                     # 步骤3: 训练
+                    context.check_cancelled()
+                    context.update_progress(0.3, "训练模型")
                     print(f"[backend.model_trainer] [3/3] 开始/继续训练ER-NeRF模型...")
 
-                    # 获取GPU ID
-                    gpu_id = 0
-                    if 'gpu_choice' in data:
-                        gpu_id = int(data['gpu_choice'].replace("GPU", ""))
-
                     # 使用auto模式（自动完成所有阶段）
                     success, message = client.train(
                         data_path=docker_data_path,
@@ -153,13 +163,15 @@ def train_model(data):
                         print(f"[backend.model_trainer] ER-NeRF Docker训练完成: {message}")
                     else:
                         print(f"[backend.model_trainer] ER-NeRF Docker训练失败: {message}")
-                        return ref_video_path
+                        return None
 
+                except JobCancelled:
+                    raise
                 except Exception as e:
                     print(f"[backend.model_trainer] ER-NeRF Docker训练异常: {e}")
                     import traceback
                     traceback.print_exc()
-                    return ref_video_path
+                    return None
 
             else:
                 # 直接调用模式（原有逻辑）
@@ -168,6 +180,7 @@ def train_model(data):
 
                 # 步骤 1: 数据预处理
                 print(f"[backend.model_trainer] [1/3] 正在进行数据预处理: {ref_video_path}")
+                context.update_progress(0.1, "数据预处理")
 
                 process_script = os.path.join(er_nerf_root, "data_utils", "process.py")
                 process_cmd = [
@@ -177,7 +190,7 @@ def train_model(data):
                     "--asr_model", "deepspeech"
                 ]
 
-                subprocess.run(process_cmd, check=True)
+                run_subprocess(process_cmd, context, check=True)
 
                 # 步骤 2: 动态计算当前进度
                 print(f"[backend.model_trainer] [2/3] 计算当前训练进度...")
@@ -206,6 +219,8 @@ def train_model(data):
                 print(f"[backend.model_trainer] 数据集长度: {real_dataset_length}, Epoch: {current_epoch}, 总步数: {current_step}")
 
                 # 步骤 3: 构造三阶段训练命令
+                context.check_cancelled()
+                context.update_progress(0.3, "训练模型")
                 print(f"[backend.model_trainer] [3/3] 开始/继续训练ER-NeRF模型...")
 
                 stage1_duration = 70000
@@ -264,8 +279,9 @@ def train_model(data):
 
                     print(f"[backend.model_trainer] 完整命令: {' '.join(train_cmd)}")
 
-                    result = subprocess.run(
+                    result = run_subprocess(
                         train_cmd,
+                        context,
                         capture_output=True,
                         text=True,
                         check=True,
@@ -276,15 +292,17 @@ def train_model(data):
                     print(f"[backend.model_trainer] 训练输出摘要:\n{result.stdout[-500:]}")
                     print(f"[backend.model_trainer] ER-NeRF 训练阶段完成！")
 
+        except JobCancelled:
+            raise
         except subprocess.CalledProcessError as e:
             print(f"[backend.model_trainer] ER-NeRF 训练失败: {e.returncode}")
             print(f"错误输出: {e.stderr}")
-            return ref_video_path
+            return None
         except Exception as e:
             print(f"[backend.model_trainer] 未知错误: {e}")
             import traceback
             traceback.print_exc()
-            return ref_video_path
+            return None
 
     print("[backend.model_trainer] 训练流程结束")
     return ref_video_path
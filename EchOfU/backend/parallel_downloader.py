@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行文件下载器
+按文件清单（manifest）并行下载模型仓库，支持断点续传和流式校验
+
+功能特性:
+- 从 HuggingFace / ModelScope 文件列表接口获取清单（路径、大小、SHA-256）
+- 多个文件并行下载，大文件（llm.pt、flow.pt 等）中断后用 HTTP Range 从 .part 续传
+- 写入时流式计算哈希，与清单中的 SHA-256（或 git blob SHA-1）比对，不符则重新下载
+- 已校验文件记录在目标目录的 .verified.json 中，再次下载时按大小和 mtime 直接跳过
+- 进度以追加方式写入 JSONL 日志，并按时间间隔节流，避免每次更新都重写整个状态文件
+
+清单接口地址可通过 HF_ENDPOINT / MODELSCOPE_DOMAIN 环境变量或 endpoint 参数替换，
+便于对本地 HTTP 替身服务器测试（见 scripts/benchmark_download.py）。
+
+使用示例:
+    manifest = fetch_huggingface_manifest("FunAudioLLM/Fun-CosyVoice3-0.5B-2512")
+    downloader = ParallelDownloader(workers=4)
+    report = downloader.download(manifest, local_dir, progress_callback=print)
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+MANIFEST_FILENAME = ".manifest.json"
+VERIFIED_FILENAME = ".verified.json"
+
+
+# ==================== 异常类定义 ====================
+
+class DownloadError(Exception):
+    """文件下载异常基类"""
+    pass
+
+
+class ManifestError(DownloadError):
+    """无法获取或解析文件清单"""
+    pass
+
+
+class ChecksumMismatchError(DownloadError):
+    """下载内容与清单中的哈希不符"""
+    pass
+
+
+class IncompleteTransferError(DownloadError):
+    """连接提前结束，已接收部分保留用于续传"""
+    pass
+
+
+class DownloadCancelledError(DownloadError):
+    """下载被取消"""
+    pass
+
+
+# ==================== 文件清单 ====================
+
+@dataclass
+class ManifestEntry:
+    """清单中的单个文件"""
+    path: str
+    url: str
+    size: int
+    sha256: Optional[str] = None
+    git_sha1: Optional[str] = None   # HuggingFace 非 LFS 文件只提供 git blob SHA-1
+
+    @property
+    def has_digest(self) -> bool:
+        return bool(self.sha256 or self.git_sha1)
+
+    def new_hasher(self):
+        """创建与清单哈希对应的增量哈希对象（无哈希时返回 None）"""
+        if self.sha256:
+            return hashlib.sha256()
+        if self.git_sha1:
+            hasher = hashlib.sha1()
+            hasher.update(f"blob {self.size}\0".encode("ascii"))
+            return hasher
+        return None
+
+    def check_digest(self, hasher) -> bool:
+        if hasher is None:
+            return True
+        return hasher.hexdigest() == (self.sha256 or self.git_sha1)
+
+
+@dataclass
+class DownloadManifest:
+    """模型仓库文件清单"""
+    repo_id: str
+    source: str
+    entries: List[ManifestEntry] = field(default_factory=list)
+
+    @property
+    def total_size(self) -> int:
+        return sum(entry.size for entry in self.entries)
+
+    def to_dict(self) -> Dict:
+        return {"repo_id": self.repo_id, "source": self.source,
+                "entries": [asdict(entry) for entry in self.entries]}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DownloadManifest":
+        return cls(data["repo_id"], data["source"], [ManifestEntry(**entry) for entry in data["entries"]])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["DownloadManifest"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def _auth_headers(token: Optional[str]) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def _get_json(url: str, headers: Dict[str, str], timeout: float):
+    """GET 并解析 JSON，返回 (数据, 响应头)"""
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8")), response.headers
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise ManifestError(f"获取文件清单失败 {url}: {e}") from e
+
+
+def _next_link(headers) -> Optional[str]:
+    """解析分页 Link 头中的 rel="next" 地址"""
+    for part in (headers.get("Link") or "").split(","):
+        if 'rel="next"' in part:
+            return part.split(";")[0].strip().strip("<>")
+    return None
+
+
+def fetch_huggingface_manifest(repo_id: str, endpoint: Optional[str] = None, revision: str = "main",
+                               token: Optional[str] = None, timeout: float = 30.0) -> DownloadManifest:
+    """通过 HuggingFace tree 接口获取文件清单（LFS 文件带 SHA-256）"""
+    endpoint = (endpoint or os.environ.get("HF_ENDPOINT") or "https://huggingface.co").rstrip("/")
+    token = token or os.environ.get("HF_TOKEN")
+    headers = _auth_headers(token)
+
+    entries = []
+    url = f"{endpoint}/api/models/{repo_id}/tree/{revision}?recursive=true"
+    while url:
+        items, response_headers = _get_json(url, headers, timeout)
+        if not isinstance(items, list):
+            raise ManifestError(f"HuggingFace 文件清单格式异常: {repo_id}")
+        for item in items:
+            if item.get("type") != "file":
+                continue
+            path = item["path"]
+            lfs = item.get("lfs") or {}
+            entries.append(ManifestEntry(
+                path=path,
+                url=f"{endpoint}/{repo_id}/resolve/{revision}/{urllib.parse.quote(path)}",
+                size=int(lfs.get("size", item.get("size", 0))),
+                sha256=lfs.get("oid") or lfs.get("sha256"),
+                git_sha1=None if lfs else item.get("oid")
+            ))
+        url = _next_link(response_headers)
+
+    if not entries:
+        raise ManifestError(f"HuggingFace 仓库没有文件: {repo_id}")
+    return DownloadManifest(repo_id, "huggingface", entries)
+
+
+def fetch_modelscope_manifest(repo_id: str, endpoint: Optional[str] = None, revision: str = "master",
+                              token: Optional[str] = None, timeout: float = 30.0) -> DownloadManifest:
+    """通过 ModelScope 文件列表接口获取文件清单（带 SHA-256）"""
+    if endpoint is None:
+        domain = os.environ.get("MODELSCOPE_DOMAIN", "www.modelscope.cn")
+        endpoint = domain if domain.startswith("http") else f"https://{domain}"
+    endpoint = endpoint.rstrip("/")
+    headers = _auth_headers(token or os.environ.get("MODELSCOPE_API_TOKEN"))
+
+    url = f"{endpoint}/api/v1/models/{repo_id}/repo/files?Revision={revision}&Recursive=true"
+    data, _ = _get_json(url, headers, timeout)
+    files = ((data or {}).get("Data") or {}).get("Files")
+    if not isinstance(files, list):
+        raise ManifestError(f"ModelScope 文件清单格式异常: {repo_id}")
+
+    entries = [
+        ManifestEntry(
+            path=item["Path"],
+            url=(f"{endpoint}/api/v1/models/{repo_id}/repo?Revision={revision}"
+                 f"&FilePath={urllib.parse.quote(item['Path'])}"),
+            size=int(item.get("Size", 0)),
+            sha256=item.get("Sha256") or None
+        )
+        for item in files if item.get("Type") != "tree"
+    ]
+    if not entries:
+        raise ManifestError(f"ModelScope 仓库没有文件: {repo_id}")
+    return DownloadManifest(repo_id, "modelscope", entries)
+
+
+def hash_file(path: str, entry: ManifestEntry):
+    """按清单的哈希类型流式计算本地文件哈希"""
+    hasher = entry.new_hasher()
+    if hasher is not None:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+    return hasher
+
+
+# ==================== 进度日志 ====================
+
+class ProgressJournal:
+    """
+    追加写入的进度日志（JSONL，每行一个 {key, state}）
+
+    同一 key 的普通更新按 min_interval 节流，终态更新使用 force=True 立即写入；
+    replay() 返回每个 key 的最后状态，compact() 在状态落盘后清空日志
+    """
+
+    def __init__(self, path: str, min_interval: float = 1.0):
+        self.path = path
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_write: Dict[str, float] = {}
+
+    def append(self, key: str, state: Dict, force: bool = False) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_write.get(key, float("-inf")) < self.min_interval:
+                return False
+            self._last_write[key] = now
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "state": state}, ensure_ascii=False) + "\n")
+        return True
+
+    def replay(self) -> Dict[str, Dict]:
+        states = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        states[record["key"]] = record["state"]
+                    except (ValueError, KeyError, TypeError):
+                        continue  # 进程中断时可能留下半行
+        except OSError:
+            pass
+        return states
+
+    def compact(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+# ==================== 并行下载器 ====================
+
+@dataclass
+class DownloadReport:
+    """一次清单下载的结果"""
+    downloaded: List[str] = field(default_factory=list)
+    resumed: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    bytes_transferred: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return not self.failed
+
+
+class _ProgressTracker:
+    """汇总各文件的已完成字节，按间隔回调 (已完成, 总量, 速度B/s)"""
+
+    def __init__(self, total: int, callback: Optional[Callable[[int, int, float], None]], interval: float):
+        self.total = total
+        self.callback = callback
+        self.interval = interval
+        self._done: Dict[str, int] = {}
+        self._transferred = 0
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last_report = 0.0
+
+    def set(self, path: str, done: int, transferred: int = 0):
+        with self._lock:
+            self._done[path] = done
+            self._transferred += transferred
+            now = time.monotonic()
+            if self.callback is None or now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            snapshot = self._snapshot(now)
+        self.callback(*snapshot)
+
+    def _snapshot(self, now: float):
+        speed = self._transferred / max(now - self._start, 1e-6)
+        return sum(self._done.values()), self.total, speed
+
+    def finish(self):
+        if self.callback is not None:
+            with self._lock:
+                snapshot = self._snapshot(time.monotonic())
+            self.callback(*snapshot)
+
+    @property
+    def transferred(self) -> int:
+        return self._transferred
+
+
+class ParallelDownloader:
+    """按清单并行下载文件，支持 Range 续传和流式哈希校验"""
+
+    PART_SUFFIX = ".part"
+
+    def __init__(self, workers: int = 4, chunk_size: int = DOWNLOAD_CHUNK_SIZE, retries: int = 3,
+                 timeout: float = 60.0, headers: Optional[Dict[str, str]] = None,
+                 progress_interval: float = 0.5):
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.progress_interval = progress_interval
+        self._cancel_event = threading.Event()
+        self._verified_lock = threading.Lock()
+
+    def cancel(self):
+        """取消正在进行的下载（已接收部分保留，下次续传）"""
+        self._cancel_event.set()
+
+    def download(self, manifest: DownloadManifest, dest_dir: str,
+                 progress_callback: Optional[Callable[[int, int, float], None]] = None,
+                 force: bool = False) -> DownloadReport:
+        """
+        下载清单中的全部文件到目标目录
+
+        Args:
+            manifest: 文件清单
+            dest_dir: 目标目录
+            progress_callback: 进度回调 (已完成字节, 总字节, 速度B/s)，按 progress_interval 节流
+            force: 忽略已下载和已校验的文件，全部重新下载
+
+        Returns:
+            DownloadReport
+        """
+        self._cancel_event.clear()
+        start = time.monotonic()
+        report = DownloadReport()
+        tracker = _ProgressTracker(manifest.total_size, progress_callback, self.progress_interval)
+
+        os.makedirs(dest_dir, exist_ok=True)
+        verified = {} if force else self._load_verified(dest_dir)
+
+        # 大文件先开始，避免最后只剩一个大文件串行下载
+        entries = sorted(manifest.entries, key=lambda entry: entry.size, reverse=True)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="model-download") as executor:
+            futures = {
+                executor.submit(self._fetch_entry, entry, dest_dir, verified, tracker, force): entry
+                for entry in entries
+            }
+            for future in as_completed(futures):
+                entry = futures[future]
+                try:
+                    outcome = future.result()
+                    getattr(report, outcome).append(entry.path)
+                except Exception as e:
+                    report.failed[entry.path] = str(e)
+
+        self._save_verified(dest_dir, verified)
+        tracker.finish()
+        report.bytes_transferred = tracker.transferred
+        report.elapsed = time.monotonic() - start
+        return report
+
+    # ---------- 单个文件 ----------
+
+    def _fetch_entry(self, entry: ManifestEntry, dest_dir: str, verified: Dict,
+                     tracker: _ProgressTracker, force: bool) -> str:
+        dest_path = os.path.join(dest_dir, *entry.path.split("/"))
+        part_path = dest_path + self.PART_SUFFIX
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+        if force:
+            for path in (dest_path, part_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        elif self._is_complete(entry, dest_path, verified):
+            tracker.set(entry.path, entry.size)
+            return "skipped"
+
+        resumed = False
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if self._cancel_event.is_set():
+                raise DownloadCancelledError("下载已取消")
+            try:
+                resumed = self._transfer(entry, part_path, tracker) or resumed
+                os.replace(part_path, dest_path)
+                self._mark_verified(verified, entry, dest_path)
+                return "resumed" if resumed else "downloaded"
+            except ChecksumMismatchError as e:
+                # 内容错误无法续传，删除后从头下载
+                last_error = e
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            except urllib.error.HTTPError as e:
+                if 400 <= e.code < 500 and e.code not in (408, 429):
+                    raise DownloadError(f"{entry.path} 请求失败: HTTP {e.code}") from e
+                last_error = e
+                time.sleep(min(2 ** attempt, 10))
+            except (urllib.error.URLError, OSError, IncompleteTransferError) as e:
+                # 网络错误保留 .part，下次尝试从断点续传
+                last_error = e
+                time.sleep(min(2 ** attempt, 10))
+        raise DownloadError(f"{entry.path} 下载失败（已重试 {self.retries} 次）: {last_error}")
+
+    def _is_complete(self, entry: ManifestEntry, dest_path: str, verified: Dict) -> bool:
+        """目标文件已存在且大小一致；有哈希时要求已校验过（或现场校验）"""
+        try:
+            stat = os.stat(dest_path)
+        except OSError:
+            return False
+        if stat.st_size != entry.size:
+            return False
+        if not entry.has_digest:
+            return True
+
+        record = verified.get(entry.path)
+        expected = entry.sha256 or entry.git_sha1
+        if record and record == [stat.st_size, stat.st_mtime_ns, expected]:
+            return True
+        if entry.check_digest(hash_file(dest_path, entry)):
+            self._mark_verified(verified, entry, dest_path)
+            return True
+        return False
+
+    def _transfer(self, entry: ManifestEntry, part_path: str, tracker: _ProgressTracker) -> bool:
+        """
+        下载到 .part 文件，已有部分时用 Range 续传
+
+        Returns:
+            是否为续传
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset > entry.size:
+            offset = 0
+
+        hasher = entry.new_hasher()
+        if offset and hasher is not None:
+            # 续传时先对已有部分计算哈希，整个文件的哈希在写入剩余部分时继续累加
+            with open(part_path, "rb") as f:
+                remaining = offset
+                while remaining:
+                    chunk = f.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    remaining -= len(chunk)
+
+        if offset == entry.size:
+            if not entry.check_digest(hasher):
+                raise ChecksumMismatchError(f"{entry.path} 哈希校验失败")
+            tracker.set(entry.path, offset)
+            return True
+
+        headers = dict(self.headers)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        request = urllib.request.Request(entry.url, headers=headers)
+
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            resumed = bool(offset)
+            if offset and not self._range_honoured(response, offset):
+                # 服务器忽略了 Range，从头写入
+                offset, resumed = 0, False
+                hasher = entry.new_hasher()
+
+            tracker.set(entry.path, offset)
+            written = offset
+            with open(part_path, "ab" if offset else "wb") as f:
+                while True:
+                    if self._cancel_event.is_set():
+                        raise DownloadCancelledError("下载已取消")
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    written += len(chunk)
+                    tracker.set(entry.path, written, len(chunk))
+
+        if written < entry.size:
+            raise IncompleteTransferError(f"{entry.path} 只接收到 {written}/{entry.size} 字节")
+        if written > entry.size or not entry.check_digest(hasher):
+            raise ChecksumMismatchError(f"{entry.path} 大小或哈希校验失败")
+        return resumed
+
+    @staticmethod
+    def _range_honoured(response, offset: int) -> bool:
+        if response.status != 206:
+            return False
+        content_range = response.headers.get("Content-Range", "")
+        try:
+            start = int(content_range.split()[1].split("-")[0])
+        except (IndexError, ValueError):
+            return False
+        return start == offset
+
+    # ---------- 校验记录 ----------
+
+    def _mark_verified(self, verified: Dict, entry: ManifestEntry, dest_path: str):
+        if not entry.has_digest:
+            return
+        stat = os.stat(dest_path)
+        with self._verified_lock:
+            verified[entry.path] = [stat.st_size, stat.st_mtime_ns, entry.sha256 or entry.git_sha1]
+
+    @staticmethod
+    def _load_verified(dest_dir: str) -> Dict:
+        try:
+            with open(os.path.join(dest_dir, VERIFIED_FILENAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_verified(self, dest_dir: str, verified: Dict):
+        path = os.path.join(dest_dir, VERIFIED_FILENAME)
+        with self._verified_lock:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(verified, f)
+            os.replace(f"{path}.tmp", path)
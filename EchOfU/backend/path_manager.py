@@ -1,5 +1,17 @@
 import os
+import threading
 from datetime import datetime
+from functools import lru_cache
+
+
+# 项目根目录环境变量（设置后跳过目录查找）
+PROJECT_ROOT_ENV = "ECHOFU_ROOT"
+
+
+@lru_cache(maxsize=4096)
+def _join(root, path_parts):
+    """缓存的路径拼接（getter 在请求路径上被频繁调用，参数组合有限）"""
+    return os.path.join(root, *path_parts)
 
 
 class PathManager:
@@ -12,13 +24,46 @@ class PathManager:
     - 音频文件路径 (static/voices/)
     - 视频文件路径 (static/videos/)
     - OpenVoice相关路径
+
+    项目根目录每个进程只查找一次（可由环境变量 ECHOFU_ROOT 指定），
+    之后创建 PathManager 不再访问文件系统；ensure_directory 对已确认的目录只做一次 stat，不重复 mkdir
     """
 
+    _root_cache = None
+    _ensured_dirs = set()
+    _lock = threading.Lock()
+
     def __init__(self):
         self.project_root = self._get_project_root()
 
-    def _get_project_root(self):
-        """获取项目根目录路径 - 递归向上查找EchOfU目录"""
+    @classmethod
+    def _get_project_root(cls):
+        """获取项目根目录路径（进程内缓存）"""
+        root = cls._root_cache
+        if root is None:
+            with cls._lock:
+                if cls._root_cache is None:
+                    cls._root_cache = cls._resolve_project_root()
+                root = cls._root_cache
+        return root
+
+    @classmethod
+    def reset_cache(cls):
+        """清除缓存的根目录和已确认目录（切换工作目录或修改 ECHOFU_ROOT 后调用）"""
+        with cls._lock:
+            cls._root_cache = None
+            cls._ensured_dirs.clear()
+        _join.cache_clear()
+
+    @staticmethod
+    def _resolve_project_root():
+        """查找项目根目录：优先使用环境变量，否则从当前目录递归向上查找EchOfU目录"""
+        env_root = os.environ.get(PROJECT_ROOT_ENV)
+        if env_root:
+            if not os.path.isdir(env_root):
+                raise FileNotFoundError(f"{PROJECT_ROOT_ENV} 指定的目录不存在: {env_root}")
+            return os.path.abspath(env_root)
+
         def find_echofu_root(start_dir):
             current_dir = os.path.abspath(start_dir)
 
@@ -54,7 +99,7 @@ class PathManager:
 
     def get_root_begin_path(self, *path_parts):
         """获取根目录起始的路径"""
-        return os.path.join(self.project_root, *path_parts)
+        return _join(self.project_root, path_parts)
 
     # ==================== 基础路径方法 ====================
 
@@ -153,17 +198,57 @@ class PathManager:
         return self.get_cosyvoice_path("download_cache")
 
     def get_speaker_features_path(self):
-        """获取说话人特征文件路径 (models/OpenVoice/speaker_features.json)"""
+        """获取说话人特征索引文件路径 (models/OpenVoice/speaker_features.json)"""
         return self.get_openvoice_model_path("speaker_features.json")
 
     def get_speaker_feature_tensor_path(self, speaker_id):
-        """获取指定说话人的特征张量文件路径"""
+        """获取指定说话人的特征张量文件路径 (models/OpenVoice/<speaker_id>_se.pth)"""
         return self.get_openvoice_model_path(f"{speaker_id}_se.pth")
 
     def get_processed_path(self, *path_parts):
         """获取处理后的数据路径"""
         return self.get_root_begin_path("processed", *path_parts)
 
+    # ==================== 缓存路径 ====================
+
+    def get_cache_path(self, *path_parts):
+        """获取缓存目录路径 (cache/)"""
+        return self.get_root_begin_path("cache", *path_parts)
+
+    def get_reference_voice_cache_path(self):
+        """获取参考音频缓存目录路径 (cache/reference_voices/)"""
+        return self.get_cache_path("reference_voices")
+
+    def get_noise_profile_cache_path(self):
+        """获取说话人噪声谱缓存目录路径 (cache/noise_profiles/)"""
+        return self.get_cache_path("noise_profiles")
+
+    def get_pitch_cache_path(self):
+        """获取变调结果缓存目录路径 (cache/pitch_shift/)"""
+        return self.get_cache_path("pitch_shift")
+
+    def get_media_index_db_path(self):
+        """获取媒体文件索引数据库路径 (cache/media_index.db)"""
+        return self.get_cache_path("media_index.db")
+
+    def get_upload_staging_path(self):
+        """获取上传暂存目录路径 (cache/uploads/)，上传流式写入此处，校验通过后移入目标目录"""
+        return self.get_cache_path("uploads")
+
+    def get_audio_features_path(self, *path_parts):
+        """获取音频特征缓存目录路径 (audio_features/，与 ER-NeRF 容器共享)"""
+        return self.get_root_begin_path("audio_features", *path_parts)
+
+    # ==================== 任务队列路径 ====================
+
+    def get_jobs_path(self, *path_parts):
+        """获取任务队列目录路径 (jobs/)"""
+        return self.get_root_begin_path("jobs", *path_parts)
+
+    def get_job_db_path(self):
+        """获取任务队列数据库路径 (jobs/jobs.db)"""
+        return self.get_jobs_path("jobs.db")
+
     # ==================== 音频文件路径 ====================
 
     def get_voices_path(self, *path_parts):
@@ -226,10 +311,21 @@ class PathManager:
 
     # ==================== 通用工具方法 ====================
 
-    def ensure_directory(self, directory_path):
-        """确保目录存在，不存在则创建"""
-        if not os.path.exists(directory_path):
-            os.makedirs(directory_path, exist_ok=True)
+    def ensure_directory(self, directory_path, force=False):
+        """确保目录存在，不存在则创建
+
+        已确认存在的目录记录在进程内，再次调用只检查目录是否仍存在（一次 stat）；
+        目录被外部删除（缓存清理、用户手动删除）时自动重新创建。
+        force=True 时直接执行 makedirs
+        """
+        if not force and directory_path in self._ensured_dirs:
+            if os.path.isdir(directory_path):
+                return directory_path
+            with self._lock:
+                self._ensured_dirs.discard(directory_path)
+        os.makedirs(directory_path, exist_ok=True)
+        with self._lock:
+            self._ensured_dirs.add(directory_path)
         return directory_path
 
     def ensure_file_directory(self, file_path):
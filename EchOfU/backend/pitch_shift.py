@@ -4,18 +4,32 @@
 """
 
 import os
+import json
 import time
+import uuid
+import hashlib
 import tempfile
 import shutil
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional, Dict, Any, List, Callable
+from typing import Optional, Dict, Any, List, Callable, Iterable, Iterator
 from pathlib import Path
 
+import numpy as np
 import librosa
 import soundfile as sf
 
+try:
+    # scipy.fft 对 float32 输入保持单精度，比 numpy.fft 快得多
+    from scipy import fft as _fft
+except ImportError:
+    _fft = np.fft
+
+from .audio_buffer import AudioBuffer
+from .path_manager import PathManager
+
 
 # ==================== 异常类层次结构 ====================
 
@@ -153,6 +167,7 @@ class PitchShiftResult:
         error_message: 错误信息（如果失败）
         processing_time: 处理耗时（秒）
         metadata: 额外元数据
+        audio_buffer: 处理后音频的内存副本（未落盘时 output_path 为 None）
     """
     success: bool
     output_path: Optional[str] = None
@@ -163,12 +178,13 @@ class PitchShiftResult:
     error_message: Optional[str] = None
     processing_time: float = 0.0
     metadata: Dict[str, Any] = field(default_factory=dict)
+    audio_buffer: Optional[AudioBuffer] = None
 
     def __str__(self) -> str:
         if self.success:
             return (
                 f"PitchShiftResult(success=True, "
-                f"output='{os.path.basename(self.output_path)}', "
+                f"output='{os.path.basename(self.output_path) if self.output_path else '<memory>'}', "
                 f"pitch={self.config.pitch_steps if self.config else 'N/A'}, "
                 f"time={self.processing_time:.3f}s)"
             )
@@ -260,6 +276,239 @@ class LibrosaPitchShiftStrategy(PitchShiftStrategy):
         return "librosa_pitch_shift"
 
 
+class BlockPhaseVocoder:
+    """
+    分块相位声码器（单次处理的状态对象）
+
+    按 hop 大小读入音频，每凑满一帧做一次 rFFT：
+    由相邻帧相位差估计每个 bin 的真实频率，把幅度和频率整体按比例搬移到新 bin，
+    再以累计相位合成并重叠相加。输出长度与输入一致，不需要额外重采样。
+
+    帧间唯一的串行状态是相位（上一帧分析相位、累计合成相位），
+    因此已就绪的多帧（最多 max_frames）可以一次性向量化处理：相位用 cumsum 递推，
+    重叠相加按 hop 对齐成二维后分 oversampling 次累加。
+    输入缓冲和重叠相加的尾部缓冲在初始化时分配，可以逐块处理流式输入。
+    计算全程使用 float32（相位增量先对 2π 取模再累加，单精度误差可忽略）。
+    """
+
+    def __init__(self, ratio: float, frame_size: int = 2048, hop_length: Optional[int] = None,
+                 max_frames: int = 64):
+        hop_length = hop_length or frame_size // 4
+        if frame_size % hop_length != 0:
+            raise InvalidParameterError(f"frame_size ({frame_size}) 必须是 hop_length ({hop_length}) 的整数倍")
+
+        self.ratio = ratio
+        self.frame_size = frame_size
+        self.hop_length = hop_length
+        self.max_frames = max_frames
+        self.latency = frame_size - hop_length
+
+        num_bins = frame_size // 2 + 1
+        self._bins = np.arange(num_bins, dtype=np.float32)
+        # 相邻帧之间每个 bin 的期望相位增量（对 2π 取模后等价）
+        self._expected_phase = np.mod(2.0 * np.pi * hop_length / frame_size * np.arange(num_bins),
+                                      2.0 * np.pi).astype(np.float32)
+        self._oversampling = frame_size // hop_length
+
+        window = np.hanning(frame_size + 1)[:-1]
+        self._window = window.astype(np.float32)
+        # 分析窗 x 合成窗重叠相加后的增益补偿
+        self._synthesis_window = (window * hop_length / np.sum(window ** 2)).astype(np.float32)
+
+        # 搬移映射与帧内容无关，预先计算：源 bin k -> 目标 bin floor(k * ratio)
+        # 降调时多个源 bin 落到同一目标：幅度求和，频率取最后一个源 bin
+        target = np.floor(np.arange(num_bins) * ratio).astype(np.int64)
+        valid = np.flatnonzero(target < num_bins)
+        self._targets, first = np.unique(target[valid], return_index=True)
+        self._group_starts = valid[first]
+        self._group_lasts = np.append(valid[first[1:] - 1], valid[-1])
+        self._source_end = valid[-1] + 1
+
+        # 输入缓冲：开头预留 latency 个零采样（与逐帧实现的初始状态一致）
+        self._input = np.zeros(self.latency + max_frames * hop_length, dtype=np.float32)
+        self._input_fill = self.latency
+        self._ola_tail = np.zeros(self.latency, dtype=np.float32)
+        self._last_phase = np.zeros(num_bins, dtype=np.float32)
+        self._sum_phase = np.zeros(num_bins, dtype=np.float32)
+
+    def _process_frames(self, num_frames: int) -> np.ndarray:
+        """处理输入缓冲中已就绪的 num_frames 帧，返回 num_frames * hop_length 个输出采样"""
+        hop = self.hop_length
+        frames = np.lib.stride_tricks.as_strided(
+            self._input,
+            shape=(num_frames, self.frame_size),
+            strides=(self._input.strides[0] * hop, self._input.strides[0]),
+            writeable=False
+        )
+        spectrum = _fft.rfft(frames * self._window, axis=1)
+        magnitude = np.abs(spectrum)
+        phase = np.angle(spectrum)
+
+        # 相位差 -> 相对 bin 中心的频率偏移（单位: bin）
+        delta = np.diff(phase, axis=0, prepend=self._last_phase[np.newaxis, :]) - self._expected_phase
+        self._last_phase[:] = phase[-1]
+        delta -= np.float32(2.0 * np.pi) * np.round(delta * np.float32(0.5 / np.pi))
+        true_frequency = self._bins + delta * np.float32(self._oversampling / (2.0 * np.pi))
+
+        # 幅度按目标 bin 累加，频率随之缩放
+        synth_magnitude = np.zeros_like(magnitude)
+        synth_frequency = np.zeros_like(magnitude)
+        synth_magnitude[:, self._targets] = np.add.reduceat(
+            magnitude[:, :self._source_end], self._group_starts, axis=1)
+        synth_frequency[:, self._targets] = true_frequency[:, self._group_lasts] * self.ratio
+
+        # 累计合成相位（逐帧递推即前缀和）
+        increment = (synth_frequency - self._bins) * np.float32(2.0 * np.pi / self._oversampling)
+        increment += self._expected_phase
+        synth_phase = self._sum_phase + np.cumsum(np.mod(increment, np.float32(2.0 * np.pi)), axis=0)
+        self._sum_phase[:] = np.mod(synth_phase[-1], 2.0 * np.pi)
+
+        synth_spectrum = np.empty(synth_magnitude.shape, dtype=spectrum.dtype)
+        synth_spectrum.real = synth_magnitude * np.cos(synth_phase)
+        synth_spectrum.imag = synth_magnitude * np.sin(synth_phase)
+        output_frames = _fft.irfft(synth_spectrum, n=self.frame_size, axis=1).astype(np.float32, copy=False)
+        output_frames *= self._synthesis_window
+
+        # 重叠相加：第 i 帧的第 j 段落在第 i + j 个 hop
+        segments = output_frames.reshape(num_frames, self._oversampling, hop)
+        rows = np.zeros((num_frames + self._oversampling - 1, hop), dtype=np.float32)
+        rows[:self._oversampling - 1] = self._ola_tail.reshape(-1, hop)
+        for j in range(self._oversampling):
+            rows[j:j + num_frames] += segments[:, j]
+
+        self._ola_tail[:] = rows[num_frames:].reshape(-1)
+        return rows[:num_frames].reshape(-1)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        输入任意长度的音频块，返回已就绪的输出采样（整体滞后 latency 个采样）
+        """
+        outputs = []
+        capacity = len(self._input)
+        position = 0
+        while position < len(block):
+            count = min(capacity - self._input_fill, len(block) - position)
+            self._input[self._input_fill:self._input_fill + count] = block[position:position + count]
+            self._input_fill += count
+            position += count
+
+            num_frames = (self._input_fill - self.latency) // self.hop_length
+            if num_frames == 0:
+                continue
+            outputs.append(self._process_frames(num_frames))
+
+            # 未用完的采样（下一帧的重叠部分 + 不足一个 hop 的余量）移到缓冲开头
+            consumed = num_frames * self.hop_length
+            remaining = self._input_fill - consumed
+            self._input[:remaining] = self._input[consumed:self._input_fill]
+            self._input_fill = remaining
+
+        if not outputs:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(outputs) if len(outputs) > 1 else outputs[0]
+
+    def flush(self) -> np.ndarray:
+        """输入结束：补零把滞留在帧缓冲中的采样全部输出"""
+        return self.process(np.zeros(self.latency + self.hop_length, dtype=np.float32))
+
+
+class PhaseVocoderPitchShiftStrategy(PitchShiftStrategy):
+    """
+    分块相位声码器变调策略
+
+    不做整段 STFT 时间伸缩 + 重采样，而是固定帧长逐块处理，
+    长音频耗时线性增长、内存占用恒定，并支持流式输入输出（见 shift_pitch_stream）。
+    变调比例与 Librosa 策略一致：2 ** (steps / bins_per_octave)。
+
+    通过 PitchShifterFactory.create("phase_vocoder") 使用。
+    """
+
+    @staticmethod
+    def _create_vocoder(config: PitchShiftConfig) -> BlockPhaseVocoder:
+        ratio = 2.0 ** (config.get_actual_steps() / config.bins_per_octave)
+        return BlockPhaseVocoder(ratio, frame_size=config.n_fft, hop_length=config.hop_length)
+
+    def shift_pitch_stream(
+        self,
+        blocks: Iterable[np.ndarray],
+        sample_rate: int,
+        config: PitchShiftConfig
+    ) -> Iterator[np.ndarray]:
+        """
+        流式变调：逐块读入、逐块产出（float32），总输出长度与输入一致
+
+        流式模式无法预知全局峰值，不做自动归一化，只对超出 [-1, 1] 的采样限幅。
+        """
+        vocoder = self._create_vocoder(config)
+        to_skip = vocoder.latency
+        remaining = 0
+
+        def emit(samples):
+            nonlocal to_skip
+            if to_skip:
+                skipped = min(to_skip, len(samples))
+                samples = samples[skipped:]
+                to_skip -= skipped
+            return np.clip(samples, -1.0, 1.0).astype(np.float32)
+
+        try:
+            for block in blocks:
+                block = np.asarray(block, dtype=np.float32).reshape(-1)
+                remaining += len(block)
+                output = emit(vocoder.process(block))
+                remaining -= len(output)
+                if len(output):
+                    yield output
+
+            tail = emit(vocoder.flush())[:remaining]
+            if len(tail):
+                yield tail
+        except Exception as e:
+            raise PitchShiftProcessingError(f"相位声码器变调失败: {str(e)}") from e
+
+    def shift_pitch(
+        self,
+        audio_data,
+        sample_rate: int,
+        config: PitchShiftConfig
+    ) -> tuple:
+        """整段变调（内部同样按块处理）"""
+        try:
+            audio_data = np.asarray(audio_data, dtype=np.float32)
+            vocoder = self._create_vocoder(config)
+
+            shifted = np.empty(len(audio_data) + vocoder.latency + vocoder.frame_size, dtype=np.float32)
+            written = 0
+            for part in (vocoder.process(audio_data), vocoder.flush()):
+                shifted[written:written + len(part)] = part
+                written += len(part)
+            shifted = shifted[vocoder.latency:vocoder.latency + len(audio_data)]
+
+            # 自动归一化
+            if config.auto_normalize:
+                max_val = abs(shifted).max() if len(shifted) else 0
+                if max_val > 0:
+                    shifted = shifted / max_val
+
+            info = {
+                "strategy": self.get_strategy_name(),
+                "actual_steps": config.get_actual_steps(),
+                "fft_bins": config.n_fft,
+                "hop_length": config.hop_length,
+                "normalized": config.auto_normalize,
+            }
+
+            return shifted, info
+
+        except PitchShiftError:
+            raise
+        except Exception as e:
+            raise PitchShiftProcessingError(f"相位声码器变调失败: {str(e)}") from e
+
+    def get_strategy_name(self) -> str:
+        return "phase_vocoder_pitch_shift"
+
+
 # ==================== 临时文件管理器 ====================
 
 class TempFileManager:
@@ -270,25 +519,39 @@ class TempFileManager:
     - 管理临时变调文件的生命周期
     - 自动清理过期文件
     - 线程安全的文件操作
+    - 变调结果缓存（按 输入内容哈希 + 变调配置 寻址，LRU + 最大保留时间淘汰）
+
+    缓存文件默认位于 cache/pitch_shift/（不在对外提供的静态目录中），不属于 managed_files。
+    返回给调用方的文件总是缓存条目的副本，淘汰缓存不会影响它们。
     """
 
+    HASH_CHUNK_SIZE = 1024 * 1024
+
     def __init__(
         self,
         base_dir: Optional[str] = None,
         max_age_hours: float = 24.0,
-        cleanup_on_init: bool = True
+        cleanup_on_init: bool = True,
+        cache_max_entries: int = 0,
+        cache_dir: Optional[str] = None
     ):
         """
         初始化文件管理器
 
         Args:
             base_dir: 基础目录（None 表示使用系统临时目录）
-            max_age_hours: 文件最大保留时间（小时）
+            max_age_hours: 文件最大保留时间（小时，同时作用于缓存条目）
             cleanup_on_init: 初始化时是否清理旧文件
+            cache_max_entries: 变调结果缓存的最大条目数（0 表示不缓存）
+            cache_dir: 缓存目录（None 表示 PathManager 的 cache/pitch_shift/）
         """
         self.base_dir = base_dir or tempfile.gettempdir()
         self.max_age_seconds = max_age_hours * 3600
         self.managed_files: List[str] = []
+        self.cache_max_entries = cache_max_entries
+        self.cache_dir = cache_dir or PathManager().get_pitch_cache_path()
+        self._lock = threading.RLock()
+        self._digest_memo: Dict[tuple, str] = {}
 
         if cleanup_on_init:
             self.cleanup_old_files()
@@ -384,8 +647,131 @@ class TempFileManager:
         except Exception as e:
             print(f"[TempFileManager] 清理旧文件时出错: {e}")
 
+        count += self._evict_cache(current_time)
         return count
 
+    # ---------- 结果缓存 ----------
+
+    @property
+    def cache_enabled(self) -> bool:
+        return self.cache_max_entries > 0
+
+    def content_digest(self, filepath: str) -> str:
+        """文件内容 SHA-256（按路径、大小和修改时间记忆，重复调用不再读文件）"""
+        abs_path = os.path.abspath(filepath)
+        stat = os.stat(abs_path)
+        memo_key = (abs_path, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            digest = self._digest_memo.get(memo_key)
+        if digest is not None:
+            return digest
+
+        sha256 = hashlib.sha256()
+        with open(abs_path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+
+        with self._lock:
+            if len(self._digest_memo) >= 1024:
+                self._digest_memo.clear()
+            self._digest_memo[memo_key] = digest
+        return digest
+
+    @staticmethod
+    def make_cache_key(content_digest: str, config: PitchShiftConfig, strategy_name: str) -> str:
+        """缓存键：输入内容哈希 + 变调配置（步数、单位、质量预设及其展开参数）+ 策略"""
+        payload = json.dumps(
+            {"config": config.to_dict(), "strategy": strategy_name},
+            sort_keys=True
+        )
+        config_digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        return f"{content_digest[:32]}_{config_digest}"
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def get_cached(self, key: str) -> Optional[str]:
+        """查找缓存结果；命中时刷新访问时间（LRU）"""
+        if not self.cache_enabled:
+            return None
+
+        cache_path = self._cache_path(key)
+        with self._lock:
+            if not os.path.isfile(cache_path):
+                return None
+            if time.time() - os.path.getmtime(cache_path) > self.max_age_seconds:
+                self._remove_quietly(cache_path)
+                return None
+            os.utime(cache_path, None)
+            return cache_path
+
+    def store_cached(self, key: str, write_func: Callable[[str], None]) -> Optional[str]:
+        """
+        写入缓存结果
+
+        Args:
+            key: 缓存键
+            write_func: 接收临时路径并写出音频的函数（写完后原子替换为缓存文件）
+
+        Returns:
+            缓存文件路径；缓存未启用或写入失败时返回 None
+        """
+        if not self.cache_enabled:
+            return None
+
+        cache_path = self._cache_path(key)
+        temp_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex[:8]}.tmp.wav")
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_func(temp_path)
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            self._remove_quietly(temp_path)
+            print(f"[TempFileManager] 写入变调缓存失败: {e}")
+            return None
+
+        with self._lock:
+            self._evict_cache(time.time())
+        return cache_path
+
+    def _evict_cache(self, current_time: float) -> int:
+        """淘汰过期缓存，并按最近访问时间把条目数限制在 cache_max_entries 以内"""
+        # 未启用缓存时不触碰缓存目录（可能由其他实例共享）
+        if not self.cache_enabled or not os.path.isdir(self.cache_dir):
+            return 0
+
+        count = 0
+        entries = []
+        with self._lock:
+            for filename in os.listdir(self.cache_dir):
+                filepath = os.path.join(self.cache_dir, filename)
+                try:
+                    mtime = os.path.getmtime(filepath)
+                except OSError:
+                    continue
+                # 过期条目、以及遗留超过一小时的临时文件
+                is_temp = filename.endswith(".tmp.wav")
+                if current_time - mtime > (3600 if is_temp else self.max_age_seconds):
+                    count += self._remove_quietly(filepath)
+                elif not is_temp:
+                    entries.append((mtime, filepath))
+
+            entries.sort()
+            overflow = len(entries) - max(self.cache_max_entries, 0)
+            for _, filepath in entries[:max(overflow, 0)]:
+                count += self._remove_quietly(filepath)
+        return count
+
+    @staticmethod
+    def _remove_quietly(filepath: str) -> int:
+        try:
+            os.remove(filepath)
+            return 1
+        except OSError:
+            return 0
+
     def __del__(self):
         """析构时清理管理的文件"""
         try:
@@ -471,19 +857,23 @@ class PitchShifter:
 
     def process(
         self,
-        input_path: str,
+        input_path: Optional[str] = None,
         output_path: Optional[str] = None,
         config: Optional[PitchShiftConfig] = None,
-        auto_cleanup: bool = True
+        auto_cleanup: bool = True,
+        audio: Optional[AudioBuffer] = None,
+        save_output: bool = True
     ) -> PitchShiftResult:
         """
         执行变调处理
 
         Args:
-            input_path: 输入音频路径
+            input_path: 输入音频路径（与 audio 二选一）
             output_path: 输出音频路径（None 表示自动生成）
             config: 变调配置（默认使用 pitch_steps=0）
             auto_cleanup: 失败时是否自动清理临时文件
+            audio: 内存中的输入音频（上游已解码时传入，避免重新读取文件）
+            save_output: 是否写出结果文件（False 时结果只包含 audio_buffer）
 
         Returns:
             PitchShiftResult: 处理结果
@@ -494,24 +884,53 @@ class PitchShifter:
         if config is None:
             config = PitchShiftConfig(pitch_steps=0)
 
-        # 生成输出路径
-        if output_path is None:
+        if audio is not None and input_path is None:
+            input_path = audio.source_path
+
+        # 查找变调结果缓存（命中时只需一次哈希 + 一次查找）
+        cache_key = None
+        if config.pitch_steps != 0 and self.file_manager.cache_enabled:
+            try:
+                cache_key = self._cache_key(input_path, audio, config)
+                cached_path = self.file_manager.get_cached(cache_key)
+                if cached_path is not None:
+                    return self._result_from_cache(cached_path, input_path, output_path, config,
+                                                   save_output, start_time)
+            except Exception as e:
+                print(f"[PitchShifter] 读取变调缓存失败，重新处理: {e}")
+                cache_key = None
+
+        # 生成输出路径（缓存文件可能被淘汰，不直接交给调用方）
+        if save_output and output_path is None:
             pitch_value = config.pitch_steps
             output_path = self.file_manager.generate_temp_path(
                 prefix=f"pitch_{pitch_value:.1f}"
             )
+        elif not save_output:
+            output_path = None
 
         # 注册输出文件以便管理
-        self.file_manager.register_file(output_path)
+        if output_path is not None:
+            self.file_manager.register_file(output_path)
 
         try:
-            # 1. 加载音频
-            audio_data, sample_rate = self.load_audio(input_path)
-            duration = len(audio_data) / sample_rate
-
-            # 2. 如果不需要变调，直接复制
+            # 1. 加载音频（已在内存中时直接使用）
+            if audio is None:
+                if input_path is None:
+                    raise AudioLoadError("未提供输入音频")
+                audio_data, sample_rate = self.load_audio(input_path)
+                audio = AudioBuffer(data=audio_data, sample_rate=sample_rate, source_path=input_path)
+            sample_rate = audio.sample_rate
+            duration = audio.duration
+
+            # 2. 如果不需要变调，直接复用输入
             if config.pitch_steps == 0:
-                shutil.copy2(input_path, output_path)
+                output_buffer = audio
+                if output_path is not None:
+                    if audio.source_path and os.path.exists(audio.source_path):
+                        shutil.copy2(audio.source_path, output_path)
+                    else:
+                        self.save_audio(audio.as_float32(), sample_rate, output_path)
                 return PitchShiftResult(
                     success=True,
                     output_path=output_path,
@@ -520,16 +939,28 @@ class PitchShifter:
                     duration=duration,
                     sample_rate=sample_rate,
                     processing_time=time.time() - start_time,
-                    metadata={"skipped": "No pitch shift needed"}
+                    metadata={"skipped": "No pitch shift needed"},
+                    audio_buffer=output_buffer
                 )
 
             # 3. 执行变调
             shifted_audio, process_info = self.strategy.shift_pitch(
-                audio_data, sample_rate, config
+                audio.as_float32(), sample_rate, config
             )
+            output_buffer = audio.with_data(shifted_audio)
 
             # 4. 保存结果
-            self.save_audio(shifted_audio, sample_rate, output_path)
+            if output_path is not None:
+                self.save_audio(shifted_audio, sample_rate, output_path)
+                output_buffer.source_path = output_path
+
+            # 5. 写入缓存
+            if cache_key is not None:
+                if output_path is not None:
+                    write_func = lambda path: shutil.copyfile(output_path, path)
+                else:
+                    write_func = lambda path: self.save_audio(shifted_audio, sample_rate, path)
+                self.file_manager.store_cached(cache_key, write_func)
 
             return PitchShiftResult(
                 success=True,
@@ -539,12 +970,13 @@ class PitchShifter:
                 duration=duration,
                 sample_rate=sample_rate,
                 processing_time=time.time() - start_time,
-                metadata=process_info
+                metadata=process_info,
+                audio_buffer=output_buffer
             )
 
         except Exception as e:
             # 失败时清理
-            if auto_cleanup and os.path.exists(output_path):
+            if auto_cleanup and output_path is not None and os.path.exists(output_path):
                 self.file_manager.cleanup_file(output_path)
 
             return PitchShiftResult(
@@ -555,6 +987,49 @@ class PitchShifter:
                 processing_time=time.time() - start_time
             )
 
+    def _cache_key(self, input_path: Optional[str], audio: Optional[AudioBuffer],
+                   config: PitchShiftConfig) -> str:
+        """计算缓存键：优先对源文件哈希（有记忆），纯内存音频对采样数据哈希"""
+        if input_path and os.path.exists(input_path):
+            digest = self.file_manager.content_digest(input_path)
+        elif audio is not None:
+            sha256 = hashlib.sha256(f"{audio.sample_rate}:{audio.data.dtype.str}:".encode("utf-8"))
+            sha256.update(np.ascontiguousarray(audio.data))
+            digest = sha256.hexdigest()
+        else:
+            raise AudioLoadError("未提供输入音频")
+        return self.file_manager.make_cache_key(digest, config, self.strategy.get_strategy_name())
+
+    def _result_from_cache(self, cached_path: str, input_path: Optional[str], output_path: Optional[str],
+                           config: PitchShiftConfig, save_output: bool, start_time: float) -> PitchShiftResult:
+        """
+        由缓存文件构建结果
+
+        落盘时把缓存条目复制到输出路径（未指定时自动生成）；不落盘时读入内存，
+        结果不引用缓存文件，之后淘汰缓存不影响调用方。
+        """
+        if save_output:
+            if output_path is None:
+                output_path = self.file_manager.generate_temp_path(prefix=f"pitch_{config.pitch_steps:.1f}")
+                self.file_manager.register_file(output_path)
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            shutil.copyfile(cached_path, output_path)
+            output_buffer = AudioBuffer.from_file(output_path, mmap=True)
+        else:
+            output_buffer = AudioBuffer.from_file(cached_path)
+            output_buffer.source_path = None
+        return PitchShiftResult(
+            success=True,
+            output_path=output_path,
+            input_path=input_path,
+            config=config,
+            duration=output_buffer.duration,
+            sample_rate=output_buffer.sample_rate,
+            processing_time=time.time() - start_time,
+            metadata={"strategy": self.strategy.get_strategy_name(), "cache_hit": True},
+            audio_buffer=output_buffer
+        )
+
 
 # ==================== 工厂模式 ====================
 
@@ -601,7 +1076,8 @@ class PitchShifterFactory:
         cls,
         output_dir: str,
         strategy_name: str = "librosa",
-        max_age_hours: float = 24.0
+        max_age_hours: float = 24.0,
+        cache_max_entries: int = 0
     ) -> PitchShifter:
         """
         创建带自定义文件管理器的处理器
@@ -610,17 +1086,22 @@ class PitchShifterFactory:
             output_dir: 输出目录
             strategy_name: 策略名称
             max_age_hours: 临时文件最大保留时间
+            cache_max_entries: 变调结果缓存的最大条目数（0 表示不缓存）
 
         Returns:
             PitchShifter: 处理器实例
         """
         file_manager = TempFileManager(
             base_dir=output_dir,
-            max_age_hours=max_age_hours
+            max_age_hours=max_age_hours,
+            cache_max_entries=cache_max_entries
         )
         return cls.create(strategy_name, file_manager)
 
 
+PitchShifterFactory.register_strategy("phase_vocoder", PhaseVocoderPitchShiftStrategy())
+
+
 # ==================== 服务层（高层接口） ====================
 
 class PitchShiftService:
@@ -633,7 +1114,9 @@ class PitchShiftService:
     def __init__(
         self,
         output_dir: Optional[str] = None,
-        auto_cleanup: bool = True
+        auto_cleanup: bool = True,
+        strategy_name: str = "librosa",
+        cache_max_entries: int = 64
     ):
         """
         初始化服务
@@ -641,26 +1124,35 @@ class PitchShiftService:
         Args:
             output_dir: 输出目录（None 表示使用临时目录）
             auto_cleanup: 是否自动清理
+            strategy_name: 变调策略（librosa / phase_vocoder）
+            cache_max_entries: 变调结果缓存的最大条目数（0 表示不缓存；
+                同一音频以相同步数和预设重复变调时直接复用结果）
         """
         self.output_dir = output_dir
         self.auto_cleanup = auto_cleanup
         self.shifter = PitchShifterFactory.create_with_file_manager(
-            output_dir or tempfile.gettempdir()
+            output_dir or tempfile.gettempdir(),
+            strategy_name=strategy_name,
+            cache_max_entries=cache_max_entries
         )
 
     def shift_pitch(
         self,
-        audio_path: str,
+        audio_path: Optional[str],
         pitch_steps: float,
-        quality: str = "balanced"
+        quality: str = "balanced",
+        audio: Optional[AudioBuffer] = None,
+        save_output: bool = True
     ) -> PitchShiftResult:
         """
         变调处理（简化接口）
 
         Args:
-            audio_path: 音频文件路径
+            audio_path: 音频文件路径（传入 audio 时可为 None）
             pitch_steps: 变调步数（半音）
             quality: 质量预设（fast/balanced/high_quality）
+            audio: 内存中的输入音频（可选）
+            save_output: 是否写出结果文件
 
         Returns:
             PitchShiftResult: 处理结果
@@ -673,7 +1165,9 @@ class PitchShiftService:
         return self.shifter.process(
             input_path=audio_path,
             config=config,
-            auto_cleanup=self.auto_cleanup
+            auto_cleanup=self.auto_cleanup,
+            audio=audio,
+            save_output=save_output
         )
 
     def cleanup_old_files(self, max_age_hours: float = 24.0) -> int:
@@ -0,0 +1,373 @@
+"""
+上传流式接收模块
+把 multipart 上传直接按固定大小的块写入暂存目录，写入过程中完成校验
+
+核心功能:
+- 接管 Werkzeug 的文件流工厂，请求体边解析边写入暂存文件（不再先整体缓存再复制）
+- 写入同时增量计算 SHA-256，用于与已有文件去重
+- 从文件头字节识别容器/编码（WAV fmt、MP4 品牌、Ogg 编码等），与扩展名不符时立即拒绝
+- Content-Length 或已写入字节超过上限时立即拒绝，不再继续读取请求体
+- 校验通过后由调用方 commit 到目标目录，未提交的暂存文件在请求结束时删除
+
+使用方式:
+    from backend.upload_ingest import IngestRequest, UploadPolicy, ingest_file_storage
+
+    app.request_class = IngestRequest
+    IngestRequest.register_upload_policy('upload_reference_audio', policy)
+
+    stream = ingest_file_storage(request.files['audio'], policy)
+    upload = stream.finish()
+    stream.commit(save_path)
+"""
+
+import os
+import shutil
+import struct
+import hashlib
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from flask import Request
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024     # 暂存文件写缓冲（固定块大小）
+SNIFF_BYTES = 4096                  # 用于识别格式的文件头长度
+MULTIPART_OVERHEAD = 64 * 1024      # Content-Length 中 multipart 边界和其他字段的余量
+
+
+class UploadRejected(Exception):
+    """上传被拒绝（格式不符、文件过大等），status_code 为建议的 HTTP 状态码"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+# ==================== 格式识别 ====================
+
+@dataclass
+class MediaFormat:
+    """从文件头识别出的容器和编码"""
+    container: str
+    codec: Optional[str] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+    def to_dict(self) -> Dict:
+        return {k: v for k, v in self.__dict__.items() if v is not None}
+
+
+# 扩展名允许的容器
+EXTENSION_CONTAINERS = {
+    '.wav': {'wav'},
+    '.mp3': {'mp3'},
+    '.m4a': {'m4a', 'mp4'},
+    '.flac': {'flac'},
+    '.ogg': {'ogg'},
+    '.mp4': {'mp4', 'mov'},
+    '.mov': {'mov', 'mp4'},
+    '.mkv': {'matroska', 'webm'},
+    '.webm': {'webm', 'matroska'},
+    '.avi': {'avi'},
+    '.flv': {'flv'},
+}
+
+_WAV_CODECS = {
+    0x0001: 'pcm', 0x0002: 'adpcm_ms', 0x0003: 'pcm_float', 0x0006: 'alaw',
+    0x0007: 'mulaw', 0x0011: 'adpcm_ima', 0x0055: 'mp3', 0xFFFE: 'extensible',
+}
+
+# 没有 ftyp 的旧式 QuickTime 文件以这些 atom 开头
+_QUICKTIME_ATOMS = {b'moov', b'mdat', b'wide', b'free', b'skip'}
+
+
+def _sniff_wav(header: bytes) -> Optional[MediaFormat]:
+    """遍历 RIFF 子块查找 fmt 块，读取编码、声道数和采样率"""
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset:offset + 4]
+        chunk_size = struct.unpack_from('<I', header, offset + 4)[0]
+        if chunk_id == b'fmt ':
+            if offset + 16 > len(header):
+                break
+            audio_format, channels, sample_rate = struct.unpack_from('<HHI', header, offset + 8)
+            if channels == 0 or sample_rate == 0:
+                return None
+            return MediaFormat('wav', _WAV_CODECS.get(audio_format, f'0x{audio_format:04x}'),
+                               sample_rate, channels)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    # fmt 块不在文件头窗口内（前面有较大的 LIST/JUNK 块），只确认容器
+    return MediaFormat('wav')
+
+
+def _sniff_ogg(header: bytes) -> MediaFormat:
+    """第一页的首个数据包标识编码（27 字节页头 + 分段表之后）"""
+    codec = None
+    if len(header) > 27:
+        packet = header[27 + header[26]:]
+        if packet.startswith(b'\x01vorbis'):
+            codec = 'vorbis'
+        elif packet.startswith(b'OpusHead'):
+            codec = 'opus'
+        elif packet.startswith(b'\x7fFLAC'):
+            codec = 'flac'
+    return MediaFormat('ogg', codec)
+
+
+def sniff_media_format(header: bytes) -> Optional[MediaFormat]:
+    """
+    根据文件头字节识别媒体格式
+
+    Returns:
+        MediaFormat，无法识别时返回 None
+    """
+    if len(header) >= 12 and header[:4] in (b'RIFF', b'RF64'):
+        form = header[8:12]
+        if form == b'WAVE':
+            return _sniff_wav(header)
+        if form == b'AVI ':
+            return MediaFormat('avi')
+        return None
+    if header[:4] == b'fLaC':
+        return MediaFormat('flac', 'flac')
+    if header[:4] == b'OggS':
+        return _sniff_ogg(header)
+    if header[:3] == b'ID3':
+        return MediaFormat('mp3', 'mp3')
+    if len(header) >= 12 and header[4:8] == b'ftyp':
+        brand = header[8:12]
+        if brand in (b'M4A ', b'M4B ', b'M4P '):
+            return MediaFormat('m4a', 'aac')
+        if brand == b'qt  ':
+            return MediaFormat('mov')
+        return MediaFormat('mp4')
+    if len(header) >= 8 and header[4:8] in _QUICKTIME_ATOMS:
+        return MediaFormat('mov')
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        return MediaFormat('webm' if b'webm' in header[:64] else 'matroska')
+    if header[:3] == b'FLV':
+        return MediaFormat('flv')
+    if len(header) >= 2 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:
+        # MPEG 帧同步：layer III 为 MP3，layer 0 为 ADTS AAC
+        layer = (header[1] >> 1) & 0x03
+        if layer == 0x01:
+            return MediaFormat('mp3', 'mp3')
+        if layer == 0x00:
+            return MediaFormat('adts', 'aac')
+    return None
+
+
+# ==================== 上传策略 ====================
+
+@dataclass
+class UploadPolicy:
+    """某类上传允许的扩展名、大小上限和暂存目录"""
+    name: str
+    extensions: Set[str]
+    max_bytes: int
+    staging_dir: str
+
+    def check_filename(self, filename: Optional[str]) -> str:
+        """校验文件名并返回小写扩展名"""
+        if not filename:
+            raise UploadRejected("没有选择文件")
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in self.extensions:
+            raise UploadRejected(f"不支持的文件格式。支持的格式: {', '.join(sorted(self.extensions))}")
+        return ext
+
+    def size_error(self, size: int) -> UploadRejected:
+        max_mb = self.max_bytes / (1024 * 1024)
+        return UploadRejected(
+            f"文件大小超过限制。最大支持{max_mb:.0f}MB，当前文件大小: {size / (1024 * 1024):.2f}MB",
+            status_code=413
+        )
+
+
+@dataclass
+class IngestedUpload:
+    """写入完成并通过校验的上传"""
+    temp_path: str
+    filename: str
+    ext: str
+    size: int
+    sha256: str
+    media_format: MediaFormat = field(default_factory=lambda: MediaFormat('unknown'))
+
+
+# ==================== 流式写入 ====================
+
+class IngestStream:
+    """
+    可写文件对象：Werkzeug 解析 multipart 时把文件内容逐段写入此对象
+
+    写入的同时计算哈希、识别格式、检查大小；校验失败时删除暂存文件并抛出 UploadRejected，
+    Werkzeug 随即停止读取请求体。同时支持 seek/read，保持 FileStorage 的原有用法
+    """
+
+    def __init__(self, policy: UploadPolicy, filename: Optional[str], content_length: Optional[int] = None):
+        self.policy = policy
+        self.filename = filename
+        self.ext = policy.check_filename(filename)
+        if content_length and content_length > policy.max_bytes + MULTIPART_OVERHEAD:
+            raise policy.size_error(content_length)
+
+        os.makedirs(policy.staging_dir, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(prefix=f"{policy.name}_", suffix=self.ext, dir=policy.staging_dir)
+        self._file = os.fdopen(fd, 'w+b', buffering=UPLOAD_CHUNK_SIZE)
+
+        self._sha256 = hashlib.sha256()
+        self._header = bytearray()
+        self._size = 0
+        self.media_format: Optional[MediaFormat] = None
+        self._committed = False
+
+    # ---------- 写入 ----------
+
+    def write(self, data) -> int:
+        self._size += len(data)
+        if self._size > self.policy.max_bytes:
+            self._reject(self.policy.size_error(self._size))
+
+        if self.media_format is None and len(self._header) < SNIFF_BYTES:
+            self._header += data[:SNIFF_BYTES - len(self._header)]
+            if len(self._header) >= SNIFF_BYTES:
+                self._check_format()
+
+        self._sha256.update(data)
+        self._file.write(data)
+        return len(data)
+
+    def _check_format(self):
+        media_format = sniff_media_format(bytes(self._header))
+        if media_format is None:
+            self._reject(UploadRejected("无法识别的文件内容，文件可能已损坏或不是有效的媒体文件"))
+        if media_format.container not in EXTENSION_CONTAINERS.get(self.ext, {media_format.container}):
+            self._reject(UploadRejected(
+                f"文件内容（{media_format.container}）与扩展名 {self.ext} 不符"
+            ))
+        self.media_format = media_format
+
+    def _reject(self, error: UploadRejected):
+        self.close()
+        raise error
+
+    def finish(self) -> IngestedUpload:
+        """结束写入，完成对短文件的格式校验并返回结果"""
+        if self._size == 0:
+            self._reject(UploadRejected("上传的文件为空"))
+        if self.media_format is None:
+            self._check_format()
+        self._file.flush()
+        return IngestedUpload(
+            temp_path=self.temp_path,
+            filename=self.filename,
+            ext=self.ext,
+            size=self._size,
+            sha256=self._sha256.hexdigest(),
+            media_format=self.media_format
+        )
+
+    def commit(self, dest_path: str) -> str:
+        """把暂存文件移到目标位置（同一文件系统上为重命名）"""
+        self._file.close()
+        shutil.move(self.temp_path, dest_path)
+        self._committed = True
+        return dest_path
+
+    # ---------- 文件对象接口 ----------
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def close(self):
+        """关闭文件；未提交时删除暂存文件（Werkzeug 在请求结束时调用）"""
+        if not self._file.closed:
+            self._file.close()
+        if not self._committed:
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def ingest_file_storage(file_storage, policy: UploadPolicy) -> IngestStream:
+    """
+    获取上传文件对应的 IngestStream
+
+    请求已由 IngestRequest 流式接收时直接返回；否则（其他请求类、测试客户端等）
+    按固定块从已缓存的文件复制一遍，校验逻辑相同
+    """
+    stream = getattr(file_storage, 'stream', None)
+    if isinstance(stream, IngestStream) and stream.policy is policy:
+        return stream
+
+    ingest = IngestStream(policy, file_storage.filename)
+    try:
+        while True:
+            chunk = file_storage.stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            ingest.write(chunk)
+    except Exception:
+        ingest.close()
+        raise
+    return ingest
+
+
+def file_sha256(path: str) -> str:
+    """按固定块计算已有文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ==================== 请求类 ====================
+
+class IngestRequest(Request):
+    """
+    Flask 请求类：对登记了上传策略的端点，multipart 文件部分直接写入 IngestStream
+
+    校验失败时 UploadRejected 会在首次访问 request.files 时抛出
+    """
+
+    upload_policies: Dict[str, UploadPolicy] = {}
+
+    @classmethod
+    def register_upload_policy(cls, endpoint: str, policy: UploadPolicy):
+        cls.upload_policies[endpoint] = policy
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        policy = self.upload_policies.get(self.endpoint) if filename is not None else None
+        if policy is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return IngestStream(policy, filename, total_content_length)
@@ -6,6 +6,9 @@ from .path_manager import PathManager
 from .voice_generator import get_voice_service, ServiceConfig
 from .pitch_shift import PitchShiftService, PitchShiftConfig
 from .ernerf_docker_client import get_ernerf_docker_client
+from .audio_feature_cache import get_audio_feature_cache
+from .media_index import record_media_file
+from .job_queue import JobCancelled, NullJobContext, run_subprocess
 
 # ==============================================================================
 # ER-NeRF 调用模式配置
@@ -14,15 +17,43 @@ from .ernerf_docker_client import get_ernerf_docker_client
 # 设置为 False 使用直接调用（需要本地环境）
 USE_DOCKER_FOR_ERNERF = os.environ.get('USE_DOCKER_FOR_ERNERF', 'true').lower() == 'true'
 
-def run_extract_audio_features(pm, wav_path, output_npy_path):
+# 生成失败时 generate_video 返回的占位文件名
+FAILED_VIDEO_NAMES = ("error.mp4", "out.mp4")
+
+def is_failed_video(video_path):
+    """判断 generate_video 的返回值是否表示生成失败"""
+    return (not video_path or os.path.basename(video_path) in FAILED_VIDEO_NAMES
+            or not os.path.exists(video_path))
+
+def _parse_gpu_id(gpu_choice):
+    """将表单中的 gpu_choice（如 GPU1）解析为GPU编号，无法解析时返回 None"""
+    gpu_id = str(gpu_choice).upper().replace("GPU", "").strip() if gpu_choice is not None else ""
+    return int(gpu_id) if gpu_id.isdigit() else None
+
+def run_extract_audio_features(pm, wav_path, output_npy_path, gpu_id=None, asr_model="deepspeech"):
     """
     调用 ER-NeRF 的脚本提取 DeepSpeech 特征。
     ER-NeRF 推理时不能直接读取 wav，需要先提取为 npy 特征。
+    相同内容的音频（按 ASR 模型区分）命中特征缓存时直接复用，不再提取。
 
     支持两种模式：
     - Docker模式：通过Docker容器调用
     - 直接模式：直接调用Python脚本
     """
+    cache = get_audio_feature_cache()
+    try:
+        if cache.fetch(wav_path, asr_model, output_npy_path):
+            return True
+    except OSError as e:
+        print(f"[backend.video_generator] 读取特征缓存失败，重新提取: {e}")
+
+    success = _extract_audio_features(pm, wav_path, output_npy_path, gpu_id=gpu_id)
+    if success:
+        cache.store(wav_path, asr_model, output_npy_path)
+    return success
+
+def _extract_audio_features(pm, wav_path, output_npy_path, gpu_id=None):
+    """实际执行特征提取（Docker / 直接调用）"""
     print(f"[backend.video_generator] 正在提取音频特征: {wav_path} -> {output_npy_path}")
     print(f"[backend.video_generator] 使用模式: {'Docker' if USE_DOCKER_FOR_ERNERF else '直接调用'}")
 
@@ -30,7 +61,7 @@ def run_extract_audio_features(pm, wav_path, output_npy_path):
         # Docker模式
         try:
             client = get_ernerf_docker_client()
-            success, result = client.extract_audio_features(wav_path)
+            success, result = client.extract_audio_features(wav_path, gpu_id=gpu_id)
 
             if success:
                 # Docker客户端会自动生成.npy文件
@@ -79,11 +110,32 @@ def run_extract_audio_features(pm, wav_path, output_npy_path):
             print(f"[backend.video_generator] 特征提取发生未知错误: {e}")
             return False
 
-def generate_video(data):
+def _parse_pitch_steps(pitch):
+    """解析表单中的变调步数，无效或为 0 时返回 0.0"""
+    try:
+        return float(pitch) if pitch else 0.0
+    except (TypeError, ValueError):
+        print(f"[backend.video_generator] 无效的变调参数: {pitch}")
+        return 0.0
+
+def _persist_audio(audio_buffer, audio_path):
+    """
+    将内存音频写为最终 wav。
+    写入时已得到内容哈希，直接登记到特征缓存，查缓存时无需再读一遍文件。
+    """
+    digest = audio_buffer.save(audio_path)
+    get_audio_feature_cache().remember_digest(audio_path, digest)
+    record_media_file(audio_path)
+    print(f"[backend.video_generator] 音频已保存: {audio_path}")
+
+def generate_video(data, context=None):
     """
     模拟视频生成逻辑：接收来自前端的参数，并返回一个视频路径。
     负责处理音频生成（TTS）、音频变调处理以及调用视频生成模型（SyncTalk/ER-NeRF）。
+    失败时返回 error.mp4 / out.mp4 占位路径（见 is_failed_video）。
+    context 为任务上下文（JobContext），用于上报进度和响应取消请求。
     """
+    context = context or NullJobContext()
     # 初始化路径管理器
     pm = PathManager()
     
@@ -107,10 +159,17 @@ def generate_video(data):
 
     # 当前处理的音频路径 (初始为参考音频)
     current_audio_path = ref_audio_path
+    # 当前音频的内存副本：TTS 结果在内存中交给变调，只有最终音频落盘
+    current_audio = None
+    timestamp = int(time.time())
+
+    pitch_steps = _parse_pitch_steps(data.get('pitch'))
 
     # 2. 语音生成逻辑 (Text -> Audio) - 使用新的CosyVoice系统
     if text and text.strip():
         print(f"[backend.video_generator] 检测到目标文本，正在使用CosyVoice生成语音: {text}")
+        context.check_cancelled()
+        context.update_progress(0.1, "语音合成")
         try:
             # 创建服务实例
             config = ServiceConfig(enable_vllm=True)
@@ -120,19 +179,20 @@ def generate_video(data):
             if ref_audio_path and not os.path.isabs(ref_audio_path):
                 ref_audio_path = pm.get_static_path(ref_audio_path)
 
-            # 生成语音
-            timestamp = int(time.time())
+            # 生成语音（随后还要变调时不写中间文件）
             output_filename = f"tts_video_{timestamp}.wav"
 
             result = service.clone_voice(
                 text=text,
                 reference_audio=ref_audio_path if ref_audio_path else None,
                 speed=1.0,
-                output_filename=output_filename
+                output_filename=output_filename,
+                save_output=not pitch_steps
             )
 
             if result.is_success:
-                current_audio_path = result.audio_path
+                current_audio = result.audio_buffer
+                current_audio_path = result.audio_path or pm.get_res_voice_path(output_filename)
                 print(f"[backend.video_generator] CosyVoice语音生成成功: {current_audio_path}")
             else:
                 print(f"[backend.video_generator] CosyVoice语音生成失败: {result.error_message}")
@@ -145,41 +205,52 @@ def generate_video(data):
     # 3. [加分项] 音频变调处理 (Pitch Shift)
     # 使用新的 PitchShiftService 模块进行变调处理
 
-    pitch_steps = data.get('pitch')
-    if pitch_steps and current_audio_path and os.path.exists(current_audio_path):
+    if pitch_steps and (current_audio is not None or (current_audio_path and os.path.exists(current_audio_path))):
+        context.check_cancelled()
+        context.update_progress(0.3, "音频变调")
         try:
-            pitch_steps = float(pitch_steps)
-            if pitch_steps != 0:
-                print(f"[backend.video_generator] 正在进行音频变调处理: {pitch_steps} steps")
-
-                # 使用 PitchShiftService 进行变调处理
-                # 服务会自动管理临时文件和清理
-                pitch_service = PitchShiftService(
-                    output_dir=pm.get_res_voice_path(),
-                    auto_cleanup=True  # 失败时自动清理
-                )
+            print(f"[backend.video_generator] 正在进行音频变调处理: {pitch_steps} steps")
+
+            # 使用 PitchShiftService 进行变调处理
+            # 服务会自动管理临时文件和清理
+            pitch_service = PitchShiftService(
+                output_dir=pm.get_res_voice_path(),
+                auto_cleanup=True,  # 失败时自动清理
+                strategy_name=data.get('pitch_engine', 'librosa')  # librosa / phase_vocoder
+            )
 
-                # 获取音质预设（从前端获取，默认 balanced）
-                pitch_quality = data.get('pitch_quality', 'balanced')
+            # 获取音质预设（从前端获取，默认 balanced）
+            pitch_quality = data.get('pitch_quality', 'balanced')
 
-                # 执行变调处理
-                result = pitch_service.shift_pitch(
-                    audio_path=current_audio_path,
-                    pitch_steps=pitch_steps,
-                    quality=pitch_quality  # 可配置: fast/balanced/high_quality
-                )
+            # 执行变调处理（结果留在内存中，由下面统一落盘）
+            result = pitch_service.shift_pitch(
+                audio_path=None if current_audio is not None else current_audio_path,
+                pitch_steps=pitch_steps,
+                quality=pitch_quality,  # 可配置: fast/balanced/high_quality
+                audio=current_audio,
+                save_output=False
+            )
 
-                if result.success:
-                    current_audio_path = result.output_path
-                    print(f"[backend.video_generator] 变调处理完成: {result}")
-                else:
-                    print(f"[backend.video_generator] 变调处理失败: {result.error_message}")
-                    print("[backend.video_generator] 将继续使用原始音频")
+            if result.success:
+                current_audio = result.audio_buffer
+                current_audio_path = pm.get_res_voice_path(f"pitch_{pitch_steps:.1f}_{timestamp}.wav")
+                print(f"[backend.video_generator] 变调处理完成: {result}")
+            else:
+                print(f"[backend.video_generator] 变调处理失败: {result.error_message}")
+                print("[backend.video_generator] 将继续使用原始音频")
 
         except Exception as e:
             print(f"[backend.video_generator] 音频变调处理异常: {e}")
             print("[backend.video_generator] 将继续使用原始音频")
 
+    # 最终音频只在这里落盘一次（后续模型和特征提取在独立进程中读取文件）
+    if current_audio is not None and current_audio.source_path is None:
+        try:
+            _persist_audio(current_audio, current_audio_path)
+        except Exception as e:
+            print(f"[backend.video_generator] 保存音频失败: {e}")
+            current_audio_path = ref_audio_path
+
     # 更新 data 中的音频路径，确保后续模型使用最终处理过的音频
     data['ref_audio'] = current_audio_path
 
@@ -190,9 +261,12 @@ def generate_video(data):
         print("[backend.video_generator] 错误: 没有有效的音频输入，无法生成视频")
         return pm.get_res_video_path("error.mp4")
 
+    context.check_cancelled()
+
     if model_name == "SyncTalk":
         try:
             print("[backend.video_generator] 开始 SyncTalk 推理...")
+            context.update_progress(0.4, "SyncTalk 推理")
             # 构建 SyncTalk 推理命令
             gpu_id = str(data.get('gpu_choice', '0')).replace("GPU", "")
             
@@ -207,7 +281,7 @@ def generate_video(data):
             ]
 
             print(f"[backend.video_generator] 执行命令: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = run_subprocess(cmd, context, capture_output=True, text=True)
             
             if result.returncode != 0:
                 print(f"[backend.video_generator] SyncTalk 警告 (returncode {result.returncode}):")
@@ -241,6 +315,8 @@ def generate_video(data):
             print(f"[backend.video_generator] SyncTalk 未找到结果文件: {source_path}")
             return pm.get_res_video_path("out.mp4")
 
+        except JobCancelled:
+            raise
         except Exception as e:
             print(f"[backend.video_generator] SyncTalk 执行异常: {e}")
             return pm.get_res_video_path("error.mp4")
@@ -262,13 +338,18 @@ def generate_video(data):
                 return pm.get_res_video_path("error.mp4")
 
             # 提取音频特征 (.wav -> .npy)
+            context.update_progress(0.4, "提取音频特征")
             audio_npy_path = current_audio_path.replace('.wav', '.npy')
-            success = run_extract_audio_features(pm, current_audio_path, audio_npy_path)
+            gpu_id = _parse_gpu_id(data.get('gpu_choice'))
+            success = run_extract_audio_features(pm, current_audio_path, audio_npy_path, gpu_id=gpu_id)
 
             if not success:
                 print("[backend.video_generator] 错误: ER-NeRF 音频特征提取失败")
                 return pm.get_res_video_path("error.mp4")
 
+            context.check_cancelled()
+            context.update_progress(0.6, "ER-NeRF 推理")
+
             if USE_DOCKER_FOR_ERNERF:
                 # Docker模式
                 print("[backend.video_generator] 使用Docker模式调用ER-NeRF...")
@@ -280,7 +361,8 @@ def generate_video(data):
                         data_path=dataset_path,
                         model_path=model_path,
                         audio_npy_path=audio_npy_path,
-                        with_torso=True
+                        with_torso=True,
+                        gpu_id=gpu_id
                     )
 
                     if success:
@@ -330,8 +412,9 @@ def generate_video(data):
 
                 print(f"[backend.video_generator] 执行命令: {' '.join(cmd)}")
 
-                subprocess.run(
+                run_subprocess(
                     cmd,
+                    context,
                     capture_output=True,
                     text=True,
                     check=True,
@@ -369,6 +452,8 @@ def generate_video(data):
                     print("[backend.video_generator] ER-NeRF 推理完成但未找到生成的视频文件")
                     return pm.get_res_video_path("out.mp4")
 
+        except JobCancelled:
+            raise
         except subprocess.CalledProcessError as e:
             print(f"[backend.video_generator] ER-NeRF 命令执行失败 (code {e.returncode})")
             print(f"Stderr: {e.stderr}")
@@ -19,13 +19,16 @@ import os
 import sys
 import time
 import uuid
+import struct
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+
 # 添加项目根目录到Python路径
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.append(str(PROJECT_ROOT))
@@ -33,8 +36,9 @@ sys.path.append(str(PROJECT_ROOT))
 # 导入CosyVoice核心模块
 from .CV_clone import (
     VoiceCloneResult, AudioMetadata,
-    get_cosy_service
+    get_cosy_service, VLLM_OPT_IN_ENV
 )
+from .audio_buffer import AudioBuffer
 
 
 # ==================== 枚举类定义 ====================
@@ -60,6 +64,9 @@ class VoiceGenerationResult:
     generation_time: float = 0.0
     error_message: Optional[str] = None
     created_time: datetime = None
+    segment_count: int = 0      # 合成的文本片段数
+    queue_time: float = 0.0     # 批量合成时本条目开始合成前的等待时间
+    audio_buffer: Optional[AudioBuffer] = None  # 合成音频的内存副本（未落盘时为唯一结果）
 
     def __post_init__(self):
         if self.created_time is None:
@@ -69,7 +76,7 @@ class VoiceGenerationResult:
 
     @property
     def is_success(self) -> bool:
-        return self.success and self.audio_path is not None
+        return self.success and (self.audio_path is not None or self.audio_buffer is not None)
 
     @property
     def is_failed(self) -> bool:
@@ -79,7 +86,7 @@ class VoiceGenerationResult:
 @dataclass
 class ServiceConfig:
     """服务配置"""
-    enable_vllm: bool = False
+    enable_vllm: bool = False  # 允许使用VLLM，实际加载还需设置 COSYVOICE_ENABLE_VLLM=1
     log_level: str = "INFO"
 
 
@@ -95,6 +102,31 @@ class ServiceNotInitialized(VoiceGeneratorError):
     pass
 
 
+# ==================== 音频流编码 ====================
+
+def build_streaming_wav_header(sample_rate: int, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """
+    构建流式 WAV 文件头
+
+    流式输出时总长度未知，RIFF 和 data 块长度使用 0xFFFFFFFF 占位，
+    浏览器和常见播放器会一直读取到连接关闭。
+    """
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (
+        b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE' +
+        b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, sample_rate,
+                              byte_rate, block_align, bits_per_sample) +
+        b'data' + struct.pack('<I', 0xFFFFFFFF)
+    )
+
+
+def segment_to_pcm16(segment) -> bytes:
+    """将模型输出的浮点音频片段转换为 16-bit PCM 字节"""
+    samples = segment.detach().cpu().numpy().reshape(-1)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
 # ==================== 主服务类 ====================
 
 class CosyVoiceService:
@@ -150,7 +182,7 @@ class CosyVoiceService:
 
             # 初始化CosyVoice核心服务
             self.logger.info("[CosyVoiceService] 初始化语音生成服务...")
-            self._cosy_service = get_cosy_service()
+            self._cosy_service = get_cosy_service(load_vllm=self._config.enable_vllm)
 
             self.logger.info("[CosyVoiceService] 服务初始化完成")
             self._log_service_status()
@@ -188,7 +220,10 @@ class CosyVoiceService:
             else:
                 self.logger.warning("❌ CosyVoice核心服务: 未就绪")
 
-            self.logger.info(f"VLLM启用: {self._config.enable_vllm}")
+            model_manager = getattr(self._cosy_service, 'model_manager', None)
+            vllm_active = bool(model_manager and model_manager.supports_concurrent_inference())
+            self.logger.info(f"VLLM启用: {vllm_active}（请求: {self._config.enable_vllm}，"
+                             f"需设置 {VLLM_OPT_IN_ENV}=1）")
             self.logger.info("=" * 50)
 
         except Exception as e:
@@ -197,7 +232,8 @@ class CosyVoiceService:
     def clone_voice(self, text: str, reference_audio: str,
                    prompt_text: Optional[str] = None,
                    output_filename: Optional[str] = None,
-                   speed: float = 1.0, language: Language = Language.CHINESE) -> VoiceGenerationResult:
+                   speed: float = 1.0, language: Language = Language.CHINESE,
+                   save_output: bool = True) -> VoiceGenerationResult:
         """
         语音克隆主接口
 
@@ -208,6 +244,7 @@ class CosyVoiceService:
             output_filename: 输出文件名（可选）
             speed: 语速控制（0.1-3.0）
             language: 语言设置
+            save_output: 是否写出音频文件（后续还要在内存中处理时可设为 False，结果见 audio_buffer）
 
         Returns:
             VoiceGenerationResult: 生成结果
@@ -226,22 +263,12 @@ class CosyVoiceService:
             self.logger.info(f"  参考音频: {reference_audio}")
 
             # 输入验证
-            if not text or not text.strip():
-                result.error_message = "文本内容不能为空"
-                return result
-
-            if not os.path.exists(reference_audio):
-                result.error_message = f"参考音频文件不存在: {reference_audio}"
+            error_message = self._validate_inputs(text, reference_audio, speed)
+            if error_message:
+                result.error_message = error_message
                 return result
 
             text = text.strip()
-            if len(text) > 5000:
-                result.error_message = "文本长度不能超过5000字符"
-                return result
-
-            if speed <= 0 or speed > 3.0:
-                result.error_message = "语速必须在0-3.0范围内"
-                return result
 
             # 执行语音生成
             cosy_result = self._cosy_service.clone_voice(
@@ -250,7 +277,8 @@ class CosyVoiceService:
                 prompt_text=prompt_text,
                 output_filename=output_filename,
                 speed=speed,
-                stream=False
+                stream=False,
+                save_output=save_output
             )
 
             generation_time = time.time() - start_time
@@ -261,10 +289,11 @@ class CosyVoiceService:
                     success=True,
                     audio_path=cosy_result.audio_path,
                     audio_metadata=cosy_result.audio_metadata,
-                    generation_time=generation_time
+                    generation_time=generation_time,
+                    audio_buffer=cosy_result.audio_buffer
                 )
 
-                self.logger.info(f"[CosyVoiceService] 语音克隆成功: {cosy_result.audio_path}")
+                self.logger.info(f"[CosyVoiceService] 语音克隆成功: {cosy_result.audio_path or '内存音频'}")
                 self.logger.info(f"  生成时长: {cosy_result.audio_metadata.duration:.2f}s")
                 self.logger.info(f"  耗时: {generation_time:.2f}s")
 
@@ -281,6 +310,169 @@ class CosyVoiceService:
             self.logger.error(f"[CosyVoiceService] 语音克隆异常: {e}")
             return result
 
+    def clone_voice_batch(self, texts: List[str], reference_audio: str,
+                          prompt_text: Optional[str] = None,
+                          output_prefix: Optional[str] = None,
+                          speed: float = 1.0) -> List[VoiceGenerationResult]:
+        """
+        批量语音克隆接口
+
+        同一参考音频的多条文本共享一次提示准备，长文本按句切分后并发合成。
+
+        Args:
+            texts: 要生成的文本列表
+            reference_audio: 参考音频文件路径
+            prompt_text: 提示文本（可选）
+            output_prefix: 输出文件名前缀（可选）
+            speed: 语速控制（0.1-3.0）
+
+        Returns:
+            List[VoiceGenerationResult]: 与 texts 顺序一致的结果列表，
+            每条结果的 generation_time 为该条目自身的合成耗时
+        """
+        results = [VoiceGenerationResult(task_id=str(uuid.uuid4()), success=False) for _ in texts]
+
+        # 逐条验证，无效条目直接返回错误，不影响其余条目
+        valid_indices = []
+        for i, text in enumerate(texts):
+            error_message = self._validate_inputs(text, reference_audio, speed)
+            if error_message:
+                results[i].error_message = error_message
+            else:
+                valid_indices.append(i)
+
+        if not valid_indices:
+            return results
+
+        self.logger.info(f"[CosyVoiceService] 开始批量语音克隆: {len(valid_indices)} 条")
+        self.logger.info(f"  参考音频: {reference_audio}")
+
+        try:
+            cosy_results = self._cosy_service.clone_voice_batch(
+                texts=[texts[i].strip() for i in valid_indices],
+                reference_audio_path=reference_audio,
+                prompt_text=prompt_text,
+                output_prefix=output_prefix,
+                speed=speed
+            )
+        except Exception as e:
+            self.logger.error(f"[CosyVoiceService] 批量语音克隆异常: {e}")
+            for i in valid_indices:
+                results[i].error_message = str(e)
+            return results
+
+        for i, cosy_result in zip(valid_indices, cosy_results):
+            result = results[i]
+            result.generation_time = cosy_result.generation_time
+            result.segment_count = cosy_result.segment_count
+            result.queue_time = cosy_result.queue_time
+            if cosy_result.is_valid:
+                result.success = True
+                result.audio_path = cosy_result.audio_path
+                result.audio_metadata = cosy_result.audio_metadata
+            else:
+                result.error_message = cosy_result.error_message or "生成失败"
+
+        succeeded = sum(1 for result in results if result.is_success)
+        self.logger.info(f"[CosyVoiceService] 批量语音克隆完成: {succeeded}/{len(texts)} 成功")
+        return results
+
+    def _validate_inputs(self, text: str, reference_audio: str, speed: float) -> Optional[str]:
+        """校验克隆参数，返回错误信息（通过时返回 None）"""
+        if not text or not text.strip():
+            return "文本内容不能为空"
+
+        if not reference_audio or not os.path.exists(reference_audio):
+            return f"参考音频文件不存在: {reference_audio}"
+
+        if len(text.strip()) > 5000:
+            return "文本长度不能超过5000字符"
+
+        if speed <= 0 or speed > 3.0:
+            return "语速必须在0-3.0范围内"
+
+        return None
+
+    def clone_voice_stream(self, text: str, reference_audio: str,
+                           prompt_text: Optional[str] = None,
+                           speed: float = 1.0, audio_format: str = "wav") -> Iterator[bytes]:
+        """
+        流式语音克隆接口
+
+        返回的生成器在模型产出每个语音片段时立即产出编码后的字节，
+        不在内存中保留完整音频。
+
+        Args:
+            text: 要生成的文本内容
+            reference_audio: 参考音频文件路径
+            prompt_text: 提示文本（可选）
+            speed: 语速控制（0.1-3.0）
+            audio_format: 输出格式，"wav"（带流式文件头）或 "pcm"（16-bit 单声道裸数据）
+
+        Returns:
+            Iterator[bytes]: 音频字节流
+
+        Raises:
+            VoiceGeneratorError: 参数无效或服务不可用
+        """
+        error_message = self._validate_inputs(text, reference_audio, speed)
+        if error_message:
+            raise VoiceGeneratorError(error_message)
+
+        if audio_format not in ("wav", "pcm"):
+            raise VoiceGeneratorError(f"不支持的流式音频格式: {audio_format}")
+
+        self.logger.info("[CosyVoiceService] 开始流式语音克隆")
+        self.logger.info(f"  文本: {text[:50]}...")
+        self.logger.info(f"  参考音频: {reference_audio}")
+
+        try:
+            segments = self._cosy_service.clone_voice_stream(
+                text=text.strip(),
+                reference_audio_path=reference_audio,
+                prompt_text=prompt_text,
+                speed=speed
+            )
+            sample_rate = self._cosy_service.get_sample_rate()
+        except Exception as e:
+            raise VoiceGeneratorError(f"流式语音克隆失败: {e}") from e
+
+        return self._encode_stream(segments, sample_rate, audio_format)
+
+    def _encode_stream(self, segments: Iterator, sample_rate: int, audio_format: str) -> Iterator[bytes]:
+        """将音频片段编码为字节流（WAV 文件头在首个片段生成后产出）"""
+        for index, segment in enumerate(segments):
+            if index == 0 and audio_format == "wav":
+                yield build_streaming_wav_header(sample_rate)
+            yield segment_to_pcm16(segment)
+
+    def get_sample_rate(self) -> int:
+        """获取输出音频采样率"""
+        return self._cosy_service.get_sample_rate()
+
+    def register_speaker(self, reference_audio: str, prompt_text: Optional[str] = None) -> Optional[str]:
+        """
+        注册参考音频的说话人特征
+
+        克隆请求会在首次使用参考音频时自动注册；也可提前调用以预热，
+        后续使用同一参考音频的克隆请求将直接复用这些特征。
+
+        Args:
+            reference_audio: 参考音频文件路径
+            prompt_text: 参考音频对应的文本（可选）
+
+        Returns:
+            说话人ID，注册失败时返回 None
+        """
+        try:
+            speaker_id = self._cosy_service.register_speaker(reference_audio, prompt_text)
+            if speaker_id:
+                self.logger.info(f"[CosyVoiceService] 说话人注册成功: {speaker_id[:16]}...")
+            return speaker_id
+        except Exception as e:
+            self.logger.warning(f"[CosyVoiceService] 说话人注册失败: {e}")
+            return None
+
     def generate_speech(self, text: str, language: Language = Language.CHINESE,
                        output_filename: Optional[str] = None) -> VoiceGenerationResult:
         """
@@ -3,7 +3,7 @@
 # ER-NeRF Docker 容器启动脚本
 #
 # 支持模式:
-#   server          - 启动服务器，等待任务
+#   server          - 启动常驻Worker（ER-NeRF/ernerf_worker.py），等待任务
 #   preprocess      - 数据预处理
 #   train           - 模型训练
 #   test            - 模型测试/推理
@@ -67,11 +67,13 @@ start_server() {
     log_info "  - shell: 进入交互式shell"
     echo ""
 
-    log_info "Server ready. Waiting for tasks..."
+    # 常驻 Worker：DeepSpeech 会话和模型保持加载，Backend 通过 HTTP 调用
+    # 一次性命令（docker compose run --rm ernerf <mode>）仍然可用
+    log_info "Starting resident worker on port ${ERNERF_WORKER_PORT:-8888}..."
     log_info "Press Ctrl+C to stop"
 
-    # 保持容器运行
-    tail -f /dev/null
+    cd /workspace/ER-NeRF
+    exec python ernerf_worker.py --host 0.0.0.0 --port "${ERNERF_WORKER_PORT:-8888}"
 }
 
 # ==============================================================================
@@ -483,7 +485,7 @@ main() {
             log_error "未知模式: $1"
             echo ""
             echo "可用模式:"
-            echo "  server          - 启动服务器，等待任务"
+            echo "  server          - 启动常驻Worker（HTTP 8888端口），等待任务"
             echo "  preprocess      - 数据预处理"
             echo "  train           - 模型训练"
             echo "  test            - 模型测试/推理"
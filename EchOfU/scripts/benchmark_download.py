@@ -0,0 +1,215 @@
+"""
+模型下载器基准测试：本地 HTTP 替身服务器上的并行下载、断点续传和哈希校验
+
+替身服务器模拟 HuggingFace 接口：
+    GET /api/models/<repo>/tree/main?recursive=true   文件清单（LFS 文件带 SHA-256）
+    GET /<repo>/resolve/main/<path>                   文件内容，支持 Range，单连接限速
+
+测试内容：
+1. 单连接 vs 多文件并行下载的吞吐量（单连接限速模拟 CDN 的单连接带宽上限）
+2. 大文件传输中途断开后用 Range 续传，只补传剩余字节
+3. 服务器首次返回损坏内容时，哈希校验失败并重新下载
+4. 再次下载时已校验文件直接跳过
+
+使用方式（在 EchOfU/ 目录下）:
+    python scripts/benchmark_download.py
+    python scripts/benchmark_download.py --files 8 --size-mb 16 --rate-mb 8 --workers 1 4 8
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.parallel_downloader import ParallelDownloader, ProgressJournal, fetch_huggingface_manifest
+
+REPO_ID = "standin/test-model"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="模型下载器基准测试（本地替身服务器）")
+    parser.add_argument("--files", type=int, default=6, help="权重文件数量")
+    parser.add_argument("--size-mb", type=float, default=8.0, help="最大文件大小（MB），其余文件依次减半")
+    parser.add_argument("--rate-mb", type=float, default=16.0, help="单连接限速（MB/s）")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 4], help="并行数（可多个）")
+    return parser.parse_args()
+
+
+class StandInServer:
+    """模拟 HuggingFace 的本地文件服务器"""
+
+    def __init__(self, files, rate_bytes):
+        self.files = files                  # path -> bytes
+        self.rate_bytes = rate_bytes
+        self.drop_after = {}                # path -> 首次请求发送多少字节后断开
+        self.corrupt_once = set()           # 首次请求返回损坏内容的文件
+        self.bytes_sent = 0
+        self.range_requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith(f"/api/models/{REPO_ID}/tree/"):
+                    return self._send_tree()
+                prefix = f"/{REPO_ID}/resolve/main/"
+                if self.path.startswith(prefix):
+                    return self._send_file(self.path[len(prefix):])
+                self.send_error(404)
+
+            def _send_tree(self):
+                import json
+                items = [
+                    {"type": "file", "path": path, "size": len(data),
+                     "oid": hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest(),
+                     "lfs": {"oid": hashlib.sha256(data).hexdigest(), "size": len(data)}}
+                    for path, data in server.files.items()
+                ]
+                body = json.dumps(items).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_file(self, path):
+                data = server.files.get(path)
+                if data is None:
+                    return self.send_error(404)
+                with server._lock:
+                    if path in server.corrupt_once:
+                        server.corrupt_once.discard(path)
+                        data = bytes([data[0] ^ 0xFF]) + data[1:]
+                    drop_after = server.drop_after.pop(path, None)
+
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header and range_header.startswith("bytes="):
+                    start = int(range_header[6:].split("-")[0])
+                    with server._lock:
+                        server.range_requests += 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(data) - start))
+                self.end_headers()
+
+                # 按单连接限速分块发送
+                chunk = 64 * 1024
+                position = start
+                sent = 0
+                began = time.monotonic()
+                while position < len(data):
+                    if drop_after is not None and sent >= drop_after:
+                        self.close_connection = True
+                        return
+                    piece = data[position:position + chunk]
+                    try:
+                        self.wfile.write(piece)
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    position += len(piece)
+                    sent += len(piece)
+                    with server._lock:
+                        server.bytes_sent += len(piece)
+                    delay = sent / server.rate_bytes - (time.monotonic() - began)
+                    if delay > 0:
+                        time.sleep(delay)
+
+        return Handler
+
+
+def make_files(count, size_mb):
+    rng = __import__("random").Random(0)
+    files = {}
+    size = int(size_mb * 1024 * 1024)
+    for i in range(count):
+        name = ["llm.pt", "flow.pt", "hift.pt", "campplus.onnx"][i] if i < 4 else f"extra_{i}.bin"
+        files[name] = rng.randbytes(max(size, 1024))
+        size //= 2
+    files["cosyvoice3.yaml"] = b"model: standin\n"
+    return files
+
+
+def main():
+    args = parse_args()
+    files = make_files(args.files, args.size_mb)
+    total_mb = sum(len(data) for data in files.values()) / (1024 * 1024)
+    server = StandInServer(files, int(args.rate_mb * 1024 * 1024)).start()
+    work_dir = tempfile.mkdtemp(prefix="download_bench_")
+
+    try:
+        manifest = fetch_huggingface_manifest(REPO_ID, endpoint=server.endpoint)
+        print(f"{len(manifest.entries)} 个文件，共 {total_mb:.1f}MB，单连接限速 {args.rate_mb:.0f}MB/s")
+
+        # 1. 吞吐量
+        for workers in args.workers:
+            dest = os.path.join(work_dir, f"w{workers}")
+            start = time.perf_counter()
+            report = ParallelDownloader(workers=workers, retries=0).download(manifest, dest)
+            elapsed = time.perf_counter() - start
+            print(f"  workers={workers:<3d} {total_mb / elapsed:7.1f} MB/s  ({elapsed:.2f}s, 成功 {report.success})")
+
+        # 2. 断点续传：最大文件首次请求在一半处断开
+        dest = os.path.join(work_dir, "resume")
+        largest = max(files, key=lambda path: len(files[path]))
+        server.drop_after[largest] = len(files[largest]) // 2
+        server.bytes_sent = 0
+        journal = ProgressJournal(os.path.join(work_dir, "progress.jsonl"), min_interval=0.2)
+        report = ParallelDownloader(workers=4).download(
+            manifest, dest, progress_callback=lambda done, total, speed: journal.append(
+                REPO_ID, {"done": done, "total": total}))
+        extra_mb = (server.bytes_sent - sum(len(d) for d in files.values())) / (1024 * 1024)
+        print(f"  续传: {report.resumed}，Range 请求 {server.range_requests} 次，"
+              f"额外传输 {extra_mb:.2f}MB，成功 {report.success}")
+        print(f"  进度日志: {sum(1 for _ in open(journal.path))} 行，最终 {journal.replay()[REPO_ID]}")
+
+        # 3. 哈希校验失败后重新下载
+        dest = os.path.join(work_dir, "corrupt")
+        server.corrupt_once.add("flow.pt")
+        report = ParallelDownloader(workers=4).download(manifest, dest)
+        intact = all(open(os.path.join(dest, path), "rb").read() == data for path, data in files.items())
+        print(f"  损坏重下: 成功 {report.success}，内容一致 {intact}")
+
+        # 4. 已校验文件跳过
+        server.bytes_sent = 0
+        start = time.perf_counter()
+        report = ParallelDownloader(workers=4).download(manifest, dest)
+        print(f"  再次下载: 跳过 {len(report.skipped)}/{len(manifest.entries)}，"
+              f"传输 {server.bytes_sent} 字节，{(time.perf_counter() - start) * 1000:.1f}ms")
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+ER-NeRF 训练数据加载基准测试：主线程 DataLoader vs 预取流水线（PrefetchLoader），单位 img/s（CPU）
+
+在临时目录生成合成数据集（随机 jpg/png 帧、关键点、音频特征），对每个 --workers 取值
+各跑一个 epoch。--step_ms 在每个 batch 之后 sleep，模拟 GPU 训练一步的耗时，
+预取流水线正是把解码和采样隐藏在这段时间里。
+
+另外检查在 seed_everything 下，不同工作线程数得到的 batch 完全一致。
+
+使用方式（在 EchOfU/ 目录下）:
+    python scripts/benchmark_nerf_dataloader.py
+    python scripts/benchmark_nerf_dataloader.py --frames 64 --H 512 --W 512 --workers 1 2 4 --step_ms 30
+    python scripts/benchmark_nerf_dataloader.py --step_ms 30 --packed 1
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ER-NeRF'))
+
+from nerf_triplane.provider import NeRFDataset
+from nerf_triplane.utils import seed_everything
+
+
+def make_dataset(root, frames, H, W):
+    rng = np.random.default_rng(0)
+    for name in ('gt_imgs', 'torso_imgs', 'landmarks'):
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    # 平滑噪声的压缩率接近真实帧，纯噪声会让解码慢得不真实
+    base = cv2.resize(rng.integers(0, 256, (H // 16, W // 16, 3), dtype=np.uint8), (W, H), interpolation=cv2.INTER_CUBIC)
+    cv2.imwrite(os.path.join(root, 'bc.jpg'), base)
+
+    transform = {'focal_len': 1200.0, 'cx': W / 2, 'cy': H / 2, 'h': H, 'w': W, 'frames': []}
+    for i in range(frames):
+        image = np.roll(base, i * 3, axis=1)
+        cv2.imwrite(os.path.join(root, 'gt_imgs', f'{i}.jpg'), image)
+        alpha = np.full((H, W, 1), 255, dtype=np.uint8)
+        alpha[:H // 4] = 0
+        cv2.imwrite(os.path.join(root, 'torso_imgs', f'{i}.png'), np.concatenate([image, alpha], axis=-1))
+
+        lms = np.stack([rng.uniform(W * 0.3, W * 0.7, 68), rng.uniform(H * 0.3, H * 0.7, 68)], axis=-1)
+        np.save(os.path.join(root, 'landmarks', f'{i}.npy'), lms.astype(np.float32))
+
+        pose = np.eye(4)
+        pose[:3, 3] = [0, 0, 1 + 0.01 * i]
+        transform['frames'].append({'img_id': i, 'aud_id': i, 'transform_matrix': pose.tolist()})
+
+    for split in ('train', 'val'):
+        with open(os.path.join(root, f'transforms_{split}.json'), 'w') as f:
+            json.dump(transform, f)
+
+    np.save(os.path.join(root, 'aud_ds.npy'), rng.standard_normal((frames, 16, 29)).astype(np.float32))
+    with open(os.path.join(root, 'au.csv'), 'w') as f:
+        f.write('frame, AU45_r\n' + ''.join(f'{i},{rng.uniform(0, 2):.3f}\n' for i in range(frames)))
+
+
+def make_opt(path, args, data_workers):
+    return argparse.Namespace(
+        path=path, preload=args.preload, packed=args.packed, data_workers=data_workers, prefetch=args.prefetch,
+        scale=4, offset=[0, 0, 0], bound=1, fp16=False, data_range=[0, -1], num_rays=args.num_rays,
+        part=False, part2=False, asr=False, aud='', asr_model='deepspeech', emb=False, att=2,
+        torso=args.torso, exp_eye=True, smooth_eye=False, finetune_lips=False, patch_size=1,
+        smooth_path=False, smooth_path_window=7, bg_img='',
+    )
+
+
+def run_epoch(loader, step_ms):
+    count = 0
+    start = time.perf_counter()
+    for data in loader:
+        data['images'].sum().item() # 消费 batch
+        if step_ms > 0:
+            time.sleep(step_ms / 1000)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def first_batches(path, args, data_workers, count=4):
+    seed_everything(0)
+    loader = NeRFDataset(make_opt(path, args, data_workers), device='cpu', type='train').dataloader()
+    batches = []
+    for data in loader:
+        batches.append(data)
+        if len(batches) == count:
+            break
+    return batches
+
+
+def same_batches(a, b):
+    for x, y in zip(a, b):
+        for key, value in x.items():
+            if torch.is_tensor(value) and not torch.equal(value, y[key]):
+                return False
+    return len(a) == len(b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ER-NeRF 训练数据加载基准测试（CPU）')
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--H', type=int, default=512)
+    parser.add_argument('--W', type=int, default=512)
+    parser.add_argument('--num_rays', type=int, default=4096 * 16)
+    parser.add_argument('--preload', type=int, default=0, help="0 = 每步从磁盘解码, 1 = 预加载到内存")
+    parser.add_argument('--packed', type=int, default=0)
+    parser.add_argument('--torso', action='store_true')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4])
+    parser.add_argument('--prefetch', type=int, default=4)
+    parser.add_argument('--step_ms', type=float, default=0, help="模拟每步训练耗时（毫秒）")
+    parser.add_argument('--epochs', type=int, default=2)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='nerf_data_bench_')
+    try:
+        make_dataset(root, args.frames, args.H, args.W)
+        print(f"{args.frames} 帧 {args.H}x{args.W}，每步 {args.num_rays} 条光线，preload={args.preload}，"
+              f"packed={args.packed}，torso={args.torso}，模拟训练步 {args.step_ms}ms")
+
+        for data_workers in [0] + args.workers:
+            seed_everything(0)
+            loader = NeRFDataset(make_opt(root, args, data_workers), device='cpu', type='train').dataloader()
+            rates = [run_epoch(loader, args.step_ms) for _ in range(args.epochs)]
+            name = '主线程' if data_workers == 0 else f'data_workers={data_workers}'
+            print(f'  {name:<16s} {max(rates):7.1f} img/s')
+
+        # 以 1 个工作线程的结果为基准（同时检验重复运行的一致性）
+        reference = first_batches(root, args, 1)
+        deterministic = all(same_batches(reference, first_batches(root, args, w)) for w in sorted({1, *args.workers}))
+        print(f'  同一种子下重复运行、不同工作线程数结果一致: {deterministic}')
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+变调策略基准测试：Librosa 整段变调 vs 分块相位声码器
+
+输出每种质量预设下的处理耗时（实时倍率）、相对加速比，
+以及两种策略输出之间的对数谱距离（LSD，dB，越小越接近）。
+
+使用方式（在 EchOfU/ 目录下）:
+    python scripts/benchmark_pitch_shift.py
+    python scripts/benchmark_pitch_shift.py --input static/voices/ref_voices/demo.wav --steps -4 3 7
+    python scripts/benchmark_pitch_shift.py --duration 300 --chunk 4096
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.audio_buffer import AudioBuffer
+from backend.pitch_shift import (
+    LibrosaPitchShiftStrategy, PhaseVocoderPitchShiftStrategy, PitchShiftConfig
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="变调策略基准测试")
+    parser.add_argument("--input", type=str, help="测试音频（默认合成谐波信号）")
+    parser.add_argument("--duration", type=float, default=60.0, help="合成信号时长（秒）")
+    parser.add_argument("--sample-rate", type=int, default=22050, help="合成信号采样率")
+    parser.add_argument("--steps", type=float, nargs="+", default=[-4.0, 3.0], help="变调半音数")
+    parser.add_argument("--presets", nargs="+", default=["fast", "balanced", "high_quality"])
+    parser.add_argument("--chunk", type=int, default=4096, help="流式测试的输入块大小（采样）")
+    return parser.parse_args()
+
+
+def synthesize_voice_like(duration, sample_rate):
+    """带颤音和包络的谐波信号，近似人声的频谱结构"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    f0 = 160.0 * (1.0 + 0.03 * np.sin(2 * np.pi * 5.0 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    signal = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 * (1.0 + np.sin(2 * np.pi * 1.5 * t))
+    return (0.3 * signal * envelope).astype(np.float32)
+
+
+def log_spectral_distance(a, b, n_fft=2048, hop=512):
+    """两段音频的对数谱距离（dB）"""
+    length = min(len(a), len(b))
+    window = np.hanning(n_fft + 1)[:-1]
+
+    def spectrum(x):
+        frames = np.lib.stride_tricks.sliding_window_view(x[:length], n_fft)[::hop]
+        return 20 * np.log10(np.abs(np.fft.rfft(frames * window, axis=1)) + 1e-6)
+
+    diff = spectrum(a) - spectrum(b)
+    return float(np.mean(np.sqrt(np.mean(diff ** 2, axis=1))))
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    args = parse_args()
+
+    if args.input:
+        buffer = AudioBuffer.from_file(args.input)
+        audio, sample_rate = buffer.as_float32(), buffer.sample_rate
+    else:
+        audio, sample_rate = synthesize_voice_like(args.duration, args.sample_rate), args.sample_rate
+    duration = len(audio) / sample_rate
+    print(f"音频: {duration:.1f}s @ {sample_rate}Hz")
+
+    librosa_strategy = LibrosaPitchShiftStrategy()
+    vocoder_strategy = PhaseVocoderPitchShiftStrategy()
+
+    # 预热（librosa 首次调用包含 numba 编译和重采样滤波器加载）
+    warmup_config = PitchShiftConfig(pitch_steps=1.0)
+    librosa_strategy.shift_pitch(audio[:sample_rate], sample_rate, warmup_config)
+    vocoder_strategy.shift_pitch(audio[:sample_rate], sample_rate, warmup_config)
+
+    header = f"{'preset':<13}{'steps':>6}{'librosa x RT':>14}{'vocoder x RT':>14}{'stream x RT':>13}{'speedup':>9}{'LSD dB':>9}"
+    print(header)
+    print("-" * len(header))
+
+    for preset in args.presets:
+        for steps in args.steps:
+            config = PitchShiftConfig(pitch_steps=steps, quality_preset=preset, auto_normalize=False)
+
+            librosa_time, (librosa_out, _) = timed(
+                lambda: librosa_strategy.shift_pitch(audio, sample_rate, config))
+            vocoder_time, (vocoder_out, _) = timed(
+                lambda: vocoder_strategy.shift_pitch(audio, sample_rate, config))
+
+            blocks = (audio[i:i + args.chunk] for i in range(0, len(audio), args.chunk))
+            stream_time, _ = timed(
+                lambda: [block for block in vocoder_strategy.shift_pitch_stream(blocks, sample_rate, config)])
+
+            lsd = log_spectral_distance(np.asarray(librosa_out), np.asarray(vocoder_out))
+            print(f"{preset:<13}{steps:>6.1f}"
+                  f"{duration / librosa_time:>14.1f}{duration / vocoder_time:>14.1f}{duration / stream_time:>13.1f}"
+                  f"{librosa_time / vocoder_time:>9.2f}{lsd:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
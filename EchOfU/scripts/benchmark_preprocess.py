@@ -0,0 +1,192 @@
+"""
+参考音频预处理基准测试：旧流程（全量解码 + 多次遍历）vs 单次解码融合流程
+
+旧流程按原实现复现：librosa.load(sr=None) → 验证（RMS）→ 复制 → 裁剪 → librosa.resample
+→ 归一化（RMS）→ 质量分析（逐帧过零率、RMS、能量、动态范围）→ 再次验证（RMS）→ 保存。
+融合流程即 AudioPreprocessor.preprocess：文件头探测 → 按目标采样率解码 → 单遍统计复用。
+
+另外对比时长探测：完整解码 vs 只读文件头（AudioValidator 使用的方式），
+以及 preprocess_batch 在不同工作进程数下的吞吐量（段/秒）。
+
+使用方式（在 EchOfU/ 目录下）:
+    python scripts/benchmark_preprocess.py
+    python scripts/benchmark_preprocess.py --input static/voices/ref_voices --repeat 5
+    python scripts/benchmark_preprocess.py --clips 20 --duration 12 --sample-rate 48000 --denoise
+    python scripts/benchmark_preprocess.py --denoise --denoise-method spectral_gate
+    python scripts/benchmark_preprocess.py --clips 64 --workers 1 2 4 8
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import librosa
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.audio_preprocessor import (
+    AudioPreprocessor, AudioQualityAnalyzer, ComprehensivePreprocessStrategy, DenoiseMethod, PreprocessConfig
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="参考音频预处理基准测试")
+    parser.add_argument("--input", type=str, help="参考音频目录（默认合成测试音频）")
+    parser.add_argument("--clips", type=int, default=10, help="合成音频数量")
+    parser.add_argument("--duration", type=float, default=8.0, help="合成音频时长（秒）")
+    parser.add_argument("--sample-rate", type=int, default=44100, help="合成音频采样率")
+    parser.add_argument("--target-sample-rate", type=int, default=24000, help="预处理目标采样率")
+    parser.add_argument("--denoise", action="store_true", help="包含降噪步骤（默认关闭，只比较解码与分析开销）")
+    parser.add_argument("--denoise-method", default=DenoiseMethod.AUTO.value,
+                        choices=[method.value for method in DenoiseMethod], help="融合流程的降噪方法")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最好成绩")
+    parser.add_argument("--workers", type=int, nargs="*", default=[], help="批量预处理的工作进程数（可多个）")
+    return parser.parse_args()
+
+
+def synthesize_clips(directory, count, duration, sample_rate):
+    """带静音首尾和噪声底的谐波信号"""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        t = np.arange(int(duration * sample_rate)) / sample_rate
+        f0 = 120.0 + 20.0 * i
+        voice = sum(np.sin(2 * np.pi * k * f0 * t) / k for k in range(1, 10))
+        envelope = np.clip(np.sin(np.pi * t / duration) * 1.5, 0, 1) ** 2
+        audio = 0.2 * voice * envelope + 0.003 * rng.standard_normal(t.shape)
+        path = os.path.join(directory, f"clip_{i:03d}.wav")
+        sf.write(path, audio.astype(np.float32), sample_rate)
+        paths.append(path)
+    return paths
+
+
+# ---------- 旧流程（原实现） ----------
+
+def legacy_preprocess(path, config, output_path):
+    strategy = ComprehensivePreprocessStrategy()
+    analyzer = AudioQualityAnalyzer()
+
+    audio, sr = librosa.load(path, sr=None)
+    np.sqrt(np.mean(audio ** 2))  # 验证
+
+    processed = audio.copy()
+    if config.trim:
+        processed = strategy._trim_silence(processed)
+    if sr != config.target_sample_rate:
+        processed = librosa.resample(processed, orig_sr=sr, target_sr=config.target_sample_rate)
+        sr = config.target_sample_rate
+    if config.denoise:
+        processed = strategy._denoise(processed, sr)
+    if config.normalize:
+        rms = np.sqrt(np.mean(processed ** 2))
+        processed = processed * float(np.clip(10 ** (-3.0 / 20) / max(rms, 1e-10), 0.5, 2.0))
+        20 * np.log10(np.max(np.abs(audio)) + 1e-10)
+        20 * np.log10(np.max(np.abs(processed)) + 1e-10)
+
+    # 质量分析（逐帧过零率 + 多次遍历）
+    mean_zcr = float(np.mean(librosa.feature.zero_crossing_rate(processed)[0]))
+    rms = float(np.sqrt(np.mean(processed ** 2)))
+    np.sum(processed ** 2)
+    dynamic_range = float(np.max(processed) - np.min(processed))
+    scores = {
+        'duration': analyzer._score_duration(len(processed) / sr),
+        'sample_rate': analyzer._score_sample_rate(sr),
+        'clarity': analyzer._score_clarity(mean_zcr),
+        'snr': analyzer._score_snr(rms),
+        'energy': analyzer._score_energy(rms),
+        'dynamic_range': analyzer._score_dynamic_range(dynamic_range),
+    }
+    weights = {'duration': 0.20, 'sample_rate': 0.15, 'clarity': 0.25,
+               'snr': 0.20, 'energy': 0.10, 'dynamic_range': 0.10}
+
+    np.sqrt(np.mean(processed ** 2))  # 再次验证
+    sf.write(output_path, processed, sr)
+    return round(sum(scores[key] * weights[key] for key in weights), 1)
+
+
+def best_time(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    args = parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="preprocess_bench_")
+    try:
+        if args.input:
+            paths = sorted(
+                os.path.join(args.input, name) for name in os.listdir(args.input)
+                if name.lower().endswith((".wav", ".flac", ".ogg", ".mp3"))
+            )
+        else:
+            paths = synthesize_clips(work_dir, args.clips, args.duration, args.sample_rate)
+        if not paths:
+            print(f"目录中没有音频: {args.input}")
+            return
+
+        config = PreprocessConfig(target_sample_rate=args.target_sample_rate, denoise=args.denoise,
+                                  denoise_method=args.denoise_method)
+        preprocessor = AudioPreprocessor(output_dir=work_dir)
+        output_path = os.path.join(work_dir, "out.wav")
+
+        # 预热（librosa 首次调用包含 numba 编译和重采样滤波器加载）
+        legacy_preprocess(paths[0], config, output_path)
+        preprocessor.preprocess(paths[0], output_path=output_path, config=config)
+
+        legacy_time, legacy_scores = best_time(
+            lambda: [legacy_preprocess(path, config, output_path) for path in paths], args.repeat)
+        fused_time, fused_results = best_time(
+            lambda: [preprocessor.preprocess(path, output_path=output_path, config=config) for path in paths],
+            args.repeat)
+
+        decode_time, _ = best_time(lambda: [sf.read(path) for path in paths], args.repeat)
+        probe_time, _ = best_time(lambda: [sf.info(path) for path in paths], args.repeat)
+
+        failed = [r.error_message for r in fused_results if not r.success]
+        if failed:
+            print(f"融合流程失败: {failed[0]}")
+            return
+        score_diff = max(abs(a - r.quality_score) for a, r in zip(legacy_scores, fused_results))
+
+        count = len(paths)
+        denoise_label = args.denoise_method if args.denoise else '关'
+        print(f"{count} 段音频，目标采样率 {args.target_sample_rate}Hz，降噪: {denoise_label}")
+        print(f"  预处理  旧流程: {legacy_time / count * 1000:8.1f} ms/段")
+        print(f"          融合:   {fused_time / count * 1000:8.1f} ms/段  "
+              f"(x{legacy_time / max(fused_time, 1e-9):.2f}, 质量评分最大差 {score_diff:.1f})")
+        print(f"  时长探测 完整解码: {decode_time / count * 1000:6.2f} ms/段")
+        print(f"          文件头:   {probe_time / count * 1000:6.2f} ms/段  "
+              f"(x{decode_time / max(probe_time, 1e-9):.0f})")
+
+        # 批量预处理吞吐量（含进程池启动开销）
+        batch_dir = os.path.join(work_dir, "batch")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = list(preprocessor.preprocess_batch(paths, config=config, workers=workers,
+                                                         output_dir=batch_dir))
+            elapsed = time.perf_counter() - start
+            throughput = count / elapsed
+            baseline = baseline or throughput
+            ok = sum(r.success for r in results)
+            print(f"  批量 workers={workers:<3d} {throughput:8.1f} 段/秒  "
+                  f"(x{throughput / baseline:.2f}, 成功 {ok}/{count})")
+        if args.workers:
+            print(f"  汇总统计: {preprocessor.get_stats()}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
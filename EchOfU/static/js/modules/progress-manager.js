@@ -0,0 +1,63 @@
+/**
+ * 任务进度管理模块
+ * 轮询后台任务队列 (/api/jobs/<id>) 直到任务结束
+ */
+class ProgressManager {
+    constructor() {
+        this.POLL_INTERVAL = 1000; // 轮询间隔（毫秒）
+    }
+
+    /**
+     * 获取任务状态
+     * @param {string} jobId - 任务ID
+     * @returns {Promise<Object>} 任务信息
+     */
+    async getJob(jobId) {
+        const response = await fetch(`/api/jobs/${encodeURIComponent(jobId)}`);
+        const result = await response.json();
+
+        if (result.status !== 'success') {
+            throw new Error(result.message || '获取任务状态失败');
+        }
+        return result.job;
+    }
+
+    /**
+     * 等待任务结束
+     * @param {string} jobId - 任务ID
+     * @param {Function} onProgress - 进度回调，参数为任务信息
+     * @returns {Promise<Object>} 已完成任务的结果
+     */
+    async waitForJob(jobId, onProgress = null) {
+        while (true) {
+            const job = await this.getJob(jobId);
+            if (onProgress) {
+                onProgress(job);
+            }
+
+            if (job.status === 'succeeded') {
+                return job.result || {};
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || '任务执行失败');
+            }
+            if (job.status === 'cancelled') {
+                throw new Error('任务已取消');
+            }
+
+            await new Promise(resolve => setTimeout(resolve, this.POLL_INTERVAL));
+        }
+    }
+
+    /**
+     * 取消任务
+     * @param {string} jobId - 任务ID
+     */
+    async cancelJob(jobId) {
+        const response = await fetch(`/api/jobs/${encodeURIComponent(jobId)}/cancel`, { method: 'POST' });
+        return await response.json();
+    }
+}
+
+// 创建全局实例
+window.progressManager = new ProgressManager();